@@ -4,25 +4,93 @@ VPN IPsec Client Application - Main Entry Point
 This module initializes and runs the Qt application.
 """
 
+import argparse
 import sys
 import os
 
 # Adiciona o diretório pai (src) ao sys.path para permitir importações relativas
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from PySide6.QtWidgets import QApplication
-from src.ui.main_window import MainWindow
-from src.utils.system_theme import get_system_color_scheme # Importar a nova função
 
 
 def load_stylesheet(theme: str) -> str:
     """Carrega o stylesheet para o tema especificado."""
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    style_path = os.path.join(script_dir, "src", "assets", "styles", f"{theme}_theme.qss")
-    if os.path.exists(style_path):
-        with open(style_path, "r") as f:
-            return f.read()
-    return ""
+    from src.utils.resources import read_asset_text
+
+    return read_asset_text(f"styles/{theme}_theme.qss")
+
+
+def parse_arguments(argv):
+    """
+    Lê as opções da aplicação; os argumentos restantes (ex.: -platform offscreen) vão para o Qt.
+    """
+    parser = argparse.ArgumentParser(
+        description="Cliente VPN IPsec. Com uma instância já em execução, as opções são repassadas a ela."
+    )
+    actions = parser.add_mutually_exclusive_group()
+    actions.add_argument("--show", action="store_true", help="exibe a janela (padrão)")
+    actions.add_argument("--connect", metavar="CONEXAO", help="conecta a conexão indicada")
+    actions.add_argument(
+        "--disconnect",
+        metavar="CONEXAO",
+        nargs="?",
+        const="",
+        help="desconecta a conexão indicada (sem nome, a selecionada)",
+    )
+    actions.add_argument(
+        "--network-changed",
+        action="store_true",
+        help="avisa a instância em execução de uma mudança de rede (ex.: NetworkManager dispatcher)",
+    )
+    actions.add_argument(
+        "--stats",
+        metavar="PERIODO",
+        nargs="?",
+        const="7d",
+        help="mostra disponibilidade, quedas e MTBF de cada conexão no período (ex.: 24h, 7d; padrão 7d) e sai",
+    )
+    parser.add_argument(
+        "--tray", action="store_true", help="ícone na bandeja; fechar a janela mantém o cliente em segundo plano"
+    )
+    return parser.parse_known_args(argv)
+
+
+def build_command(options) -> dict:
+    from src.utils.single_instance import (
+        ACTION_CONNECT,
+        ACTION_DISCONNECT,
+        ACTION_NETWORK_CHANGED,
+        ACTION_SHOW,
+        make_command,
+    )
+
+    if options.network_changed:
+        return make_command(ACTION_NETWORK_CHANGED)
+    if options.connect:
+        return make_command(ACTION_CONNECT, options.connect)
+    if options.disconnect is not None:
+        return make_command(ACTION_DISCONNECT, options.disconnect)
+    return make_command(ACTION_SHOW)
+
+
+def print_stats(period: str) -> int:
+    """Consulta o histórico dos túneis (sem carregar o Qt nem depender da instância em execução)."""
+    import time
+
+    from src.loggers.event_store import EventStore, format_summary, parse_period
+
+    try:
+        seconds = parse_period(period)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    rows = EventStore().summary(time.time() - seconds)
+    if not rows:
+        print("Nenhum evento registrado.")
+        return 0
+    print(f"Últimos {period}:")
+    print(format_summary(rows))
+    return 0
 
 
 def main() -> None:
@@ -31,7 +99,34 @@ def main() -> None:
 
     Initializes the QApplication, sets the system style, and shows the main window.
     """
-    app = QApplication(sys.argv)
+    from src.utils.single_instance import ACTION_NETWORK_CHANGED, ACTION_SHOW, InstanceLock, send_command
+
+    options, qt_arguments = parse_arguments(sys.argv[1:])
+    if options.stats is not None:
+        sys.exit(print_stats(options.stats))
+    command = build_command(options)
+
+    # Com outra instância em execução, apenas repassar o comando e sair (sem carregar o Qt)
+    instance_lock = InstanceLock()
+    if not instance_lock.acquire():
+        if send_command(command):
+            sys.exit(0)
+        print("A instância em execução não respondeu.", file=sys.stderr)
+        sys.exit(1)
+    if command["action"] == ACTION_NETWORK_CHANGED:
+        # Sem instância em execução não há túneis a recuperar
+        instance_lock.release()
+        sys.exit(0)
+
+    # Importações feitas aqui para que 'import main' (ex.: ferramentas e testes) não carregue o Qt
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+    from src.config.app_config import TRAY_ENABLED
+    from src.ui.app_controller import AppController
+    from src.utils.instance_server import InstanceServer
+    from src.utils.system_theme import get_system_color_scheme
+
+    app = QApplication(sys.argv[:1] + qt_arguments)
 
     # Set the application style to match the system theme (important for Deepin)
     app.setStyle("Fusion")
@@ -44,12 +139,36 @@ def main() -> None:
         stylesheet = load_stylesheet("light")
     app.setStyleSheet(stylesheet)
 
-    # Create and show the main application window
-    ex = MainWindow()
-    ex.show()
+    # Serviços de longa duração; a janela principal é criada (e, na bandeja, recriada) sob demanda
+    controller = AppController(tray_enabled=options.tray or TRAY_ENABLED)
+    if controller.tray_icon is not None:
+        # Fechar a janela não encerra a aplicação: a saída é pelo menu da bandeja
+        app.setQuitOnLastWindowClosed(False)
+    controller.start()
+    controller.show_window()
+
+    # Comandos de execuções seguintes (--show/--connect/--disconnect)
+    instance_server = InstanceServer(parent=app)
+    instance_server.command_received.connect(controller.handle_instance_command)
+    if not instance_server.listen():
+        print("WARNING: Não foi possível escutar comandos de outras instâncias.")
+    if command["action"] != ACTION_SHOW:
+        QTimer.singleShot(0, lambda: controller.handle_instance_command(command))
+
+    if os.environ.get("VPN_CLIENT_LAUNCH_PROBE"):
+        # Usado por packaging/launch_benchmark.py: sinaliza a primeira volta do loop com a janela exibida e sai
+        def _report_shown():
+            print("VPN_CLIENT_SHOWN", flush=True)
+            app.quit()
+
+        QTimer.singleShot(0, _report_shown)
 
     # Execute the application's main loop
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    controller.shutdown()
+    instance_server.close()
+    instance_lock.release()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
@@ -31,18 +31,31 @@ fi
 command -v python3 >/dev/null 2>&1 || { echo "Python3 é necessário mas não está instalado. Abortando."; exit 1; }
 command -v pip >/dev/null 2>&1 || { echo "pip é necessário mas não está instalado. Abortando."; exit 1; }
 
+# Versão do Python que executará a aplicação (os .pyc são específicos da versão)
+PY_VERSION="$(python3 -c 'import sys; print(f"{sys.version_info[0]}.{sys.version_info[1]}")')"
+SITE_PACKAGES="${APP_DIR}/usr/lib/python${PY_VERSION}/site-packages"
+
 echo "Criando estrutura do AppDir..."
 rm -rf ${APP_DIR}
 mkdir -p ${APP_DIR}/usr/bin
-mkdir -p ${APP_DIR}/usr/lib/python3.10/site-packages
+mkdir -p ${SITE_PACKAGES}
 mkdir -p ${APP_DIR}/usr/share/applications
 mkdir -p ${APP_DIR}/usr/share/icons/hicolor/256x256/apps
 mkdir -p ${APP_DIR}/usr/share/icons/hicolor/scalable/apps
 
-echo "Copiando arquivos do projeto..."
-cp -r "$PROJECT_ROOT/src" ${APP_DIR}/usr/bin/
-cp "$PROJECT_ROOT/main.py" ${APP_DIR}/usr/bin/
-cp "$PROJECT_ROOT/requirements.txt" ${APP_DIR}/usr/bin/ 2>/dev/null || echo "requirements.txt não encontrado"
+echo "Instalando dependências no AppDir..."
+
+# Instalar apenas as dependências de execução diretamente no AppDir
+pip install --target ${SITE_PACKAGES} -r "$PROJECT_ROOT/packaging/requirements-runtime.txt"
+
+echo "Removendo módulos e plugins do Qt não utilizados..."
+python3 "$PROJECT_ROOT/packaging/strip_pyside6.py" ${SITE_PACKAGES}
+
+echo "Copiando arquivos do projeto (recursos Qt compilados e bytecode pré-compilado)..."
+# pyside6-rcc do PySide6 recém-instalado
+PATH="${SITE_PACKAGES}/bin:${PATH}" PYTHONPATH="${SITE_PACKAGES}" \
+    python3 "$PROJECT_ROOT/packaging/build_payload.py" ${APP_DIR}/usr/bin --python python3
+python3 -m compileall -q -j 0 --invalidation-mode unchecked-hash ${SITE_PACKAGES}
 
 echo "Criando atalho da aplicação..."
 cat > ${APP_DIR}/usr/share/applications/${APP_NAME}.desktop << EOF
@@ -78,18 +91,15 @@ cp ${APP_DIR}/usr/share/icons/hicolor/scalable/apps/vpn-ipsec-client.svg ${APP_D
 # Copiar o desktop file para o diretório raiz do AppDir
 cp ${APP_DIR}/usr/share/applications/${APP_NAME}.desktop ${APP_DIR}/${APP_NAME}.desktop
 
-echo "Instalando dependências no AppDir..."
-
-# Instalar dependências diretamente no AppDir
-pip install --target ${APP_DIR}/usr/lib/python3.10/site-packages -r "$PROJECT_ROOT/requirements.txt"
-
 # Criar script de inicialização
-cat > ${APP_DIR}/usr/bin/VPN-IPsec-Client << 'EOF'
+cat > ${APP_DIR}/usr/bin/VPN-IPsec-Client << EOF
 #!/bin/bash
-SCRIPT_DIR="$(dirname "$(readlink -f "$0")")"
-export PYTHONPATH="${SCRIPT_DIR}/../lib/python3.10/site-packages:${PYTHONPATH}"
-cd "${SCRIPT_DIR}"
-exec python3 main.py "$@"
+SCRIPT_DIR="\$(dirname "\$(readlink -f "\$0")")"
+export PYTHONPATH="\${SCRIPT_DIR}/../lib/python${PY_VERSION}/site-packages:\${PYTHONPATH}"
+# O AppImage é somente leitura: usar apenas o bytecode pré-compilado
+export PYTHONDONTWRITEBYTECODE=1
+cd "\${SCRIPT_DIR}"
+exec python3 main.py "\$@"
 EOF
 
 chmod +x ${APP_DIR}/usr/bin/VPN-IPsec-Client
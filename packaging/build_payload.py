@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Prepara os arquivos da aplicação para empacotamento (AppImage e .deb).
+
+- copia main.py e src/ (sem __pycache__ e sem arquivos de desenvolvimento);
+- compila src/assets/resources.qrc em src/assets/resources_rc.py com pyside6-rcc
+  e remove os assets avulsos já embutidos no recurso;
+- opcionalmente pré-compila o bytecode (.pyc) com o interpretador de destino, usando
+  invalidação por hash não verificada: em um squashfs somente leitura o Python não
+  consegue gravar __pycache__, e assim também não precisa consultar o mtime dos fontes.
+
+Uso:
+    python3 packaging/build_payload.py DESTINO [--python PYTHON] [--no-compile] [--sourceless]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import xml.etree.ElementTree as ElementTree
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+QRC_PATH = os.path.join("src", "assets", "resources.qrc")
+RESOURCES_MODULE = os.path.join("src", "assets", "resources_rc.py")
+# Ferramentas de desenvolvimento que não fazem parte do pacote
+EXCLUDED_FILES = (os.path.join("src", "utils", "import_budget.py"),)
+
+
+def copy_sources(dest: str) -> None:
+    os.makedirs(dest, exist_ok=True)
+    shutil.copy2(os.path.join(PROJECT_ROOT, "main.py"), dest)
+    shutil.copytree(
+        os.path.join(PROJECT_ROOT, "src"),
+        os.path.join(dest, "src"),
+        ignore=shutil.ignore_patterns("__pycache__", "*.pyc", "resources_rc.py"),
+        dirs_exist_ok=True,
+    )
+    for relative_path in EXCLUDED_FILES:
+        path = os.path.join(dest, relative_path)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def compile_resources(dest: str) -> bool:
+    """
+    Gera o módulo de recursos; retorna False (mantendo os assets avulsos) se o rcc não existir.
+    """
+    rcc = shutil.which("pyside6-rcc")
+    if rcc is None:
+        print("pyside6-rcc não encontrado; os assets serão lidos do sistema de arquivos.")
+        return False
+    qrc_path = os.path.join(dest, QRC_PATH)
+    subprocess.run(
+        [rcc, "--compress-algo", "zlib", qrc_path, "-o", os.path.join(dest, RESOURCES_MODULE)],
+        check=True,
+    )
+    # Os arquivos listados no .qrc agora estão embutidos no módulo
+    assets_dir = os.path.dirname(qrc_path)
+    for element in ElementTree.parse(qrc_path).iter("file"):
+        os.remove(os.path.join(assets_dir, element.text))
+    os.remove(qrc_path)
+    for root, _, _ in sorted(os.walk(assets_dir), reverse=True):
+        if root != assets_dir and not os.listdir(root):
+            os.rmdir(root)
+    return True
+
+
+def compile_bytecode(dest: str, python: str, sourceless: bool) -> None:
+    command = [python, "-m", "compileall", "-q", "-j", "0", "--invalidation-mode", "unchecked-hash"]
+    if sourceless:
+        # .pyc no lugar do .py (importável sem os fontes)
+        command.append("-b")
+    subprocess.run(command + [dest], check=True)
+    if sourceless:
+        for root, dirs, files in os.walk(dest):
+            if "__pycache__" in dirs:
+                dirs.remove("__pycache__")
+                shutil.rmtree(os.path.join(root, "__pycache__"))
+            for name in files:
+                # main.py continua como fonte: é o script executado pelo lançador
+                if name.endswith(".py") and os.path.join(root, name) != os.path.join(dest, "main.py"):
+                    os.remove(os.path.join(root, name))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prepara os arquivos da aplicação para empacotamento.")
+    parser.add_argument("dest", help="diretório de destino (ex.: AppDir/usr/bin)")
+    parser.add_argument("--python", default=sys.executable, help="interpretador que executará a aplicação")
+    parser.add_argument("--no-compile", action="store_true", help="não gerar .pyc (ex.: gerados no postinst)")
+    parser.add_argument("--sourceless", action="store_true", help="distribuir apenas .pyc")
+    args = parser.parse_args(argv)
+
+    dest = os.path.abspath(args.dest)
+    copy_sources(dest)
+    compile_resources(dest)
+    if not args.no_compile:
+        compile_bytecode(dest, args.python, args.sourceless)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -47,13 +47,15 @@ Version: $APP_VERSION
 Section: net
 Priority: optional
 Architecture: amd64
-Depends: python3, python3-pip, python3-pyside6, python3-configparser, python3-cryptography, strongswan, libstrongswan-extra-plugins
+Depends: python3, python3-pip, python3-pyside6.qtcore, python3-pyside6.qtgui, python3-pyside6.qtwidgets, python3-pyside6.qtnetwork, python3-configparser, python3-cryptography, strongswan, libstrongswan-extra-plugins
+Recommends: python3-dnspython, qt6-svg-plugins
 Maintainer: $APP_MAINTAINER
 Description: $APP_DESCRIPTION
 EOF
 
-echo "Criando scripts de manutenção do pacote (postinst, postrm)..."
-# Script post-instalação para atualizar o cache de ícones
+echo "Criando scripts de manutenção do pacote (postinst, prerm, postrm)..."
+# Script post-instalação para atualizar o cache de ícones e pré-compilar o bytecode
+# (compilado na instalação para corresponder à versão do python3 do sistema)
 cat > "$TEMP_DIR/DEBIAN/postinst" << 'EOF'
 #!/bin/sh
 set -e
@@ -62,6 +64,18 @@ if [ "$1" = "configure" ]; then
     if command -v gtk-update-icon-cache >/dev/null 2>&1; then
         gtk-update-icon-cache -q -t -f /usr/share/icons/hicolor || true
     fi
+    echo "Pré-compilando bytecode..."
+    python3 -m compileall -q -j 0 --invalidation-mode unchecked-hash /usr/lib/vpn-ipsec-client || true
+fi
+exit 0
+EOF
+
+# Script pré-remoção para apagar o bytecode gerado no postinst
+cat > "$TEMP_DIR/DEBIAN/prerm" << 'EOF'
+#!/bin/sh
+set -e
+if [ "$1" = "remove" ] || [ "$1" = "upgrade" ]; then
+    find /usr/lib/vpn-ipsec-client -type d -name __pycache__ -prune -exec rm -rf {} + || true
 fi
 exit 0
 EOF
@@ -81,13 +95,12 @@ EOF
 
 # Dar permissão de execução para os scripts
 chmod 755 "$TEMP_DIR/DEBIAN/postinst"
+chmod 755 "$TEMP_DIR/DEBIAN/prerm"
 chmod 755 "$TEMP_DIR/DEBIAN/postrm"
 
 echo "Copiando arquivos da aplicação..."
-# Copiar arquivos principais
-cp -r "$PROJECT_ROOT/src" "$TEMP_DIR/usr/lib/$APP_NAME/"
-cp "$PROJECT_ROOT/main.py" "$TEMP_DIR/usr/lib/$APP_NAME/"
-cp "$PROJECT_ROOT/requirements.txt" "$TEMP_DIR/usr/lib/$APP_NAME/" 2>/dev/null || echo "requirements.txt não encontrado"
+# Copiar arquivos principais, com os assets como recurso Qt compilado (o bytecode é gerado no postinst)
+python3 "$PROJECT_ROOT/packaging/build_payload.py" "$TEMP_DIR/usr/lib/$APP_NAME" --no-compile
 
 # Criar script de inicialização
 cat > "$TEMP_DIR/usr/bin/$APP_NAME" << 'EOF'
@@ -105,7 +118,7 @@ fi
 
 # Executar a aplicação
 cd "$APP_DIR"
-python3 main.py "$@"
+exec python3 main.py "$@"
 EOF
 
 chmod +x "$TEMP_DIR/usr/bin/$APP_NAME"
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Mede o tempo de inicialização da aplicação: do início do processo até a janela
+principal ser exibida (marcador impresso por main.py com VPN_CLIENT_LAUNCH_PROBE=1).
+
+Cada variante é um rótulo e um comando; o comando é executado várias vezes e são
+reportados mínimo, mediana e máximo. Com --drop-caches (requer root) o cache de
+páginas é descartado antes de cada execução, simulando uma inicialização a frio.
+
+Exemplos:
+    python3 packaging/launch_benchmark.py \\
+        --variant "fontes=python3 main.py -platform offscreen" \\
+        --variant "appimage=./VPN-IPsec-Client-0.4.0-x86_64.AppImage -platform offscreen"
+"""
+
+import argparse
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+MARKER = "VPN_CLIENT_SHOWN"
+
+
+def drop_caches() -> None:
+    subprocess.run(["sync"], check=False)
+    with open("/proc/sys/vm/drop_caches", "w") as caches:
+        caches.write("3\n")
+
+
+def measure_launch(command, timeout: float, env=None) -> float:
+    """
+    Executa o comando e retorna os segundos até o marcador aparecer na saída.
+    """
+    process_env = dict(os.environ if env is None else env)
+    process_env["VPN_CLIENT_LAUNCH_PROBE"] = "1"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=process_env
+    )
+    try:
+        for line in process.stdout:
+            if line.strip() == MARKER:
+                return time.perf_counter() - started
+            if time.perf_counter() - started > timeout:
+                break
+        raise RuntimeError(f"marcador não encontrado: {' '.join(command)}")
+    finally:
+        process.kill()
+        process.wait()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compara o tempo de inicialização de variantes de empacotamento.")
+    parser.add_argument("--variant", action="append", required=True, metavar="ROTULO=COMANDO")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--drop-caches", action="store_true", help="inicialização a frio (requer root)")
+    args = parser.parse_args(argv)
+
+    variants = []
+    for spec in args.variant:
+        label, _, command = spec.partition("=")
+        variants.append((label, shlex.split(command)))
+
+    results = {label: [] for label, _ in variants}
+    # Execuções intercaladas para que variações do sistema afetem todas as variantes
+    for _ in range(args.runs):
+        for label, command in variants:
+            if args.drop_caches:
+                drop_caches()
+            results[label].append(measure_launch(command, args.timeout))
+
+    width = max(len(label) for label in results)
+    print(f"{'variante':<{width}}  {'mín':>8}  {'mediana':>8}  {'máx':>8}")
+    for label, timings in results.items():
+        print(
+            f"{label:<{width}}  {min(timings) * 1000:7.0f}ms  "
+            f"{statistics.median(timings) * 1000:7.0f}ms  {max(timings) * 1000:7.0f}ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Remove de uma instalação do PySide6 (site-packages do AppImage) tudo o que a aplicação
+não usa: módulos Python do Qt, plugins, bibliotecas, QML, traduções e ferramentas.
+
+As bibliotecas mantidas são o fechamento das dependências (DT_NEEDED, via readelf) dos
+módulos e plugins mantidos; sem readelf, Qt/lib é preservado inteiro.
+
+Uso:
+    python3 packaging/strip_pyside6.py SITE_PACKAGES [--dry-run]
+"""
+
+import argparse
+import glob
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+# Módulos importados pela aplicação (QtNetwork: QLocalServer/QLocalSocket)
+KEEP_MODULES = {"QtCore", "QtGui", "QtWidgets", "QtNetwork"}
+
+# Plugins por diretório (None mantém o diretório inteiro)
+KEEP_PLUGINS = {
+    # A aplicação força a plataforma xcb; offscreen é usado nas medições sem display
+    "platforms": {"libqxcb.so", "libqoffscreen.so"},
+    "xcbglintegrations": None,
+    "platformthemes": None,
+    "platforminputcontexts": {"libcomposeplatforminputcontextplugin.so", "libibusplatforminputcontextplugin.so"},
+    # Ícones SVG (QIcon) sem importar o módulo Python QtSvg
+    "iconengines": None,
+    "imageformats": {"libqsvg.so"},
+}
+
+# Diretórios do PySide6 sem uso em tempo de execução
+REMOVE_DIRS = ("Qt/qml", "Qt/translations", "Qt/resources", "Qt/libexec", "Qt/metatypes",
+               "include", "typesystems", "glue", "doc", "scripts", "examples")
+REMOVE_TOOLS = ("assistant", "balsam", "balsamui", "designer", "linguist", "lrelease", "lupdate",
+                "qmlformat", "qmllint", "qmlls", "qsb", "svgtoqml", "rcc", "uic")
+
+NEEDED_PATTERN = re.compile(r"\(NEEDED\)\s+Shared library: \[(.+?)\]")
+
+
+def _needed(path: str):
+    result = subprocess.run(["readelf", "-d", path], capture_output=True, text=True, check=False)
+    return NEEDED_PATTERN.findall(result.stdout)
+
+
+def _size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            if not os.path.islink(file_path):
+                total += os.path.getsize(file_path)
+    return total
+
+
+def strip(site_packages: str, dry_run: bool = False) -> None:
+    pyside = os.path.join(site_packages, "PySide6")
+    qt_lib = os.path.join(pyside, "Qt", "lib")
+    plugins_dir = os.path.join(pyside, "Qt", "plugins")
+    removed = []
+
+    def remove(path):
+        removed.append(path)
+        if dry_run:
+            return
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+    size_before = _size(pyside)
+
+    # Módulos Python do Qt não utilizados
+    roots = []
+    for module_path in glob.glob(os.path.join(pyside, "Qt*.abi3.so")):
+        name = os.path.basename(module_path).split(".")[0]
+        if name in KEEP_MODULES:
+            roots.append(module_path)
+        else:
+            remove(module_path)
+    roots += glob.glob(os.path.join(pyside, "libpyside6.abi3.so*"))
+    for stub in glob.glob(os.path.join(pyside, "*.pyi")):
+        remove(stub)
+
+    # Plugins
+    for plugin_dir in sorted(os.listdir(plugins_dir)):
+        path = os.path.join(plugins_dir, plugin_dir)
+        if plugin_dir not in KEEP_PLUGINS:
+            remove(path)
+            continue
+        keep = KEEP_PLUGINS[plugin_dir]
+        for plugin in sorted(os.listdir(path)):
+            if keep is None or plugin in keep:
+                roots.append(os.path.join(path, plugin))
+            else:
+                remove(os.path.join(path, plugin))
+
+    for relative_dir in REMOVE_DIRS:
+        path = os.path.join(pyside, relative_dir)
+        if os.path.exists(path):
+            remove(path)
+    for tool in REMOVE_TOOLS:
+        path = os.path.join(pyside, tool)
+        if os.path.exists(path):
+            remove(path)
+
+    # Bibliotecas do Qt: manter apenas o fechamento das dependências
+    if shutil.which("readelf") is None:
+        print("readelf não encontrado; Qt/lib mantido inteiro.")
+    else:
+        available = set(os.listdir(qt_lib))
+        keep_libs = set()
+        pending = list(roots)
+        while pending:
+            for needed in _needed(pending.pop()):
+                if needed in available and needed not in keep_libs:
+                    keep_libs.add(needed)
+                    pending.append(os.path.join(qt_lib, needed))
+        for lib in sorted(available - keep_libs):
+            remove(os.path.join(qt_lib, lib))
+
+    size_after = size_before if dry_run else _size(pyside)
+    print(f"{len(removed)} itens removidos do PySide6")
+    if dry_run:
+        for path in removed:
+            print(f"  {os.path.relpath(path, pyside)}")
+    else:
+        print(f"Tamanho: {size_before / 2**20:.0f} MiB -> {size_after / 2**20:.0f} MiB")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Remove partes do PySide6 não usadas pela aplicação.")
+    parser.add_argument("site_packages", help="diretório site-packages que contém o PySide6")
+    parser.add_argument("--dry-run", action="store_true", help="apenas listar o que seria removido")
+    args = parser.parse_args(argv)
+    strip(args.site_packages, args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
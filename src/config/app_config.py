@@ -6,6 +6,15 @@ This file contains all the constants and configuration settings for the VPN IPse
 
 import os
 
+
+def _env_int(name: str, default: int) -> int:
+    """Inteiro de uma variável de ambiente; o padrão quando ausente ou inválida."""
+    try:
+        return int(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
 # --- Application Info ---
 APP_TITLE = "Cliente VPN IPsec Fortigate"
 WINDOW_SIZE = (500, 650)
@@ -18,12 +27,54 @@ CONNECTION_STATES = {
     "DISCONNECTED": "Disconnected",
     "CONNECTING": "Connecting...",
     "DISCONNECTING": "Disconnecting...",
+    "REKEYING": "Rekeying...",
+    "ROUTED": "On demand",
+    "FAILED": "Failed",
     "NOT_CONFIGURED": "Not Configured",
     "NO_CONFIG": "No config",
     "UNAVAILABLE": "Unavailable",
     "ERROR": "Error",
 }
 
+# --- Status Polling ---
+# Intervalo com o estado estável
+STATUS_POLL_STABLE_MS = 5000
+# Intervalo inicial durante uma transição (conectando/desconectando), com recuo progressivo
+STATUS_POLL_FAST_MS = 500
+STATUS_POLL_BACKOFF = 1.5
+STATUS_POLL_MAX_FAST_MS = 3000
+# Intervalo com o estado estável e nenhuma janela visível (0 suspende; transições continuam rápidas)
+STATUS_POLL_HIDDEN_MS = 60000
+# Após este tempo sem atingir o estado esperado, a transição volta ao ritmo estável
+STATUS_TRANSITION_TIMEOUT_S = 60
+# Quantidade de transições de estado mantidas em memória pelo IPsecManager
+TRANSITION_LOG_SIZE = 500
+
+# --- Pre-connect Diagnostics ---
+# Verificações rápidas (DNS, rota, UDP 500/4500, certificados/segredos) antes de 'ipsec up'; opcional, "1" ativa
+PREFLIGHT_ENABLED = os.environ.get("VPN_CLIENT_PREFLIGHT", "0") == "1"
+# Prazo total das verificações; o que não terminar a tempo é tratado como inconclusivo
+PREFLIGHT_TIMEOUT_S = 1.0
+# Espera por uma resposta ICMP (porta fechada) às sondas UDP
+PREFLIGHT_PROBE_WAIT_S = 0.3
+# Por quanto tempo o resultado das verificações de rede é reaproveitado para o mesmo gateway
+PREFLIGHT_CACHE_TTL_S = 30
+
+# --- Gateway Resolver ---
+# TTL usado quando o TTL real não está disponível (resolução via getaddrinfo, sem dnspython)
+RESOLVER_DEFAULT_TTL_S = 300
+# Por quanto tempo uma falha de resolução é mantida antes de tentar de novo
+RESOLVER_NEGATIVE_TTL_S = 30
+# Piso para TTLs muito curtos (evita consultas contínuas com TTL 0)
+RESOLVER_MIN_TTL_S = 10
+RESOLVER_TIMEOUT_S = 5.0
+
+# --- Connection Selector ---
+# Atraso para agrupar mudanças de seleção antes de carregar detalhes e status
+CONNECTION_SELECTION_DEBOUNCE_MS = 250
+# A partir deste número de conexões o campo de busca é exibido
+CONNECTION_SEARCH_MIN_ITEMS = 10
+
 # --- Default Messages ---
 DEFAULT_MESSAGES = {
     "INIT": "vpn-ipsec-fortigate-client-linux initialized.",
@@ -36,6 +87,27 @@ DEFAULT_MESSAGES = {
 # --- IPsec Configuration Paths ---
 IPSEC_CONFIG_PATHS = ["/etc/ipsec.conf"]
 IPSEC_D_PATH = "/etc/ipsec.d/"
+# Extensões consideradas como fragmentos de configuração dentro de IPSEC_D_PATH
+IPSEC_D_EXTENSIONS = (".conf",)
+IPSEC_SECRETS_PATH = "/etc/ipsec.secrets"
+IPSEC_CERTS_PATH = "/etc/ipsec.d/certs/"
+
+# --- IPsec Backend ---
+# "strongswan", "libreswan" ou "auto" (detectado pelo socket de controle do daemon em execução)
+IPSEC_BACKEND = os.environ.get("VPN_CLIENT_IPSEC_BACKEND", "auto").lower()
+CHARON_CTL_PATH = "/var/run/charon.ctl"
+PLUTO_CTL_PATH = "/run/pluto/pluto.ctl"
+
+# --- Config Scan ---
+# Threads usadas na leitura dos arquivos de configuração (I/O; o parsing fica fora delas)
+CONFIG_SCAN_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+# Abaixo deste número de arquivos a varredura é sequencial (o pool não compensa)
+CONFIG_SCAN_SEQUENTIAL_LIMIT = 8
+# Processos do parsing das seções: o regex segura o GIL, então threads não o paralelizam
+CONFIG_SCAN_PROCESSES = os.cpu_count() or 1
+# Volume lido a partir do qual o parsing vai para os processos; abaixo disso, iniciar os
+# processos custa mais que parsear na thread atual (~180 MB/s em um núcleo)
+CONFIG_SCAN_PROCESS_MIN_BYTES = _env_int("VPN_CLIENT_CONFIG_SCAN_PROCESS_MIN_BYTES", 32 * 1024 * 1024)
 
 # --- Log File ---
 # Usar um único arquivo de log organizado dentro de ~/.vpnlogs/
@@ -43,3 +115,135 @@ LOGS_DIR = os.path.expanduser("~/.vpnlogs")
 os.makedirs(LOGS_DIR, mode=0o755, exist_ok=True)
 
 LOG_FILE_PATH = os.path.join(LOGS_DIR, "vpn_ipsec_client.log")
+# Índice (JSON-lines) dos deslocamentos das sessões no log, usado pelo histórico
+SESSION_INDEX_PATH = os.path.join(LOGS_DIR, "vpn_sessions.idx")
+
+# --- Event Store ---
+# Histórico dos túneis (transições, reconexões e contadores) em SQLite, para disponibilidade/quedas/MTBF
+EVENT_STORE_PATH = os.path.join(LOGS_DIR, "vpn_events.db")
+# Escritas acumuladas e gravadas em lote a cada intervalo ou ao atingir o tamanho do lote
+EVENT_STORE_FLUSH_S = 5
+EVENT_STORE_BATCH_SIZE = 200
+# Intervalo mínimo entre amostras de contadores de uma conexão
+EVENT_STORE_SAMPLE_S = 60
+# Downsampling das amostras: (idade em segundos, período em segundos), do mais fino ao mais grosso
+EVENT_STORE_DOWNSAMPLE = ((2 * 86400, 300), (30 * 86400, 3600))
+EVENT_STORE_RETENTION_DAYS = 365
+
+# --- Charon Log ---
+# Log do daemon acompanhado no painel de status; vazio procura nos caminhos padrão e, em seguida, no journald
+CHARON_LOG_PATH = os.environ.get("VPN_CLIENT_CHARON_LOG", "")
+CHARON_LOG_CANDIDATES = ["/var/log/charon.log", "/var/log/strongswan.log"]
+# Posição de leitura salva entre execuções (arquivo, inode e deslocamento ou cursor do journald)
+CHARON_LOG_STATE_PATH = os.path.join(LOGS_DIR, "charon_log.state")
+# Janela para agrupar notificações de escrita em uma única leitura
+CHARON_LOG_COALESCE_MS = 250
+# Máximo de bytes lidos por lote; o restante é lido no lote seguinte
+CHARON_LOG_READ_CHUNK = 256 * 1024
+# Linhas mantidas no painel de status
+STATUS_LOG_MAX_LINES = 1000
+
+# --- Network Changes ---
+# Acompanhar mudanças de rede (netlink) e reconectar os túneis que estavam ativos
+NETWORK_RECOVERY_ENABLED = os.environ.get("VPN_CLIENT_NETWORK_RECOVERY", "1") != "0"
+# Janela para agrupar a rajada de eventos de uma troca de rede em uma única verificação
+NETWORK_CHANGE_SETTLE_MS = 500
+# Prazo para o charon migrar sozinho uma IKE SA com MOBIKE antes de reiniciá-la
+NETWORK_MOBIKE_GRACE_MS = 2000
+
+# --- Cipher Benchmark ---
+# Propostas ESP aceitas pelo gateway (política de fase 2); padrão: as propostas padrão da FortiGate
+CIPHER_ALLOWED_ESP = [
+    proposal.strip()
+    for proposal in os.environ.get(
+        "VPN_CLIENT_ALLOWED_ESP",
+        "aes128-sha1,aes256-sha1,aes128-sha256,aes256-sha256,aes128gcm16,aes256gcm16,chacha20poly1305",
+    ).split(",")
+    if proposal.strip()
+]
+# Tempo de medição de cada transformação e tamanho dos blocos cifrados
+CIPHER_BENCHMARK_DURATION_S = 0.2
+CIPHER_BENCHMARK_CHUNK = 16 * 1024
+# Resultados por máquina; medidos novamente após o prazo ou se a CPU/OpenSSL mudar
+CIPHER_BENCHMARK_CACHE_PATH = os.path.join(LOGS_DIR, "cipher_benchmark.json")
+CIPHER_BENCHMARK_CACHE_TTL_S = 30 * 86400
+
+# --- Speed Test ---
+# Servidor de teste (python -m src.ipsec.throughput server) por conexão: "conexão=host[:porta],*=host"
+SPEED_TEST_TARGETS = dict(
+    item.split("=", 1)
+    for item in os.environ.get("VPN_CLIENT_SPEED_TEST_TARGETS", "").split(",")
+    if "=" in item
+)
+SPEED_TEST_PORT = 5299
+SPEED_TEST_DURATION_S = 5.0
+SPEED_TEST_STREAMS = 4
+# Modo UDP: taxa de envio (bit/s) e tamanho dos datagramas (abaixo do MTU após o ESP)
+SPEED_TEST_UDP_BITRATE = 50 * 10 ** 6
+SPEED_TEST_UDP_LENGTH = 1200
+
+# --- Path MTU ---
+# Espera pela resposta de cada sonda ICMP com DF e tentativas antes de considerá-la perdida
+PATH_MTU_PROBE_TIMEOUT_S = 0.5
+PATH_MTU_PROBE_ATTEMPTS = 2
+
+# --- Rekey Monitor ---
+# Medir rekeys/reautenticações (prazos do statusall, log do charon) e a perda durante eles; "0" desativa
+REKEY_MONITOR_ENABLED = os.environ.get("VPN_CLIENT_REKEY_MONITOR", "1") != "0"
+# Sondas ICMP pelo túnel: intervalo, início antes do prazo previsto e duração após o fim do rekey
+REKEY_PROBE_INTERVAL_S = 0.2
+REKEY_PROBE_LEAD_S = 15
+REKEY_PROBE_TAIL_S = 3
+# Com um rekey previsto abaixo deste prazo, os prazos são relidos a cada consulta de status
+REKEY_TIMER_NEAR_S = 150
+# Rekey sem conclusão observada após este tempo é encerrado
+REKEY_EVENT_TIMEOUT_S = 60
+# A partir desta duração um rekey é considerado lento
+REKEY_SLOW_S = 1.0
+REKEY_HISTORY_SIZE = 100
+
+# --- Fast Connect ---
+# Conexões em modo rápido ("conexão,conexão" ou "*"): ligar instala as políticas de trap
+# ('ipsec route') e o túnel é negociado pelo primeiro pacote; desligar encerra só as CHILD SAs
+FAST_CONNECT_CONNECTIONS = {
+    name.strip() for name in os.environ.get("VPN_CLIENT_FAST_CONNECT", "").split(",") if name.strip()
+}
+# Tempo em que a IKE SA é mantida após desligar; religar nesse prazo negocia só a CHILD SA
+FAST_CONNECT_WARM_S = 600
+
+# --- Command Trace ---
+# Grava cada comando do IPsec (argumentos, saída, código de saída e tempos) neste arquivo JSONL
+COMMAND_RECORD_PATH = os.environ.get("VPN_CLIENT_RECORD_COMMANDS", "")
+# Reproduz uma gravação em vez de executar os comandos, com a latência gravada multiplicada
+# pelo fator (0 = sem espera; >1 simula um gateway mais lento)
+COMMAND_REPLAY_PATH = os.environ.get("VPN_CLIENT_REPLAY_COMMANDS", "")
+COMMAND_REPLAY_LATENCY_SCALE = float(os.environ.get("VPN_CLIENT_REPLAY_LATENCY_SCALE", "1") or 1)
+
+# --- Connect Traces ---
+# Registrar cada conexão em spans por fase (sudo, IKE_SA_INIT, IKE_AUTH, CHILD_SA)
+TRACE_ENABLED = os.environ.get("VPN_CLIENT_CONNECT_TRACE", "1") != "0"
+# Traces gravados no formato JSON do OTLP; os mais antigos são removidos acima do limite
+TRACES_DIR = os.path.join(LOGS_DIR, "traces")
+TRACE_MAX_FILES = 100
+
+# --- Single Instance ---
+# Lock e socket local da instância em execução (um por usuário)
+SINGLE_INSTANCE_DIR = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+SINGLE_INSTANCE_LOCK_PATH = os.path.join(SINGLE_INSTANCE_DIR, f"vpn-ipsec-client-{os.getuid()}.lock")
+SINGLE_INSTANCE_SOCKET_PATH = os.path.join(SINGLE_INSTANCE_DIR, f"vpn-ipsec-client-{os.getuid()}.sock")
+# Tempo máximo para entregar um comando à instância em execução (inclui a espera por ela começar a escutar)
+SINGLE_INSTANCE_TIMEOUT_S = 2.0
+
+# --- Tray ---
+# Ícone na bandeja (também com --tray): fechar a janela a destrói e o cliente segue em segundo plano
+TRAY_ENABLED = os.environ.get("VPN_CLIENT_TRAY", "0") == "1"
+TRAY_ICON_SIZE = 64
+# Espera após ocultar a janela antes de registrar memória residente e despertares
+FOOTPRINT_REPORT_DELAY_S = 60
+
+# --- Metrics (opt-in) ---
+# Porta HTTP local para exposição Prometheus; 0 desativa
+METRICS_HTTP_PORT = int(os.environ.get("VPN_CLIENT_METRICS_PORT", "0") or 0)
+METRICS_BIND_ADDRESS = os.environ.get("VPN_CLIENT_METRICS_BIND", "127.0.0.1")
+# Arquivo .prom para o textfile collector do node-exporter; vazio desativa
+METRICS_TEXTFILE_PATH = os.environ.get("VPN_CLIENT_METRICS_TEXTFILE", "")
@@ -0,0 +1,295 @@
+"""
+Módulo CharonLogTailer
+
+Acompanha o log do charon (arquivo ou journald) de forma incremental, a partir da
+posição salva: apenas os bytes novos são lidos, rotação e truncamento são detectados
+pelo inode e pelo tamanho, e as linhas são entregues em lotes por conexão, conforme
+o nome da conexão citado em cada linha.
+Não há consulta periódica: as leituras são disparadas pelas notificações de escrita.
+"""
+
+import json
+import os
+import re
+import shutil
+from typing import Collection, Dict, List, Optional, Tuple
+
+from PySide6.QtCore import QFileSystemWatcher, QObject, QProcess, QTimer, Signal
+
+from ..config.app_config import (
+    CHARON_LOG_CANDIDATES,
+    CHARON_LOG_COALESCE_MS,
+    CHARON_LOG_PATH,
+    CHARON_LOG_READ_CHUNK,
+    CHARON_LOG_STATE_PATH,
+)
+
+# Identificadores do charon no journald (daemon clássico e charon-systemd)
+JOURNAL_IDENTIFIERS = ("charon", "charon-systemd")
+
+
+# Nome da conexão citado nas linhas do charon: '<conn|1>', 'conn[1]', 'conn{1}' ou 'conn'
+CONNECTION_NAME_PATTERN = re.compile(r"<([^|<>\s]+)\|\d+>|(?<![\w.-])([\w.-]+)(?:\[\d+\]|\{\d+\})|'([^'\s]+)'")
+
+
+def line_connection(line: str, conn_names: Collection[str]) -> Optional[str]:
+    """
+    Conexão a que uma linha do charon se refere, entre as conhecidas; None se nenhuma.
+    """
+    for match in CONNECTION_NAME_PATTERN.finditer(line):
+        name = match.group(1) or match.group(2) or match.group(3)
+        if name in conn_names:
+            return name
+    return None
+
+
+def group_lines_by_connection(lines: List[str], conn_names: Collection[str]) -> Dict[str, List[str]]:
+    grouped: Dict[str, List[str]] = {}
+    for line in lines:
+        conn_name = line_connection(line, conn_names)
+        if conn_name is not None:
+            grouped.setdefault(conn_name, []).append(line)
+    return grouped
+
+
+def _load_state() -> dict:
+    try:
+        with open(CHARON_LOG_STATE_PATH, "r", encoding="utf-8") as state_file:
+            return json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state: dict) -> None:
+    try:
+        tmp_path = CHARON_LOG_STATE_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as state_file:
+            json.dump(state, state_file)
+        os.replace(tmp_path, CHARON_LOG_STATE_PATH)
+    except OSError as e:
+        print(f"Error saving charon log position: {e}")
+
+
+class CharonLogReader:
+    """
+    Leitura incremental de um arquivo de log, a partir de um deslocamento salvo.
+    """
+
+    def __init__(self, path: str, state: Optional[dict] = None):
+        self.path = path
+        self._state = state or {}
+        self._file = None
+        self._inode: Optional[int] = None
+        self._offset = 0
+        # Final de linha ainda incompleto da última leitura
+        self._partial = b""
+
+    @property
+    def position(self) -> dict:
+        return {"path": self.path, "inode": self._inode, "offset": self._offset}
+
+    def open(self) -> bool:
+        """
+        Abre o arquivo retomando a posição salva (mesmo inode) ou, sem ela, a partir do final.
+        """
+        return self._open(from_start=False)
+
+    def read_new(self, limit: int = CHARON_LOG_READ_CHUNK) -> Tuple[List[str], bool]:
+        """
+        Lê até 'limit' bytes novos; retorna as linhas completas e se ainda há dados pendentes.
+        """
+        if self._file is None and not self._open(from_start=False):
+            return [], False
+        data = self._read(limit)
+        if not data and self._check_rotation():
+            data = self._read(limit)
+        return self._split_lines(data), len(data) >= limit
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self, from_start: bool) -> bool:
+        try:
+            log_file = open(self.path, "rb")
+        except OSError:
+            return False
+        stat = os.fstat(log_file.fileno())
+        if from_start:
+            offset = 0
+        elif (
+            self._state.get("path") == self.path
+            and self._state.get("inode") == stat.st_ino
+            and 0 <= self._state.get("offset", -1) <= stat.st_size
+        ):
+            offset = self._state["offset"]
+        else:
+            # Sem posição válida: acompanhar apenas o que for escrito daqui em diante
+            offset = stat.st_size
+        log_file.seek(offset)
+        self._file = log_file
+        self._inode = stat.st_ino
+        self._offset = offset
+        self._partial = b""
+        return True
+
+    def _read(self, limit: int) -> bytes:
+        data = self._file.read(limit)
+        self._offset += len(data)
+        return data
+
+    def _check_rotation(self) -> bool:
+        """
+        Chamado quando o arquivo aberto não tem mais dados: detecta rotação ou truncamento.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            # Arquivo removido e ainda não recriado
+            return False
+        if stat.st_ino != self._inode:
+            # Rotação por renomeação: o arquivo antigo já foi lido até o fim
+            self.close()
+            return self._open(from_start=True)
+        if stat.st_size < self._offset:
+            # Rotação por cópia e truncamento (copytruncate)
+            self._file.seek(0)
+            self._offset = 0
+            self._partial = b""
+            return True
+        return False
+
+    def _split_lines(self, data: bytes) -> List[str]:
+        if not data:
+            return []
+        data = self._partial + data
+        *complete, self._partial = data.split(b"\n")
+        return [line.decode("utf-8", errors="replace") for line in complete if line]
+
+
+class CharonLogTailer(QObject):
+    """
+    Entrega em lotes as linhas novas do charon, agrupadas pela conexão a que se referem.
+    """
+
+    # Nome da conexão e lista de linhas (str) referentes a ela
+    lines_ready = Signal(str, list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.source = ""
+        self._conn_names: frozenset = frozenset()
+        self._reader: Optional[CharonLogReader] = None
+        self._watcher: Optional[QFileSystemWatcher] = None
+        self._journal: Optional[QProcess] = None
+        self._journal_buffer = b""
+        self._journal_lines: List[str] = []
+        self._journal_cursor: Optional[str] = None
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(CHARON_LOG_COALESCE_MS)
+        self._flush_timer.timeout.connect(self._flush)
+
+    def start(self) -> bool:
+        """
+        Começa a acompanhar o log; retorna False se nenhuma fonte estiver acessível.
+        """
+        state = _load_state()
+        candidates = [CHARON_LOG_PATH] if CHARON_LOG_PATH else CHARON_LOG_CANDIDATES
+        for path in candidates:
+            reader = CharonLogReader(path, state)
+            if reader.open():
+                self._start_file(reader)
+                return True
+        if not CHARON_LOG_PATH and shutil.which("journalctl"):
+            self._start_journal(state.get("journal_cursor"))
+            return True
+        return False
+
+    def stop(self) -> None:
+        self._flush_timer.stop()
+        if self._watcher is not None:
+            self._watcher.removePaths(self._watcher.files() + self._watcher.directories())
+        if self._journal is not None:
+            self._journal.kill()
+            self._journal.waitForFinished(1000)
+        self._save_position()
+        if self._reader is not None:
+            self._reader.close()
+
+    def set_connections(self, conn_names: Collection[str]) -> None:
+        """
+        Define as conexões conhecidas; linhas de outras conexões são descartadas.
+        """
+        self._conn_names = frozenset(conn_names)
+
+    def _start_file(self, reader: CharonLogReader) -> None:
+        self._reader = reader
+        self.source = reader.path
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.addPath(reader.path)
+        # O diretório revela a recriação do arquivo após uma rotação
+        self._watcher.addPath(os.path.dirname(reader.path))
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+
+    def _start_journal(self, cursor: Optional[str]) -> None:
+        self.source = "journald"
+        self._journal_cursor = cursor
+        arguments = ["--follow", "--output=json"]
+        for identifier in JOURNAL_IDENTIFIERS:
+            arguments += ["--identifier", identifier]
+        arguments += ["--after-cursor", cursor] if cursor else ["--lines", "0"]
+        self._journal = QProcess(self)
+        self._journal.readyReadStandardOutput.connect(self._on_journal_output)
+        self._journal.start("journalctl", arguments)
+
+    def _on_file_changed(self, path: str) -> None:
+        # Após uma rotação o caminho deixa de ser observado; volta a ser quando o arquivo reaparecer
+        if path not in self._watcher.files() and os.path.exists(path):
+            self._watcher.addPath(path)
+        self._schedule_flush()
+
+    def _on_directory_changed(self, _directory: str) -> None:
+        if self._reader.path not in self._watcher.files() and os.path.exists(self._reader.path):
+            self._watcher.addPath(self._reader.path)
+            self._schedule_flush()
+
+    def _on_journal_output(self) -> None:
+        data = self._journal_buffer + bytes(self._journal.readAllStandardOutput())
+        *complete, self._journal_buffer = data.split(b"\n")
+        for raw in complete:
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            message = entry.get("MESSAGE")
+            if isinstance(message, str):
+                self._journal_lines.append(message)
+            self._journal_cursor = entry.get("__CURSOR", self._journal_cursor)
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        # Várias notificações dentro da janela resultam em uma única leitura
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _flush(self) -> None:
+        if self._reader is not None:
+            lines, pending = self._reader.read_new()
+            if pending:
+                self._flush_timer.start()
+        else:
+            lines, self._journal_lines = self._journal_lines, []
+        for conn_name, conn_lines in group_lines_by_connection(lines, self._conn_names).items():
+            self.lines_ready.emit(conn_name, conn_lines)
+
+    def _save_position(self) -> None:
+        state = _load_state()
+        if self._reader is not None:
+            state.update(self._reader.position)
+        if self._journal_cursor:
+            state["journal_cursor"] = self._journal_cursor
+        _save_state(state)
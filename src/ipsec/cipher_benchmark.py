@@ -0,0 +1,482 @@
+"""
+Módulo CipherBenchmark
+
+Mede, nesta máquina, a vazão de cada transformação ESP das propostas configuradas
+(esp=) e de alternativas comuns, e recomenda a mais rápida entre as aceitas pela política
+do gateway (CIPHER_ALLOWED_ESP; por padrão, as propostas de fase 2 da FortiGate).
+
+A medição usa o pacote opcional 'cryptography' (OpenSSL), que aproveita as mesmas
+instruções do kernel (AES-NI, CLMUL/PMULL). Os dados são cifrados em blocos grandes: o
+resultado reflete a vazão das cifras, não o custo por pacote do Python. Sem o pacote, a
+recomendação usa apenas as instruções detectadas em /proc/cpuinfo. Os resultados ficam
+em cache por máquina (host, CPU e versão do OpenSSL).
+
+    python -m src.ipsec.cipher_benchmark [CONEXAO] [--refresh]
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import sys
+import time
+import warnings
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from cryptography.hazmat.primitives import cmac, hashes, hmac
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.primitives.ciphers.aead import AESCCM, AESGCM, ChaCha20Poly1305
+except ImportError:  # cryptography é opcional
+    Cipher = None
+
+from ..config.app_config import (
+    CIPHER_ALLOWED_ESP,
+    CIPHER_BENCHMARK_CACHE_PATH,
+    CIPHER_BENCHMARK_CACHE_TTL_S,
+    CIPHER_BENCHMARK_CHUNK,
+    CIPHER_BENCHMARK_DURATION_S,
+)
+
+# Alternativas sempre medidas, além das propostas da conexão
+COMMON_ESP_TRANSFORMS = (
+    "aes128gcm16",
+    "aes256gcm16",
+    "chacha20poly1305",
+    "aes128-sha256",
+    "aes256-sha256",
+    "aes128-sha1",
+    "aes256-sha1",
+)
+
+AEAD_PATTERN = re.compile(r"^aes(128|192|256)?(gcm|ccm)(8|12|16|64|96|128)?$")
+CIPHER_PATTERN = re.compile(r"^(aes(128|192|256)?(ctr)?|3des)$")
+INTEGRITY_ALGORITHMS = {
+    "md5": "MD5",
+    "sha1": "SHA1",
+    "sha": "SHA1",
+    "sha256": "SHA256",
+    "sha2_256": "SHA256",
+    "sha384": "SHA384",
+    "sha2_384": "SHA384",
+    "sha512": "SHA512",
+    "sha2_512": "SHA512",
+    "aescmac": "CMAC",
+}
+# Grupos DH (PFS) e opções que não afetam a vazão
+DH_PATTERN = re.compile(r"^(modp\d+s?\d*|ecp\d+(bp)?|curve25519|x25519|curve448|x448|esn|noesn)$")
+
+# Tamanho do AAD do ESP com números de sequência de 32 bits (SPI + sequência)
+ESP_AAD = b"\x00" * 8
+
+
+class EspTransform:
+    """
+    Cifra e integridade de uma proposta ESP (sem os grupos DH).
+    """
+
+    __slots__ = ("name", "cipher", "key_bits", "mode", "integrity", "tag_bytes")
+
+    def __init__(self, name: str, cipher: str, key_bits: int, mode: str, integrity: Optional[str] = None, tag_bytes: int = 16):
+        self.name = name
+        self.cipher = cipher
+        self.key_bits = key_bits
+        self.mode = mode
+        self.integrity = integrity
+        self.tag_bytes = tag_bytes
+
+    @property
+    def is_aead(self) -> bool:
+        return self.mode in ("gcm", "ccm", "poly1305")
+
+    def __repr__(self) -> str:
+        return f"EspTransform({self.name!r})"
+
+
+def parse_proposal(proposal: str) -> Tuple[Optional[EspTransform], List[str]]:
+    """
+    Separa uma proposta ESP do strongSwan (ex.: 'aes256gcm16-modp2048', 'aes256-sha256')
+    na transformação e nos grupos DH; a transformação é None se não for reconhecida.
+    """
+    tokens = [token for token in proposal.strip().rstrip("!").lower().split("-") if token]
+    dh_groups = [token for token in tokens if DH_PATTERN.match(token)]
+    tokens = [token for token in tokens if not DH_PATTERN.match(token)]
+    if not tokens:
+        return None, dh_groups
+    first = tokens[0]
+    if first == "chacha20poly1305":
+        return EspTransform(first, "chacha20", 256, "poly1305"), dh_groups
+    match = AEAD_PATTERN.match(first)
+    if match:
+        key_bits = int(match.group(1) or 128)
+        tag = int(match.group(3) or 16)
+        # 64/96/128 são os tamanhos da tag em bits
+        tag_bytes = tag // 8 if tag > 16 else tag
+        name = f"aes{key_bits}{match.group(2)}{tag_bytes}"
+        return EspTransform(name, "aes", key_bits, match.group(2), tag_bytes=tag_bytes), dh_groups
+    match = CIPHER_PATTERN.match(first)
+    if not match or len(tokens) < 2 or tokens[1] not in INTEGRITY_ALGORITHMS:
+        return None, dh_groups
+    integrity = tokens[1]
+    if first == "3des":
+        return EspTransform(f"3des-{integrity}", "3des", 192, "cbc", integrity), dh_groups
+    key_bits = int(match.group(2) or 128)
+    mode = "ctr" if match.group(3) else "cbc"
+    name = f"aes{key_bits}{'ctr' if mode == 'ctr' else ''}-{integrity}"
+    return EspTransform(name, "aes", key_bits, mode, integrity), dh_groups
+
+
+class CpuFeatures:
+    """
+    Instruções relevantes para o IPsec (x86: aes/pclmulqdq; ARM: aes/pmull).
+    """
+
+    __slots__ = ("model", "aes", "clmul", "vector_aes")
+
+    def __init__(self, model: str, aes: bool, clmul: bool, vector_aes: bool = False):
+        self.model = model
+        self.aes = aes
+        self.clmul = clmul
+        self.vector_aes = vector_aes
+
+    def describe(self) -> str:
+        def yes_no(value):
+            return "sim" if value else "não"
+
+        text = f"{self.model}: AES-NI {yes_no(self.aes)}, CLMUL {yes_no(self.clmul)}"
+        if self.vector_aes:
+            text += ", VAES"
+        return text
+
+
+def read_cpu_features(path: str = "/proc/cpuinfo") -> CpuFeatures:
+    model = "CPU desconhecida"
+    flags = set()
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as cpuinfo:
+            for line in cpuinfo:
+                key, _, value = line.partition(":")
+                key = key.strip().lower()
+                if key in ("model name", "hardware", "cpu model") and model == "CPU desconhecida":
+                    model = value.strip()
+                elif key in ("flags", "features") and not flags:
+                    flags = set(value.split())
+                if flags and model != "CPU desconhecida":
+                    break
+    except OSError:
+        pass
+    return CpuFeatures(
+        model,
+        aes="aes" in flags,
+        clmul="pclmulqdq" in flags or "pmull" in flags,
+        vector_aes="vaes" in flags and "vpclmulqdq" in flags,
+    )
+
+
+def heuristic_order(features: CpuFeatures) -> List[str]:
+    """
+    Ordem provável de vazão quando não é possível medir.
+    """
+    if features.aes and features.clmul:
+        return ["aes128gcm16", "aes256gcm16", "chacha20poly1305", "aes128-sha256", "aes256-sha256"]
+    # Sem AES-NI, ou sem CLMUL (GHASH do GCM em software), o ChaCha20-Poly1305 costuma vencer
+    return ["chacha20poly1305", "aes128-sha1", "aes128-sha256", "aes128gcm16", "aes256gcm16"]
+
+
+def _triple_des():
+    try:
+        from cryptography.hazmat.decrepit.ciphers.algorithms import TripleDES
+    except ImportError:
+        TripleDES = getattr(algorithms, "TripleDES", None)
+    return TripleDES
+
+
+def _make_encryptor(transform: EspTransform) -> Optional[Callable[[bytes], bytes]]:
+    """
+    Função que cifra e autentica um bloco como o ESP faria; None se não suportada.
+    """
+    if transform.mode == "poly1305":
+        aead = ChaCha20Poly1305(os.urandom(32))
+        nonce = os.urandom(12)
+        return lambda data: aead.encrypt(nonce, data, ESP_AAD)
+    if transform.mode == "gcm":
+        # O AESGCM do cryptography produz tags de 16 bytes; tags menores têm o mesmo custo
+        aead = AESGCM(os.urandom(transform.key_bits // 8))
+        nonce = os.urandom(12)
+        return lambda data: aead.encrypt(nonce, data, ESP_AAD)
+    if transform.mode == "ccm":
+        aead = AESCCM(os.urandom(transform.key_bits // 8), tag_length=transform.tag_bytes)
+        # Salt de 3 bytes + IV de 8 bytes (RFC 4309)
+        nonce = os.urandom(11)
+        return lambda data: aead.encrypt(nonce, data, ESP_AAD)
+
+    if transform.cipher == "3des":
+        TripleDES = _triple_des()
+        if TripleDES is None:
+            return None
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            cipher = Cipher(TripleDES(os.urandom(24)), modes.CBC(os.urandom(8)))
+    elif transform.mode == "ctr":
+        cipher = Cipher(algorithms.AES(os.urandom(transform.key_bits // 8)), modes.CTR(os.urandom(16)))
+    else:
+        cipher = Cipher(algorithms.AES(os.urandom(transform.key_bits // 8)), modes.CBC(os.urandom(16)))
+
+    integrity = INTEGRITY_ALGORITHMS[transform.integrity]
+    if integrity == "CMAC":
+        mac_key = os.urandom(16)
+
+        def authenticate(data):
+            mac = cmac.CMAC(algorithms.AES(mac_key))
+            mac.update(data)
+            return mac.finalize()
+    else:
+        algorithm = getattr(hashes, integrity)
+        mac_key = os.urandom(algorithm.digest_size)
+
+        def authenticate(data):
+            mac = hmac.HMAC(mac_key, algorithm())
+            mac.update(data)
+            return mac.finalize()
+
+    def encrypt(data):
+        encryptor = cipher.encryptor()
+        ciphertext = encryptor.update(data) + encryptor.finalize()
+        return ciphertext + authenticate(ciphertext)
+
+    return encrypt
+
+
+def measure_transform(
+    transform: EspTransform,
+    duration: float = CIPHER_BENCHMARK_DURATION_S,
+    chunk: int = CIPHER_BENCHMARK_CHUNK,
+) -> Optional[float]:
+    """
+    Vazão em MB/s (10^6 bytes) cifrando e autenticando blocos de 'chunk' bytes.
+    """
+    if Cipher is None:
+        return None
+    try:
+        encrypt = _make_encryptor(transform)
+    except Exception:
+        return None
+    if encrypt is None:
+        return None
+    data = os.urandom(chunk)
+    encrypt(data)
+    processed = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while True:
+        encrypt(data)
+        processed += chunk
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+    return processed / (now - start) / 1e6
+
+
+def _host_key(features: CpuFeatures) -> dict:
+    key = {"host": socket.gethostname(), "cpu": features.model, "aes": features.aes, "clmul": features.clmul}
+    if Cipher is not None:
+        from cryptography.hazmat.backends.openssl import backend
+
+        key["openssl"] = backend.openssl_version_text()
+    return key
+
+
+class CipherBenchmark:
+    """
+    Resultados das medições com cache por máquina.
+    """
+
+    def __init__(self, cache_path: str = CIPHER_BENCHMARK_CACHE_PATH):
+        self.cache_path = cache_path
+        self.features = read_cpu_features()
+        self._key = _host_key(self.features)
+        self.results: Dict[str, Optional[float]] = {}
+        self.measured_at: Optional[float] = None
+        self._load_cache()
+
+    @property
+    def available(self) -> bool:
+        return Cipher is not None
+
+    def measure(self, names: List[str], refresh: bool = False) -> Dict[str, Optional[float]]:
+        """
+        Mede as transformações ainda não presentes no cache (ou todas, com refresh).
+        """
+        if refresh:
+            self.results = {}
+        missing = [name for name in dict.fromkeys(names) if name not in self.results]
+        if not missing or not self.available:
+            return {name: self.results.get(name) for name in names}
+        for name in missing:
+            transform, _dh_groups = parse_proposal(name)
+            self.results[name] = measure_transform(transform) if transform is not None else None
+        self.measured_at = time.time()
+        self._save_cache()
+        return {name: self.results.get(name) for name in names}
+
+    def _load_cache(self) -> None:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        if data.get("key") != self._key or time.time() - data.get("time", 0) > CIPHER_BENCHMARK_CACHE_TTL_S:
+            return
+        self.results = dict(data.get("results", {}))
+        self.measured_at = data.get("time")
+
+    def _save_cache(self) -> None:
+        try:
+            with open(self.cache_path, "w", encoding="utf-8") as cache_file:
+                json.dump({"key": self._key, "time": self.measured_at, "results": self.results}, cache_file, indent=1)
+        except OSError as e:
+            print(f"Error saving cipher benchmark cache: {e}")
+
+
+class CipherRecommendation:
+    """
+    Resultado da comparação para uma conexão.
+    """
+
+    __slots__ = ("conn_name", "features", "measured", "rows", "configured", "esp", "ike")
+
+    def __init__(self, conn_name: str, features: CpuFeatures, measured: bool):
+        self.conn_name = conn_name
+        self.features = features
+        # False quando a ordem veio apenas das instruções da CPU
+        self.measured = measured
+        # (transformação, MB/s ou None, configurada, aceita pela política)
+        self.rows: List[Tuple[str, Optional[float], bool, bool]] = []
+        self.configured: Optional[str] = None
+        self.esp: Optional[str] = None
+        self.ike: Optional[str] = None
+
+    def speed(self, name: Optional[str]) -> Optional[float]:
+        for row_name, mbps, _configured, _allowed in self.rows:
+            if row_name == name:
+                return mbps
+        return None
+
+    def summary(self) -> str:
+        if self.esp is None:
+            return f"{self.conn_name}: nenhuma proposta ESP aceita pôde ser avaliada."
+        if not self.measured:
+            return f"{self.conn_name}: recomendado esp={self.esp} (pelas instruções da CPU; instale 'cryptography' para medir)."
+        best, current = self.speed(self.rows_name(self.esp)), self.speed(self.configured)
+        text = f"{self.conn_name}: recomendado esp={self.esp} ({best:.0f} MB/s)"
+        if self.configured and current:
+            if self.configured == self.rows_name(self.esp):
+                text += "; já é a proposta configurada"
+            else:
+                text += f"; configurado {self.configured} ({current:.0f} MB/s, {best / current:.1f}x mais lento)"
+        if self.ike:
+            text += f"; ike={self.ike}"
+        return text + "."
+
+    def rows_name(self, proposal: str) -> Optional[str]:
+        transform, _dh_groups = parse_proposal(proposal)
+        return transform.name if transform is not None else None
+
+    def describe(self) -> str:
+        lines = [f"CPU: {self.features.describe()}"]
+        for name, mbps, configured, allowed in sorted(self.rows, key=lambda row: -(row[1] or 0)):
+            speed = f"{mbps:8.0f} MB/s" if mbps is not None else "       n/d     "
+            marks = []
+            if configured:
+                marks.append("configurada")
+            if not allowed:
+                marks.append("fora da política")
+            lines.append(f"  {name:<20} {speed}  {', '.join(marks)}".rstrip())
+        lines.append(self.summary())
+        return "\n".join(lines)
+
+
+def _allowed_names() -> List[str]:
+    names = []
+    for proposal in CIPHER_ALLOWED_ESP:
+        transform, _dh_groups = parse_proposal(proposal)
+        if transform is not None:
+            names.append(transform.name)
+    return names
+
+
+def _recommended_ike(record, transform: EspTransform) -> Optional[str]:
+    """
+    Proposta IKE com a mesma cifra e os grupos DH configurados (a IKE SA só transporta o
+    handshake; apenas mantém a mesma família de instruções).
+    """
+    if not record.ike:
+        return None
+    _ike_transform, dh_groups = parse_proposal(record.ike[0])
+    if not dh_groups:
+        return None
+    if transform.is_aead:
+        if record.get("keyexchange", "ike") == "ikev1":
+            # IKEv1 não negocia AEAD na fase 1
+            return None
+        return "-".join([transform.name, "prfsha256"] + dh_groups)
+    return "-".join([transform.name] + dh_groups)
+
+
+def recommend(record, benchmark: Optional[CipherBenchmark] = None, refresh: bool = False) -> CipherRecommendation:
+    """
+    Mede (ou reaproveita do cache) as propostas da conexão e as alternativas comuns e
+    escolhe a mais rápida aceita pela política.
+    """
+    benchmark = benchmark or CipherBenchmark()
+    configured = []
+    dh_groups: List[str] = []
+    for proposal in record.esp:
+        transform, groups = parse_proposal(proposal)
+        if transform is not None:
+            configured.append(transform.name)
+            if not dh_groups:
+                dh_groups = groups
+    allowed = _allowed_names()
+    names = list(dict.fromkeys(configured + list(COMMON_ESP_TRANSFORMS) + allowed))
+
+    result = CipherRecommendation(record.name, benchmark.features, benchmark.available)
+    result.configured = configured[0] if configured else None
+    if benchmark.available:
+        speeds = benchmark.measure(names, refresh)
+        for name in names:
+            result.rows.append((name, speeds.get(name), name in configured, name in allowed))
+        candidates = [(speeds[name], name) for name in names if name in allowed and speeds.get(name)]
+        best = max(candidates)[1] if candidates else None
+    else:
+        for name in names:
+            result.rows.append((name, None, name in configured, name in allowed))
+        best = next((name for name in heuristic_order(benchmark.features) if name in allowed), None)
+    if best is not None:
+        # Mantém o PFS configurado
+        result.esp = "-".join([best] + dh_groups)
+        result.ike = _recommended_ike(record, parse_proposal(best)[0])
+    return result
+
+
+def main(argv=None) -> int:
+    from .ipsec_config_parser import IPsecConfigParser
+
+    parser = argparse.ArgumentParser(description="Compara a vazão das propostas ESP nesta máquina.")
+    parser.add_argument("connection", nargs="?", help="conexão do ipsec.conf (padrão: a primeira)")
+    parser.add_argument("--refresh", action="store_true", help="ignora o cache e mede novamente")
+    args = parser.parse_args(argv)
+
+    config_parser = IPsecConfigParser()
+    connections = list(config_parser.scan().connections)
+    conn_name = args.connection or (connections[0] if connections else None)
+    if conn_name is None:
+        print("Nenhuma conexão configurada.", file=sys.stderr)
+        return 1
+    print(recommend(config_parser.get_connection_record(conn_name), refresh=args.refresh).describe())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+"""
+Módulo CommandTrace
+
+Execução dos comandos do IPsec (CommandRunner), gravação de cada chamada em um
+arquivo JSONL (CommandRecorder) e reprodução de uma gravação sem gateway (CommandReplayer).
+
+Cada linha da gravação é um comando: argumentos, stdout/stderr, código de saída,
+instante relativo ao início e duração; em comandos lidos linha a linha ('ipsec up')
+também o instante de cada linha. Uma linha de cabeçalho traz a implementação IPsec
+detectada (o 'ipsec --version' da detecção, quando executado, é gravado antes dela) e
+o conteúdo dos arquivos de configuração varridos (nunca o ipsec.secrets), para que a
+reprodução veja as mesmas conexões. Valores de opções com cara de segredo (PSK, senhas,
+chaves) são substituídos por REDACTED_VALUE, mas o restante da configuração (gateways,
+sub-redes, identidades) fica na gravação: trate-a como um arquivo de configuração. A reprodução devolve as respostas na ordem gravada
+para cada comando, com a latência original multiplicada por um fator: 0 para testes
+rápidos e determinísticos, valores maiores para simular um gateway lento.
+
+Ativação (na aplicação inteira, inclusive na janela principal):
+    VPN_CLIENT_RECORD_COMMANDS=trace.jsonl python main.py
+    VPN_CLIENT_REPLAY_COMMANDS=trace.jsonl VPN_CLIENT_REPLAY_LATENCY_SCALE=3 python main.py
+
+Linha de comando:
+    python -m src.ipsec.command_trace summary trace.jsonl
+    python -m src.ipsec.command_trace replay trace.jsonl [--scale 0]
+"""
+
+import argparse
+import builtins
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+TRACE_VERSION = 1
+REDACTED_VALUE = "<redacted>"
+# Opções cujo valor não deve sair da máquina (ex.: psk=, xauth_password=, leftrsasigkey=)
+SECRET_OPTION_PATTERN = re.compile(
+    r"^(\s*[A-Za-z0-9_-]*(?:psk|secret|passw(?:or)?d|sigkey|pubkey|privkey)[A-Za-z0-9_-]*\s*=\s*)\S.*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def redact_config(content: str) -> str:
+    """
+    Substitui os valores de opções com cara de segredo, mantendo as linhas e as conexões.
+    """
+    return SECRET_OPTION_PATTERN.sub(lambda match: match.group(1) + REDACTED_VALUE, content)
+
+
+class CommandRunner:
+    """
+    Executa comandos em subprocessos; é o executor padrão do IPsecCommander.
+    """
+
+    def run(self, args: List[str]) -> subprocess.CompletedProcess:
+        return subprocess.run(args, capture_output=True, text=True, check=False)
+
+    def stream(self, args: List[str], on_line: Callable[[str], None]) -> subprocess.CompletedProcess:
+        """
+        Executa lendo o stdout linha a linha, chamando on_line assim que cada uma é escrita.
+        """
+        process = subprocess.Popen(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        # O stderr é esvaziado em paralelo: com o pipe cheio o filho bloquearia sem
+        # fechar o stdout, e a leitura abaixo nunca terminaria
+        stderr_chunks = []
+        stderr_reader = threading.Thread(
+            target=lambda: stderr_chunks.append(process.stderr.read()),
+            name="ipsec-stream-stderr",
+            daemon=True,
+        )
+        stderr_reader.start()
+        stdout_lines = []
+        with process:
+            for line in process.stdout:
+                stdout_lines.append(line)
+                on_line(line)
+            stderr_reader.join()
+        returncode = process.returncode
+        return subprocess.CompletedProcess(args, returncode, "".join(stdout_lines), "".join(stderr_chunks))
+
+
+class CommandRecorder(CommandRunner):
+    """
+    Executa pelo runner real e grava cada chamada; usado de várias threads.
+    """
+
+    def __init__(self, path: str, runner: Optional[CommandRunner] = None):
+        self.path = path
+        self.runner = runner or CommandRunner()
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write_header(self, backend: str, config_files: List[str]) -> None:
+        config = {}
+        for config_file in config_files:
+            try:
+                with open(config_file, "r") as f:
+                    config[config_file] = redact_config(f.read())
+            except OSError:
+                continue
+        self._write({
+            "type": "header",
+            "version": TRACE_VERSION,
+            "backend": backend,
+            "time": time.time(),
+            "config": config,
+        })
+
+    def run(self, args: List[str]) -> subprocess.CompletedProcess:
+        start = time.monotonic()
+        try:
+            result = self.runner.run(args)
+        except OSError as e:
+            self._write_error(args, start, e)
+            raise
+        self._write_result(args, start, result)
+        return result
+
+    def stream(self, args: List[str], on_line: Callable[[str], None]) -> subprocess.CompletedProcess:
+        start = time.monotonic()
+        lines = []
+
+        def record_line(line: str) -> None:
+            lines.append([round(time.monotonic() - start, 6), line])
+            on_line(line)
+
+        try:
+            result = self.runner.stream(args, record_line)
+        except OSError as e:
+            self._write_error(args, start, e)
+            raise
+        self._write_result(args, start, result, lines)
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _write_result(self, args, start, result, lines=None) -> None:
+        entry = {
+            "type": "command",
+            "args": list(args),
+            "at": round(start - self.started, 6),
+            "duration": round(time.monotonic() - start, 6),
+            "returncode": result.returncode,
+            "stdout": result.stdout,
+            "stderr": result.stderr,
+        }
+        if lines is not None:
+            entry["lines"] = lines
+        self._write(entry)
+
+    def _write_error(self, args, start, error: OSError) -> None:
+        self._write({
+            "type": "command",
+            "args": list(args),
+            "at": round(start - self.started, 6),
+            "duration": round(time.monotonic() - start, 6),
+            "error": type(error).__name__,
+            "message": str(error),
+        })
+
+    def _write(self, entry: dict) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            # Linha completa no disco a cada comando: a gravação serve mesmo após um travamento
+            self._file.flush()
+
+
+def load_trace(path: str):
+    """
+    Cabeçalho (ou {}) e comandos de uma gravação.
+    """
+    header = {}
+    commands = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("type") == "header":
+                header = entry
+            elif entry.get("type") == "command":
+                commands.append(entry)
+    return header, commands
+
+
+class CommandReplayer(CommandRunner):
+    """
+    Responde com as gravações de cada comando, na ordem gravada; a última resposta de
+    um comando se repete quando as consultas da reprodução excedem as da gravação.
+    """
+
+    def __init__(self, path: str, latency_scale: float = 1.0):
+        self.path = path
+        self.latency_scale = latency_scale
+        self.header, self.commands = load_trace(path)
+        self._responses: Dict[tuple, List[dict]] = {}
+        for entry in self.commands:
+            self._responses.setdefault(tuple(entry["args"]), []).append(entry)
+        self._next: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self._config_dir: Optional[str] = None
+
+    @property
+    def backend(self) -> str:
+        return self.header.get("backend", "")
+
+    def config_files(self) -> List[str]:
+        """
+        Recria os arquivos de configuração gravados em um diretório temporário (mesmos
+        caminhos relativos) e retorna seus caminhos, na ordem da varredura original.
+        """
+        if self._config_dir is None:
+            self._config_dir = tempfile.mkdtemp(prefix="vpn_ipsec_replay_")
+        paths = []
+        for original, content in self.header.get("config", {}).items():
+            path = os.path.join(self._config_dir, original.lstrip(os.sep))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+            paths.append(path)
+        return paths
+
+    def run(self, args: List[str]) -> subprocess.CompletedProcess:
+        entry = self._take(args)
+        if entry is None:
+            return subprocess.CompletedProcess(args, 127, "", f"Sem gravação para: {' '.join(args)}")
+        self._sleep(entry["duration"])
+        return self._result(args, entry)
+
+    def stream(self, args: List[str], on_line: Callable[[str], None]) -> subprocess.CompletedProcess:
+        entry = self._take(args)
+        if entry is None:
+            return subprocess.CompletedProcess(args, 127, "", f"Sem gravação para: {' '.join(args)}")
+        elapsed = 0.0
+        for offset, line in entry.get("lines", []):
+            self._sleep(offset - elapsed)
+            elapsed = offset
+            on_line(line)
+        self._sleep(entry["duration"] - elapsed)
+        return self._result(args, entry)
+
+    def _take(self, args: List[str]) -> Optional[dict]:
+        key = tuple(args)
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                return None
+            index = self._next.get(key, 0)
+            self._next[key] = index + 1
+        return responses[min(index, len(responses) - 1)]
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0 and self.latency_scale > 0:
+            time.sleep(seconds * self.latency_scale)
+
+    def _result(self, args: List[str], entry: dict) -> subprocess.CompletedProcess:
+        if "error" in entry:
+            # Ex.: FileNotFoundError gravado em uma máquina sem o 'ipsec'
+            error_class = getattr(builtins, entry["error"], None)
+            if not (isinstance(error_class, type) and issubclass(error_class, OSError)):
+                error_class = OSError
+            raise error_class(entry.get("message", ""))
+        return subprocess.CompletedProcess(args, entry["returncode"], entry["stdout"], entry["stderr"])
+
+
+def _command_kind(args: List[str]) -> str:
+    """
+    Ação do 'ipsec' sem o sudo e o nome da conexão (ex.: 'up', 'whack --showstates').
+    """
+    words = [arg for arg in args if arg != "sudo"]
+    if words and words[0] == "ipsec":
+        words = words[1:]
+    if words[:1] in (["auto"], ["whack"]):
+        return " ".join(words[:2])
+    return words[0] if words else ""
+
+
+def summarize(commands: List[dict]) -> str:
+    by_kind: Dict[str, List[float]] = {}
+    for entry in commands:
+        by_kind.setdefault(_command_kind(entry["args"]), []).append(entry["duration"])
+    lines = [f"{len(commands)} comandos"]
+    for kind, durations in sorted(by_kind.items(), key=lambda item: -sum(item[1])):
+        durations.sort()
+        median = durations[len(durations) // 2]
+        lines.append(
+            f"  {kind:<24} {len(durations):>5}x  mediana {median * 1000:8.1f} ms  "
+            f"máx. {durations[-1] * 1000:8.1f} ms  total {sum(durations):7.2f} s"
+        )
+    return "\n".join(lines)
+
+
+def replay_session(manager, commands: List[dict], output=print) -> None:
+    """
+    Refaz pelo IPsecManager as ações gravadas (conectar, desconectar, consultar) e
+    relata as transições resultantes com o tempo de cada ação.
+    """
+    manager.add_transition_listener(
+        lambda transition: output(f"    {transition.conn_name}: {transition.previous.name} -> {transition.state.name}")
+    )
+    for entry in commands:
+        args = [arg for arg in entry["args"] if arg != "sudo"]
+        kind = _command_kind(entry["args"])
+        conn_name = args[-1] if len(args) > 1 else ""
+        start = time.perf_counter()
+        if kind in ("up", "auto --up", "route", "auto --route"):
+            action = f"conectar {conn_name}"
+            manager.connect_connection(conn_name)
+        elif kind in ("down", "auto --down") and not conn_name.endswith("{*}"):
+            action = f"desconectar {conn_name}"
+            manager.disconnect_connection(conn_name)
+        elif kind in ("status", "whack --showstates"):
+            action = "consulta"
+            manager.collect_counters = False
+            manager.refresh_status_snapshot()
+        elif kind in ("statusall", "whack --trafficstatus"):
+            action = "consulta detalhada"
+            manager.collect_counters = True
+            manager.refresh_status_snapshot()
+        else:
+            continue
+        output(f"{entry['at']:9.3f}s  {action} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gravações de comandos do IPsec.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="comandos gravados e suas latências")
+    summary_parser.add_argument("trace")
+    replay_parser = subparsers.add_parser("replay", help="refaz a sessão gravada pelo IPsecManager")
+    replay_parser.add_argument("trace")
+    replay_parser.add_argument("--scale", type=float, default=0.0, help="fator da latência gravada (0 = sem espera)")
+    args = parser.parse_args(argv)
+
+    try:
+        header, commands = load_trace(args.trace)
+    except (OSError, ValueError) as e:
+        print(f"Falha ao ler {args.trace}: {e}", file=sys.stderr)
+        return 1
+    if args.command == "summary":
+        print(f"Implementação: {header.get('backend', '?')}, {len(header.get('config', {}))} arquivos de configuração")
+        print(summarize(commands))
+        return 0
+
+    os.environ["VPN_CLIENT_REPLAY_COMMANDS"] = args.trace
+    os.environ["VPN_CLIENT_REPLAY_LATENCY_SCALE"] = str(args.scale)
+    from .ipsec_manager import IPsecManager
+
+    start = time.perf_counter()
+    manager = IPsecManager()
+    try:
+        print(f"Conexões: {', '.join(manager.connections) or 'nenhuma'}")
+        replay_session(manager, commands)
+    finally:
+        manager.shutdown()
+    print(f"Reprodução concluída em {time.perf_counter() - start:.2f} s (latência x{args.scale:g})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+Módulo ConfigApply
+
+Aplicação seletiva de mudanças na configuração IPsec, sem reiniciar o daemon.
+
+As seções 'conn' do arquivo atual e do novo são comparadas pelas opções efetivas
+(com 'conn %default' e 'also=' expandidos), de modo que comentários, espaços e a
+ordem das linhas não contam como mudança. O novo arquivo é gravado atomicamente e
+'ipsec update' faz o starter substituir apenas as conexões alteradas: os túneis das
+demais continuam de pé. Mudanças no ipsec.secrets usam 'ipsec rereadsecrets'.
+
+O VICI 'load-conn' não se aplica aqui: ele carrega conexões no formato do swanctl.conf,
+e o cliente gerencia conexões do ipsec.conf (stroke).
+
+Uso:
+    python -m src.ipsec.config_apply NOVO_ARQUIVO [--target /etc/ipsec.conf] [--dry-run]
+    python -m src.ipsec.config_apply NOVOS_SEGREDOS --secrets
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+from .connection_record import parse_section_options
+from .ipsec_config_parser import parse_config_sections
+
+DEFAULT_SECTION = "%default"
+
+
+def read_config_file(path: str) -> str:
+    """
+    Conteúdo atual de um arquivo de configuração; vazio se ele ainda não existir.
+    """
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+def write_atomic(path: str, content: str) -> None:
+    """
+    Grava o arquivo por um temporário no mesmo diretório e os.replace: o starter
+    nunca lê um ipsec.conf pela metade. Permissões e dono do arquivo atual são mantidos.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        current = None
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as tmp_file:
+            tmp_file.write(content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        if current is not None:
+            os.chmod(tmp_path, current.st_mode & 0o7777)
+            if os.geteuid() == 0:
+                os.chown(tmp_path, current.st_uid, current.st_gid)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    # A troca de nome só é durável após o fsync do diretório
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def effective_connections(content: str) -> Dict[str, Dict[str, str]]:
+    """
+    Opções efetivas de cada conexão: %default, depois as seções de also= (na ordem)
+    e por fim as opções da própria seção.
+    """
+    sections: Dict[str, Dict[str, str]] = {}
+    for kind, name, body in parse_config_sections(content):
+        if kind == "conn":
+            # Como no starter, um nome repetido acrescenta opções à seção anterior
+            sections.setdefault(name, {}).update(parse_section_options(body))
+    defaults = sections.get(DEFAULT_SECTION, {})
+
+    def expand(name: str, seen: tuple) -> Dict[str, str]:
+        options: Dict[str, str] = {}
+        own = sections.get(name, {})
+        for included in own.get("also", "").split():
+            if included in sections and included not in seen:
+                options.update(expand(included, seen + (included,)))
+        options.update(own)
+        options.pop("also", None)
+        return options
+
+    return {
+        name: {**defaults, **expand(name, (name,))}
+        for name in sections
+        if not name.startswith("%")
+    }
+
+
+def setup_options(content: str) -> Dict[str, str]:
+    options: Dict[str, str] = {}
+    for kind, name, body in parse_config_sections(content):
+        if kind == "config" and name == "setup":
+            options.update(parse_section_options(body))
+    return options
+
+
+class ConfigDiff:
+    """
+    Conexões adicionadas, removidas e alteradas entre duas versões de um ipsec.conf.
+    """
+
+    __slots__ = ("added", "removed", "changed", "unchanged", "setup_changed", "changed_options")
+
+    def __init__(self, old_content: str, new_content: str):
+        old = effective_connections(old_content)
+        new = effective_connections(new_content)
+        self.added: List[str] = [name for name in new if name not in old]
+        self.removed: List[str] = [name for name in old if name not in new]
+        self.changed: List[str] = []
+        self.unchanged: List[str] = []
+        # Conexão alterada -> opções com valor diferente (removidas aparecem com None, "-chave")
+        self.changed_options: Dict[str, Dict[str, Optional[str]]] = {}
+        for name, options in new.items():
+            if name not in old:
+                continue
+            if options == old[name]:
+                self.unchanged.append(name)
+                continue
+            self.changed.append(name)
+            self.changed_options[name] = {
+                key: options.get(key)
+                for key in sorted(set(options) | set(old[name]))
+                if options.get(key) != old[name].get(key)
+            }
+        self.setup_changed = setup_options(old_content) != setup_options(new_content)
+
+    @property
+    def affected(self) -> List[str]:
+        return self.added + self.removed + self.changed
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.affected and not self.setup_changed
+
+    def describe(self) -> str:
+        if self.is_empty:
+            return "Nenhuma conexão alterada."
+        lines = []
+        for name in self.added:
+            lines.append(f"+ {name}")
+        for name in self.removed:
+            lines.append(f"- {name}")
+        for name in self.changed:
+            changes = ", ".join(
+                f"{key}={value}" if value is not None else f"-{key}"
+                for key, value in self.changed_options[name].items()
+            )
+            lines.append(f"~ {name}: {changes}")
+        if self.unchanged:
+            lines.append(f"  {len(self.unchanged)} conexões sem mudança não serão tocadas")
+        if self.setup_changed:
+            lines.append(
+                "! 'config setup' alterada: só é aplicada com 'ipsec restart', que derruba todos os túneis"
+            )
+        return "\n".join(lines)
+
+
+class ConfigApplyResult:
+    """
+    Resultado de uma aplicação: o diff, os comandos executados e as conexões religadas.
+    """
+
+    __slots__ = ("path", "diff", "written", "reconnected", "messages", "error")
+
+    def __init__(self, path: str, diff: Optional[ConfigDiff] = None):
+        self.path = path
+        self.diff = diff
+        self.written = False
+        self.reconnected: List[str] = []
+        self.messages: List[str] = []
+        self.error = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+    def describe(self) -> str:
+        lines = [f"{self.path}:"]
+        if self.diff is not None:
+            lines.append(self.diff.describe())
+        lines.extend(self.messages)
+        if self.reconnected:
+            lines.append(f"Religadas após a mudança: {', '.join(self.reconnected)}")
+        if self.error:
+            lines.append(self.error)
+        return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Aplica um novo ipsec.conf/ipsec.secrets sem derrubar os túneis das conexões inalteradas."
+    )
+    parser.add_argument("source", help="arquivo com o novo conteúdo")
+    parser.add_argument("--target", help="arquivo a substituir (padrão: /etc/ipsec.conf ou /etc/ipsec.secrets)")
+    parser.add_argument("--secrets", action="store_true", help="o conteúdo é um ipsec.secrets")
+    parser.add_argument("--dry-run", action="store_true", help="apenas mostra as conexões afetadas")
+    args = parser.parse_args(argv)
+
+    from ..config.app_config import IPSEC_CONFIG_PATHS, IPSEC_SECRETS_PATH
+
+    try:
+        content = read_config_file(args.source)
+    except OSError as e:
+        print(f"Falha ao ler {args.source}: {e.strerror or e}", file=sys.stderr)
+        return 1
+    target = args.target or (IPSEC_SECRETS_PATH if args.secrets else IPSEC_CONFIG_PATHS[0])
+    if args.dry_run:
+        if args.secrets:
+            changed = read_config_file(target) != content
+            print(f"{target}: {'alterado' if changed else 'sem mudança'}")
+        else:
+            print(ConfigDiff(read_config_file(target), content).describe())
+        return 0
+
+    from .ipsec_manager import IPsecManager
+
+    manager = IPsecManager()
+    try:
+        if args.secrets:
+            result = manager.apply_secrets(content, target)
+        else:
+            result = manager.apply_config(content, target)
+    finally:
+        manager.shutdown()
+    print(result.describe())
+    return 0 if result.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,457 @@
+"""
+Módulo ConnectTracer
+
+Rastreia cada conexão em spans por fase, para identificar onde o tempo é gasto:
+
+    connect <conexão>
+    ├── preflight
+    ├── ipsec up
+    │   ├── sudo          (até o charon aceitar o pedido: primeira linha do 'ipsec up')
+    │   ├── IKE_SA_INIT   (ou Main/Aggressive Mode no IKEv1; retransmissões como atributo)
+    │   ├── IKE_AUTH
+    │   │   └── EAP
+    │   └── CHILD_SA
+    └── confirmação      (até a consulta de status observar o túnel ativo)
+
+As fases vêm das linhas de 'ipsec up' lidas à medida que são escritas; linhas do log do
+charon e transições de estado entram como eventos. Os traces são gravados em
+LOGS_DIR/traces no formato JSON do OTLP e podem ser exportados para o formato de trace
+do Chrome (chrome://tracing, Perfetto):
+
+    python -m src.ipsec.connect_tracer                 # lista os traces e a duração das fases
+    python -m src.ipsec.connect_tracer --chrome out.json [TRACE]
+    python -m src.ipsec.connect_tracer --otlp out.json [TRACE]
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from ..config.app_config import TRACE_MAX_FILES, TRACES_DIR
+
+SERVICE_NAME = "vpn-ipsec-client"
+SCOPE_NAME = "vpn-ipsec-client.connect"
+# Códigos de status do OTLP
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+# Tamanho máximo de uma linha registrada como evento
+MAX_EVENT_TEXT = 300
+
+# Linhas do 'ipsec up' (strongSwan) que marcam as fronteiras das fases
+IKE_INIT_START = re.compile(r"^initiating (?:Main Mode |Aggressive Mode )?IKE_SA ")
+IKE_INIT_DONE = re.compile(r"^parsed (?:IKE_SA_INIT|ID_PROT|AGGRESSIVE) response")
+RETRANSMIT = re.compile(r"^retransmit \d+ of request with message ID \d+")
+EAP_START = re.compile(r"^(?:server requested EAP_|received EAP identity request)")
+EAP_DONE = re.compile(r"^EAP method \S+ (succeeded|failed)")
+IKE_AUTH_DONE = re.compile(r"^IKE_SA \S+ established")
+CHILD_SA_DONE = re.compile(r"^CHILD_SA \S+ established")
+
+# Fases dentro de 'ipsec up', na ordem em que ocorrem
+PHASES = ("sudo", "IKE_SA_INIT", "IKE_AUTH", "EAP", "CHILD_SA")
+
+
+class Span:
+    """
+    Um intervalo do trace, com eventos e atributos.
+    """
+
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "events", "status", "message")
+
+    def __init__(self, name: str, parent_id: str = "", start_ns: Optional[int] = None):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, object] = {}
+        # (timestamp_ns, nome, atributos)
+        self.events: List[tuple] = []
+        self.status = STATUS_UNSET
+        self.message = ""
+
+    @property
+    def duration(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e9
+
+
+class ConnectTrace:
+    """
+    Trace de uma tentativa de conexão. feed_line pode ser chamado de outra thread.
+    """
+
+    def __init__(self, conn_name: str, kind: str = "connect"):
+        self.conn_name = conn_name
+        self.trace_id = secrets.token_hex(16)
+        self.root = Span(f"{kind} {conn_name}")
+        self.root.attributes["ipsec.connection"] = conn_name
+        self.spans: List[Span] = [self.root]
+        self.finished = False
+        self._lock = threading.Lock()
+        # Fases abertas por nome
+        self._open: Dict[str, Span] = {}
+
+    # --- Spans ---
+
+    def start_span(self, name: str, parent: Optional[Span] = None, start_ns: Optional[int] = None) -> Span:
+        with self._lock:
+            return self._start(name, parent or self.root, start_ns)
+
+    def end_span(self, span: Span, ok: Optional[bool] = None, message: str = "", **attributes) -> None:
+        with self._lock:
+            self._end(span, ok, message, **attributes)
+
+    def add_event(self, name: str, timestamp_ns: Optional[int] = None, **attributes) -> None:
+        """
+        Registra um evento na fase aberta mais interna (ou na raiz).
+        """
+        with self._lock:
+            self._current().events.append((timestamp_ns or time.time_ns(), name, attributes))
+
+    # --- 'ipsec up' ---
+
+    def begin_ipsec_up(self) -> None:
+        with self._lock:
+            up = self._open["ipsec up"] = self._start("ipsec up", self.root)
+            self._open["sudo"] = self._start("sudo", up)
+
+    def feed_line(self, line: str, timestamp_ns: Optional[int] = None) -> None:
+        """
+        Recebe uma linha de 'ipsec up' no momento em que foi lida.
+        """
+        timestamp_ns = timestamp_ns or time.time_ns()
+        line = line.strip()
+        if not line:
+            return
+        with self._lock:
+            up = self._open.get("ipsec up")
+            if up is None:
+                return
+            if IKE_INIT_START.search(line):
+                self._close("sudo", timestamp_ns)
+                span = self._open["IKE_SA_INIT"] = self._start("IKE_SA_INIT", up, timestamp_ns)
+                span.attributes["ike.retransmits"] = 0
+            elif IKE_INIT_DONE.search(line):
+                self._close("IKE_SA_INIT", timestamp_ns, ok=True)
+                self._open["IKE_AUTH"] = self._start("IKE_AUTH", up, timestamp_ns)
+            elif RETRANSMIT.search(line):
+                span = self._current()
+                span.attributes["ike.retransmits"] = int(span.attributes.get("ike.retransmits", 0)) + 1
+            elif EAP_START.search(line) and "EAP" not in self._open and "IKE_AUTH" in self._open:
+                self._open["EAP"] = self._start("EAP", self._open["IKE_AUTH"], timestamp_ns)
+            elif EAP_DONE.search(line):
+                self._close("EAP", timestamp_ns, ok=EAP_DONE.search(line).group(1) == "succeeded")
+            elif IKE_AUTH_DONE.search(line):
+                self._close("EAP", timestamp_ns, ok=True)
+                self._close("IKE_AUTH", timestamp_ns, ok=True)
+                self._open["CHILD_SA"] = self._start("CHILD_SA", up, timestamp_ns)
+            elif CHILD_SA_DONE.search(line):
+                self._close("CHILD_SA", timestamp_ns, ok=True)
+            self._current().events.append((timestamp_ns, line[:MAX_EVENT_TEXT], {"source": "ipsec up"}))
+
+    def end_ipsec_up(self, success: bool, message: str) -> None:
+        """
+        Fecha as fases ainda abertas; em caso de sucesso começa a espera pela confirmação.
+        """
+        now = time.time_ns()
+        with self._lock:
+            for phase in reversed(PHASES):
+                self._close(phase, now, ok=None if success else False, message="" if success else message)
+            self._close("ipsec up", now, ok=success, message="" if success else message)
+            if success:
+                self._open["confirmação"] = self._start("confirmação", self.root, now)
+
+    # --- Encerramento ---
+
+    def finish(self, ok: bool, message: str = "") -> None:
+        now = time.time_ns()
+        with self._lock:
+            if self.finished:
+                return
+            for name in list(self._open):
+                self._close(name, now, ok=ok if name == "confirmação" else None)
+            self._end(self.root, ok, message, end_ns=now)
+            self.finished = True
+
+    def phase_durations(self) -> Dict[str, float]:
+        """
+        Duração (s) de cada span, pelo nome; fases repetidas são somadas.
+        """
+        durations: Dict[str, float] = {}
+        for span in self.spans[1:]:
+            durations[span.name] = durations.get(span.name, 0.0) + span.duration
+        return durations
+
+    def summary(self) -> str:
+        parts = []
+        for span in self.spans[1:]:
+            text = f"{span.name} {span.duration:.2f}s"
+            text += _retransmits_text(span.attributes.get("ike.retransmits"))
+            parts.append(text)
+        return f"Trace de {self.conn_name} ({self.root.duration:.2f}s): " + ", ".join(parts)
+
+    # --- Exportação ---
+
+    def to_otlp(self) -> dict:
+        """
+        Documento no formato JSON do OTLP (ExportTraceServiceRequest).
+        """
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": SCOPE_NAME},
+                            "spans": [self._otlp_span(span) for span in self.spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def _otlp_span(self, span: Span) -> dict:
+        data = {
+            "traceId": self.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # SPAN_KIND_INTERNAL
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns if span.end_ns is not None else span.start_ns),
+            "attributes": _otlp_attributes(span.attributes),
+            "events": [
+                {"timeUnixNano": str(timestamp), "name": name, "attributes": _otlp_attributes(attributes)}
+                for timestamp, name, attributes in span.events
+            ],
+            "status": {"code": span.status, "message": span.message},
+        }
+        if span.parent_id:
+            data["parentSpanId"] = span.parent_id
+        return data
+
+    # --- Internos (com o lock) ---
+
+    def _start(self, name: str, parent: Span, start_ns: Optional[int] = None) -> Span:
+        span = Span(name, parent.span_id, start_ns)
+        self.spans.append(span)
+        return span
+
+    def _end(self, span: Span, ok: Optional[bool], message: str = "", end_ns: Optional[int] = None, **attributes) -> None:
+        if span.end_ns is not None:
+            return
+        span.end_ns = end_ns or time.time_ns()
+        span.attributes.update(attributes)
+        if ok is not None:
+            span.status = STATUS_OK if ok else STATUS_ERROR
+        span.message = message
+
+    def _close(self, name: str, end_ns: int, ok: Optional[bool] = None, message: str = "") -> None:
+        span = self._open.pop(name, None)
+        if span is not None:
+            self._end(span, ok, message, end_ns)
+
+    def _current(self) -> Span:
+        for name in ("EAP", "IKE_AUTH", "IKE_SA_INIT", "CHILD_SA", "sudo", "ipsec up", "confirmação"):
+            if name in self._open:
+                return self._open[name]
+        return self.root
+
+
+def _retransmits_text(retransmits) -> str:
+    retransmits = int(retransmits or 0)
+    if not retransmits:
+        return ""
+    return f" ({retransmits} {'retransmissão' if retransmits == 1 else 'retransmissões'})"
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def _otlp_plain(value: dict):
+    return next(iter(value.values())) if value else None
+
+
+def otlp_to_chrome(document: dict) -> dict:
+    """
+    Converte um documento OTLP em trace do Chrome: spans como eventos completos ('X'),
+    eventos de span como instantâneos ('i').
+    """
+    events = []
+    for resource_spans in document.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                start_us = int(span["startTimeUnixNano"]) / 1000
+                args = {item["key"]: _otlp_plain(item["value"]) for item in span.get("attributes", [])}
+                if span.get("status", {}).get("message"):
+                    args["status"] = span["status"]["message"]
+                events.append({
+                    "name": span["name"],
+                    "cat": "connect",
+                    "ph": "X",
+                    "ts": start_us,
+                    "dur": int(span["endTimeUnixNano"]) / 1000 - start_us,
+                    "pid": 1,
+                    "tid": 1,
+                    "args": args,
+                })
+                for event in span.get("events", []):
+                    events.append({
+                        "name": event["name"],
+                        "cat": "log",
+                        "ph": "i",
+                        "s": "t",
+                        "ts": int(event["timeUnixNano"]) / 1000,
+                        "pid": 1,
+                        "tid": 1,
+                        "args": {item["key"]: _otlp_plain(item["value"]) for item in event.get("attributes", [])},
+                    })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class ConnectTracer:
+    """
+    Mantém os traces em andamento (um por conexão) e grava os concluídos em TRACES_DIR.
+    """
+
+    def __init__(self, directory: str = TRACES_DIR, max_files: int = TRACE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        self.active: Dict[str, ConnectTrace] = {}
+        # Último trace concluído por conexão, ainda não consultado pela interface
+        self._finished: Dict[str, ConnectTrace] = {}
+
+    def begin(self, conn_name: str, kind: str = "connect") -> ConnectTrace:
+        previous = self.active.get(conn_name)
+        if previous is not None:
+            self._finish(previous, False, "substituído por uma nova tentativa")
+        trace = self.active[conn_name] = ConnectTrace(conn_name, kind)
+        return trace
+
+    def record_transition(self, transition) -> None:
+        """
+        Eventos de estado; CONNECTED encerra o trace com sucesso, FAILED/DISCONNECTED com erro.
+        """
+        trace = self.active.get(transition.conn_name)
+        if trace is None:
+            return
+        trace.add_event(
+            f"{transition.previous.label} -> {transition.state.label}",
+            int(transition.timestamp * 1e9),
+            source="status",
+        )
+        if transition.state.is_connected:
+            self._finish(trace, True)
+        elif not transition.state.is_transitional and transition.previous.is_transitional:
+            self._finish(trace, False, transition.detail or transition.state.label)
+
+    def record_log_lines(self, conn_name: str, lines: List[str]) -> None:
+        """
+        Linhas do log do charon referentes à conexão, durante um trace em andamento.
+        """
+        trace = self.active.get(conn_name)
+        if trace is None:
+            return
+        now = time.time_ns()
+        for line in lines:
+            trace.add_event(line[:MAX_EVENT_TEXT], now, source="charon")
+
+    def pop_finished(self, conn_name: str) -> Optional[ConnectTrace]:
+        return self._finished.pop(conn_name, None)
+
+    def _finish(self, trace: ConnectTrace, ok: bool, message: str = "") -> None:
+        trace.finish(ok, message)
+        if self.active.get(trace.conn_name) is trace:
+            del self.active[trace.conn_name]
+        self._finished[trace.conn_name] = trace
+        self._save(trace)
+
+    def _save(self, trace: ConnectTrace) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(trace.root.start_ns / 1e9))
+            safe_name = re.sub(r"[^\w.-]", "_", trace.conn_name)
+            path = os.path.join(self.directory, f"{stamp}-{safe_name}-{trace.trace_id[:8]}.json")
+            with open(path, "w", encoding="utf-8") as trace_file:
+                json.dump(trace.to_otlp(), trace_file)
+            self._prune()
+        except OSError as e:
+            print(f"Error saving connect trace: {e}")
+
+    def _prune(self) -> None:
+        paths = list_trace_files(self.directory)
+        for path in paths[: max(0, len(paths) - self.max_files)]:
+            os.remove(path)
+
+
+def list_trace_files(directory: str = TRACES_DIR) -> List[str]:
+    """
+    Traces gravados, do mais antigo ao mais recente.
+    """
+    return sorted(glob.glob(os.path.join(directory, "*.json")))
+
+
+def _describe(document: dict) -> str:
+    spans = document["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root = spans[0]
+
+    def duration(span):
+        return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e9
+
+    status = {STATUS_OK: "ok", STATUS_ERROR: "erro"}.get(root["status"]["code"], "?")
+    def retransmits(span):
+        attributes = {item["key"]: _otlp_plain(item["value"]) for item in span.get("attributes", [])}
+        return _retransmits_text(attributes.get("ike.retransmits"))
+
+    phases = ", ".join(f"{span['name']} {duration(span):.2f}s{retransmits(span)}" for span in spans[1:])
+    return f"{root['name']} [{status}] {duration(root):.2f}s: {phases}"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Lista e exporta os traces de conexão.")
+    parser.add_argument("trace", nargs="?", help="arquivo do trace (padrão: o mais recente)")
+    parser.add_argument("--chrome", metavar="SAIDA", help="exporta no formato de trace do Chrome")
+    parser.add_argument("--otlp", metavar="SAIDA", help="exporta no formato JSON do OTLP")
+    args = parser.parse_args(argv)
+
+    paths = list_trace_files()
+    if not args.chrome and not args.otlp:
+        for path in paths[-20:]:
+            with open(path, "r", encoding="utf-8") as trace_file:
+                print(f"{os.path.basename(path)}  {_describe(json.load(trace_file))}")
+        return 0
+
+    path = args.trace or (paths[-1] if paths else None)
+    if path is None:
+        print("Nenhum trace gravado.", file=sys.stderr)
+        return 1
+    with open(path, "r", encoding="utf-8") as trace_file:
+        document = json.load(trace_file)
+    if args.otlp:
+        with open(args.otlp, "w", encoding="utf-8") as output:
+            json.dump(document, output, indent=1)
+    if args.chrome:
+        with open(args.chrome, "w", encoding="utf-8") as output:
+            json.dump(otlp_to_chrome(document), output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Módulo ConnectionRecord
+
+Representação tipada e compacta de uma conexão IPsec definida em arquivo de configuração.
+Os campos derivados (opções, propostas IKE/ESP, sub-redes, autenticação) são calculados
+apenas no primeiro acesso, para que catálogos grandes custem pouco até serem exibidos.
+
+Memória por conexão de um catálogo sintético:
+    python -m src.ipsec.connection_record [--connections 10000]
+"""
+
+import argparse
+import re
+import sys
+from typing import Dict, Optional, Tuple
+
+KEY_VALUE_PATTERN = re.compile(r"^\s*([a-zA-Z0-9_-]+)\s*=\s*(.*?)(?:\s*#.*)?$")
+SERVER_ADDRESS_NOT_FOUND = "Server address not found"
+
+# Marcador para campos preguiçosos ainda não calculados (None é um valor válido)
+_UNSET = object()
+
+
+def parse_section_options(section_content: str) -> Dict[str, str]:
+    """
+    Extrai os pares chave=valor de uma seção 'conn', com as chaves internadas.
+    """
+    options = {}
+    for line in section_content.splitlines():
+        stripped = line.strip()
+        # Ignora linhas que são apenas comentários ou vazias
+        if not stripped or stripped.startswith("#"):
+            continue
+        match = KEY_VALUE_PATTERN.search(line)
+        if match:
+            # Internar as chaves faz todas as conexões compartilharem as mesmas strings
+            options[sys.intern(match.group(1))] = match.group(2).strip()
+    return options
+
+
+def _split_list(value: Optional[str]) -> Tuple[str, ...]:
+    """
+    Divide um valor separado por vírgulas, descartando o sufixo estrito '!' do strongSwan.
+    """
+    if not value:
+        return ()
+    return tuple(
+        item.strip().rstrip("!") for item in value.split(",") if item.strip()
+    )
+
+
+class ConnectionRecord:
+    """
+    Uma conexão IPsec e seus detalhes normalizados.
+    """
+
+    __slots__ = (
+        "name",
+        "config_file",
+        "error",
+        "_section",
+        "_options",
+        "_ike",
+        "_esp",
+        "_left_subnets",
+        "_right_subnets",
+        "_auth_type",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        config_file: str = "",
+        section: str = "",
+        error: Optional[str] = None,
+    ):
+        self.name = sys.intern(name)
+        self.config_file = config_file
+        self.error = error
+        # Texto bruto da seção, compartilhado com o resultado da varredura
+        self._section = section
+        self._options = _UNSET
+        self._ike = _UNSET
+        self._esp = _UNSET
+        self._left_subnets = _UNSET
+        self._right_subnets = _UNSET
+        self._auth_type = _UNSET
+
+    @classmethod
+    def from_error(cls, name: str, message: str, config_file: str = "") -> "ConnectionRecord":
+        """
+        Cria um registro que representa uma falha ao localizar ou ler a conexão.
+        """
+        return cls(name, config_file, error=message)
+
+    @property
+    def is_valid(self) -> bool:
+        return self.error is None
+
+    @property
+    def options(self) -> Dict[str, str]:
+        """
+        Pares chave=valor da seção, parseados no primeiro acesso.
+        """
+        if self._options is _UNSET:
+            self._options = parse_section_options(self._section)
+        return self._options
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return self.options.get(key, default)
+
+    @property
+    def ike(self) -> Tuple[str, ...]:
+        """
+        Propostas IKE configuradas (ex.: ('aes256-sha256-ecp256',)).
+        """
+        if self._ike is _UNSET:
+            self._ike = _split_list(self.get("ike"))
+        return self._ike
+
+    @property
+    def esp(self) -> Tuple[str, ...]:
+        """
+        Propostas ESP configuradas (ex.: ('aes256gcm16', 'aes256-sha256')).
+        """
+        if self._esp is _UNSET:
+            self._esp = _split_list(self.get("esp"))
+        return self._esp
+
+    @property
+    def left_subnets(self) -> Tuple[str, ...]:
+        if self._left_subnets is _UNSET:
+            self._left_subnets = _split_list(self.get("leftsubnet"))
+        return self._left_subnets
+
+    @property
+    def right_subnets(self) -> Tuple[str, ...]:
+        if self._right_subnets is _UNSET:
+            self._right_subnets = _split_list(self.get("rightsubnet"))
+        return self._right_subnets
+
+    @property
+    def auth_type(self) -> Optional[str]:
+        """
+        Tipo de autenticação, procurando pelos diferentes campos possíveis.
+        """
+        if self._auth_type is _UNSET:
+            self._auth_type = (
+                self.get("authby") or self.get("leftauth") or self.get("rightauth")
+            )
+        return self._auth_type
+
+    @property
+    def server_address(self) -> str:
+        """
+        Endereço do servidor (gateway) da conexão.
+        """
+        if self.get("right"):
+            return self.get("right")
+        if self.get("alsoip"):
+            return self.get("alsoip")
+        if self.right_subnets:
+            return self.right_subnets[0].split("/")[0]
+        return SERVER_ADDRESS_NOT_FOUND
+
+    def __repr__(self) -> str:
+        if self.error:
+            return f"ConnectionRecord({self.name!r}, error={self.error!r})"
+        return f"ConnectionRecord({self.name!r}, config_file={self.config_file!r})"
+
+
+def measure_catalog_memory(count: int) -> Tuple[float, float]:
+    """
+    Memória por conexão (bytes) de um catálogo sintético, antes e depois de materializar os campos.
+    """
+    import tracemalloc
+
+    template = (
+        "    keyexchange=ikev2\n"
+        "    ike=aes256-sha256-ecp256\n"
+        "    esp=aes256gcm16,aes256-sha256\n"
+        "    left=%defaultroute\n"
+        "    leftauth=eap-mschapv2\n"
+        "    leftsourceip=%config\n"
+        "    right=vpn{0}.example.com\n"
+        "    rightauth=psk\n"
+        "    rightsubnet=10.{1}.0.0/16,192.168.{1}.0/24\n"
+        "    auto=add\n"
+    )
+    sections = [template.format(i, i % 256) for i in range(count)]
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    records = [
+        ConnectionRecord(f"conn-{i}", "/etc/ipsec.d/catalog.conf", section)
+        for i, section in enumerate(sections)
+    ]
+    unparsed, _ = tracemalloc.get_traced_memory()
+    for record in records:
+        record.ike, record.esp, record.right_subnets, record.auth_type
+    parsed, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (unparsed - baseline) / count, (parsed - baseline) / count
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Memória por conexão de um catálogo sintético.")
+    parser.add_argument("--connections", type=int, default=10000, help="conexões no catálogo")
+    args = parser.parse_args(argv)
+
+    unparsed, parsed = measure_catalog_memory(args.connections)
+    print(f"{args.connections} conexões")
+    print(f"  registro sem parsing: {unparsed:.0f} bytes/conexão")
+    print(f"  registro materializado: {parsed:.0f} bytes/conexão")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Módulo ConnectionState
+
+Estados tipados das conexões IPsec e a máquina de estados por conexão mantida pelo
+IPsecManager. A máquina combina as ações do usuário (conectar/desconectar) com os
+estados observados nas consultas de status e só produz transições reais.
+"""
+
+import time
+from enum import Enum
+from typing import Optional
+
+from ..config.app_config import CONNECTION_STATES
+
+
+class ConnectionState(Enum):
+    """
+    Estado de uma conexão; o valor é a chave do rótulo em CONNECTION_STATES.
+    """
+
+    NOT_CONFIGURED = "NOT_CONFIGURED"
+    DISCONNECTED = "DISCONNECTED"
+    CONNECTING = "CONNECTING"
+    CONNECTED = "CONNECTED"
+    REKEYING = "REKEYING"
+    # Políticas de trap instaladas: o túnel é negociado pelo primeiro pacote
+    ROUTED = "ROUTED"
+    DISCONNECTING = "DISCONNECTING"
+    FAILED = "FAILED"
+    ERROR = "ERROR"
+
+    @property
+    def label(self) -> str:
+        return CONNECTION_STATES[self.value]
+
+    @property
+    def is_connected(self) -> bool:
+        # Durante um rekey o túnel continua estabelecido
+        return self in (ConnectionState.CONNECTED, ConnectionState.REKEYING)
+
+    @property
+    def is_active(self) -> bool:
+        # Ligada para o usuário: túnel estabelecido ou pronto para subir sob demanda
+        return self.is_connected or self == ConnectionState.ROUTED
+
+    @property
+    def is_transitional(self) -> bool:
+        # Apenas ações do usuário em andamento; um rekey acontece com o túnel conectado
+        return self in (ConnectionState.CONNECTING, ConnectionState.DISCONNECTING)
+
+
+class StateTransition:
+    """
+    Uma mudança de estado de uma conexão.
+    """
+
+    __slots__ = ("conn_name", "previous", "state", "timestamp", "detail")
+
+    def __init__(
+        self,
+        conn_name: str,
+        previous: ConnectionState,
+        state: ConnectionState,
+        timestamp: float,
+        detail: str = "",
+    ):
+        self.conn_name = conn_name
+        self.previous = previous
+        self.state = state
+        self.timestamp = timestamp
+        self.detail = detail
+
+    def __repr__(self) -> str:
+        return f"StateTransition({self.conn_name!r}, {self.previous.name} -> {self.state.name})"
+
+
+class ConnectionStateMachine:
+    """
+    Máquina de estados de uma conexão.
+    """
+
+    def __init__(self, conn_name: str, state: ConnectionState = ConnectionState.DISCONNECTED):
+        self.conn_name = conn_name
+        self.state = state
+        self.detail = ""
+        self.since = time.time()
+        # Último estado visto em uma consulta, usado ao abandonar uma transição
+        self.observed = state
+        # Instante em que o 'ipsec up' desta conexão retornou (None enquanto não retornar)
+        self.initiated_at: Optional[float] = None
+
+    def begin_connect(self) -> Optional[StateTransition]:
+        if self.state.is_active:
+            return None
+        self.initiated_at = None
+        return self._move(ConnectionState.CONNECTING)
+
+    def mark_initiated(self) -> None:
+        """
+        Registra que o comando de conexão síncrono retornou: a partir daqui, um túnel
+        ausente na consulta seguinte é uma falha, não uma negociação em andamento.
+        """
+        if self.state == ConnectionState.CONNECTING:
+            self.initiated_at = time.time()
+
+    def begin_disconnect(self) -> Optional[StateTransition]:
+        if self.state in (ConnectionState.DISCONNECTED, ConnectionState.NOT_CONFIGURED):
+            return None
+        return self._move(ConnectionState.DISCONNECTING)
+
+    def fail(self, detail: str) -> Optional[StateTransition]:
+        return self._move(ConnectionState.FAILED, detail)
+
+    def abort_transition(self) -> Optional[StateTransition]:
+        """
+        Volta ao último estado observado (ex.: o comando de desconexão falhou).
+        """
+        if self.state not in (ConnectionState.CONNECTING, ConnectionState.DISCONNECTING):
+            return None
+        return self._move(self.observed)
+
+    def observe(
+        self, observed: ConnectionState, detail: str = "", polled_at: Optional[float] = None
+    ) -> Optional[StateTransition]:
+        """
+        Aplica o estado visto em uma consulta de status.
+
+        polled_at é o instante em que a consulta começou; uma consulta iniciada antes do
+        retorno do 'ipsec up' não encerra a conexão em andamento.
+        """
+        self.observed = observed
+        # Estados intermediários do usuário só terminam quando o estado esperado é observado
+        if self.state == ConnectionState.CONNECTING and observed in (
+            ConnectionState.DISCONNECTED,
+            ConnectionState.NOT_CONFIGURED,
+        ):
+            if self.initiated_at is None or (polled_at is not None and polled_at < self.initiated_at):
+                return None
+            return self.fail(detail or "O túnel não foi estabelecido após o comando de conexão.")
+        if self.state == ConnectionState.DISCONNECTING and observed.is_active:
+            return None
+        # Uma falha permanece visível até a próxima ação ou até o túnel subir
+        if self.state == ConnectionState.FAILED and observed == ConnectionState.DISCONNECTED:
+            return None
+        return self._move(observed, detail)
+
+    def expire(self, timeout: float, now: Optional[float] = None) -> Optional[StateTransition]:
+        """
+        Encerra uma transição iniciada pelo usuário que excedeu o prazo.
+        """
+        now = now if now is not None else time.time()
+        if now - self.since < timeout:
+            return None
+        if self.state == ConnectionState.CONNECTING:
+            return self.fail("Tempo esgotado aguardando a conexão ser estabelecida.")
+        if self.state == ConnectionState.DISCONNECTING:
+            return self._move(self.observed)
+        return None
+
+    def _move(self, state: ConnectionState, detail: str = "") -> Optional[StateTransition]:
+        if state == self.state:
+            self.detail = detail or self.detail
+            return None
+        transition = StateTransition(self.conn_name, self.state, state, time.time(), detail)
+        self.state = state
+        self.detail = detail
+        self.since = transition.timestamp
+        return transition
@@ -0,0 +1,88 @@
+"""
+Módulo ConnectionStats
+
+Estatísticas por conexão mantidas pelo IPsecManager (estado, tempo conectado,
+reconexões, latência de conexão e contadores das SAs), alimentadas pelas transições
+da máquina de estados e pelas consultas de status que a aplicação já faz.
+"""
+
+import time
+from typing import Optional
+
+from .connection_state import ConnectionState, StateTransition
+
+
+class ConnectionStats:
+    """
+    Estatísticas acumuladas de uma conexão desde o início da aplicação.
+    """
+
+    __slots__ = (
+        "name",
+        "state",
+        "connected_since",
+        "connects",
+        "reconnects",
+        "transitions",
+        "connect_started",
+        "last_connect_latency",
+        "bytes_in",
+        "bytes_out",
+        "packets_in",
+        "packets_out",
+        "updated_at",
+    )
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = ConnectionState.DISCONNECTED
+        self.connected_since: Optional[float] = None
+        self.connects = 0
+        self.reconnects = 0
+        self.transitions = 0
+        self.connect_started: Optional[float] = None
+        self.last_connect_latency: Optional[float] = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.packets_in = 0
+        self.packets_out = 0
+        self.updated_at: Optional[float] = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.state.is_connected
+
+    def record_transition(self, transition: StateTransition) -> None:
+        """
+        Atualiza as estatísticas a partir de uma transição da máquina de estados.
+        """
+        now = transition.timestamp
+        self.transitions += 1
+        if transition.state == ConnectionState.CONNECTING:
+            self.connect_started = now
+        elif transition.state.is_connected and not transition.previous.is_connected:
+            self.connected_since = now
+            if self.connects:
+                self.reconnects += 1
+            self.connects += 1
+            if self.connect_started is not None:
+                self.last_connect_latency = now - self.connect_started
+            self.connect_started = None
+        elif not transition.state.is_connected and transition.previous.is_connected:
+            self.connected_since = None
+            self.bytes_in = self.bytes_out = self.packets_in = self.packets_out = 0
+        if transition.state in (ConnectionState.FAILED, ConnectionState.DISCONNECTED):
+            self.connect_started = None
+        self.state = transition.state
+        self.updated_at = now
+
+    def record_counters(self, bytes_in: int, bytes_out: int, packets_in: int, packets_out: int) -> None:
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.packets_in = packets_in
+        self.packets_out = packets_out
+
+    def uptime(self, now: Optional[float] = None) -> float:
+        if self.connected_since is None:
+            return 0.0
+        return (now if now is not None else time.time()) - self.connected_since
@@ -1,30 +1,149 @@
-import subprocess
+import os
 import re
-from typing import Tuple
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..config.app_config import (
+    CHARON_CTL_PATH,
+    COMMAND_RECORD_PATH,
+    COMMAND_REPLAY_LATENCY_SCALE,
+    COMMAND_REPLAY_PATH,
+    IPSEC_BACKEND,
+    PLUTO_CTL_PATH,
+)
+from .command_trace import CommandRecorder, CommandReplayer, CommandRunner
+from .connection_state import ConnectionState
+from .ipsec_config_parser import IPsecConfigParser
+from .rekey_monitor import parse_sa_timers
+
+# Linhas de SA do 'ipsec status': "nome[1]: ESTABLISHED ..." (IKE) e "nome{1}:  INSTALLED ..." (CHILD)
+SA_STATE_PATTERN = re.compile(r"^\s*([^\s\[{]+)[\[{]\d+[\]}]:\s+([A-Z_]+)", re.MULTILINE)
+ESTABLISHED_SA_STATES = {"ESTABLISHED", "INSTALLED", "REKEYED"}
+REKEYING_SA_STATES = {"REKEYING"}
+CONNECTING_SA_STATES = {"CONNECTING", "CREATED", "INSTALLING"}
+# CHILD SAs ativas e políticas de trap ("nome{1}:  ROUTED, TUNNEL, reqid 1" em "Routed Connections")
+CHILD_SA_STATES = {"INSTALLED", "REKEYED"}
+ROUTED_SA_STATES = {"ROUTED"}
+# Endpoints da IKE SA: "nome[1]: ESTABLISHED 5 minutes ago, 192.0.2.10[id]...203.0.113.5[id]"
+SA_ENDPOINTS_PATTERN = re.compile(
+    r"^\s*([^\s\[{]+)\[\d+\]:\s+ESTABLISHED[^,\n]*,\s*([^\s\[]+)\[[^\]\n]*\]\.\.\.([^\s\[]+)\[",
+    re.MULTILINE,
+)
+# Contadores do 'ipsec statusall': "nome{1}:   AES_CBC_256/..., 3344 bytes_i (40 pkts, 2s ago), 5566 bytes_o (42 pkts, 2s ago)"
+SA_COUNTERS_PATTERN = re.compile(
+    r"^\s*([^\s\[{]+)\{\d+\}:.*?(\d+) bytes_i(?: \((\d+) pkts?[^)]*\))?, (\d+) bytes_o(?: \((\d+) pkts?[^)]*\))?",
+    re.MULTILINE,
+)
+# Suite da CHILD SA no 'ipsec statusall': "nome{1}:   AES_GCM_16_256, 3344 bytes_i ..." ou "AES_CBC_256/HMAC_SHA2_256_128/MODP_2048, ..."
+SA_CIPHER_PATTERN = re.compile(r"^\s*([^\s\[{]+)\{\d+\}:\s+([A-Z0-9_]+(?:/[A-Z0-9_]+)*), \d+ bytes_i", re.MULTILINE)
+# Encapsulamento da CHILD SA: "nome{1}:  INSTALLED, TUNNEL, reqid 1, ESP in UDP SPIs: ..." com NAT-T
+SA_ENCAP_PATTERN = re.compile(r"^\s*([^\s\[{]+)\{\d+\}:\s+INSTALLED, \w+, reqid \d+, (ESP in UDP|ESP|AH) SPIs", re.MULTILINE)
+
+
+BACKEND_STRONGSWAN = "strongswan"
+BACKEND_LIBRESWAN = "libreswan"
+
+
+def detect_backend(runner: Optional[CommandRunner] = None) -> str:
+    """
+    Implementação IPsec instalada: a configurada, a do socket de controle presente
+    ou, sem daemon em execução, a indicada por 'ipsec --version' (executado pelo runner,
+    para que a consulta também seja gravada).
+    """
+    if IPSEC_BACKEND in (BACKEND_STRONGSWAN, BACKEND_LIBRESWAN):
+        return IPSEC_BACKEND
+    if os.path.exists(PLUTO_CTL_PATH):
+        return BACKEND_LIBRESWAN
+    if os.path.exists(CHARON_CTL_PATH):
+        return BACKEND_STRONGSWAN
+    try:
+        result = (runner or CommandRunner()).run(["ipsec", "--version"])
+    except OSError:
+        return BACKEND_STRONGSWAN
+    return BACKEND_LIBRESWAN if "libreswan" in result.stdout.lower() else BACKEND_STRONGSWAN
+
+
+def create_commander(config_parser: Optional[IPsecConfigParser] = None) -> "IPsecCommander":
+    """
+    Commander da implementação detectada; o do Libreswan só é importado quando usado.
+
+    Com COMMAND_REPLAY_PATH, a implementação e os arquivos de configuração vêm da gravação
+    e nenhum comando é executado; com COMMAND_RECORD_PATH, cada comando é gravado.
+    """
+    config_parser = config_parser or IPsecConfigParser()
+    if COMMAND_REPLAY_PATH:
+        runner = CommandReplayer(COMMAND_REPLAY_PATH, COMMAND_REPLAY_LATENCY_SCALE)
+        config_parser.config_files = runner.config_files()
+        backend = runner.backend or BACKEND_STRONGSWAN
+    elif COMMAND_RECORD_PATH:
+        runner = CommandRecorder(COMMAND_RECORD_PATH)
+        backend = detect_backend(runner)
+        runner.write_header(backend, config_parser._get_all_config_files())
+    else:
+        runner = CommandRunner()
+        backend = detect_backend(runner)
+    if backend == BACKEND_LIBRESWAN:
+        from .libreswan_commander import LibreswanCommander
+
+        commander = LibreswanCommander(config_parser)
+    else:
+        commander = IPsecCommander(config_parser)
+    commander.runner = runner
+    return commander
 
 
 class IPsecCommander:
     """
     Responsável por executar comandos IPsec e interpretar suas saídas.
+
+    Implementação para o strongSwan (stroke); outras implementações sobrescrevem
+    _action_args, _read_status e os comandos que diferem (ver LibreswanCommander).
     """
 
-    def connect_connection(self, conn_name: str) -> Tuple[bool, str]:
+    backend = BACKEND_STRONGSWAN
+    # 'ipsec down nome{*}' encerra só as CHILD SAs, mantendo a IKE SA para o modo rápido
+    keeps_ike_sa = True
+
+    def __init__(self, config_parser: Optional[IPsecConfigParser] = None):
+        # Executa os comandos; trocado pelo gravador/reprodutor de src/ipsec/command_trace.py
+        self.runner = CommandRunner()
+        # Compartilha a varredura de configuração com o IPsecManager em vez de reler os arquivos
+        self.config_parser = config_parser or IPsecConfigParser()
+        # Contadores da última consulta detalhada: nome -> (bytes_in, pacotes_in, bytes_out, pacotes_out)
+        self.last_sa_counters: Dict[str, Tuple[int, int, int, int]] = {}
+        # Endpoints das IKE SAs estabelecidas na última consulta: nome -> (local, remoto)
+        self.last_sa_endpoints: Dict[str, Tuple[str, str]] = {}
+        # Prazos de rekey/reautenticação (segundos) da última consulta detalhada e o momento dela
+        self.last_sa_timers: Dict[str, Dict[str, int]] = {}
+        self.last_sa_timers_at = 0.0
+        # Estados das SAs por conexão na última consulta
+        self.last_sa_states: Dict[str, Set[str]] = {}
+        # Conexões em modo rápido (definidas pelo IPsecManager): uma IKE SA sem CHILD SA
+        # é a IKE SA mantida após desligar, não uma conexão estabelecida
+        self.fast_connections: Set[str] = set()
+
+    def connect_connection(
+        self, conn_name: str, on_line: Optional[Callable[[str, int], None]] = None
+    ) -> Tuple[bool, str]:
         """
         Inicia uma conexão IPsec.
+
+        on_line recebe cada linha da saída de 'ipsec up' assim que é escrita, com o instante
+        da leitura (time.time_ns); usado pelo trace de conexão para separar as fases.
         """
         try:
-            result = subprocess.run(
-                ["sudo", "ipsec", "up", conn_name],
-                capture_output=True,
-                text=True,
-                check=False,  # Não levantar exceção automaticamente
-            )
-            # O comando 'ipsec up' pode retornar 0 mesmo quando o processo de conexão é iniciado
-            # ou pode retornar outro código mesmo após iniciar o processo
-            if result.returncode == 0 or "connection 'fortigate-vpn' established successfully" in result.stdout or "initiating" in result.stdout:
+            def feed_line(line: str) -> None:
+                if on_line is not None:
+                    on_line(line, time.time_ns())
+
+            result = self.runner.stream(["sudo", "ipsec", *self._action_args("up", conn_name)], feed_line)
+            stdout, stderr, returncode = result.stdout, result.stderr, result.returncode
+            # 'ipsec up' só retorna após a negociação: 0 com o túnel estabelecido; qualquer
+            # outro código é uma falha, mesmo com "initiating ..." já escrito na saída
+            if returncode == 0:
                 return True, f'Conexão IPsec "{conn_name}" iniciada com sucesso. Verifique o status para confirmação.'
             else:
-                return False, f'Falha ao iniciar conexão "{conn_name}": {result.stderr.strip() or result.stdout.strip()}'
+                return False, f'Falha ao iniciar conexão "{conn_name}": {stderr.strip() or stdout.strip()}'
         except FileNotFoundError:
             return (
                 False,
@@ -38,12 +157,7 @@ class IPsecCommander:
         Termina uma conexão IPsec.
         """
         try:
-            result = subprocess.run(
-                ["sudo", "ipsec", "down", conn_name],
-                capture_output=True,
-                text=True,
-                check=False,  # Não levantar exceção automaticamente
-            )
+            result = self.runner.run(["sudo", "ipsec", *self._action_args("down", conn_name)])
             # O comando 'ipsec down' pode retornar 0 mesmo quando o processo de desconexão é iniciado
             # ou pode retornar outro código mesmo após iniciar o processo
             if result.returncode == 0 or "deleting IKE_SA" in result.stdout or "connection '" + conn_name + "' closed successfully" in result.stdout:
@@ -58,92 +172,238 @@ class IPsecCommander:
         except Exception as e:
             return False, f"Erro inesperado ao terminar conexão: {str(e)}"
 
-    def get_connection_status(self, conn_name: str) -> Tuple[str, bool]:
+    def route_connection(self, conn_name: str) -> Tuple[bool, str]:
         """
-        Obtém o status de uma conexão IPsec específica.
+        Instala as políticas de trap da conexão ('ipsec route'); o primeiro pacote
+        destinado ao rightsubnet dispara a negociação.
+        """
+        return self._run_ipsec(
+            self._action_args("route", conn_name),
+            ("routed", "already routed"),
+            f'Conexão IPsec "{conn_name}" ativada sob demanda: o túnel sobe com o primeiro pacote.',
+            f'Falha ao instalar as políticas de "{conn_name}"',
+        )
+
+    def unroute_connection(self, conn_name: str) -> Tuple[bool, str]:
+        """
+        Remove as políticas de trap da conexão ('ipsec unroute').
+        """
+        return self._run_ipsec(
+            self._action_args("unroute", conn_name),
+            ("unrouted", "not found"),
+            f'Políticas de trap de "{conn_name}" removidas.',
+            f'Falha ao remover as políticas de "{conn_name}"',
+        )
+
+    def disconnect_child_sas(self, conn_name: str) -> Tuple[bool, str]:
+        """
+        Encerra apenas as CHILD SAs da conexão ('ipsec down nome{*}'), mantendo a IKE SA.
+        """
+        return self._run_ipsec(
+            ["down", f"{conn_name}{{*}}"],
+            ("closing CHILD_SA", "no CHILD_SA"),
+            f'Túnel "{conn_name}" desligado; IKE SA mantida para reconexão rápida.',
+            f'Falha ao encerrar as CHILD SAs de "{conn_name}"',
+        )
+
+    def update_config(self, changed: Iterable[str] = (), removed: Iterable[str] = ()) -> Tuple[bool, str]:
         """
+        Relê o ipsec.conf ('ipsec update'): o starter substitui apenas as conexões
+        alteradas, adicionadas ou removidas; as SAs das demais não são tocadas.
+
+        changed/removed não são necessários aqui: o starter calcula a diferença sozinho.
+        """
+        return self._run_ipsec(
+            ["update"],
+            ("Updating",),
+            "Configuração IPsec atualizada (ipsec update).",
+            "Falha ao atualizar a configuração IPsec",
+        )
+
+    def reread_secrets(self) -> Tuple[bool, str]:
+        """
+        Relê o ipsec.secrets sem afetar as SAs existentes ('ipsec rereadsecrets').
+        """
+        return self._run_ipsec(
+            ["rereadsecrets"],
+            (),
+            "Segredos IPsec relidos (ipsec rereadsecrets).",
+            "Falha ao reler os segredos IPsec",
+        )
+
+    def _action_args(self, action: str, conn_name: str) -> List[str]:
+        """
+        Argumentos do 'ipsec' para uma ação sobre uma conexão (up, down, route, unroute).
+        """
+        return [action, conn_name]
+
+    def _run_ipsec(
+        self, args: list, success_markers: Tuple[str, ...], success: str, failure: str
+    ) -> Tuple[bool, str]:
         try:
-            # Primeiro, verificar se a conexão está ativa ou em processo de conexão
-            result = subprocess.run(
-                ["sudo", "ipsec", "status"], capture_output=True, text=True, check=False
+            result = self.runner.run(["sudo", "ipsec", *args])
+            if result.returncode == 0 or any(marker in result.stdout for marker in success_markers):
+                return True, success
+            return False, f"{failure}: {result.stderr.strip() or result.stdout.strip()}"
+        except FileNotFoundError:
+            return (
+                False,
+                "Erro: Comando 'ipsec' não encontrado. Verifique se o StrongSwan/LibreSwan está instalado e no PATH.",
             )
-            
-            # Verificar se o comando foi executado com sucesso
-            if result.returncode != 0:
-                # Se o comando falhou, tentar obter status de configuração
-                if self._is_connection_configured(conn_name):
-                    return "Desconectado", False
-                else:
-                    return f"Erro ao obter status: {result.stderr.strip() or result.stdout.strip()}", False
-            
-            status_output = result.stdout
-
-            # Procurar por diferentes padrões de status para tornar a detecção mais robusta
-            # Primeiro, procurar por ESTABLISHED ou conexões ativas
-            established_pattern = rf"{re.escape(conn_name)}.*ESTABLISHED"
-            if re.search(established_pattern, status_output, re.MULTILINE | re.DOTALL):
-                return "Conectado", True
-            
-            # Em seguida, procurar por CONNECTING ou IKE_AUTH, CHILD_CREATE (em progresso)
-            connecting_patterns = [
-                rf"{re.escape(conn_name)}.*CONNECTING",
-                rf"{re.escape(conn_name)}.*IKE_AUTH",
-                rf"{re.escape(conn_name)}.*CHILD_CREATE",
-                # Adicionando mais padrões comuns
-                rf"{re.escape(conn_name)}.*initiating",
-                rf"{re.escape(conn_name)}.*establishing"
-            ]
-            
-            for pattern in connecting_patterns:
-                if re.search(pattern, status_output, re.MULTILINE | re.DOTALL):
-                    return "Conectando", False
-
-            # Verificar se a conexão simplesmente está listada como configurada (mesmo que não ativa)
-            # A saída de "ipsec status" pode não mostrar conexões inativas, então devemos verificar
-            # se a conexão está definida em algum arquivo de configuração
-            if self._is_connection_configured(conn_name):
-                # A conexão está configurada mas não ativa
-                return "Desconectado", False
-            else:
-                # A conexão não está configurada
-                return "Não configurado", False
-                
+        except Exception as e:
+            return False, f"{failure}: {str(e)}"
+
+    def get_sa_cipher(self, conn_name: str) -> Optional[str]:
+        """
+        Suite negociada da CHILD SA ativa da conexão (ex.: 'AES_GCM_16_256'), ou None.
+        """
+        return self.get_child_sa_info(conn_name)[0]
+
+    def get_child_sa_info(self, conn_name: str) -> Tuple[Optional[str], Optional[bool]]:
+        """
+        Suite da CHILD SA ativa e se o ESP está encapsulado em UDP (NAT-T); None no que não for encontrado.
+        """
+        try:
+            result = self.runner.run(["sudo", "ipsec", "statusall", conn_name])
+        except (FileNotFoundError, OSError):
+            return None, None
+        cipher = next(
+            (match.group(2) for match in SA_CIPHER_PATTERN.finditer(result.stdout) if match.group(1) == conn_name),
+            None,
+        )
+        udp_encap = next(
+            (
+                match.group(2) == "ESP in UDP"
+                for match in SA_ENCAP_PATTERN.finditer(result.stdout)
+                if match.group(1) == conn_name
+            ),
+            None,
+        )
+        return cipher, udp_encap
+
+    def get_connection_status(self, conn_name: str) -> Tuple[ConnectionState, str]:
+        """
+        Obtém o status de uma conexão IPsec específica.
+        """
+        return self.get_status_snapshot([conn_name])[conn_name]
+
+    def get_status_snapshot(
+        self, conn_names: Iterable[str], detailed: bool = False
+    ) -> Dict[str, Tuple[ConnectionState, str]]:
+        """
+        Obtém o estado observado (e um detalhe, em caso de erro) de várias conexões
+        com uma única chamada a 'ipsec status'.
+
+        Com detailed=True usa 'ipsec statusall' e também atualiza last_sa_counters e last_sa_timers.
+        """
+        conn_names = list(conn_names)
+        try:
+            error = self._read_status(detailed)
         except FileNotFoundError:
-            return "Erro: Comando 'ipsec' não encontrado.", False
+            return {
+                name: (ConnectionState.ERROR, "Erro: Comando 'ipsec' não encontrado.")
+                for name in conn_names
+            }
         except Exception as e:
             # Em caso de erro geral, verificar se a conexão está configurada
-            if self._is_connection_configured(conn_name):
-                return "Desconectado", False
+            return {
+                name: self._fallback_status(name, f"Erro inesperado ao obter status: {str(e)}")
+                for name in conn_names
+            }
+        if error:
+            # Se o comando falhou, tentar obter status de configuração
+            return {name: self._fallback_status(name, error) for name in conn_names}
+        return self._snapshot_from_states(conn_names)
+
+    def _read_status(self, detailed: bool) -> Optional[str]:
+        """
+        Consulta o daemon e atualiza last_sa_states/endpoints (e, com detailed, contadores
+        e prazos); retorna a mensagem de erro quando o comando falha.
+        """
+        result = self.runner.run(["sudo", "ipsec", "statusall" if detailed else "status"])
+        # Verificar se o comando foi executado com sucesso
+        if result.returncode != 0:
+            return f"Erro ao obter status: {result.stderr.strip() or result.stdout.strip()}"
+
+        self.last_sa_states = self._parse_sa_states(result.stdout)
+        self.last_sa_endpoints = self._parse_sa_endpoints(result.stdout)
+        if detailed:
+            self.last_sa_counters = self._parse_sa_counters(result.stdout)
+            self.last_sa_timers = parse_sa_timers(result.stdout)
+            self.last_sa_timers_at = time.time()
+        return None
+
+    def _snapshot_from_states(self, conn_names: List[str]) -> Dict[str, Tuple[ConnectionState, str]]:
+        """
+        Estado de cada conexão a partir de last_sa_states (vocabulário do strongSwan).
+        """
+        snapshot = {}
+        for name in conn_names:
+            states = self.last_sa_states.get(name, set())
+            if states & REKEYING_SA_STATES:
+                snapshot[name] = (ConnectionState.REKEYING, "")
+            elif states & CHILD_SA_STATES or (
+                states & ESTABLISHED_SA_STATES and name not in self.fast_connections
+            ):
+                snapshot[name] = (ConnectionState.CONNECTED, "")
+            elif states & CONNECTING_SA_STATES:
+                snapshot[name] = (ConnectionState.CONNECTING, "")
+            elif states & ROUTED_SA_STATES:
+                snapshot[name] = (ConnectionState.ROUTED, "")
             else:
-                return f"Erro inesperado ao obter status: {str(e)}", False
+                # A saída de "ipsec status" não mostra conexões inativas, então verificamos
+                # se a conexão está definida em algum arquivo de configuração
+                snapshot[name] = self._fallback_status(name, None)
+        return snapshot
+
+    def _parse_sa_states(self, status_output: str) -> Dict[str, Set[str]]:
+        """
+        Agrupa por conexão os estados das SAs listadas (ex.: 'vpn[1]: ESTABLISHED ...').
+        """
+        sa_states: Dict[str, Set[str]] = {}
+        for match in SA_STATE_PATTERN.finditer(status_output):
+            sa_states.setdefault(match.group(1), set()).add(match.group(2))
+        return sa_states
+
+    def _parse_sa_endpoints(self, status_output: str) -> Dict[str, Tuple[str, str]]:
+        """
+        Endereços local e remoto da IKE SA estabelecida de cada conexão (usados após mudanças de rede).
+        """
+        return {
+            match.group(1): (match.group(2), match.group(3))
+            for match in SA_ENDPOINTS_PATTERN.finditer(status_output)
+        }
+
+    def _parse_sa_counters(self, status_output: str) -> Dict[str, Tuple[int, int, int, int]]:
+        """
+        Soma por conexão os contadores das CHILD SAs (bytes/pacotes de entrada e saída).
+        """
+        counters: Dict[str, Tuple[int, int, int, int]] = {}
+        for match in SA_COUNTERS_PATTERN.finditer(status_output):
+            name = match.group(1)
+            values = tuple(int(match.group(i) or 0) for i in (2, 3, 4, 5))
+            previous = counters.get(name, (0, 0, 0, 0))
+            counters[name] = tuple(a + b for a, b in zip(previous, values))
+        return counters
+
+    def _fallback_status(
+        self, conn_name: str, error: Optional[str]
+    ) -> Tuple[ConnectionState, str]:
+        """
+        Estado de uma conexão sem SA ativa: desconectada se estiver configurada.
+        """
+        if self._is_connection_configured(conn_name):
+            return ConnectionState.DISCONNECTED, ""
+        if error:
+            return ConnectionState.ERROR, error
+        return ConnectionState.NOT_CONFIGURED, ""
 
     def _is_connection_configured(self, conn_name: str) -> bool:
         """
         Verifica se uma conexão está configurada em algum arquivo de configuração do IPsec.
         """
         try:
-            # Procurar por definições de conexão em arquivos de configuração
-            import os
-            
-            # Verificar no arquivo principal
-            if os.path.exists("/etc/ipsec.conf"):
-                with open("/etc/ipsec.conf", "r") as f:
-                    content = f.read()
-                    if re.search(rf"^\s*conn\s+{re.escape(conn_name)}\b", content, re.MULTILINE | re.IGNORECASE):
-                        return True
-            
-            # Verificar nos arquivos do diretório ipsec.d
-            ipsec_d_path = "/etc/ipsec.d/"
-            if os.path.exists(ipsec_d_path) and os.path.isdir(ipsec_d_path):
-                for file_name in os.listdir(ipsec_d_path):
-                    if file_name.endswith(('.conf', '.ipsec', '.cfg')):
-                        file_path = os.path.join(ipsec_d_path, file_name)
-                        if os.path.isfile(file_path):
-                            with open(file_path, "r") as f:
-                                content = f.read()
-                                if re.search(rf"^\s*conn\s+{re.escape(conn_name)}\b", content, re.MULTILINE | re.IGNORECASE):
-                                    return True
-            return False
+            return self.config_parser.is_connection_configured(conn_name)
         except Exception:
             # Se houver qualquer erro ao ler os arquivos de configuração, assumir que não está configurada
             return False
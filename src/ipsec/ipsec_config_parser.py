@@ -1,8 +1,125 @@
 import os
 import re
-from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
-from ..config.app_config import IPSEC_CONFIG_PATHS, IPSEC_D_PATH
+from ..config.app_config import (
+    CONFIG_SCAN_PROCESS_MIN_BYTES,
+    CONFIG_SCAN_PROCESSES,
+    CONFIG_SCAN_SEQUENTIAL_LIMIT,
+    CONFIG_SCAN_WORKERS,
+    IPSEC_CONFIG_PATHS,
+    IPSEC_D_EXTENSIONS,
+    IPSEC_D_PATH,
+)
+from .connection_record import ConnectionRecord
+
+# Cabeçalho de seção de topo (conn, ca ou config setup); o corpo de uma seção vai até o próximo cabeçalho
+SECTION_HEADER_PATTERN = re.compile(
+    r"^[ \t]*(conn|ca|config)[ \t]+([^\s#]+)[^\n]*\n?", re.MULTILINE
+)
+
+
+def parse_config_sections(content: str) -> List[Tuple[str, str, str]]:
+    """
+    Divide o conteúdo de um ipsec.conf em seções (tipo, nome, conteúdo), na ordem do arquivo.
+    """
+    sections = []
+    headers = list(SECTION_HEADER_PATTERN.finditer(content))
+    for index, header in enumerate(headers):
+        end = headers[index + 1].start() if index + 1 < len(headers) else len(content)
+        sections.append((header.group(1), header.group(2), content[header.end():end]))
+    return sections
+
+
+def _read_config_file(file_path: str) -> Tuple[str, Optional[str]]:
+    """
+    Conteúdo de um arquivo de configuração e o erro de leitura, se houver.
+
+    Executada nas threads do pool de varredura; não compartilha estado com o parser.
+    """
+    try:
+        with open(file_path, "r") as f:
+            return f.read(), None
+    except FileNotFoundError:
+        return "", None
+    except Exception as e:
+        return "", str(e)
+
+
+def _parse_conn_sections(content: str) -> List[Tuple[str, str]]:
+    """
+    Seções 'conn' de um arquivo como pares (nome, conteúdo); executada também nos processos de parsing.
+    """
+    return [(name, section) for kind, name, section in parse_config_sections(content) if kind == "conn"]
+
+
+def _scan_config_file(file_path: str) -> Tuple[List[Tuple[str, str]], Optional[str]]:
+    """
+    Lê um arquivo de configuração e retorna suas seções 'conn' como pares (nome, conteúdo).
+    """
+    content, error = _read_config_file(file_path)
+    return _parse_conn_sections(content), error
+
+
+def _parse_contents(contents: List[str]) -> List[List[Tuple[str, str]]]:
+    """
+    Parseia o conteúdo dos arquivos, em processos quando o volume compensa iniciá-los.
+    """
+    workers = min(CONFIG_SCAN_PROCESSES, len(contents))
+    if workers > 1 and sum(map(len, contents)) >= CONFIG_SCAN_PROCESS_MIN_BYTES:
+        # Importados só aqui: a maioria das varreduras nunca chega a este volume
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            # spawn: a aplicação já tem threads (Qt, resolver), e um fork com threads pode travar
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                # Lotes grandes: cada item atravessa um pipe, e a ordem de entrada é preservada
+                return list(
+                    executor.map(_parse_conn_sections, contents, chunksize=max(1, len(contents) // (workers * 4)))
+                )
+        except (OSError, BrokenProcessPool):
+            # Sem processos disponíveis (limites, sandbox): parsear aqui mesmo
+            pass
+    return [_parse_conn_sections(content) for content in contents]
+
+
+class ConfigScanResult:
+    """
+    Resultado consolidado de uma varredura dos arquivos de configuração IPsec.
+    """
+
+    def __init__(self):
+        self.files: List[str] = []
+        self.connections: List[str] = []
+        self.connection_files: Dict[str, str] = {}
+        # Um registro por conexão, reaproveitado até a próxima varredura (campos parseados sob demanda)
+        self.records: Dict[str, ConnectionRecord] = {}
+        # Conexões definidas em mais de um lugar: nome -> todos os arquivos, na ordem de varredura
+        self.duplicates: Dict[str, List[str]] = {}
+        self.errors: Dict[str, str] = {}
+
+    def add_file(self, file_path: str, sections: List[Tuple[str, str]], error: Optional[str]):
+        """
+        Mescla as seções de um arquivo; a primeira definição de cada conexão prevalece.
+        """
+        self.files.append(file_path)
+        if error:
+            self.errors[file_path] = error
+        for conn_name, section in sections:
+            if conn_name in self.connection_files:
+                locations = self.duplicates.setdefault(
+                    conn_name, [self.connection_files[conn_name]]
+                )
+                locations.append(file_path)
+                continue
+            self.connections.append(conn_name)
+            self.connection_files[conn_name] = file_path
+            self.records[conn_name] = ConnectionRecord(conn_name, file_path, section)
 
 
 class IPsecConfigParser:
@@ -10,118 +127,112 @@ class IPsecConfigParser:
     Responsável por parsear arquivos de configuração IPsec e extrair detalhes de conexão.
     """
 
+    def __init__(self, config_files: Optional[List[str]] = None):
+        self._scan_result: Optional[ConfigScanResult] = None
+        # Arquivos fixos em vez dos caminhos do sistema (ex.: os de uma gravação reproduzida)
+        self.config_files = config_files
+
     def _get_all_config_files(self) -> List[str]:
         """
         Coleta todos os caminhos de arquivos de configuração IPsec relevantes.
         """
+        if self.config_files is not None:
+            return list(self.config_files)
         config_files = IPSEC_CONFIG_PATHS.copy()
-        if os.path.exists(IPSEC_D_PATH):
-            for file in os.listdir(IPSEC_D_PATH):
-                if file.endswith(".conf") and not file.endswith("~"):
-                    config_files.append(os.path.join(IPSEC_D_PATH, file))
+        try:
+            with os.scandir(IPSEC_D_PATH) as entries:
+                fragments = [
+                    entry.path
+                    for entry in entries
+                    if entry.name.endswith(IPSEC_D_EXTENSIONS) and entry.is_file()
+                ]
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            fragments = []
+        # Ordem estável para que a mesclagem seja determinística entre execuções
+        config_files.extend(sorted(fragments))
         return config_files
 
-    def _connection_exists_in_file(self, conn_name: str, file_path: str) -> bool:
+    def scan(self) -> ConfigScanResult:
         """
-        Verifica se uma conexão específica existe em um arquivo de configuração.
+        Lê todos os arquivos de configuração em paralelo (threads) e parseia as seções
+        (em processos, para catálogos grandes), mesclando na ordem de varredura.
         """
-        if not os.path.exists(file_path):
-            return False
-        with open(file_path, "r") as f:
-            content = f.read()
-            pattern = rf"^\s*conn\s+{re.escape(conn_name)}\s*($|[\s#])"
-            return bool(re.search(pattern, content, re.MULTILINE))
+        config_files = self._get_all_config_files()
+        if len(config_files) <= CONFIG_SCAN_SEQUENTIAL_LIMIT:
+            parsed = map(_scan_config_file, config_files)
+        else:
+            workers = min(CONFIG_SCAN_WORKERS, len(config_files))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # map preserva a ordem de entrada, independentemente da ordem de conclusão
+                read = list(executor.map(_read_config_file, config_files))
+            sections = _parse_contents([content for content, _error in read])
+            parsed = zip(sections, (error for _content, error in read))
+
+        result = ConfigScanResult()
+        for file_path, (sections, error) in zip(config_files, parsed):
+            result.add_file(file_path, sections, error)
+        self._scan_result = result
+        return result
 
-    def _parse_key_value_pairs_from_section(self, section_content: str) -> dict:
+    def get_scan_result(self) -> ConfigScanResult:
         """
-        Extrai todos os pares chave=valor de uma string de conteúdo de seção.
+        Retorna a última varredura, executando uma se ainda não houver.
         """
-        details = {}
-        # Regex para capturar chave, valor e opcionalmente ignorar comentários na mesma linha
-        pattern = r"^\s*([a-zA-Z0-9_-]+)\s*=\s*(.*?)(?:\s*#.*)?$"
-        for line in section_content.splitlines():
-            # Ignora linhas que são apenas comentários ou vazias
-            if not line.strip() or line.strip().startswith("#"):
-                continue
-
-            match = re.search(pattern, line)
-            if match:
-                key = match.group(1).strip()
-                value = match.group(2).strip()
-                details[key] = value
-        return details
-
-    def _parse_connections_from_file(self, file_path: str) -> List[str]:
-        """
-        Extrai os nomes das conexões de um arquivo de configuração IPsec.
-        """
-        connections = []
-        if os.path.exists(file_path):
-            with open(file_path, "r") as f:
-                content = f.read()
-                found_conns = re.findall(r"^\s*conn\s+([^\s#]+)", content, re.MULTILINE)
-                connections.extend(
-                    [
-                        conn.strip()
-                        for conn in found_conns
-                        if not conn.strip().startswith("#")
-                    ]
-                )
-        return connections
+        if self._scan_result is None:
+            return self.scan()
+        return self._scan_result
 
     def find_connection_file(self, conn_name: str) -> Optional[str]:
         """
         Encontra o arquivo de configuração que contém uma conexão específica.
         """
-        for config_file in self._get_all_config_files():
-            if self._connection_exists_in_file(conn_name, config_file):
-                return config_file
-        return None
+        return self.get_scan_result().connection_files.get(conn_name)
+
+    def is_connection_configured(self, conn_name: str) -> bool:
+        """
+        Verifica se uma conexão está definida em algum arquivo de configuração.
+        """
+        return conn_name in self.get_scan_result().connection_files
+
+    def get_connection_record(self, conn_name: str) -> ConnectionRecord:
+        """
+        Obtém o registro de uma conexão a partir da última varredura.
+        """
+        record = self.get_scan_result().records.get(conn_name)
+        if record is None:
+            return ConnectionRecord.from_error(
+                conn_name, f"Conexão '{conn_name}' não encontrada nos arquivos de configuração."
+            )
+        return record
 
     def get_connection_details_from_file(
         self, config_file: str, conn_name: str
-    ) -> dict:
+    ) -> ConnectionRecord:
         """
         Extrai detalhes de uma conexão IPsec de um arquivo de configuração.
         """
-        details = {}
-        try:
-            with open(config_file, "r") as f:
-                content = f.read()
-            # Regex para capturar a seção da conexão, incluindo linhas com 'left', 'right', etc.
-            # e parando antes da próxima declaração 'conn' ou do final do arquivo.
-            pattern = rf"^\s*conn\s+{re.escape(conn_name)}\s*\n((?:\s*[^\n]*\n)*?)(?=\n\s*conn\s+|\Z)"
-            matches = re.search(pattern, content, re.DOTALL | re.MULTILINE)
-            if matches:
-                conn_section = matches.group(1)
-                details = self._parse_key_value_pairs_from_section(conn_section)
-                details["config_file"] = config_file
-                details["conn_name"] = conn_name
-            else:
-                details["error"] = (
-                    f"Conexão '{conn_name}' não encontrada no arquivo '{config_file}'."
-                )
-        except FileNotFoundError:
-            details["error"] = (
-                f"Erro: Arquivo de configuração '{config_file}' não encontrado."
+        scan_result = self.get_scan_result()
+        if scan_result.connection_files.get(conn_name) == config_file:
+            return self.get_connection_record(conn_name)
+        if not os.path.exists(config_file):
+            return ConnectionRecord.from_error(
+                conn_name,
+                f"Erro: Arquivo de configuração '{config_file}' não encontrado.",
+                config_file,
             )
-        except Exception as e:
-            details["error"] = (
-                f"Erro ao ler detalhes da conexão do arquivo '{config_file}': {str(e)}"
+
+        sections, error = _scan_config_file(config_file)
+        if error:
+            return ConnectionRecord.from_error(
+                conn_name,
+                f"Erro ao ler detalhes da conexão do arquivo '{config_file}': {error}",
+                config_file,
             )
-        return details
-
-    def get_server_address_from_details(self, connection_details: dict) -> str:
-        """
-        Extrai o endereço do servidor de um dicionário de detalhes da conexão.
-        """
-        if "right" in connection_details:
-            return connection_details["right"]
-        if "alsoip" in connection_details:
-            return connection_details["alsoip"]
-        if "rightsubnet" in connection_details:
-            subnet = connection_details["rightsubnet"]
-            if "/" in subnet:
-                return subnet.split("/")[0]
-            return subnet
-        return "Server address not found"
+        for name, section in sections:
+            if name == conn_name:
+                return ConnectionRecord(conn_name, config_file, section)
+        return ConnectionRecord.from_error(
+            conn_name,
+            f"Conexão '{conn_name}' não encontrada no arquivo '{config_file}'.",
+            config_file,
+        )
@@ -5,14 +5,32 @@ Este módulo contém a classe ConnectionIPsec que gerencia todas as operações
 relacionadas às conexões IPsec.
 """
 
-import os
-import subprocess
-import re
-from typing import List, Optional, Tuple
+import ipaddress
+import socket
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, FrozenSet, List, Optional, Tuple
 
-from ..config.app_config import IPSEC_CONFIG_PATHS, IPSEC_D_PATH
+from ..config.app_config import (
+    FAST_CONNECT_CONNECTIONS,
+    FAST_CONNECT_WARM_S,
+    IPSEC_CONFIG_PATHS,
+    IPSEC_SECRETS_PATH,
+    PREFLIGHT_ENABLED,
+    REKEY_MONITOR_ENABLED,
+    SPEED_TEST_TARGETS,
+    TRACE_ENABLED,
+    TRANSITION_LOG_SIZE,
+)
+from .connection_record import SERVER_ADDRESS_NOT_FOUND, ConnectionRecord
+from .connection_state import ConnectionState, ConnectionStateMachine, StateTransition
+from .connection_stats import ConnectionStats
+from .connect_tracer import ConnectTracer
 from .ipsec_config_parser import IPsecConfigParser
-from .ipsec_commander import IPsecCommander
+from .ipsec_commander import create_commander
+from .preflight import WILDCARD_GATEWAYS, PreflightChecker, PreflightReport, route_source_address
+from .rekey_monitor import RekeyMonitor
+from .resolver_cache import ResolverCache
 
 
 class IPsecManager:
@@ -22,8 +40,44 @@ class IPsecManager:
 
     def __init__(self):
         self.config_parser = IPsecConfigParser()
-        self.commander = IPsecCommander()
+        # strongSwan ou Libreswan, conforme o daemon detectado
+        self.commander = create_commander(self.config_parser)
         self.connections = []
+        # Conexões definidas em mais de um arquivo: nome -> arquivos onde aparecem
+        self.duplicate_connections = {}
+        # Máquina de estados por conexão; é a fonte de verdade do estado exibido
+        self.state_machines: Dict[str, ConnectionStateMachine] = {}
+        # Estado atual de cada conexão (nome -> ConnectionState), compartilhado com a UI
+        self.status_snapshot: Dict[str, ConnectionState] = {}
+        # Histórico recente de transições (alimenta o log e as métricas)
+        self.transition_log: Deque[StateTransition] = deque(maxlen=TRANSITION_LOG_SIZE)
+        self._transition_listeners: List[Callable[[StateTransition], None]] = []
+        # Estatísticas por conexão (estado, uptime, reconexões, latência, contadores) para métricas
+        self.stats: Dict[str, ConnectionStats] = {}
+        # Quando ativo, as consultas usam 'ipsec statusall' para obter também os contadores das SAs
+        self.collect_counters = False
+        # Endereços dos gateways, resolvidos e renovados em segundo plano conforme o TTL
+        self.resolver = ResolverCache()
+        self.resolver.add_change_listener(self._on_gateway_address_changed)
+        # Conexão selecionada na interface; com as ativas e as candidatas a reconexão, são as
+        # únicas cujo gateway é mantido resolvido (as demais são resolvidas sob demanda)
+        self.selected_connection: Optional[str] = None
+        self._watched_gateways: FrozenSet[str] = frozenset()
+        # Diagnóstico antes de 'ipsec up' (None quando desativado)
+        self.preflight = PreflightChecker(resolver=self.resolver) if PREFLIGHT_ENABLED else None
+        self.last_preflight: Optional[PreflightReport] = None
+        # Trace por fase de cada conexão (None quando desativado)
+        self.tracer = ConnectTracer() if TRACE_ENABLED else None
+        # Rekeys/reautenticações e a perda durante eles (None quando desativado; a thread
+        # de sondagem é iniciada pela aplicação com rekey_monitor.start())
+        self.rekey_monitor = RekeyMonitor(self.probe_host) if REKEY_MONITOR_ENABLED else None
+        self._rekey_timers_at = 0.0
+        # Conexões que subiram e não foram desligadas pelo usuário, com o endereço local em uso;
+        # são as candidatas a reconexão após uma mudança de rede
+        self.established_sources: Dict[str, Optional[str]] = {}
+        # IKE SAs mantidas após desligar uma conexão em modo rápido: nome -> desde (time.time).
+        # Alterado só na thread da UI; o StatusScheduler encerra as vencidas após cada consulta
+        self.warm_ike_sas: Dict[str, float] = {}
         self.current_connection = None
         self.load_connections()
 
@@ -31,57 +85,657 @@ class IPsecManager:
         """
         Carrega as conexões IPsec a partir dos arquivos de configuração.
         """
-        result = subprocess.run(["which", "ipsec"], capture_output=True, text=True)
+        # Pelo runner do commander, para que a verificação também seja gravada/reproduzida
+        result = self.commander.runner.run(["which", "ipsec"])
         if result.returncode != 0:
             self.connections = []
+            self.duplicate_connections = {}
             return []
 
-        connections = []
-        for config_file in self.config_parser._get_all_config_files():
-            connections.extend(
-                self.config_parser._parse_connections_from_file(config_file)
-            )
+        scan_result = self.config_parser.scan()
+        self.connections = list(scan_result.connections)
+        self.duplicate_connections = dict(scan_result.duplicates)
+        self.commander.fast_connections = {
+            conn_name for conn_name in self.connections if self.fast_connect_enabled(conn_name)
+        }
+        self._watch_gateways()
+        return self.connections
 
-        self.connections = connections
-        return connections
+    def select_connection(self, conn_name: Optional[str]) -> None:
+        """
+        Registra a conexão selecionada na interface; seu gateway passa a ser resolvido em segundo plano.
+        """
+        self.selected_connection = conn_name
+        self._watch_gateways()
+
+    def _watch_gateways(self) -> None:
+        # Catálogos com milhares de conexões: só a selecionada, as ativas (ou em transição) e
+        # as que a recuperação de rede pode religar; o diagnóstico e o MTU resolvem sob demanda
+        conn_names = set(self.established_sources)
+        conn_names.update(
+            conn_name
+            for conn_name, state in list(self.status_snapshot.items())
+            if state.is_active or state.is_transitional
+        )
+        if self.selected_connection:
+            conn_names.add(self.selected_connection)
+        gateways = set()
+        for conn_name in conn_names.intersection(self.connections):
+            gateway = self.get_connection_details(conn_name).server_address
+            if gateway != SERVER_ADDRESS_NOT_FOUND and gateway not in WILDCARD_GATEWAYS:
+                gateways.add(gateway)
+        gateways = frozenset(gateways)
+        if gateways != self._watched_gateways:
+            self._watched_gateways = gateways
+            self.resolver.watch(gateways)
 
-    def get_connection_details(self, conn_name: str) -> Tuple[str, str, dict]:
+    def _on_gateway_address_changed(self, host: str, old_addresses, new_addresses) -> None:
+        # Chamado na thread do resolver: o diagnóstico em cache se referia ao endereço antigo
+        if self.preflight is not None:
+            self.preflight.invalidate(host)
+
+    def get_connection_details(self, conn_name: str) -> ConnectionRecord:
         """
         Obtém os detalhes de uma conexão específica.
         """
-        config_file_path = self.config_parser.find_connection_file(conn_name)
-        if not config_file_path:
-            return "", "Server address not found", {}
+        return self.config_parser.get_connection_record(conn_name)
 
-        connection_details = self.config_parser.get_connection_details_from_file(
-            config_file_path, conn_name
-        )
-        server_addr = self.config_parser.get_server_address_from_details(
-            connection_details
-        )
-        return config_file_path, server_addr, connection_details
+    def fast_connect_enabled(self, conn_name: str) -> bool:
+        return conn_name in FAST_CONNECT_CONNECTIONS or "*" in FAST_CONNECT_CONNECTIONS
 
     def connect_connection(self, conn_name: str) -> Tuple[bool, str]:
         """
-        Inicia uma conexão IPsec.
+        Inicia uma conexão IPsec, bloqueando até o 'ipsec up' retornar.
+
+        A interface usa as três fases separadamente, com run_connect fora da thread da UI.
         """
-        success, message = self.commander.connect_connection(conn_name)
-        if success:
-            self.current_connection = conn_name
+        self.begin_connect(conn_name)
+        success, message = self.run_connect(conn_name)
+        self.finish_connect(conn_name, success, message)
         return success, message
 
+    def begin_connect(self, conn_name: str) -> None:
+        """
+        Passa a conexão para CONNECTING; chamado na thread da UI, antes de run_connect.
+        """
+        machine = self.get_state_machine(conn_name)
+        if self.fast_connect_enabled(conn_name):
+            # A IKE SA mantida volta a ser usada; warm_ike_sas só muda na thread da UI
+            self._cancel_warm_ike_sa(conn_name)
+            self._emit(machine.begin_connect())
+            return
+        if self.tracer is not None:
+            self.tracer.begin(conn_name)
+        self._emit(machine.begin_connect())
+
+    def run_connect(self, conn_name: str) -> Tuple[bool, str]:
+        """
+        Diagnóstico e 'ipsec up' (ou 'ipsec route' no modo rápido); bloqueia, pode ser
+        chamado fora da thread da UI e não emite transições.
+        """
+        if self.fast_connect_enabled(conn_name):
+            return self._fast_connect(conn_name)
+        trace = self.tracer.active.get(conn_name) if self.tracer is not None else None
+        if self.preflight is not None:
+            # Problemas de DNS/rota/firewall/credenciais aparecem em ~1 s, sem esperar o IKE
+            span = trace.start_span("preflight") if trace is not None else None
+            report = self.preflight.run(self.get_connection_details(conn_name))
+            self.last_preflight = report
+            if span is not None:
+                trace.end_span(span, report.ok, cached=report.cached)
+            if not report.ok:
+                return False, report.summary()
+        if trace is not None:
+            trace.begin_ipsec_up()
+        success, message = self.commander.connect_connection(
+            conn_name, on_line=trace.feed_line if trace is not None else None
+        )
+        if trace is not None:
+            trace.end_ipsec_up(success, message)
+        return success, message
+
+    def finish_connect(self, conn_name: str, success: bool, message: str) -> None:
+        """
+        Aplica o resultado de run_connect à máquina de estados; chamado na thread da UI.
+        """
+        machine = self.get_state_machine(conn_name)
+        if not success:
+            self._emit(machine.fail(message))
+            return
+        self.current_connection = conn_name
+        if self.fast_connect_enabled(conn_name):
+            # O trap já está instalado: não há negociação a esperar até o primeiro pacote
+            self._emit(machine.observe(ConnectionState.ROUTED))
+        else:
+            machine.mark_initiated()
+
     def disconnect_connection(self, conn_name: str) -> Tuple[bool, str]:
         """
         Termina uma conexão IPsec.
         """
+        machine = self.get_state_machine(conn_name)
+        routed = machine.observed == ConnectionState.ROUTED
+        self._emit(machine.begin_disconnect())
+        # Desligada pelo usuário: não deve ser reconectada após mudanças de rede
+        self.established_sources.pop(conn_name, None)
+        if self.fast_connect_enabled(conn_name):
+            return self._fast_disconnect(conn_name)
+        if routed:
+            # auto=route no ipsec.conf: sem remover o trap o próximo pacote religaria o túnel
+            self.commander.unroute_connection(conn_name)
         success, message = self.commander.disconnect_connection(conn_name)
         if success:
             if self.current_connection == conn_name:
                 self.current_connection = None
+        else:
+            self._emit(machine.abort_transition())
+        return success, message
+
+    def _fast_connect(self, conn_name: str) -> Tuple[bool, str]:
+        """
+        Modo rápido: instala o trap ('ipsec route') e volta sem esperar o IKE.
+
+        A conexão aparece como ROUTED até o primeiro pacote; com a IKE SA ainda mantida
+        do último desligamento, só a CHILD SA é negociada.
+        """
+        warm = "ESTABLISHED" in self.commander.last_sa_states.get(conn_name, ())
+        success, message = self.commander.route_connection(conn_name)
+        if success and warm:
+            message += " IKE SA já estabelecida: apenas a CHILD SA será negociada."
+        return success, message
+
+    def _fast_disconnect(self, conn_name: str) -> Tuple[bool, str]:
+        """
+        Modo rápido: remove o trap e encerra só as CHILD SAs; a IKE SA é mantida por
+        FAST_CONNECT_WARM_S e depois encerrada.
+        """
+        machine = self.get_state_machine(conn_name)
+        success, message = self.commander.unroute_connection(conn_name)
+        if success:
+            success, message = self.commander.disconnect_child_sas(conn_name)
+        if not success:
+            self._emit(machine.abort_transition())
+            return success, message
+        if self.current_connection == conn_name:
+            self.current_connection = None
+        if self.commander.keeps_ike_sa and "ESTABLISHED" in self.commander.last_sa_states.get(conn_name, ()):
+            self._keep_ike_sa_warm(conn_name)
         return success, message
 
-    def get_connection_status(self, conn_name: str) -> Tuple[str, bool]:
+    def _keep_ike_sa_warm(self, conn_name: str) -> None:
+        self.warm_ike_sas[conn_name] = time.time()
+
+    def _cancel_warm_ike_sa(self, conn_name: str) -> bool:
+        """
+        Deixa de encerrar a IKE SA mantida; retorna se havia uma.
+        """
+        return self.warm_ike_sas.pop(conn_name, None) is not None
+
+    def expire_warm_ike_sas(self, now: Optional[float] = None) -> List[str]:
+        """
+        Retira as IKE SAs mantidas há mais de FAST_CONNECT_WARM_S e retorna as que devem
+        ser encerradas com end_warm_ike_sa.
+
+        Chamado na thread da UI, como expire_stale_transitions: a decisão usa o mesmo
+        estado que begin_connect altera. Uma conexão em transição é avaliada na próxima
+        consulta; uma religada apenas deixa de ser acompanhada, pois voltou a usar a IKE SA.
+        """
+        now = now if now is not None else time.time()
+        expired = []
+        for conn_name, since in list(self.warm_ike_sas.items()):
+            state = self.get_connection_state(conn_name)
+            if now - since < FAST_CONNECT_WARM_S or state.is_transitional:
+                continue
+            del self.warm_ike_sas[conn_name]
+            if not state.is_active:
+                expired.append(conn_name)
+        return expired
+
+    def end_warm_ike_sa(self, conn_name: str) -> Tuple[bool, str]:
+        """
+        Encerra a IKE SA mantida ('ipsec down'); bloqueia e pode ser chamado fora da thread
+        da UI. A próxima consulta de status reflete o resultado.
+        """
+        state = self.get_connection_state(conn_name)
+        if state.is_active or state.is_transitional:
+            # Religada entre a expiração e a execução
+            return False, f"{conn_name} voltou a ser usada; IKE SA mantida."
+        return self.commander.disconnect_connection(conn_name)
+
+    def fast_connect_text(self, conn_name: str, now: Optional[float] = None) -> str:
+        """
+        Estado real de uma conexão em modo rápido, para a interface.
+        """
+        if not self.fast_connect_enabled(conn_name):
+            return ""
+        now = now if now is not None else time.time()
+        states = self.commander.last_sa_states.get(conn_name, set())
+        ike = "IKE SA estabelecida" if "ESTABLISHED" in states else "sem IKE SA"
+        state = self.status_snapshot.get(conn_name)
+        if state == ConnectionState.ROUTED:
+            return f"Conexão rápida: trap instalado, túnel sobe com o primeiro pacote ({ike})"
+        if state is not None and state.is_connected:
+            return "Conexão rápida: túnel estabelecido pelo trap"
+        since = self.warm_ike_sas.get(conn_name)
+        if since is not None:
+            remaining = max(0, int(since + FAST_CONNECT_WARM_S - now))
+            return f"Conexão rápida: IKE SA mantida por mais {remaining // 60} min {remaining % 60} s"
+        return f"Conexão rápida: desligada ({ike})"
+
+    def apply_config(self, content: str, path: Optional[str] = None):
+        """
+        Substitui um arquivo de configuração e aplica só as conexões alteradas.
+
+        Grava atomicamente e executa 'ipsec update'; o starter derruba e recarrega apenas
+        as conexões alteradas ou removidas. As alteradas que estavam ligadas são religadas.
+        """
+        from .config_apply import ConfigApplyResult, ConfigDiff, read_config_file, write_atomic
+
+        path = path or IPSEC_CONFIG_PATHS[0]
+        try:
+            current = read_config_file(path)
+        except OSError as e:
+            result = ConfigApplyResult(path)
+            result.error = f"Falha ao ler {path}: {e.strerror or e}"
+            return result
+        diff = ConfigDiff(current, content)
+        result = ConfigApplyResult(path, diff)
+        if content == current:
+            return result
+        active = [name for name in diff.changed if self.get_connection_state(name).is_active]
+        try:
+            write_atomic(path, content)
+        except OSError as e:
+            result.error = f"Falha ao gravar {path}: {e.strerror or e}"
+            return result
+        result.written = True
+        if diff.affected:
+            success, message = self.commander.update_config(diff.added + diff.changed, diff.removed)
+            result.messages.append(message)
+            if not success:
+                result.error = message
+                return result
+        self.load_connections()
+        for conn_name in active:
+            # Desligada pelo starter ao ser substituída; volta com a nova configuração
+            success, message = self.connect_connection(conn_name)
+            if success:
+                result.reconnected.append(conn_name)
+            else:
+                result.messages.append(message)
+        return result
+
+    def apply_secrets(self, content: str, path: Optional[str] = None):
+        """
+        Substitui o ipsec.secrets e o relê; nenhuma SA é afetada.
+        """
+        from .config_apply import ConfigApplyResult, read_config_file, write_atomic
+
+        path = path or IPSEC_SECRETS_PATH
+        result = ConfigApplyResult(path)
+        try:
+            if read_config_file(path) == content:
+                result.messages.append("Segredos sem mudança.")
+                return result
+            write_atomic(path, content)
+        except OSError as e:
+            result.error = f"Falha ao gravar {path}: {e.strerror or e}"
+            return result
+        result.written = True
+        success, message = self.commander.reread_secrets()
+        result.messages.append(message)
+        if not success:
+            result.error = message
+        return result
+
+    def local_address_for(self, conn_name: str) -> Optional[str]:
+        """
+        Endereço local pelo qual o gateway da conexão seria alcançado agora (None sem rota).
+
+        Usa apenas o cache do resolver e a tabela de rotas; não bloqueia nem envia pacotes.
+        """
+        gateway = self.get_connection_details(conn_name).server_address
+        if gateway == SERVER_ADDRESS_NOT_FOUND or gateway in WILDCARD_GATEWAYS:
+            return None
+        entry = self.resolver.lookup(gateway)
+        if entry is None or not entry.address:
+            return None
+        try:
+            return route_source_address(entry.address)
+        except OSError:
+            return None
+
+    def supports_mobike(self, conn_name: str) -> bool:
+        """
+        IKEv2 com MOBIKE (padrão do strongSwan): o charon migra a IKE SA para o novo endereço.
+        """
+        record = self.get_connection_details(conn_name)
+        return record.get("keyexchange", "ike") != "ikev1" and record.get("mobike", "yes") != "no"
+
+    def plan_network_recovery(self, mobike_grace_over: bool) -> Tuple[List[Tuple[str, str]], bool]:
+        """
+        Após uma mudança de rede (e uma nova consulta de status), decide quais conexões que
+        estavam ativas precisam ser reiniciadas.
+
+        Retorna a lista de (conexão, motivo) e se alguma conexão com MOBIKE ainda está no
+        prazo para migrar sozinha.
+        """
+        reinitiate = []
+        waiting = False
+        for conn_name, source in list(self.established_sources.items()):
+            if conn_name not in self.connections:
+                continue
+            state = self.get_connection_state(conn_name)
+            if state in (ConnectionState.CONNECTING, ConnectionState.DISCONNECTING):
+                continue
+            local_address = self.local_address_for(conn_name)
+            if local_address is None:
+                # Ainda sem rota até o gateway: a próxima mudança de rede tenta de novo
+                continue
+            endpoints = self.commander.last_sa_endpoints.get(conn_name)
+            sa_address = endpoints[0] if endpoints else source
+            if state.is_connected and sa_address == local_address:
+                self.established_sources[conn_name] = local_address
+                continue
+            if state.is_connected and self.supports_mobike(conn_name) and not mobike_grace_over:
+                waiting = True
+                continue
+            if state.is_connected:
+                reason = f"endereço local {sa_address} -> {local_address}"
+            else:
+                reason = f"túnel inativo ({state.label})"
+            reinitiate.append((conn_name, reason))
+        return reinitiate, waiting
+
+    def begin_reinitiate(self, conn_name: str) -> None:
         """
-        Obtém o status de uma conexão IPsec específica.
+        Marca o início de uma reconexão automática; o 'ipsec up' (reinitiate) é executado
+        por quem chama, em segundo plano.
         """
-        return self.commander.get_connection_status(conn_name)
+        if self.tracer is not None:
+            self.tracer.begin(conn_name, kind="reconnect").begin_ipsec_up()
+        self._emit(self.get_state_machine(conn_name).begin_connect())
+
+    def reinitiate(self, conn_name: str) -> Tuple[bool, str]:
+        """
+        Executa o 'ipsec up' de uma reconexão automática; pode ser chamado fora da thread da UI.
+        """
+        trace = self.tracer.active.get(conn_name) if self.tracer is not None else None
+        return self.commander.connect_connection(
+            conn_name, on_line=trace.feed_line if trace is not None else None
+        )
+
+    def finish_reinitiate(self, conn_name: str, success: bool, message: str) -> None:
+        trace = self.tracer.active.get(conn_name) if self.tracer is not None else None
+        if trace is not None:
+            trace.end_ipsec_up(success, message)
+        if not success:
+            self._emit(self.get_state_machine(conn_name).fail(message))
+
+    def speed_test_target(self, conn_name: str) -> str:
+        """
+        Servidor de teste de vazão configurado para a conexão (VPN_CLIENT_SPEED_TEST_TARGETS), ou vazio.
+        """
+        return SPEED_TEST_TARGETS.get(conn_name) or SPEED_TEST_TARGETS.get("*", "")
+
+    def run_speed_test(self, conn_name: str, target: str, udp: bool = False):
+        """
+        Executa um teste de vazão contra um servidor dentro do rightsubnet da conexão.
+
+        Bloqueia pela duração do teste: deve ser chamado fora da thread da UI. Levanta
+        ValueError se o destino não passar pelo túnel e OSError se o servidor não responder.
+        """
+        from .throughput import parse_target, run_tcp_test, run_udp_test
+
+        host, port = parse_target(target)
+        self._tunnel_address(conn_name, host, port)
+        result = run_udp_test(host, port) if udp else run_tcp_test(host, port)
+        result.conn_name = conn_name
+        result.cipher = self.commander.get_sa_cipher(conn_name) or ""
+        return result
+
+    def run_path_mtu_check(self, conn_name: str, target: str = ""):
+        """
+        Diagnóstico de MTU da conexão ativa: overhead da transformação ESP negociada e
+        sondagem DF até um host do rightsubnet (o informado, o do teste de vazão ou o
+        primeiro endereço de cada sub-rede).
+
+        Bloqueia por alguns segundos: deve ser chamado fora da thread da UI. Levanta
+        ValueError se a conexão não estiver ativa ou o destino não passar pelo túnel.
+        """
+        from .cipher_benchmark import parse_proposal
+        from .path_mtu import PathMtuReport, discover_path_mtu, kernel_path_mtu, overhead_for_sa_suite, overhead_for_transform
+
+        if not self.get_connection_state(conn_name).is_connected:
+            raise ValueError(f"{conn_name} não está conectada.")
+        record = self.get_connection_details(conn_name)
+        entry = None
+        if record.server_address not in (SERVER_ADDRESS_NOT_FOUND, *WILDCARD_GATEWAYS):
+            entry = self.resolver.lookup(record.server_address) or self.resolver.resolve(record.server_address)
+        if entry is None or not entry.address:
+            raise ValueError(f"Endereço do gateway de {conn_name} desconhecido.")
+        gateway = entry.address
+
+        suite, udp_encap = self.commander.get_child_sa_info(conn_name)
+        overhead = overhead_for_sa_suite(suite) if suite else None
+        if overhead is None:
+            # Sem a SA (sem sudo, por exemplo): a primeira proposta configurada
+            for proposal in record.esp:
+                transform, _dh_groups = parse_proposal(proposal)
+                if transform is not None:
+                    overhead = overhead_for_transform(transform)
+                    break
+        if udp_encap is None and record.get("forceencaps") == "yes":
+            udp_encap = True
+
+        hosts = [target] if target else self._probe_hosts(conn_name)
+
+        report = PathMtuReport(
+            conn_name,
+            gateway,
+            kernel_path_mtu(gateway),
+            udp_encap,
+            overhead,
+            socket.AF_INET6 if ":" in gateway else socket.AF_INET,
+            fragmentation=record.get("fragmentation", "yes"),
+            ike_version=record.get("keyexchange", "ikev2"),
+        )
+        for host in hosts:
+            address = self._tunnel_address(conn_name, host, 0)
+            report.inner_family = socket.AF_INET6 if address.version == 6 else socket.AF_INET
+            try:
+                report.probe = discover_path_mtu(str(address))
+            except OSError as e:
+                report.errors.append(f"Sondagem até {address} não executada: {e.strerror or e}")
+                break
+            if report.probe.responsive:
+                break
+        if not hosts:
+            report.errors.append("Nenhum host do rightsubnet para sondar; informe um que responda a ping.")
+        return report
+
+    def probe_host(self, conn_name: str) -> Optional[str]:
+        """
+        Host do rightsubnet sondado pelo monitor de rekeys (None sem um host conhecido).
+        """
+        for host in self._probe_hosts(conn_name):
+            try:
+                return str(self._tunnel_address(conn_name, host, 0))
+            except ValueError:
+                continue
+        return None
+
+    def _probe_hosts(self, conn_name: str) -> List[str]:
+        """
+        Hosts candidatos a sondas pelo túnel: o do teste de vazão e o primeiro endereço de cada sub-rede.
+        """
+        hosts = []
+        configured = self.speed_test_target(conn_name)
+        if configured:
+            from .throughput import parse_target
+
+            hosts.append(parse_target(configured)[0])
+        for subnet in self.get_connection_details(conn_name).right_subnets:
+            try:
+                network = ipaddress.ip_network(subnet, strict=False)
+            except ValueError:
+                continue
+            if network.prefixlen and network.num_addresses > 2:
+                hosts.append(str(network.network_address + 1))
+            elif network.prefixlen == network.max_prefixlen:
+                hosts.append(str(network.network_address))
+        return hosts
+
+    def _tunnel_address(self, conn_name: str, host: str, port: int):
+        """
+        Resolve 'host' e exige que esteja no rightsubnet da conexão (tráfego pelo túnel).
+        """
+        try:
+            address = ipaddress.ip_address(socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)[0][4][0])
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Destino inválido: {host} ({e})")
+        subnets = []
+        for subnet in self.get_connection_details(conn_name).right_subnets:
+            try:
+                subnets.append(ipaddress.ip_network(subnet, strict=False))
+            except ValueError:
+                continue
+        # O loopback é aceito para testar os próprios diagnósticos
+        if not address.is_loopback and not any(address in subnet for subnet in subnets):
+            raise ValueError(f"{address} não está no rightsubnet de {conn_name}; o teste não passaria pelo túnel.")
+        return address
+
+    def get_connection_state(self, conn_name: str) -> ConnectionState:
+        """
+        Estado atual conhecido de uma conexão, sem consultar o IPsec.
+        """
+        return self.get_state_machine(conn_name).state
+
+    def get_connection_status(self, conn_name: str) -> ConnectionState:
+        """
+        Consulta o IPsec e retorna o estado de uma conexão específica.
+        """
+        polled_at = time.time()
+        self.apply_status_snapshot(
+            self.commander.get_status_snapshot([conn_name], self.collect_counters), polled_at
+        )
+        return self.get_connection_state(conn_name)
+
+    def refresh_status_snapshot(self) -> Dict[str, ConnectionState]:
+        """
+        Atualiza o estado de todas as conexões carregadas com uma única consulta.
+        """
+        polled_at = time.time()
+        self.apply_status_snapshot(self.poll_status_snapshot(), polled_at)
+        return self.status_snapshot
+
+    def poll_status_snapshot(self) -> Dict[str, Tuple[ConnectionState, str]]:
+        """
+        Consulta o estado de todas as conexões sem alterar o estado do gerenciador.
+
+        Pode ser chamado fora da thread da UI; o resultado é aplicado com apply_status_snapshot.
+        """
+        return self.commander.get_status_snapshot(list(self.connections), self.collect_counters)
+
+    def apply_status_snapshot(
+        self, snapshot: Dict[str, Tuple[ConnectionState, str]], polled_at: Optional[float] = None
+    ) -> List[StateTransition]:
+        """
+        Aplica os estados observados às máquinas de estado; retorna apenas as transições reais.
+
+        polled_at é o instante (time.time) em que a consulta começou.
+        """
+        transitions = []
+        for conn_name, (observed, detail) in snapshot.items():
+            transition = self.get_state_machine(conn_name).observe(observed, detail, polled_at)
+            if transition is not None:
+                transitions.append(transition)
+                self._emit(transition)
+            if self.collect_counters and self.status_snapshot[conn_name].is_connected:
+                bytes_in, packets_in, bytes_out, packets_out = (
+                    self.commander.last_sa_counters.get(conn_name, (0, 0, 0, 0))
+                )
+                self._get_stats(conn_name).record_counters(
+                    bytes_in, bytes_out, packets_in, packets_out
+                )
+        if self.rekey_monitor is not None and self.commander.last_sa_timers_at > self._rekey_timers_at:
+            self._rekey_timers_at = self.commander.last_sa_timers_at
+            self.rekey_monitor.update_timers(
+                self.commander.last_sa_timers,
+                self._rekey_timers_at,
+                [name for name, state in self.status_snapshot.items() if state.is_connected],
+            )
+        return transitions
+
+    def expire_stale_transitions(self, timeout: float) -> List[StateTransition]:
+        """
+        Encerra conexões/desconexões que não atingiram o estado esperado dentro do prazo.
+        """
+        transitions = []
+        for machine in list(self.state_machines.values()):
+            transition = machine.expire(timeout)
+            if transition is not None:
+                transitions.append(transition)
+                self._emit(transition)
+        return transitions
+
+    def has_transitional_states(self) -> bool:
+        return any(state.is_transitional for state in self.status_snapshot.values())
+
+    def add_transition_listener(self, listener: Callable[[StateTransition], None]) -> None:
+        """
+        Registra uma função chamada a cada transição real de estado.
+        """
+        self._transition_listeners.append(listener)
+
+    def remove_transition_listener(self, listener: Callable[[StateTransition], None]) -> None:
+        if listener in self._transition_listeners:
+            self._transition_listeners.remove(listener)
+
+    def get_state_machine(self, conn_name: str) -> ConnectionStateMachine:
+        machine = self.state_machines.get(conn_name)
+        if machine is None:
+            machine = self.state_machines[conn_name] = ConnectionStateMachine(conn_name)
+            self.status_snapshot[conn_name] = machine.state
+        return machine
+
+    def _emit(self, transition: Optional[StateTransition]) -> None:
+        if transition is None:
+            return
+        self.status_snapshot[transition.conn_name] = transition.state
+        if transition.state.is_connected and not transition.previous.is_connected:
+            endpoints = self.commander.last_sa_endpoints.get(transition.conn_name)
+            self.established_sources[transition.conn_name] = (
+                endpoints[0] if endpoints else self.local_address_for(transition.conn_name)
+            )
+        was_watched = transition.previous.is_active or transition.previous.is_transitional
+        if (transition.state.is_active or transition.state.is_transitional) != was_watched:
+            self._watch_gateways()
+        self.transition_log.append(transition)
+        self._get_stats(transition.conn_name).record_transition(transition)
+        if self.tracer is not None:
+            self.tracer.record_transition(transition)
+        if self.rekey_monitor is not None:
+            self.rekey_monitor.record_transition(transition)
+        for listener in list(self._transition_listeners):
+            listener(transition)
+
+    def shutdown(self) -> None:
+        """
+        Encerra as threads de apoio (resolver, diagnóstico e monitor de rekeys) e as
+        IKE SAs mantidas pelo modo rápido.
+        """
+        self.resolver.stop()
+        for conn_name in list(self.warm_ike_sas):
+            if self._cancel_warm_ike_sa(conn_name):
+                self.commander.disconnect_connection(conn_name)
+        if self.preflight is not None:
+            self.preflight.shutdown()
+        if self.rekey_monitor is not None:
+            self.rekey_monitor.stop()
+
+    def _get_stats(self, conn_name: str) -> ConnectionStats:
+        stats = self.stats.get(conn_name)
+        if stats is None:
+            stats = self.stats[conn_name] = ConnectionStats(conn_name)
+        return stats
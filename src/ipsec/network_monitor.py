@@ -0,0 +1,170 @@
+"""
+Módulo NetworkMonitor
+
+Escuta as notificações de rede do kernel (netlink NETLINK_ROUTE): interfaces que sobem
+ou caem, endereços adicionados/removidos e mudanças da rota padrão. A rajada de eventos
+de uma troca de Wi-Fi, de um resume ou de dock/undock é agrupada em um único sinal.
+
+Rotas fora da tabela main (ex.: a tabela 220 do strongSwan) e endereços de escopo
+host/link são ignorados, para que o próprio túnel não dispare verificações.
+"""
+
+import socket
+import struct
+from typing import List, Optional, Set, Tuple
+
+from PySide6.QtCore import QObject, QSocketNotifier, QTimer, Signal
+
+from ..config.app_config import NETWORK_CHANGE_SETTLE_MS
+
+# Grupos multicast de NETLINK_ROUTE (linux/rtnetlink.h)
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+MONITOR_GROUPS = RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_IFADDR | RTMGRP_IPV6_ROUTE
+
+RTM_NEWLINK, RTM_DELLINK = 16, 17
+RTM_NEWADDR, RTM_DELADDR = 20, 21
+RTM_NEWROUTE, RTM_DELROUTE = 24, 25
+
+NLMSG_HEADER = struct.Struct("=IHHII")
+IFINFOMSG = struct.Struct("=BxHiII")
+IFADDRMSG = struct.Struct("=BBBBI")
+RTMSG = struct.Struct("=BBBBBBBBI")
+
+IFF_UP = 0x1
+IFF_RUNNING = 0x40
+IFF_LOWER_UP = 0x10000
+RT_TABLE_MAIN = 254
+RT_SCOPE_LINK = 253
+RT_SCOPE_HOST = 254
+
+
+def parse_netlink_messages(data: bytes) -> List[Tuple[int, bytes]]:
+    """
+    Divide um datagrama netlink em (tipo, payload).
+    """
+    messages = []
+    offset = 0
+    while offset + NLMSG_HEADER.size <= len(data):
+        length, msg_type, _flags, _seq, _pid = NLMSG_HEADER.unpack_from(data, offset)
+        if length < NLMSG_HEADER.size:
+            break
+        messages.append((msg_type, data[offset + NLMSG_HEADER.size:offset + length]))
+        # Mensagens alinhadas em 4 bytes
+        offset += (length + 3) & ~3
+    return messages
+
+
+def _interface_name(index: int) -> str:
+    try:
+        return socket.if_indextoname(index)
+    except OSError:
+        return f"if{index}"
+
+
+def describe_event(msg_type: int, payload: bytes) -> Optional[str]:
+    """
+    Descrição curta de um evento relevante para os túneis, ou None para ruído.
+    """
+    if msg_type in (RTM_NEWLINK, RTM_DELLINK) and len(payload) >= IFINFOMSG.size:
+        _family, _type, index, flags, change = IFINFOMSG.unpack_from(payload)
+        if msg_type == RTM_DELLINK:
+            return f"{_interface_name(index)} removida"
+        # NEWLINK sem mudança de flags é frequente (estatísticas, eventos de Wi-Fi)
+        if not change & (IFF_UP | IFF_RUNNING | IFF_LOWER_UP):
+            return None
+        carrier = flags & IFF_UP and flags & IFF_LOWER_UP
+        return f"{_interface_name(index)} {'ativa' if carrier else 'inativa'}"
+    if msg_type in (RTM_NEWADDR, RTM_DELADDR) and len(payload) >= IFADDRMSG.size:
+        _family, _prefix, _flags, scope, index = IFADDRMSG.unpack_from(payload)
+        if scope in (RT_SCOPE_LINK, RT_SCOPE_HOST):
+            return None
+        action = "novo endereço" if msg_type == RTM_NEWADDR else "endereço removido"
+        return f"{_interface_name(index)}: {action}"
+    if msg_type in (RTM_NEWROUTE, RTM_DELROUTE) and len(payload) >= RTMSG.size:
+        _family, dst_len, _src_len, _tos, table = RTMSG.unpack_from(payload)[:5]
+        if table != RT_TABLE_MAIN or dst_len != 0:
+            return None
+        return "rota padrão alterada"
+    return None
+
+
+class NetworkMonitor(QObject):
+    """
+    Emite network_changed uma vez por rajada de eventos de rede relevantes.
+    """
+
+    # Descrição resumida dos eventos agrupados
+    network_changed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._socket: Optional[socket.socket] = None
+        self._notifier: Optional[QSocketNotifier] = None
+        self._reasons: Set[str] = set()
+
+        self._settle_timer = QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.setInterval(NETWORK_CHANGE_SETTLE_MS)
+        self._settle_timer.timeout.connect(self._flush)
+
+    def start(self) -> bool:
+        """
+        Assina os grupos netlink; retorna False se o netlink não estiver disponível.
+        """
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, MONITOR_GROUPS))
+            sock.setblocking(False)
+        except (AttributeError, OSError):
+            return False
+        self._socket = sock
+        self._notifier = QSocketNotifier(sock.fileno(), QSocketNotifier.Read, self)
+        self._notifier.activated.connect(self._on_readable)
+        return True
+
+    def stop(self) -> None:
+        self._settle_timer.stop()
+        if self._notifier is not None:
+            self._notifier.setEnabled(False)
+            self._notifier = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def notify_change(self, reason: str) -> None:
+        """
+        Registra uma mudança vinda de fora do netlink (ex.: script do NetworkManager dispatcher).
+        """
+        self._reasons.add(reason)
+        self._schedule_flush()
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                data = self._socket.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                # ENOBUFS: eventos perdidos em uma rajada; tratar como mudança
+                self._reasons.add(f"eventos perdidos ({e.strerror or e})")
+                break
+            for msg_type, payload in parse_netlink_messages(data):
+                reason = describe_event(msg_type, payload)
+                if reason is not None:
+                    self._reasons.add(reason)
+        if self._reasons:
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        # Contado a partir do primeiro evento: uma rajada contínua não adia a verificação
+        if not self._settle_timer.isActive():
+            self._settle_timer.start()
+
+    def _flush(self) -> None:
+        reasons, self._reasons = self._reasons, set()
+        if reasons:
+            self.network_changed.emit(", ".join(sorted(reasons)))
@@ -0,0 +1,119 @@
+"""
+Módulo NetworkRecovery
+
+Recuperação rápida após mudanças de rede: a cada mudança (NetworkMonitor) o status é
+consultado imediatamente e as conexões que estavam ativas são conferidas pelo
+IPsecManager. Quem ainda usa o endereço local antigo, ou caiu, é reiniciado com
+'ipsec up'. Conexões com MOBIKE recebem um prazo curto para o charon migrar a IKE SA
+sozinho antes disso.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Set
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from ..config.app_config import NETWORK_MOBIKE_GRACE_MS
+from .connection_state import ConnectionState
+from .network_monitor import NetworkMonitor
+
+
+class NetworkRecovery(QObject):
+    """
+    Liga o NetworkMonitor ao StatusScheduler e reinicia os túneis afetados em segundo plano.
+    """
+
+    # Reconexões iniciadas e seus resultados, para o log de status
+    message = Signal(str)
+    # Reconexão automática concluída (conexão, sucesso, mensagem)
+    reconnect_finished = Signal(str, bool, str)
+    # Resultado do 'ipsec up' (conexão, sucesso, mensagem), entregue na thread da UI
+    _reinitiate_finished = Signal(str, bool, str)
+
+    def __init__(self, connection_manager, status_scheduler, parent=None):
+        super().__init__(parent)
+        self.connection_manager = connection_manager
+        self.status_scheduler = status_scheduler
+        self.monitor = NetworkMonitor(self)
+        self.monitor.network_changed.connect(self.on_network_changed)
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ipsec-recover")
+        # Há uma mudança ainda não resolvida; avaliada após a próxima consulta de status
+        self._pending = False
+        self._changed_at = 0.0
+        self._in_progress: Set[str] = set()
+
+        self._grace_timer = QTimer(self)
+        self._grace_timer.setSingleShot(True)
+        self._grace_timer.timeout.connect(self.status_scheduler.request_refresh)
+
+        self.status_scheduler.state_changed.connect(self._on_state_changed)
+        self.status_scheduler.snapshot_updated.connect(self._on_snapshot_updated)
+        self._reinitiate_finished.connect(self._on_reinitiate_finished)
+
+    def start(self) -> bool:
+        """
+        Começa a escutar o netlink; retorna False se não estiver disponível.
+        """
+        return self.monitor.start()
+
+    def stop(self) -> None:
+        self.monitor.stop()
+        self._grace_timer.stop()
+        self.status_scheduler.state_changed.disconnect(self._on_state_changed)
+        self.status_scheduler.snapshot_updated.disconnect(self._on_snapshot_updated)
+        self._executor.shutdown(wait=False)
+
+    def on_network_changed(self, _reason: str) -> None:
+        # O diagnóstico em cache se referia à rede anterior
+        if self.connection_manager.preflight is not None:
+            self.connection_manager.preflight.invalidate()
+        self._pending = True
+        self._changed_at = time.monotonic()
+        self.status_scheduler.request_refresh()
+
+    def _on_state_changed(self, transition) -> None:
+        # Um túnel ativo que caiu sem ação do usuário (ex.: DPD após um resume) também é recuperado
+        if (
+            transition.previous.is_connected
+            and transition.state in (ConnectionState.DISCONNECTED, ConnectionState.FAILED)
+            and transition.conn_name in self.connection_manager.established_sources
+        ):
+            self._pending = True
+            self._changed_at = time.monotonic()
+
+    def _on_snapshot_updated(self) -> None:
+        if not self._pending:
+            return
+        elapsed_ms = (time.monotonic() - self._changed_at) * 1000
+        reinitiate, waiting = self.connection_manager.plan_network_recovery(
+            elapsed_ms >= NETWORK_MOBIKE_GRACE_MS
+        )
+        self._pending = waiting
+        if waiting and not self._grace_timer.isActive():
+            self._grace_timer.start(max(0, int(NETWORK_MOBIKE_GRACE_MS - elapsed_ms)))
+        for conn_name, reason in reinitiate:
+            if conn_name in self._in_progress:
+                continue
+            self._in_progress.add(conn_name)
+            self.message.emit(f"Reconectando {conn_name}: {reason}")
+            self.connection_manager.begin_reinitiate(conn_name)
+            future = self._executor.submit(self.connection_manager.reinitiate, conn_name)
+            future.add_done_callback(
+                lambda future, conn_name=conn_name: self._reinitiate_done(conn_name, future)
+            )
+
+    def _reinitiate_done(self, conn_name: str, future) -> None:
+        # Executado na thread de recuperação: apenas repassa o resultado para a thread da UI
+        try:
+            success, message = future.result()
+        except Exception as e:
+            success, message = False, f"Erro inesperado ao reconectar: {str(e)}"
+        self._reinitiate_finished.emit(conn_name, success, message)
+
+    def _on_reinitiate_finished(self, conn_name: str, success: bool, message: str) -> None:
+        self._in_progress.discard(conn_name)
+        self.connection_manager.finish_reinitiate(conn_name, success, message)
+        self.reconnect_finished.emit(conn_name, success, message)
+        self.message.emit(message)
+        self.status_scheduler.request_refresh()
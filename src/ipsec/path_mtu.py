@@ -0,0 +1,574 @@
+"""
+Módulo PathMtu
+
+Diagnóstico de MTU através do túnel: calcula o MTU interno efetivo para a transformação
+ESP negociada (cabeçalho ESP, IV, preenchimento, ICV e o UDP do NAT-T sobre o MTU do
+caminho até o gateway) e o confirma com sondas ICMP com o bit DF até um host do
+rightsubnet, por busca binária do maior pacote entregue.
+
+Um pacote grande que some sem que nenhum roteador devolva o ICMP "fragmentação
+necessária" (ou "packet too big" no IPv6) indica um buraco negro de PMTU: conexões TCP
+abrem, mas travam na primeira resposta grande. O relatório recomenda o MSS a usar no
+clamping e a opção fragmentation= da conexão.
+
+As sondas usam um socket ICMP sem privilégios (net.ipv4.ping_group_range) ou, como root,
+um socket raw.
+
+    python -m src.ipsec.path_mtu CONEXAO [HOST]
+    python -m src.ipsec.path_mtu --probe 127.0.0.1
+"""
+
+import argparse
+import errno
+import os
+import re
+import select
+import socket
+import struct
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from ..config.app_config import PATH_MTU_PROBE_ATTEMPTS, PATH_MTU_PROBE_TIMEOUT_S
+
+# Constantes do Linux ausentes do módulo socket em algumas versões do Python
+IP_MTU_DISCOVER = getattr(socket, "IP_MTU_DISCOVER", 10)
+IP_PMTUDISC_PROBE = getattr(socket, "IP_PMTUDISC_PROBE", 3)
+IP_MTU = getattr(socket, "IP_MTU", 14)
+IP_RECVERR = getattr(socket, "IP_RECVERR", 11)
+IPV6_MTU_DISCOVER = getattr(socket, "IPV6_MTU_DISCOVER", 23)
+IPV6_PMTUDISC_PROBE = getattr(socket, "IPV6_PMTUDISC_PROBE", 3)
+IPV6_MTU = getattr(socket, "IPV6_MTU", 24)
+IPV6_RECVERR = getattr(socket, "IPV6_RECVERR", 25)
+MSG_ERRQUEUE = getattr(socket, "MSG_ERRQUEUE", 0x2000)
+# struct sock_extended_err: ee_errno, ee_origin, ee_type, ee_code, ee_pad, ee_info (MTU), ee_data
+SOCK_EXTENDED_ERR = struct.Struct("=IBBBBII")
+
+ICMP_HEADER = struct.Struct("!BBHHH")
+ICMP_ECHO_REQUEST = {socket.AF_INET: 8, socket.AF_INET6: 128}
+ICMP_ECHO_REPLY = {socket.AF_INET: 0, socket.AF_INET6: 129}
+IP_HEADER_BYTES = {socket.AF_INET: 20, socket.AF_INET6: 40}
+# Cabeçalhos TCP/IP descontados do MTU para obter o MSS
+TCP_IP_HEADER_BYTES = {socket.AF_INET: 40, socket.AF_INET6: 60}
+
+# Overhead fixo do ESP: SPI + número de sequência; trailer: tamanho do preenchimento + próximo cabeçalho
+ESP_HEADER_BYTES = 8
+ESP_TRAILER_BYTES = 2
+NAT_T_HEADER_BYTES = 8
+
+SA_AEAD_PATTERN = re.compile(r"^AES_(GCM|CCM)_(8|12|16)_\d+$")
+SA_INTEGRITY_PATTERN = re.compile(r"^(HMAC_[A-Z0-9_]+|AES_XCBC|AES_CMAC)_(\d+)$")
+# Tamanho do ICV das integridades do ipsec.conf (truncamento padrão do ESP)
+ICV_BYTES = {"MD5": 12, "SHA1": 12, "SHA256": 16, "SHA384": 24, "SHA512": 32, "CMAC": 12}
+
+
+class EspOverhead:
+    """
+    Bytes que a transformação ESP acrescenta a cada pacote: IV, ICV e o alinhamento do
+    preenchimento (bloco da cifra, no mínimo 4).
+    """
+
+    __slots__ = ("label", "iv", "block", "icv")
+
+    def __init__(self, label: str, iv: int, block: int, icv: int):
+        self.label = label
+        self.iv = iv
+        self.block = block
+        self.icv = icv
+
+    def __repr__(self) -> str:
+        return f"EspOverhead({self.label!r}, iv={self.iv}, block={self.block}, icv={self.icv})"
+
+
+def overhead_for_sa_suite(suite: str) -> Optional[EspOverhead]:
+    """
+    Overhead de uma suite como o strongSwan a exibe (ex.: 'AES_GCM_16_256',
+    'AES_CBC_256/HMAC_SHA2_256_128'); None se a cifra não for reconhecida.
+    """
+    parts = suite.split("/")
+    cipher = parts[0]
+    match = SA_AEAD_PATTERN.match(cipher)
+    if match:
+        return EspOverhead(suite, 8, 4, int(match.group(2)))
+    if cipher.startswith("CHACHA20_POLY1305"):
+        return EspOverhead(suite, 8, 4, 16)
+    if "_CBC" in cipher:
+        small_block = cipher.startswith(("3DES", "DES", "BLOWFISH", "CAST"))
+        iv = block = 8 if small_block else 16
+    elif "_CTR" in cipher:
+        iv, block = 8, 4
+    elif cipher == "NULL":
+        iv, block = 0, 4
+    else:
+        return None
+    icv = 0
+    for part in parts[1:]:
+        match = SA_INTEGRITY_PATTERN.match(part)
+        if match:
+            icv = int(match.group(2)) // 8
+            break
+    return EspOverhead(suite, iv, block, icv)
+
+
+def overhead_for_transform(transform) -> Optional[EspOverhead]:
+    """
+    Overhead de uma transformação do esp= (EspTransform do cipher_benchmark).
+    """
+    from .cipher_benchmark import INTEGRITY_ALGORITHMS
+
+    if transform.mode in ("gcm", "ccm"):
+        return EspOverhead(transform.name, 8, 4, transform.tag_bytes)
+    if transform.mode == "poly1305":
+        return EspOverhead(transform.name, 8, 4, 16)
+    icv = ICV_BYTES.get(INTEGRITY_ALGORITHMS.get(transform.integrity or ""), 0)
+    if transform.mode == "ctr":
+        return EspOverhead(transform.name, 8, 4, icv)
+    block = 8 if transform.cipher == "3des" else 16
+    return EspOverhead(transform.name, block, block, icv)
+
+
+def encapsulation_bytes(overhead: EspOverhead, family: int, udp_encap: bool) -> int:
+    """
+    Bytes fixos do pacote externo (sem o preenchimento): IP, UDP do NAT-T, ESP, IV e ICV.
+    """
+    return (
+        IP_HEADER_BYTES[family]
+        + (NAT_T_HEADER_BYTES if udp_encap else 0)
+        + ESP_HEADER_BYTES
+        + overhead.iv
+        + overhead.icv
+    )
+
+
+def inner_mtu(outer_mtu: int, overhead: EspOverhead, family: int = socket.AF_INET, udp_encap: bool = False) -> int:
+    """
+    Maior pacote interno que cabe em um pacote ESP de até 'outer_mtu' bytes.
+
+    O pacote interno mais o trailer é preenchido até um múltiplo do bloco, então o
+    espaço disponível é arredondado para baixo antes de descontar o trailer.
+    """
+    available = outer_mtu - encapsulation_bytes(overhead, family, udp_encap)
+    return max(0, available // overhead.block * overhead.block - ESP_TRAILER_BYTES)
+
+
+def mss_for_mtu(mtu: int, family: int = socket.AF_INET) -> int:
+    return mtu - TCP_IP_HEADER_BYTES[family]
+
+
+def kernel_path_mtu(address: str) -> int:
+    """
+    MTU que o kernel usaria agora até 'address' (rota, PMTU em cache ou xfrm); OSError sem rota.
+    """
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        # connect() em UDP não envia nada: apenas associa a rota ao socket
+        sock.connect((address, 9))
+        if family == socket.AF_INET6:
+            return sock.getsockopt(socket.IPPROTO_IPV6, IPV6_MTU)
+        return sock.getsockopt(socket.IPPROTO_IP, IP_MTU)
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class PathMtuProbe:
+    """
+    Resultado da sondagem DF até um host: maior pacote entregue, MTU informado por ICMP
+    (ou pelo kernel) e os tamanhos que se perderam sem nenhum aviso.
+    """
+
+    __slots__ = ("address", "upper", "mtu", "reported_mtu", "silent_drops", "probes")
+
+    def __init__(self, address: str, upper: int):
+        self.address = address
+        # Limite da busca: o MTU do kernel até o host
+        self.upper = upper
+        # Maior pacote (IP completo) com resposta; None se o host não respondeu nem ao menor
+        self.mtu: Optional[int] = None
+        self.reported_mtu: Optional[int] = None
+        self.silent_drops: List[int] = []
+        self.probes = 0
+
+    @property
+    def responsive(self) -> bool:
+        return self.mtu is not None
+
+    @property
+    def blackhole(self) -> Optional[bool]:
+        """
+        Pacotes acima do MTU encontrado sumiram sem ICMP; None se o host não respondeu.
+        """
+        if not self.responsive:
+            return None
+        return bool(self.silent_drops) and self.reported_mtu is None
+
+
+class IcmpProber:
+    """
+    Envia pedidos de eco ICMP com o bit DF de um tamanho exato e classifica a resposta.
+    """
+
+    def __init__(self, address: str, timeout: float = PATH_MTU_PROBE_TIMEOUT_S):
+        self.address = address
+        self.timeout = timeout
+        self.family = socket.AF_INET6 if ":" in address else socket.AF_INET
+        proto = socket.IPPROTO_ICMPV6 if self.family == socket.AF_INET6 else socket.IPPROTO_ICMP
+        try:
+            self.sock = socket.socket(self.family, socket.SOCK_DGRAM, proto)
+            self.raw = False
+        except PermissionError:
+            try:
+                self.sock = socket.socket(self.family, socket.SOCK_RAW, proto)
+            except PermissionError:
+                raise PermissionError(
+                    errno.EPERM,
+                    "sondas ICMP não permitidas (ajuste net.ipv4.ping_group_range ou execute como root)",
+                )
+            self.raw = True
+        if self.family == socket.AF_INET6:
+            self.sock.setsockopt(socket.IPPROTO_IPV6, IPV6_MTU_DISCOVER, IPV6_PMTUDISC_PROBE)
+            self.sock.setsockopt(socket.IPPROTO_IPV6, IPV6_RECVERR, 1)
+        else:
+            self.sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_PROBE)
+            self.sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+        # Em sockets sem privilégios o kernel troca o identificador pelo "porto" do socket
+        self.identifier = os.getpid() & 0xFFFF
+        self.sequence = 0
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def __enter__(self) -> "IcmpProber":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def probe(self, size: int) -> Tuple[str, Optional[int]]:
+        """
+        Sonda com um pacote IP de 'size' bytes: ('ok', None), ('too_big', MTU informado)
+        ou ('lost', None) sem resposta dentro do prazo.
+        """
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        payload_size = size - IP_HEADER_BYTES[self.family] - ICMP_HEADER.size
+        payload = struct.pack("!d", time.monotonic()).ljust(max(payload_size, 8), b"\x00")[:max(payload_size, 0)]
+        header = ICMP_HEADER.pack(ICMP_ECHO_REQUEST[self.family], 0, 0, self.identifier, self.sequence)
+        if self.family == socket.AF_INET:
+            # No ICMPv6 o kernel calcula a soma de verificação
+            header = ICMP_HEADER.pack(
+                ICMP_ECHO_REQUEST[self.family], 0, _checksum(header + payload), self.identifier, self.sequence
+            )
+        try:
+            self.sock.sendto(header + payload, (self.address, 0))
+        except OSError as e:
+            if e.errno == errno.EMSGSIZE:
+                return "too_big", self._queued_mtu()
+            raise
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return "lost", None
+            readable, _, _ = select.select([self.sock], [], [], remaining)
+            if not readable:
+                return "lost", None
+            try:
+                data = self.sock.recv(65535)
+            except OSError as e:
+                if e.errno == errno.EMSGSIZE:
+                    return "too_big", self._queued_mtu()
+                # Outros erros ICMP (destino inalcançável) ficam na fila; o host não respondeu
+                self._queued_mtu()
+                continue
+            outcome = self._classify(data)
+            if outcome is not None:
+                return outcome
+
+    def _queued_mtu(self) -> Optional[int]:
+        """
+        Lê a fila de erros do socket (IP_RECVERR) e devolve o MTU de um erro EMSGSIZE.
+        """
+        mtu = None
+        while True:
+            try:
+                _data, ancdata, _flags, _address = self.sock.recvmsg(512, 512, MSG_ERRQUEUE | socket.MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return mtu
+            except OSError:
+                return mtu
+            for _level, _type, cmsg in ancdata:
+                if len(cmsg) >= SOCK_EXTENDED_ERR.size:
+                    ee_errno, _origin, _type, _code, _pad, ee_info, _data = SOCK_EXTENDED_ERR.unpack_from(cmsg)
+                    if ee_errno == errno.EMSGSIZE and ee_info:
+                        mtu = ee_info
+
+    def _classify(self, data: bytes) -> Optional[Tuple[str, Optional[int]]]:
+        """
+        Interpreta um pacote recebido; None se não for a resposta desta sonda.
+        """
+        if self.raw and self.family == socket.AF_INET:
+            # Sockets raw IPv4 recebem o cabeçalho IP
+            data = data[(data[0] & 0x0F) * 4:]
+        if len(data) < ICMP_HEADER.size:
+            return None
+        icmp_type, code, _checksum_value, identifier, sequence = ICMP_HEADER.unpack_from(data)
+        if icmp_type == ICMP_ECHO_REPLY[self.family]:
+            if sequence == self.sequence and (not self.raw or identifier == self.identifier):
+                return "ok", None
+            return None
+        if not self.raw:
+            return None
+        # Socket raw: os erros ICMP chegam como pacotes, com o início do pedido original
+        if self.family == socket.AF_INET and icmp_type == 3 and code == 4:
+            original = data[ICMP_HEADER.size:]
+            original = original[(original[0] & 0x0F) * 4:] if original else b""
+            mtu = struct.unpack_from("!H", data, 6)[0]
+        elif self.family == socket.AF_INET6 and icmp_type == 2:
+            original = data[ICMP_HEADER.size + 40:]
+            mtu = struct.unpack_from("!I", data, 4)[0]
+        else:
+            return None
+        if len(original) >= ICMP_HEADER.size:
+            _type, _code, _sum, identifier, sequence = ICMP_HEADER.unpack_from(original)
+            if identifier == self.identifier and sequence == self.sequence:
+                return "too_big", mtu or None
+        return None
+
+    def probe_with_retries(self, size: int, attempts: int = PATH_MTU_PROBE_ATTEMPTS) -> Tuple[str, Optional[int]]:
+        outcome = ("lost", None)
+        for _ in range(attempts):
+            outcome = self.probe(size)
+            if outcome[0] != "lost":
+                return outcome
+        return outcome
+
+
+def discover_path_mtu(address: str, upper: Optional[int] = None, timeout: float = PATH_MTU_PROBE_TIMEOUT_S) -> PathMtuProbe:
+    """
+    Busca binária do maior pacote com o bit DF que recebe resposta de 'address'.
+
+    Um ICMP "fragmentação necessária" estreita a busca ao MTU informado; tamanhos que
+    somem sem aviso são anotados como descartes silenciosos. Bloqueia por alguns segundos.
+    """
+    if upper is None:
+        upper = kernel_path_mtu(address)
+    result = PathMtuProbe(address, upper)
+    with IcmpProber(address, timeout) as prober:
+        # Pacote pequeno: confirma que o host responde ao eco antes da busca
+        minimum = IP_HEADER_BYTES[prober.family] + ICMP_HEADER.size + 8
+        result.probes += 1
+        if prober.probe_with_retries(minimum)[0] != "ok":
+            return result
+        low, high = minimum, upper
+        while low < high:
+            size = (low + high + 1) // 2
+            result.probes += 1
+            status, mtu = prober.probe_with_retries(size)
+            if status == "ok":
+                low = size
+                continue
+            if status == "too_big" and mtu:
+                result.reported_mtu = mtu if result.reported_mtu is None else min(result.reported_mtu, mtu)
+                if low <= mtu < size:
+                    # Nada acima do MTU informado pode passar: a busca continua abaixo dele
+                    high = mtu
+                    continue
+            elif status == "lost":
+                result.silent_drops.append(size)
+            high = size - 1
+        result.mtu = low
+    # Descartes silenciosos abaixo do MTU encontrado foram perdas comuns, não de tamanho
+    result.silent_drops = [size for size in result.silent_drops if size > result.mtu]
+    return result
+
+
+class PathMtuReport:
+    """
+    Diagnóstico de MTU de uma conexão: o cálculo a partir da transformação ESP e o
+    resultado da sondagem através do túnel.
+    """
+
+    __slots__ = (
+        "conn_name",
+        "gateway",
+        "outer_mtu",
+        "udp_encap",
+        "overhead",
+        "outer_family",
+        "inner_family",
+        "fragmentation",
+        "ike_version",
+        "probe",
+        "errors",
+    )
+
+    def __init__(
+        self,
+        conn_name: str,
+        gateway: str,
+        outer_mtu: int,
+        udp_encap: Optional[bool],
+        overhead: Optional[EspOverhead],
+        outer_family: int = socket.AF_INET,
+        inner_family: int = socket.AF_INET,
+        fragmentation: str = "yes",
+        ike_version: str = "ikev2",
+    ):
+        self.conn_name = conn_name
+        self.gateway = gateway
+        self.outer_mtu = outer_mtu
+        # None quando não foi possível ler a SA: o cálculo supõe NAT-T (pior caso)
+        self.udp_encap = udp_encap
+        self.overhead = overhead
+        self.outer_family = outer_family
+        self.inner_family = inner_family
+        self.fragmentation = fragmentation
+        self.ike_version = ike_version
+        self.probe: Optional[PathMtuProbe] = None
+        self.errors: List[str] = []
+
+    @property
+    def expected_inner_mtu(self) -> Optional[int]:
+        if self.overhead is None:
+            return None
+        return inner_mtu(self.outer_mtu, self.overhead, self.outer_family, self.udp_encap is not False)
+
+    @property
+    def effective_mtu(self) -> Optional[int]:
+        """
+        MTU interno a usar: o menor entre o calculado e o medido.
+        """
+        candidates = [self.expected_inner_mtu]
+        if self.probe is not None and self.probe.responsive:
+            candidates.append(self.probe.mtu)
+        candidates = [value for value in candidates if value]
+        return min(candidates) if candidates else None
+
+    @property
+    def recommended_mss(self) -> Optional[int]:
+        mtu = self.effective_mtu
+        return mss_for_mtu(mtu, self.inner_family) if mtu else None
+
+    @property
+    def blackhole(self) -> Optional[bool]:
+        return self.probe.blackhole if self.probe is not None else None
+
+    def recommendations(self) -> List[str]:
+        items = []
+        mss = self.recommended_mss
+        if mss:
+            items.append(
+                f"MSS clamping em {mss} para o tráfego do túnel: "
+                f"iptables -t mangle -A OUTPUT -p tcp --tcp-flags SYN,RST SYN -m policy --pol ipsec --dir out "
+                f"-j TCPMSS --set-mss {mss} (e o mesmo em FORWARD se esta máquina roteia uma LAN)"
+            )
+        if self.blackhole:
+            items.append(
+                f"O caminho descarta pacotes acima de {self.probe.mtu} bytes sem ICMP: sem o clamping, "
+                "conexões TCP travam nas respostas grandes"
+            )
+        if self.fragmentation == "no":
+            items.append(
+                "fragmentation=yes: mensagens IKE grandes (certificados no IKE_AUTH) são fragmentadas "
+                "pelo próprio IKE em vez de depender da fragmentação IP"
+            )
+        elif self.blackhole and self.ike_version == "ikev1" and self.fragmentation != "force":
+            items.append("fragmentation=force: no IKEv1 fragmenta as mensagens IKE mesmo sem o gateway anunciar suporte")
+        return items
+
+    def describe(self) -> str:
+        lines = [f"Diagnóstico de MTU de {self.conn_name}:"]
+        lines.append(f"  MTU do caminho até o gateway {self.gateway}: {self.outer_mtu}")
+        if self.overhead is None:
+            lines.append("  Transformação ESP desconhecida: não é possível calcular o overhead")
+        else:
+            nat_t = {True: "sim", False: "não", None: "desconhecido, supondo sim"}[self.udp_encap]
+            parts = [f"IP {IP_HEADER_BYTES[self.outer_family]}"]
+            if self.udp_encap is not False:
+                parts.append(f"UDP {NAT_T_HEADER_BYTES}")
+            parts.append(f"ESP {ESP_HEADER_BYTES}")
+            if self.overhead.iv:
+                parts.append(f"IV {self.overhead.iv}")
+            if self.overhead.icv:
+                parts.append(f"ICV {self.overhead.icv}")
+            fixed = encapsulation_bytes(self.overhead, self.outer_family, self.udp_encap is not False)
+            lines.append(f"  Transformação: {self.overhead.label}; NAT-T: {nat_t}")
+            lines.append(
+                f"  Overhead: {' + '.join(parts)} = {fixed} bytes, mais o trailer ({ESP_TRAILER_BYTES} bytes) "
+                f"e o preenchimento até múltiplos de {self.overhead.block}"
+            )
+            expected = self.expected_inner_mtu
+            lines.append(
+                f"  MTU interno calculado: {expected} (MSS {mss_for_mtu(expected, self.inner_family)})"
+            )
+        probe = self.probe
+        if probe is not None:
+            if not probe.responsive:
+                lines.append(f"  Sondagem até {probe.address}: sem resposta ao eco ICMP; resultado inconclusivo")
+            else:
+                lines.append(
+                    f"  Sondagem DF até {probe.address}: maior pacote entregue {probe.mtu} bytes "
+                    f"({probe.probes} sondas, limite do kernel {probe.upper})"
+                )
+                if probe.reported_mtu is not None:
+                    lines.append(f"  ICMP \"fragmentação necessária\" informou MTU {probe.reported_mtu}: o PMTUD funciona")
+                if probe.blackhole:
+                    lines.append(
+                        f"  Pacotes de {min(probe.silent_drops)} bytes ou mais foram descartados sem ICMP: "
+                        "buraco negro de PMTU"
+                    )
+                expected = self.expected_inner_mtu
+                if expected and probe.mtu < expected and not probe.blackhole:
+                    lines.append(f"  O caminho é menor que o calculado ({probe.mtu} < {expected})")
+        for error in self.errors:
+            lines.append(f"  {error}")
+        recommendations = self.recommendations()
+        if recommendations:
+            lines.append("  Recomendações:")
+            lines.extend(f"    - {item}" for item in recommendations)
+        return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Diagnóstico de MTU através do túnel IPsec.")
+    parser.add_argument("connection", nargs="?", help="conexão ativa do ipsec.conf")
+    parser.add_argument("host", nargs="?", default="", help="host do rightsubnet que responde a ping")
+    parser.add_argument("--probe", metavar="HOST", help="apenas sonda o MTU até HOST, sem uma conexão")
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        try:
+            probe = discover_path_mtu(args.probe)
+        except OSError as e:
+            print(f"Falha na sondagem: {e.strerror or e}", file=sys.stderr)
+            return 1
+        if not probe.responsive:
+            print(f"{args.probe} não respondeu ao eco ICMP.", file=sys.stderr)
+            return 1
+        print(f"{args.probe}: MTU {probe.mtu} ({probe.probes} sondas, limite do kernel {probe.upper})")
+        return 0
+    if not args.connection:
+        parser.error("informe a conexão ou --probe HOST")
+
+    from .ipsec_manager import IPsecManager
+
+    manager = IPsecManager()
+    try:
+        report = manager.run_path_mtu_check(args.connection, args.host)
+    except (OSError, ValueError) as e:
+        print(f"Falha no diagnóstico: {e}", file=sys.stderr)
+        return 1
+    finally:
+        manager.shutdown()
+    print(report.describe())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
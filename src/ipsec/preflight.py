@@ -0,0 +1,328 @@
+"""
+Módulo Preflight
+
+Diagnóstico rápido executado antes de 'ipsec up': resolução do gateway, rota local
+até ele, alcance das portas UDP 500/4500 e existência dos certificados/segredos
+referenciados. As verificações rodam em paralelo dentro de um prazo curto, para que
+um problema de DNS ou de firewall apareça em menos de um segundo em vez de após os
+retransmits do IKE.
+"""
+
+import errno
+import os
+import select
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from ..config.app_config import (
+    IPSEC_CERTS_PATH,
+    IPSEC_SECRETS_PATH,
+    PREFLIGHT_CACHE_TTL_S,
+    PREFLIGHT_PROBE_WAIT_S,
+    PREFLIGHT_TIMEOUT_S,
+)
+from .connection_record import SERVER_ADDRESS_NOT_FOUND, ConnectionRecord
+from .resolver_cache import ResolverCache
+
+IKE_PORT = 500
+NAT_T_PORT = 4500
+# Keepalive NAT-T (RFC 3948): um único byte 0xFF, ignorado pelo daemon IKE
+NAT_T_KEEPALIVE = b"\xff"
+# Valores de 'right' que não identificam um gateway específico
+WILDCARD_GATEWAYS = ("%any", "%any6", "%defaultroute")
+
+
+class PreflightCheck:
+    """
+    Resultado de uma verificação: passed=None indica resultado inconclusivo.
+    """
+
+    __slots__ = ("name", "passed", "message")
+
+    def __init__(self, name: str, passed: Optional[bool], message: str):
+        self.name = name
+        self.passed = passed
+        self.message = message
+
+    def __repr__(self) -> str:
+        return f"PreflightCheck({self.name!r}, {self.passed!r}, {self.message!r})"
+
+
+class PreflightReport:
+    """
+    Conjunto das verificações de uma conexão.
+    """
+
+    __slots__ = ("conn_name", "gateway", "checks", "elapsed", "cached")
+
+    def __init__(
+        self,
+        conn_name: str,
+        gateway: str,
+        checks: List[PreflightCheck],
+        elapsed: float,
+        cached: bool = False,
+    ):
+        self.conn_name = conn_name
+        self.gateway = gateway
+        self.checks = checks
+        self.elapsed = elapsed
+        self.cached = cached
+
+    @property
+    def failures(self) -> List[PreflightCheck]:
+        return [check for check in self.checks if check.passed is False]
+
+    @property
+    def warnings(self) -> List[PreflightCheck]:
+        # Inconclusivos ou problemas que não impedem a conexão
+        return [check for check in self.checks if check.passed is None]
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    def summary(self) -> str:
+        if self.ok:
+            warnings = "; ".join(f"{check.name}: {check.message}" for check in self.warnings)
+            if warnings:
+                return f'Diagnóstico de "{self.conn_name}" sem bloqueios ({self.elapsed * 1000:.0f} ms); avisos: {warnings}'
+            return f'Diagnóstico de "{self.conn_name}" sem problemas ({self.elapsed * 1000:.0f} ms).'
+        details = "; ".join(f"{check.name}: {check.message}" for check in self.failures)
+        return f'Diagnóstico de "{self.conn_name}" falhou: {details}'
+
+
+def _resolve(host: str, resolver: Optional[ResolverCache], timeout: float) -> Tuple[Optional[str], PreflightCheck]:
+    if resolver is not None:
+        # Normalmente já resolvido em segundo plano: sem espera no caminho da conexão
+        entry = resolver.resolve(host, timeout)
+        if entry is None:
+            return None, PreflightCheck("DNS", None, f"resolução de '{host}' ainda em andamento")
+        if not entry.addresses:
+            return None, PreflightCheck("DNS", False, f"não foi possível resolver '{host}' ({entry.error})")
+        return entry.address, PreflightCheck("DNS", True, f"{host} -> {entry.address}")
+    try:
+        infos = socket.getaddrinfo(host, IKE_PORT, type=socket.SOCK_DGRAM)
+    except socket.gaierror as e:
+        return None, PreflightCheck("DNS", False, f"não foi possível resolver '{host}' ({e.strerror})")
+    address = infos[0][4][0]
+    return address, PreflightCheck("DNS", True, f"{host} -> {address}")
+
+
+def route_source_address(address: str) -> str:
+    """
+    Endereço local que o kernel usaria agora para alcançar 'address'; OSError sem rota.
+    """
+    # connect() em UDP não envia nada: apenas consulta a tabela de rotas do kernel
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.connect((address, IKE_PORT))
+        return sock.getsockname()[0]
+
+
+def _check_route(address: str) -> PreflightCheck:
+    try:
+        local_address = route_source_address(address)
+    except OSError as e:
+        if e.errno in (errno.ENETUNREACH, errno.EHOSTUNREACH):
+            return PreflightCheck("Rota", False, f"sem rota para {address}")
+        return PreflightCheck("Rota", None, f"não verificada ({e.strerror or e})")
+    return PreflightCheck("Rota", True, f"via {local_address}")
+
+
+def _probe_udp_ports(address: str, wait_s: float) -> List[PreflightCheck]:
+    """
+    Envia um keepalive NAT-T para as portas 500 e 4500 e aguarda um ICMP de porta fechada.
+
+    UDP não confirma entrega: sem resposta é o resultado normal; apenas a recusa
+    (ICMP port unreachable) prova que o gateway não escuta IKE naquela porta. Só as
+    duas portas recusadas bloqueiam a conexão: um gateway sem NAT-T (ou que só atende
+    na 4500) recusa uma delas e ainda negocia pela outra, então a recusa de uma só
+    porta vira um aviso.
+    """
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    sockets: Dict[socket.socket, int] = {}
+    results: Dict[int, PreflightCheck] = {}
+    try:
+        for port in (IKE_PORT, NAT_T_PORT):
+            name = f"UDP/{port}"
+            try:
+                sock = socket.socket(family, socket.SOCK_DGRAM)
+                sock.setblocking(False)
+                sock.connect((address, port))
+                sock.send(NAT_T_KEEPALIVE)
+                sockets[sock] = port
+            except OSError as e:
+                results[port] = PreflightCheck(name, False, f"falha ao enviar ({e.strerror or e})")
+
+        deadline = time.monotonic() + wait_s
+        pending = list(sockets)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select(pending, [], [], remaining)
+            for sock in readable:
+                port = sockets[sock]
+                pending.remove(sock)
+                try:
+                    sock.recv(1)
+                    results[port] = PreflightCheck(f"UDP/{port}", True, "resposta recebida")
+                except ConnectionRefusedError:
+                    results[port] = PreflightCheck(
+                        f"UDP/{port}", False, "porta fechada no gateway (ICMP port unreachable)"
+                    )
+                except OSError as e:
+                    results[port] = PreflightCheck(f"UDP/{port}", None, str(e.strerror or e))
+        for sock, port in sockets.items():
+            results.setdefault(port, PreflightCheck(f"UDP/{port}", True, "nenhuma recusa recebida"))
+    finally:
+        for sock in sockets:
+            sock.close()
+    checks = [results[port] for port in (IKE_PORT, NAT_T_PORT)]
+    if not all(check.passed is False for check in checks):
+        for check in checks:
+            if check.passed is False:
+                check.passed = None
+                check.message += "; o IKE pode seguir pela outra porta"
+    return checks
+
+
+def _check_file(name: str, path: str) -> PreflightCheck:
+    try:
+        os.stat(path)
+    except FileNotFoundError:
+        return PreflightCheck(name, False, f"arquivo não encontrado: {path}")
+    except PermissionError:
+        # Sem permissão para verificar (ex.: diretório restrito ao root): não bloquear a conexão
+        return PreflightCheck(name, None, f"sem permissão para verificar {path}")
+    return PreflightCheck(name, True, path)
+
+
+def check_credentials(record: ConnectionRecord) -> List[PreflightCheck]:
+    """
+    Verifica se os certificados e o arquivo de segredos referenciados existem.
+    """
+    checks = []
+    for key in ("leftcert", "rightcert"):
+        value = record.get(key)
+        if not value or value.startswith("%"):
+            continue
+        path = value if os.path.isabs(value) else os.path.join(IPSEC_CERTS_PATH, value)
+        checks.append(_check_file(key, path))
+
+    auth_values = " ".join(
+        value for value in (record.get("authby"), record.get("leftauth")) if value
+    )
+    if any(method in auth_values for method in ("psk", "secret", "eap", "xauth")):
+        checks.append(_check_file("Segredos", IPSEC_SECRETS_PATH))
+    return checks
+
+
+def check_gateway(
+    host: str,
+    timeout: float = PREFLIGHT_TIMEOUT_S,
+    resolver: Optional[ResolverCache] = None,
+) -> List[PreflightCheck]:
+    """
+    Resolve o gateway e verifica rota e portas UDP, dentro do prazo informado.
+    """
+    started = time.monotonic()
+    address, dns_check = _resolve(host, resolver, timeout)
+    checks = [dns_check]
+    if address is None:
+        return checks
+    route_check = _check_route(address)
+    checks.append(route_check)
+    if route_check.passed is False:
+        return checks
+    remaining = timeout - (time.monotonic() - started)
+    checks.extend(_probe_udp_ports(address, max(0.0, min(PREFLIGHT_PROBE_WAIT_S, remaining))))
+    return checks
+
+
+class PreflightChecker:
+    """
+    Executa o diagnóstico em paralelo e reaproveita o resultado de rede por gateway.
+    """
+
+    def __init__(
+        self,
+        timeout: float = PREFLIGHT_TIMEOUT_S,
+        cache_ttl: float = PREFLIGHT_CACHE_TTL_S,
+        resolver: Optional[ResolverCache] = None,
+    ):
+        self.timeout = timeout
+        self.resolver = resolver
+        self.cache_ttl = cache_ttl
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ipsec-preflight")
+        # gateway -> (expira em, verificações de rede)
+        self._cache: Dict[str, Tuple[float, List[PreflightCheck]]] = {}
+        self._lock = threading.Lock()
+
+    def run(self, record: ConnectionRecord) -> PreflightReport:
+        """
+        Executa todas as verificações de uma conexão; retorna em no máximo ~timeout segundos.
+        """
+        started = time.monotonic()
+        gateway = record.server_address if record.is_valid else SERVER_ADDRESS_NOT_FOUND
+        checks_gateway = gateway not in WILDCARD_GATEWAYS and gateway != SERVER_ADDRESS_NOT_FOUND
+
+        # Gateways curinga ou ausentes não têm verificações de rede (nem cache)
+        network_checks = self._cached(gateway) if checks_gateway else []
+        cached = checks_gateway and network_checks is not None
+        futures = {}
+        if network_checks is None:
+            futures["Rede"] = self._executor.submit(
+                check_gateway, gateway, self.timeout, self.resolver
+            )
+        futures["Credenciais"] = self._executor.submit(check_credentials, record)
+        done, _ = wait(futures.values(), timeout=self.timeout)
+
+        checks: List[PreflightCheck] = []
+        for key, future in futures.items():
+            if future not in done:
+                checks.append(PreflightCheck(key, None, "tempo esgotado"))
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                checks.append(PreflightCheck(key, None, f"erro inesperado: {str(e)}"))
+                continue
+            if key == "Rede":
+                network_checks = result
+                self._store(gateway, result)
+            else:
+                checks.extend(result)
+        checks[:0] = network_checks or []
+        return PreflightReport(record.name, gateway, checks, time.monotonic() - started, cached)
+
+    def invalidate(self, gateway: Optional[str] = None) -> None:
+        """
+        Descarta o resultado em cache de um gateway (ou de todos).
+        """
+        with self._lock:
+            if gateway is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(gateway, None)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def _cached(self, gateway: str) -> Optional[List[PreflightCheck]]:
+        with self._lock:
+            entry = self._cache.get(gateway)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def _store(self, gateway: str, checks: List[PreflightCheck]) -> None:
+        # Falhas não são guardadas: após corrigir a rede, a próxima tentativa verifica de novo
+        if any(check.passed is False for check in checks):
+            return
+        with self._lock:
+            self._cache[gateway] = (time.monotonic() + self.cache_ttl, checks)
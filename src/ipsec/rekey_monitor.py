@@ -0,0 +1,516 @@
+"""
+Módulo RekeyMonitor
+
+Acompanha os rekeys e reautenticações de cada conexão estabelecida, que o estado
+CONNECTED sozinho esconde: os prazos de cada SA vêm do 'ipsec statusall' ("rekeying in
+40 minutes", "reauthentication in 2 hours"), e o início e o fim de cada rekey vêm do log
+do charon (CREATE_CHILD_SA com REKEY_SA, "IKE_SA ... rekeyed", "reauthenticating") ou,
+sem o log, da passagem pelo estado REKEYING nas consultas de status.
+
+Pouco antes do prazo previsto, e durante cada rekey, um host do rightsubnet é sondado
+com ecos ICMP em intervalos curtos. A perda e a maior interrupção dessas sondas são
+associadas ao rekey: um congelamento de alguns segundos a cada hora aparece como um
+rekey (ou reautenticação) com sondas perdidas, e não como um túnel instável.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from ..config.app_config import (
+    REKEY_EVENT_TIMEOUT_S,
+    REKEY_HISTORY_SIZE,
+    REKEY_PROBE_INTERVAL_S,
+    REKEY_PROBE_LEAD_S,
+    REKEY_PROBE_TAIL_S,
+    REKEY_SLOW_S,
+    REKEY_TIMER_NEAR_S,
+)
+from .connection_state import ConnectionState, StateTransition
+
+KIND_CHILD_REKEY = "child_rekey"
+KIND_IKE_REKEY = "ike_rekey"
+KIND_REAUTH = "reauth"
+# Rekey visto apenas pelo estado REKEYING (sem o log do charon não se sabe de qual SA)
+KIND_REKEY = "rekey"
+KIND_LABELS = {
+    KIND_CHILD_REKEY: "rekey da CHILD_SA",
+    KIND_IKE_REKEY: "rekey da IKE_SA",
+    KIND_REAUTH: "reautenticação",
+    KIND_REKEY: "rekey",
+}
+
+# Prazos no 'ipsec statusall', nas linhas das SAs: "nome[1]: IKEv2 SPIs: ..., rekeying in 3 hours,
+# pubkey reauthentication in 7 hours" (IKE) e "nome{1}:  AES_GCM_16_256, ... bytes_o, rekeying in
+# 45 minutes" (CHILD); uma linha da IKE SA pode trazer os dois prazos
+SA_LINE_PATTERN = re.compile(r"^\s*([^\s\[{]+)([\[{])\d+[\]}]:(.*)$", re.MULTILINE)
+SA_TIMER_PATTERN = re.compile(r"(rekeying|reauthentication) in (\d+) (second|minute|hour|day)s?")
+TIMER_UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Linhas do charon que marcam início e fim dos rekeys
+CREATE_CHILD_SA = re.compile(r"(?:generating|parsed) CREATE_CHILD_SA request \d+ \[([^\]]*)\]")
+QUICK_MODE = re.compile(r"(?:generating|parsed) QUICK_MODE request \d+")
+REAUTH_START = re.compile(r"reauthenticating IKE_SA")
+IKE_REKEYED = re.compile(r"IKE_SA \S+ rekeyed between")
+CHILD_ESTABLISHED = re.compile(r"CHILD_SA \S+ established with SPIs")
+REKEY_FAILED = re.compile(
+    r"failed to establish CHILD_SA|establishing CHILD_SA \S+ failed|giving up after \d+ retransmits"
+    r"|received (?:NO_PROPOSAL_CHOSEN|TS_UNACCEPTABLE|AUTHENTICATION_FAILED) notify"
+)
+# Carimbo do filelog do charon com milissegundos (time_add_ms = yes): "Oct 19 13:00:00.123"
+LOG_TIMESTAMP = re.compile(r"^(\w{3}\s+\d{1,2} \d\d:\d\d:\d\d)\.(\d{3})\b")
+
+
+def parse_sa_timers(status_output: str) -> Dict[str, Dict[str, int]]:
+    """
+    Prazos (em segundos) de cada conexão no 'ipsec statusall': o menor por tipo de SA.
+    """
+    timers: Dict[str, Dict[str, int]] = {}
+    for line in SA_LINE_PATTERN.finditer(status_output):
+        name, bracket, rest = line.groups()
+        for match in SA_TIMER_PATTERN.finditer(rest):
+            action, amount, unit = match.groups()
+            if action == "reauthentication":
+                kind = KIND_REAUTH
+            else:
+                kind = KIND_IKE_REKEY if bracket == "[" else KIND_CHILD_REKEY
+            seconds = int(amount) * TIMER_UNITS[unit]
+            conn_timers = timers.setdefault(name, {})
+            conn_timers[kind] = min(seconds, conn_timers.get(kind, seconds))
+    return timers
+
+
+def line_timestamp(line: str, fallback: float) -> float:
+    """
+    Momento de uma linha do charon: o carimbo com milissegundos, se houver, ou 'fallback'.
+
+    Sem milissegundos (journald, filelog padrão) vale o momento da leitura, agrupada pelo
+    acompanhamento do log: durações abaixo de ~0,3 s não são distinguíveis.
+    """
+    match = LOG_TIMESTAMP.match(line)
+    if not match:
+        return fallback
+    try:
+        moment = datetime.strptime(f"{datetime.now().year} {match.group(1)}", "%Y %b %d %H:%M:%S")
+    except ValueError:
+        return fallback
+    return moment.timestamp() + int(match.group(2)) / 1000
+
+
+class RekeyEvent:
+    """
+    Um rekey ou reautenticação de uma conexão, com a perda das sondas durante ele.
+    """
+
+    __slots__ = (
+        "conn_name",
+        "kind",
+        "start",
+        "end",
+        "ok",
+        "source",
+        "probes_sent",
+        "probes_lost",
+        "stall",
+    )
+
+    def __init__(self, conn_name: str, kind: str, start: float, source: str = "log"):
+        self.conn_name = conn_name
+        self.kind = kind
+        self.start = start
+        self.end: Optional[float] = None
+        self.ok: Optional[bool] = None
+        # "log" (linhas do charon) ou "status" (estado REKEYING)
+        self.source = source
+        # Sondas enviadas/perdidas no intervalo do rekey; None sem sondagem
+        self.probes_sent: Optional[int] = None
+        self.probes_lost: Optional[int] = None
+        # Maior sequência de sondas perdidas, em segundos
+        self.stall = 0.0
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else max(0.0, self.end - self.start)
+
+    @property
+    def disrupted(self) -> bool:
+        return bool(self.probes_lost)
+
+    @property
+    def slow(self) -> bool:
+        return (self.duration or 0.0) >= REKEY_SLOW_S
+
+    def summary(self) -> str:
+        label = KIND_LABELS.get(self.kind, self.kind)
+        if self.ok is False:
+            text = f"{self.conn_name}: {label} falhou"
+        elif self.duration is None:
+            text = f"{self.conn_name}: {label} sem conclusão observada"
+        else:
+            text = f"{self.conn_name}: {label} em {self.duration:.2f} s"
+        if self.probes_sent:
+            if self.probes_lost:
+                text += f", {self.probes_lost}/{self.probes_sent} sondas perdidas (interrupção de {self.stall:.1f} s)"
+            else:
+                text += f", sem perda ({self.probes_sent} sondas)"
+        hint = self.tuning_hint()
+        if hint:
+            text += f". {hint}"
+        return text
+
+    def tuning_hint(self) -> str:
+        """
+        Sugestão de ajuste quando o rekey interrompeu o tráfego.
+        """
+        if not (self.disrupted or self.slow or self.ok is False):
+            return ""
+        if self.kind == KIND_REAUTH:
+            return (
+                "A reautenticação recria as SAs: reauth=no (IKEv2) ou charon.make_before_break=yes "
+                "evitam a interrupção"
+            )
+        if self.kind == KIND_CHILD_REKEY:
+            return (
+                "Verifique se o rekeymargin faz o cliente renovar antes do lifetime do gateway "
+                "e o custo do grupo DH (PFS) da proposta ESP"
+            )
+        if self.kind == KIND_IKE_REKEY:
+            return "Verifique o ikelifetime/rekeymargin e o custo do grupo DH da proposta IKE"
+        return ""
+
+
+class TunnelProber:
+    """
+    Sonda um host pelo túnel com ecos ICMP em intervalos fixos, em uma thread própria.
+    """
+
+    def __init__(self, address: str, interval: float = REKEY_PROBE_INTERVAL_S):
+        self.address = address
+        self.interval = interval
+        # (momento do envio, respondida)
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=int(600 / interval))
+        self.error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"rekey-probe-{address}", daemon=True)
+
+    @property
+    def responsive(self) -> bool:
+        """
+        O host respondeu a alguma sonda (sem isso, a perda não diz nada sobre o túnel).
+        """
+        return any(ok for _sent, ok in list(self.samples))
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def loss_between(self, start: float, end: float) -> Tuple[int, int, float]:
+        """
+        Sondas enviadas e perdidas em [start, end] e a maior sequência de perdas (segundos).
+        """
+        sent = lost = run = longest = 0
+        for sent_at, ok in list(self.samples):
+            if not start <= sent_at <= end:
+                continue
+            sent += 1
+            if ok:
+                run = 0
+            else:
+                lost += 1
+                run += 1
+                longest = max(longest, run)
+        return sent, lost, longest * self.interval
+
+    def _run(self) -> None:
+        from .path_mtu import IcmpProber
+
+        try:
+            prober = IcmpProber(self.address, timeout=self.interval)
+        except OSError as e:
+            self.error = e.strerror or str(e)
+            return
+        with prober:
+            while not self._stop.is_set():
+                sent_at = time.time()
+                try:
+                    status, _mtu = prober.probe(64)
+                except OSError:
+                    status = "lost"
+                self.samples.append((sent_at, status == "ok"))
+                self._stop.wait(max(0.0, self.interval - (time.time() - sent_at)))
+
+
+class RekeyMonitor:
+    """
+    Prazos, rekeys em andamento e histórico por conexão, com a sondagem durante os rekeys.
+
+    As linhas do log e as transições chegam pela thread da UI; a sondagem e o fechamento
+    dos eventos ocorrem em uma thread própria, que dorme até o próximo prazo previsto.
+    Os ouvintes recebem cada RekeyEvent concluído nessa thread.
+    """
+
+    def __init__(self, probe_target: Callable[[str], Optional[str]]):
+        # Host do rightsubnet sondado para uma conexão (None sem um host conhecido)
+        self.probe_target = probe_target
+        # Prazos absolutos previstos por conexão: tipo -> momento
+        self.timers: Dict[str, Dict[str, float]] = {}
+        self.timers_observed: Dict[str, float] = {}
+        self.active: Dict[str, RekeyEvent] = {}
+        # Concluídos aguardando as sondas do final do intervalo
+        self._closing: List[RekeyEvent] = []
+        self.history: Deque[RekeyEvent] = deque(maxlen=REKEY_HISTORY_SIZE)
+        self.probers: Dict[str, TunnelProber] = {}
+        self.probe_errors: Dict[str, str] = {}
+        self._listeners: List[Callable[[RekeyEvent], None]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="rekey-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        for prober in self.probers.values():
+            prober.stop()
+        self.probers.clear()
+
+    def add_listener(self, listener: Callable[[RekeyEvent], None]) -> None:
+        self._listeners.append(listener)
+
+    # --- Entradas ---
+
+    def timers_due(self, conn_names: List[str], now: Optional[float] = None) -> bool:
+        """
+        Se os prazos devem ser lidos de novo ('ipsec statusall'): ainda desconhecidos ou um
+        rekey previsto em breve (abaixo de 2 minutos o statusall mostra segundos).
+        """
+        now = now if now is not None else time.time()
+        for name in conn_names:
+            observed = self.timers_observed.get(name)
+            if observed is None:
+                return True
+            due = min(self.timers.get(name, {}).values(), default=None)
+            if due is not None and due - now <= REKEY_TIMER_NEAR_S and now - observed >= REKEY_PROBE_LEAD_S / 2:
+                return True
+        return False
+
+    def update_timers(self, timers: Dict[str, Dict[str, int]], observed_at: float, conn_names: List[str]) -> None:
+        """
+        Aplica os prazos lidos do 'ipsec statusall' às conexões estabelecidas.
+        """
+        with self._lock:
+            for name in conn_names:
+                self.timers[name] = {kind: observed_at + seconds for kind, seconds in timers.get(name, {}).items()}
+                self.timers_observed[name] = observed_at
+        self._wakeup.set()
+
+    def feed_log_lines(self, conn_name: str, lines: List[str], now: Optional[float] = None) -> None:
+        """
+        Linhas do charon referentes à conexão: detectam o início e o fim dos rekeys.
+        """
+        now = now if now is not None else time.time()
+        changed = False
+        with self._lock:
+            for line in lines:
+                timestamp = line_timestamp(line, now)
+                event = self.active.get(conn_name)
+                match = CREATE_CHILD_SA.search(line)
+                if match and event is None:
+                    payloads = match.group(1)
+                    if "N(REKEY_SA)" in payloads:
+                        self._begin(conn_name, KIND_CHILD_REKEY, timestamp)
+                    elif "TSi" not in payloads:
+                        self._begin(conn_name, KIND_IKE_REKEY, timestamp)
+                    changed = True
+                elif QUICK_MODE.search(line) and event is None and conn_name in self.timers_observed:
+                    # IKEv1: um Quick Mode com o túnel já estabelecido é um rekey da CHILD_SA
+                    self._begin(conn_name, KIND_CHILD_REKEY, timestamp)
+                    changed = True
+                elif REAUTH_START.search(line):
+                    if event is None or event.kind != KIND_REAUTH:
+                        if event is not None:
+                            self._close(event, timestamp, True)
+                        self._begin(conn_name, KIND_REAUTH, timestamp)
+                        changed = True
+                elif event is None:
+                    continue
+                elif IKE_REKEYED.search(line) and event.kind == KIND_IKE_REKEY:
+                    self._close(event, timestamp, True)
+                    changed = True
+                elif CHILD_ESTABLISHED.search(line) and event.kind in (KIND_CHILD_REKEY, KIND_REAUTH, KIND_REKEY):
+                    self._close(event, timestamp, True)
+                    changed = True
+                elif REKEY_FAILED.search(line):
+                    self._close(event, timestamp, False)
+                    changed = True
+        if changed:
+            self._wakeup.set()
+
+    def record_transition(self, transition: StateTransition) -> None:
+        """
+        Passagens pelo estado REKEYING; usadas quando o log não registrou o rekey.
+        """
+        conn_name = transition.conn_name
+        with self._lock:
+            event = self.active.get(conn_name)
+            if transition.state == ConnectionState.REKEYING:
+                if event is None:
+                    self._begin(conn_name, KIND_REKEY, transition.timestamp, source="status")
+            elif event is not None:
+                if transition.state.is_connected:
+                    if event.source == "status":
+                        self._close(event, transition.timestamp, True)
+                else:
+                    # O túnel caiu durante o rekey
+                    self._close(event, transition.timestamp, False)
+            if not transition.state.is_connected:
+                self.timers.pop(conn_name, None)
+                self.timers_observed.pop(conn_name, None)
+        self._wakeup.set()
+
+    # --- Consultas ---
+
+    def next_rekey(self, conn_name: str, now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """
+        Próximo rekey previsto da conexão: (tipo, segundos até ele).
+        """
+        now = now if now is not None else time.time()
+        timers = self.timers.get(conn_name)
+        if not timers:
+            return None
+        kind, due = min(timers.items(), key=lambda item: item[1])
+        return kind, max(0.0, due - now)
+
+    def recent(self, conn_name: str) -> List[RekeyEvent]:
+        return [event for event in list(self.history) if event.conn_name == conn_name]
+
+    def status_text(self, conn_name: str, now: Optional[float] = None) -> str:
+        """
+        Resumo para a interface: próximo rekey previsto e os últimos observados.
+        """
+        lines = []
+        event = self.active.get(conn_name)
+        if event is not None:
+            lines.append(f"{KIND_LABELS.get(event.kind, event.kind).capitalize()} em andamento")
+        upcoming = self.next_rekey(conn_name, now)
+        if upcoming is not None:
+            kind, seconds = upcoming
+            lines.append(f"Próximo {KIND_LABELS[kind]}: em {_format_wait(seconds)}")
+        recent = self.recent(conn_name)
+        if recent:
+            durations = [event.duration for event in recent if event.duration is not None]
+            disrupted = sum(1 for event in recent if event.disrupted)
+            text = f"Últimos {len(recent)} rekeys"
+            if durations:
+                text += f": máx. {max(durations):.2f} s"
+            text += f", {disrupted} com perda de sondas" if disrupted else ", sem perda de sondas"
+            lines.append(text)
+            lines.append(f"Último: {recent[-1].summary()}")
+        if conn_name in self.probe_errors:
+            lines.append(f"Sondas indisponíveis: {self.probe_errors[conn_name]}")
+        return "\n".join(lines)
+
+    # --- Internos ---
+
+    def _begin(self, conn_name: str, kind: str, start: float, source: str = "log") -> None:
+        # Chamado com _lock
+        self.active[conn_name] = RekeyEvent(conn_name, kind, start, source)
+
+    def _close(self, event: RekeyEvent, end: float, ok: bool) -> None:
+        # Chamado com _lock
+        event.end = max(end, event.start)
+        event.ok = ok
+        if self.active.get(event.conn_name) is event:
+            del self.active[event.conn_name]
+        self._closing.append(event)
+
+    def _wanted_probes(self, now: float) -> Dict[str, bool]:
+        # Chamado com _lock: conexões que devem ser sondadas agora
+        wanted = {name: True for name in self.active}
+        for event in self._closing:
+            wanted[event.conn_name] = True
+        for name, timers in self.timers.items():
+            if any(-REKEY_PROBE_LEAD_S <= due - now <= REKEY_PROBE_LEAD_S for due in timers.values()):
+                wanted[name] = True
+        return wanted
+
+    def _run(self) -> None:
+        while not self._stopping:
+            now = time.time()
+            finished = []
+            with self._lock:
+                # Rekeys sem conclusão dentro do prazo
+                for event in list(self.active.values()):
+                    if now - event.start >= REKEY_EVENT_TIMEOUT_S:
+                        self._close(event, now, False)
+                        event.end = event.ok = None
+                for event in list(self._closing):
+                    if now - (event.end or event.start) >= REKEY_PROBE_TAIL_S:
+                        self._closing.remove(event)
+                        finished.append(event)
+                wanted = self._wanted_probes(now)
+                upcoming = [
+                    due - REKEY_PROBE_LEAD_S for timers in self.timers.values() for due in timers.values()
+                ]
+            for event in finished:
+                self._measure(event)
+                self.history.append(event)
+                for listener in list(self._listeners):
+                    listener(event)
+            self._update_probers(wanted)
+            if wanted or self.active:
+                wait = REKEY_PROBE_INTERVAL_S * 2
+            else:
+                future = [moment - now for moment in upcoming if moment > now]
+                wait = min(future + [60.0])
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def _update_probers(self, wanted: Dict[str, bool]) -> None:
+        for name in list(self.probers):
+            # A sondagem continua até o fim do intervalo do último rekey
+            if name not in wanted:
+                self.probers.pop(name).stop()
+        for name in wanted:
+            prober = self.probers.get(name)
+            if prober is not None:
+                if prober.error:
+                    self.probe_errors[name] = prober.error
+                continue
+            if name in self.probe_errors:
+                continue
+            address = self.probe_target(name)
+            if address is None:
+                continue
+            prober = self.probers[name] = TunnelProber(address)
+            prober.start()
+
+    def _measure(self, event: RekeyEvent) -> None:
+        prober = self.probers.get(event.conn_name)
+        if prober is None or not prober.responsive:
+            return
+        end = event.end if event.end is not None else time.time()
+        # Uma sonda enviada pouco antes do início pode ter sido perdida pelo rekey
+        sent, lost, stall = prober.loss_between(event.start - prober.interval * 2, end + REKEY_PROBE_TAIL_S)
+        if sent:
+            event.probes_sent, event.probes_lost, event.stall = sent, lost, stall
+
+
+def _format_wait(seconds: float) -> str:
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f} h"
+    if seconds >= 120:
+        return f"{int(seconds // 60)} min"
+    return f"{int(seconds)} s"
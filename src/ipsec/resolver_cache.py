@@ -0,0 +1,256 @@
+"""
+Módulo ResolverCache
+
+Cache assíncrono de resolução dos gateways ('right') que respeita o TTL dos registros.
+Os gateways configurados são resolvidos em segundo plano e renovados quando expiram,
+de modo que diagnóstico, sondas e exibição leem o endereço da memória em vez de
+bloquear no resolver do sistema. Mudanças de endereço são informadas aos ouvintes.
+
+Com o dnspython instalado o TTL real é usado; sem ele a resolução usa getaddrinfo
+com um TTL padrão.
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..config.app_config import (
+    RESOLVER_DEFAULT_TTL_S,
+    RESOLVER_MIN_TTL_S,
+    RESOLVER_NEGATIVE_TTL_S,
+    RESOLVER_TIMEOUT_S,
+)
+
+try:
+    import dns.exception
+    import dns.resolver
+except ImportError:  # dnspython é opcional
+    dns = None
+
+# (host, endereços anteriores, endereços novos)
+AddressChangeListener = Callable[[str, Tuple[str, ...], Tuple[str, ...]], None]
+
+
+class ResolvedHost:
+    """
+    Resultado de uma resolução: endereços (vazio em caso de erro) e validade.
+    """
+
+    __slots__ = ("host", "addresses", "ttl", "resolved_at", "expires", "error")
+
+    def __init__(self, host: str, addresses: Tuple[str, ...], ttl: float, error: Optional[str] = None):
+        self.host = host
+        self.addresses = addresses
+        self.ttl = ttl
+        self.resolved_at = time.monotonic()
+        self.expires = self.resolved_at + ttl
+        self.error = error
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.monotonic() < self.expires
+
+    @property
+    def address(self) -> Optional[str]:
+        return self.addresses[0] if self.addresses else None
+
+    def __repr__(self) -> str:
+        if self.error:
+            return f"ResolvedHost({self.host!r}, error={self.error!r})"
+        return f"ResolvedHost({self.host!r}, {self.addresses!r}, ttl={self.ttl:.0f})"
+
+
+def _is_ip_literal(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def _query_dnspython(host: str) -> Tuple[Tuple[str, ...], Optional[float]]:
+    """
+    Consulta A e AAAA; retorna os endereços e o menor TTL entre as respostas.
+    """
+    addresses: List[str] = []
+    ttl: Optional[float] = None
+    for rdtype in ("A", "AAAA"):
+        try:
+            answer = dns.resolver.resolve(host, rdtype, lifetime=RESOLVER_TIMEOUT_S)
+        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+            continue
+        addresses.extend(record.address for record in answer)
+        ttl = answer.rrset.ttl if ttl is None else min(ttl, answer.rrset.ttl)
+    return tuple(addresses), ttl
+
+
+def _query_system(host: str) -> Tuple[str, ...]:
+    infos = socket.getaddrinfo(host, None, type=socket.SOCK_DGRAM)
+    # Mantém a ordem de preferência do sistema, sem repetições
+    return tuple(dict.fromkeys(info[4][0] for info in infos))
+
+
+class ResolverCache:
+    """
+    Cache de endereços dos gateways com renovação em segundo plano.
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = RESOLVER_DEFAULT_TTL_S,
+        negative_ttl: float = RESOLVER_NEGATIVE_TTL_S,
+        min_ttl: float = RESOLVER_MIN_TTL_S,
+    ):
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.min_ttl = min_ttl
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ipsec-resolver")
+        self._entries: Dict[str, ResolvedHost] = {}
+        self._pending: Dict[str, Future] = {}
+        # Gateways mantidos sempre atualizados pela thread de renovação
+        self._watched: Set[str] = set()
+        self._listeners: List[AddressChangeListener] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def lookup(self, host: str) -> Optional[ResolvedHost]:
+        """
+        Retorna o que estiver em cache sem bloquear, mesmo vencido; agenda a renovação se preciso.
+        """
+        with self._lock:
+            entry = self._entries.get(host)
+        if entry is None or not entry.is_fresh:
+            self._refresh(host)
+        return entry
+
+    def resolve(self, host: str, timeout: float = RESOLVER_TIMEOUT_S) -> Optional[ResolvedHost]:
+        """
+        Retorna uma entrada válida, aguardando a resolução por no máximo 'timeout' segundos.
+
+        Se o prazo acabar, devolve a entrada vencida (se houver) ou None.
+        """
+        with self._lock:
+            entry = self._entries.get(host)
+        if entry is not None and entry.is_fresh:
+            return entry
+        future = self._refresh(host)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return entry
+
+    def watch(self, hosts: Iterable[str]) -> None:
+        """
+        Define os gateways a manter atualizados e dispara a resolução de todos em segundo plano.
+        """
+        hosts = {host for host in hosts if host}
+        with self._lock:
+            self._watched = hosts
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(
+                    target=self._refresh_loop, name="ipsec-resolver-refresh", daemon=True
+                )
+                self._thread.start()
+        for host in hosts:
+            self.lookup(host)
+        self._wakeup.set()
+
+    def add_change_listener(self, listener: AddressChangeListener) -> None:
+        """
+        Registra um ouvinte de mudança de endereço; é chamado fora da thread da UI.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_change_listener(self, listener: AddressChangeListener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wakeup.set()
+        self._executor.shutdown(wait=False)
+
+    def _refresh(self, host: str) -> Future:
+        # Uma única resolução em andamento por host
+        with self._lock:
+            future = self._pending.get(host)
+            if future is not None:
+                return future
+            entry = self._entries.get(host)
+            if self._stopped or (entry is not None and entry.is_fresh):
+                # Parado, ou renovado por outra thread desde a leitura de quem chamou
+                future = Future()
+                future.set_result(entry)
+                return future
+            future = self._executor.submit(self._resolve_now, host)
+            self._pending[host] = future
+        return future
+
+    def _resolve_now(self, host: str) -> ResolvedHost:
+        try:
+            entry = self._query(host)
+        except Exception as e:
+            entry = ResolvedHost(host, (), self.negative_ttl, error=str(e))
+
+        with self._lock:
+            previous = self._entries.get(host)
+            if entry.error and previous is not None and previous.addresses:
+                # Falha temporária do DNS: manter o último endereço conhecido até a próxima tentativa
+                entry = ResolvedHost(host, previous.addresses, self.negative_ttl, error=entry.error)
+            self._entries[host] = entry
+            self._pending.pop(host, None)
+
+        if (
+            previous is not None
+            and previous.addresses
+            and entry.addresses
+            and set(previous.addresses) != set(entry.addresses)
+        ):
+            for listener in list(self._listeners):
+                try:
+                    listener(host, previous.addresses, entry.addresses)
+                except Exception as e:
+                    print(f"Error in resolver listener: {e}")
+        return entry
+
+    def _query(self, host: str) -> ResolvedHost:
+        if _is_ip_literal(host):
+            return ResolvedHost(host, (host,), float("inf"))
+        if dns is not None:
+            try:
+                addresses, ttl = _query_dnspython(host)
+            except dns.exception.DNSException:
+                addresses, ttl = (), None
+            if addresses:
+                return ResolvedHost(host, addresses, max(self.min_ttl, ttl or 0))
+        # Sem dnspython (ou nome só conhecido localmente, ex.: /etc/hosts): resolver do sistema
+        try:
+            addresses = _query_system(host)
+        except socket.gaierror as e:
+            return ResolvedHost(host, (), self.negative_ttl, error=e.strerror)
+        return ResolvedHost(host, addresses, self.default_ttl)
+
+    def _refresh_loop(self) -> None:
+        while not self._stopped:
+            with self._lock:
+                watched = [(host, self._entries.get(host)) for host in self._watched]
+            now = time.monotonic()
+            next_wakeup = now + self.default_ttl
+            for host, entry in watched:
+                if entry is None:
+                    # Ainda em resolução: a entrada aparece quando terminar
+                    continue
+                if entry.expires <= now:
+                    self._refresh(host)
+                    next_wakeup = min(next_wakeup, now + self.min_ttl)
+                else:
+                    next_wakeup = min(next_wakeup, entry.expires)
+            self._wakeup.wait(max(1.0, next_wakeup - time.monotonic()))
+            self._wakeup.clear()
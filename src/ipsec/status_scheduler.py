@@ -0,0 +1,168 @@
+"""
+Módulo StatusScheduler
+
+Agenda as consultas de status do IPsec em um único lugar: consultas rápidas (com
+recuo progressivo) enquanto alguma conexão está em transição, lentas quando o estado
+está estável (ainda mais espaçadas, ou suspensas, sem janela visível), e nunca duas
+consultas idênticas ao mesmo tempo. Os interessados assinam as transições de estado
+em vez de disparar consultas.
+"""
+
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from ..config.app_config import (
+    STATUS_POLL_BACKOFF,
+    STATUS_POLL_FAST_MS,
+    STATUS_POLL_HIDDEN_MS,
+    STATUS_POLL_MAX_FAST_MS,
+    STATUS_POLL_STABLE_MS,
+    STATUS_TRANSITION_TIMEOUT_S,
+)
+
+
+class StatusScheduler(QObject):
+    """
+    Consulta o estado das conexões do IPsecManager em segundo plano e repassa as transições.
+    """
+
+    # StateTransition — emitido apenas em transições reais, vindas de consultas ou de ações
+    state_changed = Signal(object)
+    # Emitido após cada consulta concluída (snapshot e estatísticas atualizados)
+    snapshot_updated = Signal()
+    # Falha de uma consulta, para o log; repetida só quando o erro muda
+    poll_failed = Signal(str)
+    # Resultado da thread de consulta (snapshot ou None, traceback da falha ou ""),
+    # entregue na thread da UI (conexão enfileirada)
+    _poll_finished = Signal(object, str)
+
+    def __init__(self, connection_manager, parent=None):
+        super().__init__(parent)
+        self.connection_manager = connection_manager
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ipsec-status")
+        self._in_flight = False
+        # Consulta pedida durante outra em andamento: refeita assim que esta terminar
+        self._refresh_pending = False
+        # Instante em que a consulta em andamento foi pedida (time.time)
+        self._polled_at = 0.0
+        # Última falha informada; evita repetir no log o mesmo erro a cada consulta
+        self._last_error = ""
+        self._running = False
+        self._fast_interval = STATUS_POLL_FAST_MS
+        self._background = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._poll)
+        self._poll_finished.connect(self._on_poll_finished)
+        self.connection_manager.add_transition_listener(self._on_transition)
+
+    def start(self) -> None:
+        """
+        Inicia o ciclo de consultas com uma consulta imediata.
+        """
+        self._running = True
+        self.request_refresh()
+
+    def stop(self) -> None:
+        self._running = False
+        self._timer.stop()
+        self.connection_manager.remove_transition_listener(self._on_transition)
+        self._executor.shutdown(wait=False)
+
+    def request_refresh(self) -> None:
+        """
+        Pede uma consulta o quanto antes. Com uma consulta em andamento (iniciada antes do
+        pedido, e portanto possivelmente desatualizada), outra é feita logo após ela.
+        """
+        if not self._running:
+            return
+        if self._in_flight:
+            self._refresh_pending = True
+            return
+        self._timer.start(0)
+
+    @property
+    def background(self) -> bool:
+        return self._background
+
+    def set_background(self, background: bool) -> None:
+        """
+        Sem janela visível, as consultas com o estado estável passam a STATUS_POLL_HIDDEN_MS;
+        o novo intervalo vale a partir da próxima consulta. Transições continuam rápidas.
+        """
+        if background == self._background:
+            return
+        self._background = background
+        if not background:
+            # Janela visível de novo: mostrar o estado atual o quanto antes
+            self.request_refresh()
+
+    def _on_transition(self, transition) -> None:
+        # Chamado pelo IPsecManager na thread da UI
+        if transition.state.is_transitional and not transition.previous.is_transitional:
+            # Início de uma transição: consultas rápidas a partir de agora
+            self._fast_interval = STATUS_POLL_FAST_MS
+            if self._running and not self._in_flight:
+                self._timer.start(STATUS_POLL_FAST_MS)
+            elif self._in_flight:
+                # A consulta em andamento começou antes da ação do usuário
+                self._refresh_pending = True
+        self.state_changed.emit(transition)
+
+    def _poll(self) -> None:
+        if not self._running or self._in_flight:
+            return
+        self._in_flight = True
+        self._polled_at = time.time()
+        future = self._executor.submit(self.connection_manager.poll_status_snapshot)
+        future.add_done_callback(self._poll_done)
+
+    def _poll_done(self, future) -> None:
+        # Executado na thread de consulta: apenas repassa o resultado para a thread da UI
+        try:
+            snapshot, error = future.result(), ""
+        except Exception:
+            snapshot, error = None, traceback.format_exc()
+        self._poll_finished.emit(snapshot, error)
+
+    def _on_poll_finished(self, snapshot, error: str) -> None:
+        self._in_flight = False
+        if error:
+            # Uma consulta quebrada de vez não pode ficar escondida pelo recuo do agendamento
+            summary = error.strip().splitlines()[-1]
+            if summary != self._last_error:
+                self._last_error = summary
+                print(f"Error polling IPsec status:\n{error}")
+                self.poll_failed.emit(f"Falha na consulta de status: {summary}")
+        else:
+            self._last_error = ""
+        if snapshot is not None:
+            # As transições resultantes chegam por _on_transition
+            self.connection_manager.apply_status_snapshot(snapshot, self._polled_at)
+            self.connection_manager.expire_stale_transitions(STATUS_TRANSITION_TIMEOUT_S)
+            if self._running:
+                # IKE SAs mantidas pelo modo rápido: o prazo é avaliado aqui, na thread da UI,
+                # e o 'ipsec down' vai para a thread de consulta, em série com as consultas
+                for conn_name in self.connection_manager.expire_warm_ike_sas():
+                    self._executor.submit(self.connection_manager.end_warm_ike_sa, conn_name)
+            self.snapshot_updated.emit()
+        if self._running and self._refresh_pending:
+            self._refresh_pending = False
+            self._timer.start(0)
+        elif self._running:
+            interval = self._next_interval()
+            # Intervalo 0: consultas suspensas até uma transição ou um request_refresh()
+            if interval > 0:
+                self._timer.start(interval)
+
+    def _next_interval(self) -> int:
+        if not self.connection_manager.has_transitional_states():
+            self._fast_interval = STATUS_POLL_FAST_MS
+            return STATUS_POLL_HIDDEN_MS if self._background else STATUS_POLL_STABLE_MS
+        interval = self._fast_interval
+        self._fast_interval = min(int(self._fast_interval * STATUS_POLL_BACKOFF), STATUS_POLL_MAX_FAST_MS)
+        return interval
@@ -0,0 +1,442 @@
+"""
+Módulo Throughput
+
+Teste de vazão pelo túnel, no estilo do iperf, contra um servidor pequeno executado em
+um host dentro do rightsubnet da conexão (ou em 127.0.0.1, para testar o próprio teste):
+
+    python -m src.ipsec.throughput server [--bind 0.0.0.0] [--port 5299]
+    python -m src.ipsec.throughput client HOST [--port 5299] [--streams 4] [--time 10]
+    python -m src.ipsec.throughput client HOST --udp [--bitrate 50M] [--length 1200]
+
+TCP: cada stream envia dados pelo tempo definido e o servidor informa quantos bytes
+recebeu e em quanto tempo (goodput do lado de quem recebe); as retransmissões vêm do
+TCP_INFO dos sockets do cliente. UDP: datagramas numerados a uma taxa fixa; o servidor
+calcula perda, fora de ordem e jitter (RFC 3550) e os devolve pelo canal de controle TCP.
+
+Usa apenas a biblioteca padrão, para que o servidor rode em qualquer host com Python 3.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from ..config.app_config import (
+    SPEED_TEST_DURATION_S,
+    SPEED_TEST_PORT,
+    SPEED_TEST_STREAMS,
+    SPEED_TEST_UDP_BITRATE,
+    SPEED_TEST_UDP_LENGTH,
+)
+
+MODE_TCP = "tcp"
+MODE_UDP = "udp"
+# Pedido do resultado de um teste UDP pelo canal de controle
+MODE_UDP_RESULT = "udp-result"
+
+SEND_BUFFER = 128 * 1024
+# Cabeçalho dos datagramas UDP: identificador do teste, sequência, instante de envio (ns)
+UDP_HEADER = struct.Struct("!8sIQ")
+# Testes UDP mantidos pelo servidor até o cliente pedir o resultado
+MAX_UDP_TESTS = 64
+# struct tcp_info (linux/tcp.h): 8 campos u8 seguidos de u32; tcpi_rtt é o 16º e tcpi_total_retrans o 24º
+TCP_INFO = struct.Struct("=8B24I")
+TCP_INFO_RTT = 8 + 15
+TCP_INFO_TOTAL_RETRANS = 8 + 23
+
+
+def parse_bitrate(text: str) -> int:
+    """
+    Converte '50M', '1G' ou '800k' em bits por segundo.
+    """
+    text = text.strip().upper()
+    multiplier = {"K": 10 ** 3, "M": 10 ** 6, "G": 10 ** 9}.get(text[-1:], 1)
+    number = text[:-1] if text[-1:] in "KMG" else text
+    return int(float(number) * multiplier)
+
+
+def parse_target(text: str, default_port: int = SPEED_TEST_PORT):
+    """
+    'host', 'host:porta' ou '[ipv6]:porta' -> (host, porta).
+    """
+    text = text.strip()
+    if text.startswith("["):
+        host, _, rest = text[1:].partition("]")
+        return host, int(rest[1:]) if rest.startswith(":") else default_port
+    if text.count(":") == 1:
+        host, port = text.split(":")
+        return host, int(port)
+    return text, default_port
+
+
+class SpeedTestResult:
+    """
+    Resultado de um teste de vazão.
+    """
+
+    __slots__ = (
+        "mode", "target", "streams", "duration", "bytes", "goodput_bps", "retransmits",
+        "rtt_ms", "jitter_ms", "lost", "sent", "out_of_order", "timestamp", "conn_name", "cipher",
+    )
+
+    def __init__(self, mode: str, target: str, streams: int = 1):
+        self.mode = mode
+        self.target = target
+        self.streams = streams
+        self.duration = 0.0
+        self.bytes = 0
+        self.goodput_bps = 0.0
+        # TCP
+        self.retransmits: Optional[int] = None
+        self.rtt_ms: Optional[float] = None
+        # UDP
+        self.jitter_ms: Optional[float] = None
+        self.lost: Optional[int] = None
+        self.sent: Optional[int] = None
+        self.out_of_order: Optional[int] = None
+        self.timestamp = time.time()
+        # Preenchidos por quem executa o teste pelo túnel
+        self.conn_name = ""
+        self.cipher = ""
+
+    @property
+    def loss_ratio(self) -> Optional[float]:
+        if not self.sent or self.lost is None:
+            return None
+        return self.lost / self.sent
+
+    def summary(self) -> str:
+        text = f"{self.mode.upper()} {self.target}: {self.goodput_bps / 1e6:.1f} Mbit/s"
+        if self.mode == MODE_TCP:
+            text += f" ({self.streams} streams"
+            if self.retransmits is not None:
+                text += f", {self.retransmits} retransmissões"
+            if self.rtt_ms is not None:
+                text += f", RTT {self.rtt_ms:.1f} ms"
+            text += ")"
+        else:
+            text += f" (perda {self.loss_ratio * 100 if self.loss_ratio is not None else 0:.2f}%"
+            if self.jitter_ms is not None:
+                text += f", jitter {self.jitter_ms:.2f} ms"
+            text += ")"
+        if self.cipher:
+            text += f" [{self.cipher}]"
+        return text
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _read_line(sock: socket.socket, limit: int = 4096) -> bytes:
+    data = b""
+    while not data.endswith(b"\n") and len(data) < limit:
+        chunk = sock.recv(1)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def _send_json(sock: socket.socket, payload: dict) -> None:
+    sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+
+
+def _tcp_info(sock: socket.socket):
+    """
+    (retransmissões, RTT em ms) do socket; (None, None) fora do Linux.
+    """
+    try:
+        data = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, TCP_INFO.size)
+        values = TCP_INFO.unpack(data[:TCP_INFO.size])
+    except (AttributeError, OSError, struct.error):
+        return None, None
+    return values[TCP_INFO_TOTAL_RETRANS], values[TCP_INFO_RTT] / 1000
+
+
+# --- Servidor ---
+
+
+class _UdpTest:
+    __slots__ = ("received", "bytes", "max_seq", "out_of_order", "jitter", "last_transit", "first", "last")
+
+    def __init__(self):
+        self.received = 0
+        self.bytes = 0
+        self.max_seq = -1
+        self.out_of_order = 0
+        self.jitter = 0.0
+        self.last_transit: Optional[int] = None
+        self.first = time.monotonic()
+        self.last = self.first
+
+    def add(self, seq: int, sent_ns: int, size: int) -> None:
+        now = time.monotonic()
+        self.received += 1
+        self.bytes += size
+        self.last = now
+        if seq < self.max_seq:
+            self.out_of_order += 1
+        self.max_seq = max(self.max_seq, seq)
+        # Jitter da RFC 3550: a diferença entre relógios se cancela entre pacotes consecutivos
+        transit = time.time_ns() - sent_ns
+        if self.last_transit is not None:
+            self.jitter += (abs(transit - self.last_transit) - self.jitter) / 16
+        self.last_transit = transit
+
+    def to_dict(self) -> dict:
+        return {
+            "received": self.received,
+            "bytes": self.bytes,
+            "max_seq": self.max_seq,
+            "out_of_order": self.out_of_order,
+            "jitter_ms": self.jitter / 1e6,
+            "elapsed": self.last - self.first,
+        }
+
+
+class SpeedTestServer:
+    """
+    Recebe os testes TCP (sink) e UDP na mesma porta.
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = SPEED_TEST_PORT):
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                server._handle_tcp(self.request)
+
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+
+        class TcpServer(socketserver.ThreadingTCPServer):
+            address_family = family
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._tcp = TcpServer((host, port), Handler)
+        self.port = self._tcp.server_address[1]
+        self._udp = socket.socket(family, socket.SOCK_DGRAM)
+        self._udp.bind((host, self.port))
+        self._udp_tests: "OrderedDict[bytes, _UdpTest]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for target, name in ((self._tcp.serve_forever, "speed-tcp"), (self._serve_udp, "speed-udp")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def serve_forever(self) -> None:
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        self._tcp.shutdown()
+        self._tcp.server_close()
+        self._udp.close()
+
+    def _serve_udp(self) -> None:
+        while True:
+            try:
+                data, _address = self._udp.recvfrom(65535)
+            except OSError:
+                return
+            if len(data) < UDP_HEADER.size:
+                continue
+            test_id, seq, sent_ns = UDP_HEADER.unpack_from(data)
+            with self._lock:
+                test = self._udp_tests.get(test_id)
+                if test is None:
+                    test = self._udp_tests[test_id] = _UdpTest()
+                    while len(self._udp_tests) > MAX_UDP_TESTS:
+                        self._udp_tests.popitem(last=False)
+                test.add(seq, sent_ns, len(data))
+
+    def _handle_tcp(self, sock: socket.socket) -> None:
+        try:
+            request = json.loads(_read_line(sock).decode("utf-8") or "{}")
+        except ValueError:
+            return
+        mode = request.get("mode")
+        if mode == MODE_TCP:
+            received = 0
+            start = None
+            while True:
+                chunk = sock.recv(SEND_BUFFER)
+                if not chunk:
+                    break
+                if start is None:
+                    start = time.monotonic()
+                received += len(chunk)
+            elapsed = time.monotonic() - start if start is not None else 0.0
+            _send_json(sock, {"bytes": received, "elapsed": elapsed})
+        elif mode == MODE_UDP_RESULT:
+            test_id = bytes.fromhex(request.get("test", ""))
+            with self._lock:
+                test = self._udp_tests.pop(test_id, None)
+            _send_json(sock, test.to_dict() if test is not None else {"received": 0})
+
+
+# --- Cliente ---
+
+
+def _tcp_stream(host: str, port: int, duration: float, results: list, index: int) -> None:
+    try:
+        sock = socket.create_connection((host, port), timeout=10)
+        try:
+            _send_json(sock, {"mode": MODE_TCP})
+            buffer = b"\x00" * SEND_BUFFER
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                sock.sendall(buffer)
+            retransmits, rtt_ms = _tcp_info(sock)
+            sock.shutdown(socket.SHUT_WR)
+            reply = json.loads(_read_line(sock).decode("utf-8"))
+            results[index] = (reply["bytes"], reply["elapsed"], retransmits, rtt_ms)
+        finally:
+            sock.close()
+    except (OSError, ValueError, KeyError) as e:
+        results[index] = e
+
+
+def run_tcp_test(
+    host: str, port: int = SPEED_TEST_PORT, streams: int = SPEED_TEST_STREAMS, duration: float = SPEED_TEST_DURATION_S
+) -> SpeedTestResult:
+    """
+    Envia em 'streams' conexões TCP paralelas; levanta OSError se o servidor não responder.
+    """
+    results: list = [None] * streams
+    threads = [
+        threading.Thread(target=_tcp_stream, args=(host, port, duration, results, index), daemon=True)
+        for index in range(streams)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(duration + 30)
+    failures = [result for result in results if not isinstance(result, tuple)]
+    if failures:
+        error = failures[0]
+        raise error if isinstance(error, OSError) else OSError(f"Teste TCP sem resposta do servidor: {error}")
+
+    result = SpeedTestResult(MODE_TCP, f"{host}:{port}", streams)
+    result.bytes = sum(received for received, _elapsed, _retransmits, _rtt in results)
+    result.duration = max(elapsed for _received, elapsed, _retransmits, _rtt in results)
+    result.goodput_bps = sum(received * 8 / elapsed for received, elapsed, _r, _t in results if elapsed > 0)
+    retransmits = [value for _b, _e, value, _t in results if value is not None]
+    result.retransmits = sum(retransmits) if retransmits else None
+    rtts = [value for _b, _e, _r, value in results if value is not None]
+    result.rtt_ms = sum(rtts) / len(rtts) if rtts else None
+    return result
+
+
+def run_udp_test(
+    host: str,
+    port: int = SPEED_TEST_PORT,
+    bitrate: int = SPEED_TEST_UDP_BITRATE,
+    duration: float = SPEED_TEST_DURATION_S,
+    length: int = SPEED_TEST_UDP_LENGTH,
+) -> SpeedTestResult:
+    """
+    Envia datagramas de 'length' bytes a 'bitrate' bit/s e busca perda e jitter no servidor.
+    """
+    length = max(length, UDP_HEADER.size)
+    test_id = os.urandom(8)
+    padding = b"\x00" * (length - UDP_HEADER.size)
+    interval = length * 8 / bitrate
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    sent = 0
+    try:
+        sock.connect((host, port))
+        start = time.monotonic()
+        deadline = start + duration
+        next_send = start
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if now < next_send:
+                time.sleep(min(next_send - now, 0.005))
+                continue
+            # Envia o que estiver atrasado de uma vez (o sleep tem resolução de ~1 ms)
+            while next_send <= now:
+                try:
+                    sock.send(UDP_HEADER.pack(test_id, sent, time.time_ns()) + padding)
+                except (BlockingIOError, ConnectionRefusedError):
+                    pass
+                sent += 1
+                next_send += interval
+    finally:
+        sock.close()
+
+    # Espera os últimos datagramas em trânsito antes de pedir o resultado
+    time.sleep(0.25)
+    control = socket.create_connection((host, port), timeout=10)
+    try:
+        _send_json(control, {"mode": MODE_UDP_RESULT, "test": test_id.hex()})
+        reply = json.loads(_read_line(control).decode("utf-8"))
+    finally:
+        control.close()
+
+    result = SpeedTestResult(MODE_UDP, f"{host}:{port}")
+    result.sent = sent
+    result.bytes = reply.get("bytes", 0)
+    result.duration = reply.get("elapsed", 0.0)
+    received = reply.get("received", 0)
+    result.lost = max(0, sent - received)
+    result.out_of_order = reply.get("out_of_order", 0)
+    result.jitter_ms = reply.get("jitter_ms")
+    result.goodput_bps = result.bytes * 8 / duration if duration > 0 else 0.0
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de vazão pelo túnel IPsec (cliente e servidor).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    server_parser = commands.add_parser("server", help="recebe os testes (executar em um host do rightsubnet)")
+    server_parser.add_argument("--bind", default="0.0.0.0")
+    server_parser.add_argument("--port", type=int, default=SPEED_TEST_PORT)
+    client_parser = commands.add_parser("client", help="executa um teste contra um servidor")
+    client_parser.add_argument("host")
+    client_parser.add_argument("--port", type=int, default=SPEED_TEST_PORT)
+    client_parser.add_argument("--time", type=float, default=SPEED_TEST_DURATION_S)
+    client_parser.add_argument("--streams", type=int, default=SPEED_TEST_STREAMS)
+    client_parser.add_argument("--udp", action="store_true")
+    client_parser.add_argument("--bitrate", default=str(SPEED_TEST_UDP_BITRATE))
+    client_parser.add_argument("--length", type=int, default=SPEED_TEST_UDP_LENGTH)
+    args = parser.parse_args(argv)
+
+    if args.command == "server":
+        server = SpeedTestServer(args.bind, args.port)
+        print(f"Servidor de teste de vazão em {args.bind}:{server.port} (TCP e UDP)")
+        server.serve_forever()
+        return 0
+    try:
+        if args.udp:
+            result = run_udp_test(args.host, args.port, parse_bitrate(args.bitrate), args.time, args.length)
+        else:
+            result = run_tcp_test(args.host, args.port, args.streams, args.time)
+    except OSError as e:
+        print(f"Falha no teste: {e}", file=sys.stderr)
+        return 1
+    print(result.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
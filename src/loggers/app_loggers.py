@@ -7,8 +7,11 @@ de arquivos de log da aplicação VPN IPsec.
 
 import os
 from datetime import datetime
+from typing import Optional
 
 from ..config.app_config import LOG_FILE_PATH
+from .event_store import EventStore
+from .session_index import SessionIndex
 
 
 class AppLoggers:
@@ -22,6 +25,10 @@ class AppLoggers:
         log_dir = os.path.dirname(LOG_FILE_PATH)
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir, mode=0o755, exist_ok=True)
+        # Sessões delimitadas no próprio log, com índice de deslocamentos para o histórico
+        self.session_index = SessionIndex()
+        # Histórico dos túneis (SQLite) para disponibilidade, quedas e MTBF
+        self.event_store = EventStore()
 
     def set_connection_status(self, is_connected: bool):
         """
@@ -29,34 +36,35 @@ class AppLoggers:
         """
         self.is_connected = is_connected
 
+    def track_connection_state(self, connection_name: str, state) -> Optional[str]:
+        """
+        Abre ou encerra o registro da sessão conforme o ConnectionState observado.
+        Retorna a mensagem a exibir quando a sessão muda, ou None.
+        """
+        if state.is_connected and not self.is_connected:
+            self.set_connection_status(True)
+            self.create_log_file(connection_name)
+            return f"Connected to {connection_name}. Log file created."
+        if not state.is_connected and not state.is_transitional and self.is_connected:
+            self.set_connection_status(False)
+            self.delete_log_file()
+            return f"Disconnected from {connection_name}."
+        return None
+
     def create_log_file(self, connection_name: str):
         """
         Adiciona registro de início de conexão ao arquivo único de log.
         """
         if not connection_name:
             return
-
-        initial_content = (
-            f"\n" + "=" * 50 + f"\n"
-            f"VPN IPsec Log - Connection: {connection_name}\n"
-            f"Start Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            + "=" * 50 + f"\n"
-        )
-
-        self._write_to_log_file(initial_content)
+        # O SessionIndex escreve o cabeçalho e guarda seu deslocamento para o histórico
+        self._run_session_op(self.session_index.start_session, connection_name)
 
     def delete_log_file(self):
         """
         Adiciona registro de fim de conexão ao arquivo único de log.
         """
-        final_content = (
-            "=" * 50 + f"\n"
-            f"End Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            f"Connection ended.\n"
-            + "=" * 50 + f"\n"
-        )
-
-        self._write_to_log_file(final_content)
+        self._run_session_op(self.session_index.end_session)
 
     def _write_to_log_file(self, content: str) -> bool:
         """
@@ -83,6 +91,17 @@ class AppLoggers:
 
         return self._write_to_log_file(formatted_message + "\n")
 
+    def _run_session_op(self, operation, *args) -> bool:
+        """
+        Executa uma operação do log de sessões sem deixar falhas de escrita chegarem à UI.
+        """
+        try:
+            operation(*args)
+            return True
+        except Exception as e:
+            print(f"Error writing to session log: {e}")
+            return False
+
     def get_log_file_path(self) -> str:
         """
         Retorna o caminho do arquivo de log único.
@@ -0,0 +1,531 @@
+"""
+Módulo EventStore
+
+Histórico persistente dos túneis em SQLite (modo WAL): transições de estado, reconexões
+automáticas, início/fim do cliente, amostras dos contadores das SAs, rekeys (duração e
+perda das sondas durante eles) e testes de vazão.
+Responde, com consultas indexadas e sem varrer os logs de texto, a perguntas como
+"quantas vezes o túnel de produção caiu na última semana?": disponibilidade, quedas e
+MTBF por conexão e período.
+
+As escritas são acumuladas em memória e gravadas em lote por uma thread própria. As
+amostras de contadores antigas são reduzidas a uma por período de 5 minutos e, depois, de
+1 hora (o maior valor do período, já que os contadores são cumulativos); os registros além
+da retenção são removidos.
+"""
+
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from ..config.app_config import (
+    EVENT_STORE_BATCH_SIZE,
+    EVENT_STORE_DOWNSAMPLE,
+    EVENT_STORE_FLUSH_S,
+    EVENT_STORE_PATH,
+    EVENT_STORE_RETENTION_DAYS,
+    EVENT_STORE_SAMPLE_S,
+)
+
+KIND_STATE = "state"
+KIND_RECONNECT = "reconnect"
+# Início/fim do cliente (conn vazio): encerra os intervalos conectados em aberto
+KIND_APP = "app"
+
+# Estados em que o túnel está estabelecido (ConnectionState.is_connected)
+CONNECTED_STATES = ("CONNECTED", "REKEYING")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    conn TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    state TEXT NOT NULL,
+    previous TEXT,
+    detail TEXT,
+    is_drop INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS events_conn_kind_time ON events (conn, kind, time);
+CREATE INDEX IF NOT EXISTS events_drops ON events (conn, time) WHERE is_drop = 1;
+CREATE INDEX IF NOT EXISTS events_time ON events (time);
+CREATE TABLE IF NOT EXISTS speed_tests (
+    time REAL NOT NULL,
+    conn TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    target TEXT NOT NULL,
+    cipher TEXT,
+    goodput_bps REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    streams INTEGER,
+    retransmits INTEGER,
+    rtt_ms REAL,
+    jitter_ms REAL,
+    lost INTEGER,
+    sent INTEGER
+);
+CREATE INDEX IF NOT EXISTS speed_tests_conn_time ON speed_tests (conn, time);
+CREATE TABLE IF NOT EXISTS rekeys (
+    time REAL NOT NULL,
+    conn TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    duration REAL,
+    ok INTEGER,
+    source TEXT NOT NULL,
+    probes_sent INTEGER,
+    probes_lost INTEGER,
+    stall REAL
+);
+CREATE INDEX IF NOT EXISTS rekeys_conn_time ON rekeys (conn, time);
+CREATE TABLE IF NOT EXISTS samples (
+    conn TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    time REAL NOT NULL,
+    bytes_in INTEGER NOT NULL,
+    bytes_out INTEGER NOT NULL,
+    packets_in INTEGER NOT NULL,
+    packets_out INTEGER NOT NULL,
+    PRIMARY KEY (conn, resolution, time)
+) WITHOUT ROWID;
+"""
+
+PERIOD_PATTERN = re.compile(r"^(\d+)\s*([hdw])$")
+PERIOD_UNITS = {"h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_period(text: str) -> int:
+    """
+    Converte '24h', '7d' ou '2w' em segundos; levanta ValueError para outros formatos.
+    """
+    match = PERIOD_PATTERN.match(text.strip().lower())
+    if not match:
+        raise ValueError(f"Período inválido: {text!r} (use, por exemplo, 24h, 7d ou 2w)")
+    return int(match.group(1)) * PERIOD_UNITS[match.group(2)]
+
+
+class Availability:
+    """
+    Disponibilidade de uma conexão em um período.
+    """
+
+    __slots__ = (
+        "conn_name", "start", "end", "observed", "connected", "drops", "failures", "reconnects",
+        "rekeys", "rekey_max", "disrupted_rekeys",
+    )
+
+    def __init__(self, conn_name: str, start: float, end: float):
+        self.conn_name = conn_name
+        self.start = start
+        self.end = end
+        # Tempo desde a primeira observação da conexão no período
+        self.observed = 0.0
+        self.connected = 0.0
+        self.drops = 0
+        self.failures = 0
+        self.reconnects = 0
+        # Rekeys/reautenticações, a maior duração e quantos tiveram perda de sondas
+        self.rekeys = 0
+        self.rekey_max: Optional[float] = None
+        self.disrupted_rekeys = 0
+
+    @property
+    def uptime_ratio(self) -> Optional[float]:
+        if self.observed <= 0:
+            return None
+        return self.connected / self.observed
+
+    @property
+    def mtbf(self) -> Optional[float]:
+        """
+        Tempo médio conectado entre quedas (None sem quedas no período).
+        """
+        if not self.drops:
+            return None
+        return self.connected / self.drops
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours:02d}h"
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+
+
+def format_ratio(ratio: Optional[float]) -> str:
+    return "-" if ratio is None else f"{ratio * 100:.2f}%"
+
+
+class EventStore:
+    """
+    Grava e consulta o histórico dos túneis. Os métodos record_* apenas enfileiram.
+    """
+
+    def __init__(self, path: str = EVENT_STORE_PATH, flush_interval: float = EVENT_STORE_FLUSH_S):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._connection: Optional[sqlite3.Connection] = None
+        # Protege a conexão (escritas da thread de gravação e consultas da UI/CLI)
+        self._db_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending_events: List[tuple] = []
+        self._pending_samples: List[tuple] = []
+        self._pending_speed_tests: List[tuple] = []
+        self._pending_rekeys: List[tuple] = []
+        self._last_sample = {}
+        self._last_maintenance = 0.0
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Escrita ---
+
+    def start(self) -> None:
+        """
+        Inicia a thread de gravação e registra o início do cliente.
+        """
+        self.record_app_event("start")
+        self._thread = threading.Thread(target=self._run, name="event-store", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Registra o fim do cliente e grava o que estiver pendente.
+        """
+        self.record_app_event("stop")
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        with self._db_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def record_transition(self, transition) -> None:
+        is_drop = (
+            transition.previous.is_connected
+            and not transition.state.is_connected
+            and transition.state.value != "DISCONNECTING"
+        )
+        self._enqueue_event((
+            transition.timestamp, transition.conn_name, KIND_STATE, transition.state.value,
+            transition.previous.value, transition.detail or None, int(is_drop),
+        ))
+
+    def record_reconnect(self, conn_name: str, success: bool, detail: str = "") -> None:
+        self._enqueue_event(
+            (time.time(), conn_name, KIND_RECONNECT, "ok" if success else "failed", None, detail or None, 0)
+        )
+
+    def record_app_event(self, state: str) -> None:
+        self._enqueue_event((time.time(), "", KIND_APP, state, None, None, 0))
+
+    def counters_due(self, conn_name: str, now: Optional[float] = None) -> bool:
+        now = now if now is not None else time.time()
+        return now - self._last_sample.get(conn_name, 0.0) >= EVENT_STORE_SAMPLE_S
+
+    def record_counters(self, conn_name: str, bytes_in: int, bytes_out: int, packets_in: int, packets_out: int) -> bool:
+        """
+        Amostra os contadores de uma conexão, no máximo uma vez a cada EVENT_STORE_SAMPLE_S.
+        """
+        now = time.time()
+        if not self.counters_due(conn_name, now):
+            return False
+        self._last_sample[conn_name] = now
+        with self._pending_lock:
+            self._pending_samples.append((conn_name, 0, now, bytes_in, bytes_out, packets_in, packets_out))
+        return True
+
+    def record_speed_test(self, result) -> None:
+        """
+        Registra um SpeedTestResult junto com a suite negociada.
+        """
+        with self._pending_lock:
+            self._pending_speed_tests.append((
+                result.timestamp, result.conn_name, result.mode, result.target, result.cipher or None,
+                result.goodput_bps, result.bytes, result.duration, result.streams, result.retransmits,
+                result.rtt_ms, result.jitter_ms, result.lost, result.sent,
+            ))
+        self._wakeup.set()
+
+    def record_rekey(self, event) -> None:
+        """
+        Registra um RekeyEvent concluído (duração e perda das sondas).
+        """
+        with self._pending_lock:
+            self._pending_rekeys.append((
+                event.start, event.conn_name, event.kind, event.duration,
+                None if event.ok is None else int(event.ok), event.source,
+                event.probes_sent, event.probes_lost, event.stall if event.probes_sent else None,
+            ))
+        self._wakeup.set()
+
+    def flush(self) -> None:
+        """
+        Grava os registros pendentes em uma única transação.
+        """
+        with self._pending_lock:
+            events, self._pending_events = self._pending_events, []
+            samples, self._pending_samples = self._pending_samples, []
+            speed_tests, self._pending_speed_tests = self._pending_speed_tests, []
+            rekeys, self._pending_rekeys = self._pending_rekeys, []
+        if not events and not samples and not speed_tests and not rekeys:
+            return
+        with self._db_lock:
+            connection = self._ensure_open()
+            if connection is None:
+                return
+            try:
+                with connection:
+                    connection.executemany(
+                        "INSERT INTO events (time, conn, kind, state, previous, detail, is_drop) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        events,
+                    )
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO samples "
+                        "(conn, resolution, time, bytes_in, bytes_out, packets_in, packets_out) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        samples,
+                    )
+                    connection.executemany(
+                        "INSERT INTO speed_tests (time, conn, mode, target, cipher, goodput_bps, bytes, "
+                        "duration, streams, retransmits, rtt_ms, jitter_ms, lost, sent) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        speed_tests,
+                    )
+                    connection.executemany(
+                        "INSERT INTO rekeys (time, conn, kind, duration, ok, source, probes_sent, probes_lost, stall) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rekeys,
+                    )
+            except sqlite3.Error as e:
+                print(f"Error writing to event store: {e}")
+
+    def maintain(self, now: Optional[float] = None) -> None:
+        """
+        Reduz as amostras antigas a períodos maiores e remove os eventos além da retenção.
+        """
+        now = now if now is not None else time.time()
+        with self._db_lock:
+            connection = self._ensure_open()
+            if connection is None:
+                return
+            try:
+                with connection:
+                    source = 0
+                    for age, resolution in EVENT_STORE_DOWNSAMPLE:
+                        # Alinhado ao período: cada período é reduzido uma única vez
+                        cutoff = math.floor((now - age) / resolution) * resolution
+                        connection.execute(
+                            "INSERT OR REPLACE INTO samples "
+                            "SELECT conn, ?, CAST(time / ? AS INTEGER) * ?, MAX(bytes_in), MAX(bytes_out), "
+                            "MAX(packets_in), MAX(packets_out) FROM samples "
+                            "WHERE resolution = ? AND time < ? GROUP BY conn, CAST(time / ? AS INTEGER)",
+                            (resolution, resolution, resolution, source, cutoff, resolution),
+                        )
+                        connection.execute(
+                            "DELETE FROM samples WHERE resolution = ? AND time < ?", (source, cutoff)
+                        )
+                        source = resolution
+                    retention = now - EVENT_STORE_RETENTION_DAYS * 86400
+                    connection.execute("DELETE FROM events WHERE time < ?", (retention,))
+                    connection.execute("DELETE FROM samples WHERE time < ?", (retention,))
+                    connection.execute("DELETE FROM speed_tests WHERE time < ?", (retention,))
+                    connection.execute("DELETE FROM rekeys WHERE time < ?", (retention,))
+            except sqlite3.Error as e:
+                print(f"Error maintaining event store: {e}")
+        self._last_maintenance = now
+
+    # --- Consultas ---
+
+    def availability(self, conn_name: str, start: float, end: Optional[float] = None) -> Availability:
+        """
+        Disponibilidade, quedas, falhas e reconexões de uma conexão no período [start, end).
+
+        O tempo em que o cliente não estava em execução conta como desconectado (ao sair, o
+        cliente desconecta a VPN ativa).
+        """
+        self.flush()
+        end = min(end if end is not None else time.time(), time.time())
+        result = Availability(conn_name, start, end)
+        first = self._query(
+            "SELECT MIN(time) FROM events WHERE conn = ? AND kind = ?", (conn_name, KIND_STATE)
+        )
+        if not first or first[0][0] is None or first[0][0] >= end:
+            return result
+        observed_start = max(start, first[0][0])
+        result.observed = end - observed_start
+
+        # Estado no início do período: último evento da conexão ou do cliente antes dele
+        connected = False
+        last_state = self._query(
+            "SELECT time, state FROM events WHERE conn = ? AND kind = ? AND time < ? ORDER BY time DESC LIMIT 1",
+            (conn_name, KIND_STATE, observed_start),
+        )
+        last_app = self._query(
+            "SELECT time FROM events WHERE conn = '' AND kind = ? AND time < ? ORDER BY time DESC LIMIT 1",
+            (KIND_APP, observed_start),
+        )
+        if last_state and (not last_app or last_state[0][0] >= last_app[0][0]):
+            connected = last_state[0][1] in CONNECTED_STATES
+
+        rows = self._query(
+            "SELECT time, state FROM events WHERE conn = ? AND kind = ? AND time >= ? AND time < ? "
+            "UNION ALL "
+            "SELECT time, NULL FROM events WHERE conn = '' AND kind = ? AND time >= ? AND time < ? "
+            "ORDER BY time",
+            (conn_name, KIND_STATE, observed_start, end, KIND_APP, observed_start, end),
+        )
+        since = observed_start
+        for timestamp, state in rows:
+            if connected:
+                result.connected += timestamp - since
+            connected = state in CONNECTED_STATES
+            since = timestamp
+        if connected:
+            result.connected += end - since
+
+        result.drops = self._query(
+            "SELECT COUNT(*) FROM events WHERE conn = ? AND is_drop = 1 AND time >= ? AND time < ?",
+            (conn_name, start, end),
+        )[0][0]
+        result.failures = self._query(
+            "SELECT COUNT(*) FROM events WHERE conn = ? AND kind = ? AND time >= ? AND time < ? AND state = 'FAILED'",
+            (conn_name, KIND_STATE, start, end),
+        )[0][0]
+        result.reconnects = self._query(
+            "SELECT COUNT(*) FROM events WHERE conn = ? AND kind = ? AND time >= ? AND time < ?",
+            (conn_name, KIND_RECONNECT, start, end),
+        )[0][0]
+        result.rekeys, result.rekey_max, result.disrupted_rekeys = self._query(
+            "SELECT COUNT(*), MAX(duration), COALESCE(SUM(probes_lost > 0), 0) FROM rekeys "
+            "WHERE conn = ? AND time >= ? AND time < ?",
+            (conn_name, start, end),
+        )[0]
+        return result
+
+    def summary(self, start: float, end: Optional[float] = None) -> List[Availability]:
+        """
+        Disponibilidade de todas as conexões com eventos até o fim do período.
+        """
+        self.flush()
+        end = end if end is not None else time.time()
+        names = [row[0] for row in self._query(
+            "SELECT DISTINCT conn FROM events WHERE kind = ? AND time < ? ORDER BY conn", (KIND_STATE, end)
+        )]
+        return [self.availability(name, start, end) for name in names]
+
+    def counter_samples(self, conn_name: str, start: float, end: Optional[float] = None) -> List[tuple]:
+        """
+        Amostras (tempo, bytes_in, bytes_out, pacotes_in, pacotes_out) na melhor resolução disponível.
+        """
+        self.flush()
+        end = end if end is not None else time.time()
+        return self._query(
+            "SELECT time, bytes_in, bytes_out, packets_in, packets_out FROM samples "
+            "WHERE conn = ? AND time >= ? AND time < ? ORDER BY time",
+            (conn_name, start, end),
+        )
+
+    def speed_tests(self, conn_name: str, limit: int = 20) -> List[dict]:
+        """
+        Testes de vazão mais recentes da conexão.
+        """
+        self.flush()
+        columns = ("time", "mode", "target", "cipher", "goodput_bps", "retransmits", "rtt_ms", "jitter_ms", "lost", "sent")
+        rows = self._query(
+            f"SELECT {', '.join(columns)} FROM speed_tests WHERE conn = ? ORDER BY time DESC LIMIT ?",
+            (conn_name, limit),
+        )
+        return [dict(zip(columns, row)) for row in rows]
+
+    # --- Internos ---
+
+    def _enqueue_event(self, row: tuple) -> None:
+        with self._pending_lock:
+            self._pending_events.append(row)
+            full = len(self._pending_events) >= EVENT_STORE_BATCH_SIZE
+        if full:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            if time.time() - self._last_maintenance >= 86400:
+                self.maintain()
+
+    def _query(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        with self._db_lock:
+            connection = self._ensure_open()
+            if connection is None:
+                return []
+            try:
+                return connection.execute(sql, parameters).fetchall()
+            except sqlite3.Error as e:
+                print(f"Error reading event store: {e}")
+                return []
+
+    def _ensure_open(self) -> Optional[sqlite3.Connection]:
+        # Chamado com _db_lock; aberto na primeira escrita/consulta, fora do caminho de inicialização
+        if self._connection is None:
+            try:
+                connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                connection.executescript(SCHEMA)
+                self._connection = connection
+            except sqlite3.Error as e:
+                print(f"Error opening event store {self.path}: {e}")
+                return None
+        return self._connection
+
+
+def format_rekeys(row: Availability) -> str:
+    """
+    Rekeys do período, com a maior duração e quantos tiveram perda de sondas.
+    """
+    if not row.rekeys:
+        return "0"
+    details = []
+    if row.rekey_max is not None:
+        details.append(f"máx. {row.rekey_max:.2f} s")
+    if row.disrupted_rekeys:
+        details.append(f"{row.disrupted_rekeys} com perda")
+    return f"{row.rekeys} ({', '.join(details)})" if details else str(row.rekeys)
+
+
+def format_summary(rows: List[Availability]) -> str:
+    """
+    Tabela de texto com a disponibilidade por conexão (usada por --stats).
+    """
+    header = ("Conexão", "Disponibilidade", "Conectado", "Quedas", "MTBF", "Falhas", "Reconexões", "Rekeys")
+    lines = [header] + [
+        (
+            row.conn_name,
+            format_ratio(row.uptime_ratio),
+            format_duration(row.connected),
+            str(row.drops),
+            format_duration(row.mtbf),
+            str(row.failures),
+            str(row.reconnects),
+            format_rekeys(row),
+        )
+        for row in rows
+    ]
+    widths = [max(len(line[column]) for line in lines) for column in range(len(header))]
+    return "\n".join(
+        "  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip() for line in lines
+    )
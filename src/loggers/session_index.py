@@ -0,0 +1,272 @@
+"""
+Módulo SessionIndex
+
+Este módulo escreve os marcadores de início e fim de sessão no arquivo de log da
+aplicação e mantém um índice lateral (JSON-lines) com o deslocamento em bytes, a
+conexão, o início e o fim de cada sessão, para que o histórico seja listado e aberto sem
+varrer o arquivo de log inteiro. As mensagens ficam apenas no log de texto: o índice
+aponta para elas, sem uma segunda cópia.
+"""
+
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ..config.app_config import LOG_FILE_PATH, SESSION_INDEX_PATH
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+BANNER_RULE = "=" * 50
+START_PREFIX = "VPN IPsec Log - Connection: "
+START_TIME_PREFIX = "Start Time: "
+END_TIME_PREFIX = "End Time: "
+END_LINE = "Connection ended."
+MESSAGE_PATTERN = re.compile(r"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] ?(.*)$")
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime(TIME_FORMAT)
+
+
+def _parse_time(text: str) -> Optional[float]:
+    try:
+        return time.mktime(time.strptime(text.strip(), TIME_FORMAT))
+    except ValueError:
+        return None
+
+
+class SessionInfo:
+    """
+    Uma sessão de conexão registrada no índice.
+    """
+
+    __slots__ = ("session_id", "conn_name", "start", "end", "offset", "end_offset")
+
+    def __init__(self, session_id: str, conn_name: str, start: float, offset: int):
+        self.session_id = session_id
+        self.conn_name = conn_name
+        self.start = start
+        self.end: Optional[float] = None
+        self.offset = offset
+        self.end_offset: Optional[int] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+
+class SessionIndex:
+    """
+    Delimita as sessões no log de texto e lê o histórico através do índice.
+    """
+
+    def __init__(self, log_path: str = LOG_FILE_PATH, index_path: str = SESSION_INDEX_PATH):
+        self.log_path = log_path
+        self.index_path = index_path
+        self.current: Optional[SessionInfo] = None
+
+    def start_session(self, conn_name: str) -> SessionInfo:
+        """
+        Abre uma nova sessão, escrevendo o cabeçalho no log e seu deslocamento no índice.
+        """
+        if self.current is not None:
+            self.end_session()
+        self._ensure_index()
+        now = time.time()
+        # A linha em branco separa do conteúdo anterior; a sessão começa na régua
+        offset = self._append_log(
+            f"\n{BANNER_RULE}\n{START_PREFIX}{conn_name}\n"
+            f"{START_TIME_PREFIX}{_format_time(now)}\n{BANNER_RULE}\n"
+        ) + 1
+        session = SessionInfo(str(offset), conn_name, now, offset)
+        self._append_index(
+            {"event": "start", "session": session.session_id, "conn": conn_name,
+             "time": now, "offset": offset}
+        )
+        self.current = session
+        return session
+
+    def end_session(self) -> Optional[SessionInfo]:
+        """
+        Fecha a sessão atual, escrevendo o rodapé no log e seu fim no índice.
+        """
+        session = self.current
+        if session is None:
+            return None
+        session.end = time.time()
+        text = f"{BANNER_RULE}\n{END_TIME_PREFIX}{_format_time(session.end)}\n{END_LINE}\n{BANNER_RULE}\n"
+        session.end_offset = self._append_log(text) + len(text.encode("utf-8"))
+        self._append_index(
+            {"event": "end", "session": session.session_id, "time": session.end,
+             "end_offset": session.end_offset}
+        )
+        self.current = None
+        return session
+
+    def list_sessions(self) -> List[SessionInfo]:
+        """
+        Lista as sessões a partir do índice, da mais recente para a mais antiga.
+        """
+        self._ensure_index()
+        sessions: Dict[str, SessionInfo] = {}
+        ordered: List[SessionInfo] = []
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as index_file:
+                for line in index_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Linha truncada por uma queda durante a escrita
+                        continue
+                    if entry.get("event") == "start":
+                        session = SessionInfo(
+                            entry["session"], entry.get("conn", ""), entry["time"], entry["offset"]
+                        )
+                        sessions[session.session_id] = session
+                        ordered.append(session)
+                    elif entry.get("event") == "end" and entry.get("session") in sessions:
+                        session = sessions[entry["session"]]
+                        session.end = entry["time"]
+                        session.end_offset = entry["end_offset"]
+        except FileNotFoundError:
+            return []
+
+        # Sessões interrompidas (sem registro de fim) terminam onde a próxima começa
+        for current, following in zip(ordered, ordered[1:]):
+            if current.end_offset is None:
+                current.end_offset = following.offset
+        ordered.reverse()
+        return ordered
+
+    def read_session(self, session: SessionInfo) -> List[dict]:
+        """
+        Lê os registros de uma sessão indo direto ao seu deslocamento no log.
+        """
+        try:
+            with open(self.log_path, "rb") as log_file:
+                log_file.seek(session.offset)
+                if session.end_offset is not None:
+                    data = log_file.read(max(0, session.end_offset - session.offset))
+                else:
+                    data = log_file.read()
+        except FileNotFoundError:
+            return []
+        return self._parse_session(data.decode("utf-8", errors="replace"), session)
+
+    def rebuild_index(self) -> None:
+        """
+        Reconstrói o índice varrendo o log uma única vez (índice perdido ou desatualizado).
+        """
+        rule = BANNER_RULE.encode()
+        entries = []
+        session = None
+        offset = 0
+        previous, previous_offset = b"", 0
+        with open(self.log_path, "rb") as log_file:
+            for line in log_file:
+                line_offset = offset
+                offset += len(line)
+                stripped = line.rstrip(b"\r\n")
+                # Evita decodificar as mensagens: só as linhas dos marcadores interessam
+                if stripped.startswith(START_PREFIX.encode()) and previous == rule:
+                    session = {"event": "start", "session": str(previous_offset),
+                               "conn": stripped[len(START_PREFIX):].decode("utf-8", errors="replace"),
+                               "time": 0.0, "offset": previous_offset}
+                    entries.append(session)
+                elif session is not None and stripped.startswith(START_TIME_PREFIX.encode()):
+                    session["time"] = _parse_time(stripped[len(START_TIME_PREFIX):].decode(errors="replace")) or 0.0
+                elif session is not None and stripped.startswith(END_TIME_PREFIX.encode()):
+                    end = _parse_time(stripped[len(END_TIME_PREFIX):].decode(errors="replace"))
+                    session["end"] = end if end is not None else session["time"]
+                elif session is not None and stripped == rule and previous == END_LINE.encode():
+                    entries.append({"event": "end", "session": session["session"],
+                                    "time": session.pop("end", session["time"]), "end_offset": offset})
+                    session = None
+                previous, previous_offset = stripped, line_offset
+        with open(self.index_path, "w", encoding="utf-8") as index_file:
+            for entry in entries:
+                entry.pop("end", None)
+                index_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _parse_session(self, text: str, session: SessionInfo) -> List[dict]:
+        records: List[dict] = []
+        last_time = session.start
+        for line in text.splitlines():
+            if not line or line == BANNER_RULE or line == END_LINE or line.startswith(START_PREFIX):
+                continue
+            if line.startswith(START_TIME_PREFIX):
+                records.append({"type": "session_start", "session": session.session_id,
+                                "conn": session.conn_name, "time": session.start})
+                continue
+            if line.startswith(END_TIME_PREFIX):
+                end = _parse_time(line[len(END_TIME_PREFIX):])
+                records.append({"type": "session_end", "session": session.session_id,
+                                "time": session.end or end or last_time})
+                continue
+            match = MESSAGE_PATTERN.match(line)
+            if match:
+                last_time = _parse_time(match.group(1)) or last_time
+                records.append({"type": "message", "session": session.session_id,
+                                "time": last_time, "message": match.group(2)})
+            elif records and records[-1]["type"] == "message":
+                # Continuação de uma mensagem com várias linhas
+                records[-1]["message"] += "\n" + line
+            else:
+                records.append({"type": "message", "session": session.session_id,
+                                "time": last_time, "message": line})
+        return records
+
+    def _ensure_index(self) -> None:
+        if not os.path.exists(self.log_path):
+            return
+        if not os.path.exists(self.index_path) or self._index_is_stale():
+            self.rebuild_index()
+
+    def _index_is_stale(self) -> bool:
+        """
+        O índice não corresponde mais ao log (ex.: log apagado ou truncado e reescrito).
+        """
+        last = None
+        with open(self.index_path, "r", encoding="utf-8") as index_file:
+            for line in index_file:
+                try:
+                    last = json.loads(line)
+                except ValueError:
+                    continue
+        if last is None:
+            return False
+        # A última sessão indexada começa em uma régua ou, se fechada, termina logo após uma
+        rule = (BANNER_RULE + "\n").encode()
+        try:
+            if last.get("event") == "end":
+                position = last["end_offset"] - len(rule)
+            else:
+                position = last["offset"]
+            with open(self.log_path, "rb") as log_file:
+                log_file.seek(max(0, position))
+                return log_file.read(len(rule)) != rule
+        except (KeyError, TypeError, OSError):
+            return True
+
+    def _append_log(self, text: str) -> int:
+        """
+        Acrescenta texto ao log e retorna o deslocamento em que foi escrito.
+        """
+        with open(self.log_path, "ab") as log_file:
+            offset = log_file.tell()
+            log_file.write(text.encode("utf-8"))
+        return offset
+
+    def _append_index(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with open(self.index_path, "ab+") as index_file:
+            # Uma linha truncada por uma queda não pode engolir a próxima entrada
+            if index_file.tell() > 0:
+                index_file.seek(-1, os.SEEK_END)
+                if index_file.read(1) != b"\n":
+                    line = "\n" + line
+            index_file.write(line.encode("utf-8"))
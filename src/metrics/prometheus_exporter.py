@@ -0,0 +1,161 @@
+"""
+Módulo PrometheusExporter
+
+Exposição opcional das métricas dos túneis no formato texto do Prometheus, via porta
+HTTP local e/ou arquivo do textfile collector do node-exporter. As requisições são
+atendidas a partir de um snapshot em memória: um scrape nunca dispara comandos 'ipsec'.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional
+
+from ..ipsec.connection_state import ConnectionState
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+METRIC_HELP = [
+    ("vpn_ipsec_connection_up", "gauge", "1 se a conexão está estabelecida."),
+    ("vpn_ipsec_connection_uptime_seconds", "gauge", "Tempo desde que a conexão foi estabelecida."),
+    ("vpn_ipsec_connection_connects_total", "counter", "Conexões estabelecidas desde o início do cliente."),
+    ("vpn_ipsec_connection_reconnects_total", "counter", "Conexões estabelecidas após a primeira."),
+    ("vpn_ipsec_connection_connect_latency_seconds", "gauge", "Tempo entre 'ipsec up' e o estado conectado na última conexão."),
+    ("vpn_ipsec_connection_sa_bytes_in", "gauge", "Bytes recebidos pelas CHILD SAs atuais."),
+    ("vpn_ipsec_connection_sa_bytes_out", "gauge", "Bytes enviados pelas CHILD SAs atuais."),
+    ("vpn_ipsec_connection_sa_packets_in", "gauge", "Pacotes recebidos pelas CHILD SAs atuais."),
+    ("vpn_ipsec_connection_sa_packets_out", "gauge", "Pacotes enviados pelas CHILD SAs atuais."),
+    ("vpn_ipsec_connection_state", "gauge", "1 para o estado atual da conexão, 0 para os demais."),
+    ("vpn_ipsec_connection_transitions_total", "counter", "Transições de estado desde o início do cliente."),
+]
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_metrics(stats: Iterable, now: Optional[float] = None) -> str:
+    """
+    Gera a exposição texto a partir das ConnectionStats do IPsecManager.
+    """
+    now = now if now is not None else time.time()
+    samples = {name: [] for name, _, _ in METRIC_HELP}
+    for conn in stats:
+        label = f'connection="{_escape_label(conn.name)}"'
+        samples["vpn_ipsec_connection_up"].append((label, 1 if conn.is_connected else 0))
+        samples["vpn_ipsec_connection_uptime_seconds"].append((label, round(conn.uptime(now), 3)))
+        samples["vpn_ipsec_connection_connects_total"].append((label, conn.connects))
+        samples["vpn_ipsec_connection_reconnects_total"].append((label, conn.reconnects))
+        if conn.last_connect_latency is not None:
+            samples["vpn_ipsec_connection_connect_latency_seconds"].append(
+                (label, round(conn.last_connect_latency, 3))
+            )
+        samples["vpn_ipsec_connection_sa_bytes_in"].append((label, conn.bytes_in))
+        samples["vpn_ipsec_connection_sa_bytes_out"].append((label, conn.bytes_out))
+        samples["vpn_ipsec_connection_sa_packets_in"].append((label, conn.packets_in))
+        samples["vpn_ipsec_connection_sa_packets_out"].append((label, conn.packets_out))
+        for state in ConnectionState:
+            samples["vpn_ipsec_connection_state"].append(
+                (f'{label},state="{state.name.lower()}"', 1 if conn.state == state else 0)
+            )
+        samples["vpn_ipsec_connection_transitions_total"].append((label, conn.transitions))
+
+    lines = []
+    for name, metric_type, help_text in METRIC_HELP:
+        if not samples[name]:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples[name]:
+            lines.append(f"{name}{{{labels}}} {value}")
+    lines.append("# HELP vpn_ipsec_snapshot_timestamp_seconds Momento em que o snapshot foi gerado.")
+    lines.append("# TYPE vpn_ipsec_snapshot_timestamp_seconds gauge")
+    lines.append(f"vpn_ipsec_snapshot_timestamp_seconds {now:.3f}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.exporter.snapshot.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes periódicos não devem poluir a saída da aplicação
+        pass
+
+
+class MetricsExporter:
+    """
+    Publica o snapshot de métricas via HTTP local e/ou arquivo textfile.
+    """
+
+    def __init__(self, port: int = 0, bind_address: str = "127.0.0.1", textfile_path: str = ""):
+        self.port = port
+        self.bind_address = bind_address
+        self.textfile_path = textfile_path
+        self.snapshot = ""
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.port or self.textfile_path)
+
+    def start(self) -> None:
+        """
+        Inicia o servidor HTTP em uma thread daemon, se uma porta foi configurada.
+        """
+        if not self.port or self._server is not None:
+            return
+        self._server = ThreadingHTTPServer((self.bind_address, self.port), _MetricsRequestHandler)
+        self._server.daemon_threads = True
+        self._server.exporter = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="metrics-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+
+    def publish(self, snapshot: str) -> None:
+        """
+        Substitui o snapshot servido (troca atômica de referência) e atualiza o textfile.
+        """
+        self.snapshot = snapshot
+        if self.textfile_path:
+            self._write_textfile(snapshot)
+
+    def _write_textfile(self, snapshot: str) -> None:
+        # Escrita atômica: o node-exporter nunca deve ler um arquivo pela metade
+        directory = os.path.dirname(os.path.abspath(self.textfile_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".vpn_ipsec_", suffix=".prom.tmp", dir=directory)
+        except OSError as e:
+            print(f"Error writing metrics textfile: {e}")
+            return
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+                tmp_file.write(snapshot)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.textfile_path)
+        except OSError as e:
+            # Sem o rename o temporário ficaria no diretório do collector a cada publicação
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            print(f"Error writing metrics textfile: {e}")
@@ -0,0 +1,457 @@
+"""
+App Controller Module
+
+Mantém os serviços que vivem enquanto a aplicação está aberta (IPsecManager, agendador
+de status, log do charon, log de sessões e métricas) e cria a janela principal sob demanda.
+
+No modo bandeja, fechar a janela a destrói: o cliente segue apenas acompanhando as
+transições de estado, com as consultas de status espaçadas e sem timers de interface,
+e o ícone da bandeja mostra o estado dos túneis.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+from PySide6.QtGui import QColor, QIcon, QPainter, QPen
+from PySide6.QtWidgets import QApplication, QMenu, QSystemTrayIcon
+
+from ..config.app_config import (
+    APP_TITLE,
+    FOOTPRINT_REPORT_DELAY_S,
+    METRICS_BIND_ADDRESS,
+    METRICS_HTTP_PORT,
+    METRICS_TEXTFILE_PATH,
+    NETWORK_RECOVERY_ENABLED,
+    TRAY_ICON_SIZE,
+)
+from ..ipsec.charon_log_tailer import CharonLogTailer
+from ..ipsec.connection_state import ConnectionState
+from ..ipsec.ipsec_manager import IPsecManager
+from ..ipsec.network_recovery import NetworkRecovery
+from ..ipsec.status_scheduler import StatusScheduler
+from ..loggers.app_loggers import AppLoggers
+from ..utils.process_footprint import describe_footprint, read_footprint
+from ..utils.resources import asset_path
+from ..utils.single_instance import (
+    ACTION_CONNECT,
+    ACTION_DISCONNECT,
+    ACTION_NETWORK_CHANGED,
+    ACTION_SHOW,
+    make_command,
+)
+from .connection_list_model import BADGE_COLORS
+from .main_window import MainWindow
+
+
+class AppController(QObject):
+    """
+    Dono dos serviços de longa duração e da janela principal (criada e destruída sob demanda).
+    """
+
+    # RekeyEvent concluído, vindo da thread do monitor de rekeys
+    rekey_finished = Signal(object)
+    # Conexão iniciada em segundo plano concluída (conexão, sucesso, mensagem), já aplicada
+    connect_finished = Signal(str, bool, str)
+    # Resultado do 'ipsec up' da thread de ações, entregue na thread da UI
+    _connect_done = Signal(str, bool, str)
+
+    def __init__(self, tray_enabled: bool = False, parent=None):
+        super().__init__(parent)
+        self.connection_manager = IPsecManager()
+        self.log_manager = AppLoggers()
+        self.event_store = self.log_manager.event_store
+        self.connection_manager.add_transition_listener(self.event_store.record_transition)
+        self.status_scheduler = StatusScheduler(self.connection_manager, self)
+        self.status_scheduler.state_changed.connect(self._on_state_changed)
+        self.status_scheduler.snapshot_updated.connect(self._on_snapshot_updated)
+        self.status_scheduler.poll_failed.connect(self.log_manager.add_log_message)
+        self.metrics_exporter = None
+        # Reconexão rápida após trocas de rede, resume e dock/undock
+        self.network_recovery = None
+        if NETWORK_RECOVERY_ENABLED:
+            self.network_recovery = NetworkRecovery(self.connection_manager, self.status_scheduler, self)
+            self.network_recovery.message.connect(self._on_recovery_message)
+            self.network_recovery.reconnect_finished.connect(self.event_store.record_reconnect)
+            self.network_recovery.monitor.network_changed.connect(
+                lambda reason: self.log_manager.add_log_message(f"Mudança de rede: {reason}")
+            )
+        if self.connection_manager.rekey_monitor is not None:
+            self.connection_manager.rekey_monitor.add_listener(self.rekey_finished.emit)
+            self.rekey_finished.connect(self._on_rekey_finished)
+        # Linhas do charon de todas as conexões, para o monitor de rekeys e os traces;
+        # também sem janela, no modo bandeja
+        self.charon_log_tailer = CharonLogTailer(self)
+        self.charon_log_tailer.lines_ready.connect(self._on_charon_log_lines)
+        # 'ipsec up' (com retransmissões) leva segundos: fora da thread da UI, para que a
+        # bandeja e o servidor de instância única continuem respondendo
+        self._action_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ipsec-action")
+        self._connect_done.connect(self._on_connect_done)
+        self.window = None
+        # Conexão selecionada; preservada quando a janela é destruída e recriada
+        self.current_conn_name = None
+
+        # Consumo medido ao entrar em segundo plano, comparado depois de FOOTPRINT_REPORT_DELAY_S
+        self._background_footprint = None
+        self._footprint_timer = QTimer(self)
+        self._footprint_timer.setSingleShot(True)
+        self._footprint_timer.setInterval(FOOTPRINT_REPORT_DELAY_S * 1000)
+        self._footprint_timer.timeout.connect(self._report_footprint)
+
+        self.tray_icon = None
+        self._tray_key = None
+        self._tray_icons = {}
+        if tray_enabled and QSystemTrayIcon.isSystemTrayAvailable():
+            self._create_tray_icon()
+
+    def start(self):
+        """Inicia as consultas de status; as métricas ficam para a primeira volta do loop de eventos."""
+        self.event_store.start()
+        if self.connection_manager.rekey_monitor is not None:
+            self.connection_manager.rekey_monitor.start()
+        self._start_charon_log_tailer()
+        self.status_scheduler.start()
+        if self.network_recovery is not None and not self.network_recovery.start():
+            self.log_manager.add_log_message(
+                "Netlink indisponível; mudanças de rede só serão notadas via --network-changed."
+            )
+        QTimer.singleShot(0, self._start_metrics_exporter)
+
+    def show_window(self):
+        """Exibe a janela principal, criando-a se necessário."""
+        if self.window is None:
+            self.window = MainWindow(self)
+            if self.tray_icon is not None:
+                # Fechar a janela libera widgets, timers e o acompanhamento do log do charon
+                self.window.setAttribute(Qt.WA_DeleteOnClose)
+                self.window.destroyed.connect(self._on_window_destroyed)
+        self.window.showNormal()
+        self.window.raise_()
+        self.window.activateWindow()
+        self.set_background(False)
+
+    def set_background(self, background: bool):
+        """Chamado quando nenhuma janela está visível (destruída ou minimizada) e ao voltar."""
+        if background == self.status_scheduler.background:
+            return
+        self.status_scheduler.set_background(background)
+        if background:
+            self._background_footprint = read_footprint()
+            self._footprint_timer.start()
+        else:
+            self._footprint_timer.stop()
+            if self._background_footprint is not None:
+                self.log_manager.add_log_message(
+                    f"Fim do período em segundo plano: "
+                    f"{describe_footprint(self._background_footprint, read_footprint())}"
+                )
+                self._background_footprint = None
+
+    def handle_instance_command(self, command):
+        """Executa um comando repassado por outra execução da aplicação."""
+        if command["action"] == ACTION_NETWORK_CHANGED:
+            if self.network_recovery is not None:
+                self.network_recovery.monitor.notify_change("aviso externo")
+            return
+        if self.window is None and (self.tray_icon is None or command["action"] == ACTION_SHOW):
+            self.show_window()
+        if self.window is not None:
+            self.window.handle_instance_command(command)
+            return
+        # Na bandeja, conectar/desconectar sem recriar a janela
+        conn_name = command.get("connection") or self.current_conn_name
+        if command["action"] == ACTION_CONNECT:
+            self._connect_in_background(conn_name)
+        elif command["action"] == ACTION_DISCONNECT:
+            self._disconnect_in_background(conn_name)
+
+    def shutdown(self):
+        """Encerra os serviços ao sair, desconectando a VPN da sessão ativa."""
+        self._footprint_timer.stop()
+        if self.network_recovery is not None:
+            self.network_recovery.stop()
+        self.charon_log_tailer.stop()
+        self.status_scheduler.stop()
+        self._action_executor.shutdown(wait=False)
+        if self.tray_icon is not None:
+            self.tray_icon.hide()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+        if self.log_manager.is_connected and self.current_conn_name:
+            # Desconecta automaticamente a VPN ao fechar o aplicativo
+            self.log_manager.add_log_message(
+                f"Desconectando IPsec connection: {self.current_conn_name} antes de sair..."
+            )
+            success, message = self.connection_manager.disconnect_connection(self.current_conn_name)
+            self.log_manager.add_log_message(message)
+            if success:
+                self.log_manager.add_log_message(
+                    f"VPN '{self.current_conn_name}' desconectada com sucesso antes de sair."
+                )
+            else:
+                self.log_manager.add_log_message(
+                    f"Falha ao desconectar VPN '{self.current_conn_name}' antes de sair, "
+                    f"mas aplicativo será fechado: {message}"
+                )
+        self.connection_manager.shutdown()
+        self.event_store.close()
+
+    def set_connections(self, conn_names):
+        """Conexões carregadas (ou recarregadas) cujas linhas do charon são acompanhadas."""
+        self.charon_log_tailer.set_connections(conn_names)
+
+    def select_connection(self, conn_name):
+        """Conexão selecionada (janela ou bandeja); seu gateway passa a ser resolvido em segundo plano."""
+        self.current_conn_name = conn_name
+        self.connection_manager.select_connection(conn_name)
+
+    def _start_charon_log_tailer(self):
+        self.set_connections(self.connection_manager.connections)
+        if self.charon_log_tailer.start():
+            self.log_manager.add_log_message(
+                f"Acompanhando o log do charon: {self.charon_log_tailer.source}"
+            )
+        else:
+            self.log_manager.add_log_message(
+                "Log do charon inacessível; apenas as mensagens do cliente serão exibidas."
+            )
+
+    def _on_charon_log_lines(self, conn_name, lines):
+        """Anexa as linhas ao trace da conexão e as repassa ao monitor de rekeys."""
+        tracer = self.connection_manager.tracer
+        if tracer is not None:
+            tracer.record_log_lines(conn_name, lines)
+        if self.connection_manager.rekey_monitor is not None:
+            self.connection_manager.rekey_monitor.feed_log_lines(conn_name, lines)
+
+    def _on_window_destroyed(self):
+        self.window = None
+        self.log_manager.add_log_message("Janela fechada; o cliente continua na bandeja.")
+        self.set_background(True)
+
+    def _on_state_changed(self, transition):
+        # Com a janela aberta, ela registra as transições e a sessão da conexão selecionada
+        if self.window is None:
+            self.log_manager.add_log_message(
+                f"{transition.conn_name}: {transition.previous.label} -> {transition.state.label}"
+            )
+            if transition.conn_name == self.current_conn_name:
+                message = self.log_manager.track_connection_state(transition.conn_name, transition.state)
+                if message:
+                    self._notify(message)
+            if transition.state == ConnectionState.FAILED:
+                self._notify(f"{transition.conn_name}: {transition.detail or transition.state.label}")
+        self._update_tray()
+
+    def _on_recovery_message(self, message):
+        if self.window is not None:
+            self.window.add_status_message(message, show_in_ui=True)
+        else:
+            self._notify(message)
+
+    def _on_rekey_finished(self, event):
+        self.event_store.record_rekey(event)
+        if self.window is not None:
+            self.window.add_status_message(event.summary(), show_in_ui=True)
+        elif event.disrupted:
+            self._notify(event.summary())
+        else:
+            self.log_manager.add_log_message(event.summary())
+
+    def _on_snapshot_updated(self):
+        self._publish_metrics()
+        self._sample_counters()
+
+    def _sample_counters(self):
+        """
+        Amostra os contadores das SAs para o histórico, pedindo um 'statusall' só quando devido
+        (também para reler os prazos de rekey quando um está próximo).
+        """
+        manager = self.connection_manager
+        connected = [stats for stats in manager.stats.values() if stats.is_connected]
+        if manager.collect_counters:
+            for stats in connected:
+                self.event_store.record_counters(
+                    stats.name, stats.bytes_in, stats.bytes_out, stats.packets_in, stats.packets_out
+                )
+            # Com as métricas ativas a consulta detalhada é sempre feita
+            manager.collect_counters = self.metrics_exporter is not None
+        elif any(self.event_store.counters_due(stats.name) for stats in connected):
+            manager.collect_counters = True
+        elif manager.rekey_monitor is not None and connected and manager.rekey_monitor.timers_due(
+            [stats.name for stats in connected]
+        ):
+            manager.collect_counters = True
+
+    def _connect_in_background(self, conn_name):
+        if conn_name not in self.connection_manager.connections:
+            self._notify(f"Conexão '{conn_name}' não encontrada.")
+            return
+        state = self.connection_manager.get_connection_state(conn_name)
+        if state.is_active or state.is_transitional:
+            self._notify(f"{conn_name}: {state.label}")
+            return
+        self.select_connection(conn_name)
+        self.start_connect(conn_name)
+
+    def start_connect(self, conn_name):
+        """Inicia a conexão sem bloquear; o resultado chega por connect_finished."""
+        self.connection_manager.begin_connect(conn_name)
+        future = self._action_executor.submit(self.connection_manager.run_connect, conn_name)
+        future.add_done_callback(lambda future: self._connect_result(conn_name, future))
+
+    def _connect_result(self, conn_name, future):
+        # Executado na thread de ações: apenas repassa o resultado para a thread da UI
+        try:
+            success, message = future.result()
+        except Exception as e:
+            success, message = False, f"Erro inesperado ao iniciar conexão: {str(e)}"
+        try:
+            self._connect_done.emit(conn_name, success, message)
+        except RuntimeError:
+            # Aplicação encerrada durante o 'ipsec up'
+            pass
+
+    def _on_connect_done(self, conn_name, success, message):
+        self.connection_manager.finish_connect(conn_name, success, message)
+        self.status_scheduler.request_refresh()
+        if self.window is None:
+            self._notify(message)
+        self.connect_finished.emit(conn_name, success, message)
+
+    def _disconnect_in_background(self, conn_name):
+        if conn_name not in self.connection_manager.connections:
+            self._notify(f"Conexão '{conn_name}' não encontrada.")
+            return
+        state = self.connection_manager.get_connection_state(conn_name)
+        if not state.is_active:
+            self._notify(f"{conn_name}: {state.label}")
+            return
+        success, message = self.connection_manager.disconnect_connection(conn_name)
+        self._notify(message)
+
+    def _notify(self, message):
+        """Registra a mensagem e, sem janela, exibe-a como notificação da bandeja."""
+        self.log_manager.add_log_message(message)
+        if self.window is None and self.tray_icon is not None:
+            self.tray_icon.showMessage(APP_TITLE, message, QSystemTrayIcon.Information, 5000)
+
+    def _report_footprint(self):
+        self.log_manager.add_log_message(
+            f"Em segundo plano: {describe_footprint(self._background_footprint, read_footprint())}"
+        )
+
+    # --- Bandeja ---
+
+    def _create_tray_icon(self):
+        self.tray_icon = QSystemTrayIcon(self)
+        self.tray_icon.activated.connect(self._on_tray_activated)
+
+        menu = QMenu()
+        menu.addAction("Abrir", self.show_window)
+        self._tray_toggle_action = menu.addAction("Conectar", self._on_tray_toggle)
+        menu.addSeparator()
+        menu.addAction("Sair", QApplication.quit)
+        # O QSystemTrayIcon não assume a posse do menu
+        self._tray_menu = menu
+        self.tray_icon.setContextMenu(menu)
+        menu.aboutToShow.connect(self._update_tray_menu)
+
+        self._update_tray()
+        self.tray_icon.show()
+
+    def _on_tray_activated(self, reason):
+        if reason != QSystemTrayIcon.Trigger:
+            return
+        if self.window is not None and self.window.isVisible() and not self.window.isMinimized():
+            self.window.close()
+        else:
+            self.show_window()
+
+    def _on_tray_toggle(self):
+        if not self.current_conn_name:
+            return
+        state = self.connection_manager.get_connection_state(self.current_conn_name)
+        action = ACTION_DISCONNECT if state.is_active else ACTION_CONNECT
+        self.handle_instance_command(make_command(action, self.current_conn_name))
+
+    def _update_tray_menu(self):
+        # Atualizado só quando o menu é aberto
+        conn_name = self.current_conn_name
+        if conn_name not in self.connection_manager.connections:
+            self._tray_toggle_action.setText("Conectar")
+            self._tray_toggle_action.setEnabled(False)
+            return
+        state = self.connection_manager.get_connection_state(conn_name)
+        self._tray_toggle_action.setText(
+            f"Desconectar {conn_name}" if state.is_active else f"Conectar {conn_name}"
+        )
+        self._tray_toggle_action.setEnabled(not state.is_transitional)
+
+    def _update_tray(self):
+        """Atualiza ícone e dica da bandeja; o ícone só é trocado quando o estado agregado muda."""
+        if self.tray_icon is None:
+            return
+        snapshot = self.connection_manager.status_snapshot
+        connected = sorted(name for name, state in snapshot.items() if state.is_connected)
+        if any(state.is_transitional for state in snapshot.values()):
+            key = "CONNECTING"
+        elif connected:
+            key = "CONNECTED"
+        elif any(state == ConnectionState.FAILED for state in snapshot.values()):
+            key = "DISCONNECTED"
+        else:
+            key = "UNKNOWN"
+        if key != self._tray_key:
+            self._tray_key = key
+            self.tray_icon.setIcon(self._tray_icon_for(key))
+        status = f"Conectado: {', '.join(connected)}" if connected else "Nenhum túnel ativo"
+        self.tray_icon.setToolTip(f"{APP_TITLE}\n{status}")
+
+    def _tray_icon_for(self, key):
+        """Ícone da aplicação com um badge na cor do estado (as mesmas cores do seletor)."""
+        if key not in self._tray_icons:
+            pixmap = QIcon(asset_path("icon.svg")).pixmap(TRAY_ICON_SIZE, TRAY_ICON_SIZE)
+            badge = TRAY_ICON_SIZE * 0.42
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(QPen(QColor("white"), TRAY_ICON_SIZE / 16))
+            painter.setBrush(QColor(BADGE_COLORS[key]))
+            painter.drawEllipse(
+                TRAY_ICON_SIZE - badge - 1, TRAY_ICON_SIZE - badge - 1, badge, badge
+            )
+            painter.end()
+            self._tray_icons[key] = QIcon(pixmap)
+        return self._tray_icons[key]
+
+    # --- Métricas ---
+
+    def _start_metrics_exporter(self):
+        """Ativa a exposição de métricas, se configurada (opt-in via variáveis de ambiente)."""
+        if not (METRICS_HTTP_PORT or METRICS_TEXTFILE_PATH):
+            # Desativadas: o módulo (e o http.server) nem chega a ser importado
+            return
+        from ..metrics.prometheus_exporter import MetricsExporter
+
+        self.metrics_exporter = MetricsExporter(
+            METRICS_HTTP_PORT, METRICS_BIND_ADDRESS, METRICS_TEXTFILE_PATH
+        )
+        self.connection_manager.collect_counters = True
+        try:
+            self.metrics_exporter.start()
+        except OSError as e:
+            self.log_manager.add_log_message(f"Não foi possível iniciar o endpoint de métricas: {str(e)}")
+            return
+        self._publish_metrics()
+        if METRICS_HTTP_PORT:
+            self.log_manager.add_log_message(
+                f"Métricas disponíveis em http://{METRICS_BIND_ADDRESS}:{METRICS_HTTP_PORT}/metrics"
+            )
+
+    def _publish_metrics(self):
+        """Publica um novo snapshot de métricas; os scrapes são servidos apenas dele."""
+        if self.metrics_exporter is not None and self.metrics_exporter.enabled:
+            from ..metrics.prometheus_exporter import render_metrics
+
+            self.metrics_exporter.publish(
+                render_metrics(self.connection_manager.stats.values())
+            )
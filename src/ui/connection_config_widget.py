@@ -3,22 +3,32 @@ from PySide6.QtWidgets import (
     QVBoxLayout,
     QHBoxLayout,
     QLabel,
+    QLineEdit,
     QComboBox,
     QGridLayout,
     QGroupBox,
     QSpacerItem,
     QSizePolicy,
+    QPushButton,
 )
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtCore import Qt, QTimer, Signal
 from PySide6.QtGui import QFont
 
-from ..config.app_config import CONNECTION_STATES
+from ..config.app_config import (
+    CONNECTION_SEARCH_MIN_ITEMS,
+    CONNECTION_SELECTION_DEBOUNCE_MS,
+    CONNECTION_STATES,
+)
+from ..ipsec.connection_record import SERVER_ADDRESS_NOT_FOUND
+from ..ipsec.connection_state import ConnectionState
+from .connection_list_model import ConnectionFilterProxyModel, ConnectionListModel
 from .toggle_switch_button import ToggleSwitchButton  # Importar o novo widget
 
 
 class ConnectionConfigWidget(QGroupBox):
     connection_changed = Signal(str)
     toggle_requested = Signal(bool)
+    cipher_benchmark_requested = Signal()
 
     def __init__(self, connection_manager, parent=None):
         super().__init__("Configuração IPsec", parent)
@@ -34,14 +44,49 @@ class ConnectionConfigWidget(QGroupBox):
         config_layout.setColumnStretch(2, 0)  # Coluna 2 (toggle) não se expande
 
         config_layout.addWidget(QLabel("Conexão IPsec:"), 0, 0)
+        # Modelo/proxy em vez de itens no QComboBox: catálogos grandes são carregados com um único reset
+        self.connection_model = ConnectionListModel(
+            self.connection_mgr.status_snapshot, self._connection_tooltip
+        )
+        self.connection_proxy = ConnectionFilterProxyModel()
+        self.connection_proxy.setSourceModel(self.connection_model)
+
         self.conn_selector = QComboBox()
-        self.conn_selector.currentTextChanged.connect(self._on_connection_changed)
+        self.conn_selector.setModel(self.connection_proxy)
+        self.conn_selector.view().setUniformItemSizes(True)
+        # Só uma escolha explícita (clique, Enter, setas) troca a conexão; filtrar não troca
+        self.conn_selector.activated.connect(self._on_connection_activated)
         # Definir política de tamanho para o QComboBox
         self.conn_selector.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
         # Definir tamanho mínimo para garantir consistência
         self.conn_selector.setMinimumWidth(150)
         self.conn_selector.setMaximumWidth(300)
-        config_layout.addWidget(self.conn_selector, 0, 1, 1, 2)
+
+        # Busca incremental, exibida apenas quando há muitas conexões
+        self.search_field = QLineEdit()
+        self.search_field.setPlaceholderText("Filtrar conexões...")
+        self.search_field.setClearButtonEnabled(True)
+        self.search_field.setMaximumWidth(300)
+        self.search_field.textChanged.connect(self._on_search_text_changed)
+        self.search_field.returnPressed.connect(self._activate_first_match)
+        self.search_field.setVisible(False)
+
+        selector_layout = QVBoxLayout()
+        selector_layout.setContentsMargins(0, 0, 0, 0)
+        selector_layout.addWidget(self.conn_selector)
+        selector_layout.addWidget(self.search_field)
+        config_layout.addLayout(selector_layout, 0, 1, 1, 2)
+
+        # Mudanças de seleção (teclado, busca) são agrupadas antes de carregar detalhes e status
+        self._selection_timer = QTimer(self)
+        self._selection_timer.setSingleShot(True)
+        self._selection_timer.setInterval(CONNECTION_SELECTION_DEBOUNCE_MS)
+        self._selection_timer.timeout.connect(self._emit_connection_changed)
+        self._last_emitted_connection = None
+        # Conexão escolhida pelo usuário; independe do item que o filtro deixa visível
+        self._selected_connection = ""
+        # Gateway exibido, reexibido com o endereço quando a resolução sob demanda terminar
+        self._server_address = ""
 
         config_layout.addWidget(QLabel("Nome da Conexão:"), 1, 0)
         self.conn_name_label = QLabel("--")
@@ -61,7 +106,12 @@ class ConnectionConfigWidget(QGroupBox):
 
         config_layout.addWidget(QLabel("Protocolos (IKE/ESP):"), 5, 0)
         self.protocols_label = QLabel("--")
-        config_layout.addWidget(self.protocols_label, 5, 1, 1, 2)
+        config_layout.addWidget(self.protocols_label, 5, 1)
+        # Mede as propostas ESP nesta máquina e sugere a mais rápida aceita pelo gateway
+        self.benchmark_button = QPushButton("Comparar")
+        self.benchmark_button.setToolTip("Comparar a vazão das cifras ESP nesta máquina")
+        self.benchmark_button.clicked.connect(self.cipher_benchmark_requested)
+        config_layout.addWidget(self.benchmark_button, 5, 2)
 
         config_layout.addWidget(QLabel("Sub-rede Remota:"), 6, 0)
         self.rightsubnet_label = QLabel("--")
@@ -110,8 +160,61 @@ class ConnectionConfigWidget(QGroupBox):
 
         self.setLayout(config_layout)
 
-    def _on_connection_changed(self, conn_name):
-        self.connection_changed.emit(conn_name)
+    def _on_connection_activated(self, index):
+        self._selected_connection = self.conn_selector.itemText(index)
+        self._selection_timer.start()
+
+    def _on_search_text_changed(self, text):
+        self.connection_proxy.set_search_text(text)
+        self._sync_selector()
+
+    def _activate_first_match(self):
+        """Enter na busca escolhe o primeiro resultado do filtro."""
+        if self.connection_proxy.rowCount() == 0:
+            return
+        self.conn_selector.setCurrentIndex(0)
+        self._selected_connection = self.conn_selector.itemText(0)
+        self._selection_timer.stop()
+        self._emit_connection_changed()
+
+    def _sync_selector(self):
+        """
+        Mantém a conexão escolhida no seletor enquanto o filtro muda; se ela ficar oculta,
+        o seletor mostra o resultado do filtro em vez de outro item como se fosse o atual.
+        """
+        index = -1
+        if self._selected_connection:
+            index = self.conn_selector.findText(self._selected_connection, Qt.MatchExactly)
+        if index < 0:
+            matches = self.connection_proxy.rowCount()
+            if matches == 0:
+                self.conn_selector.setPlaceholderText("Nenhuma conexão corresponde ao filtro")
+            else:
+                self.conn_selector.setPlaceholderText(f"{matches} conexões correspondem ao filtro")
+        self.conn_selector.setCurrentIndex(index)
+
+    def _emit_connection_changed(self):
+        conn_name = self.get_selected_connection()
+        if conn_name and conn_name != self._last_emitted_connection:
+            self._last_emitted_connection = conn_name
+            self.connection_changed.emit(conn_name)
+
+    def _connection_tooltip(self, conn_name, state):
+        """Detalhes da linha sob o cursor, carregados apenas quando a dica é exibida."""
+        record = self.connection_mgr.get_connection_details(conn_name)
+        lines = [conn_name]
+        if record.is_valid:
+            lines.append(f"Servidor: {record.server_address}")
+            lines.append(
+                f"IKE/ESP: {','.join(record.ike) or '--'}/{','.join(record.esp) or '--'}"
+            )
+        if state:
+            lines.append(f"Status: {state.label}")
+        return "\n".join(lines)
+
+    def refresh_status_badges(self):
+        """Atualiza os badges de status a partir do snapshot compartilhado."""
+        self.connection_model.status_snapshot_changed()
 
     def _on_toggle_state_changed(self, state):
         """Lida com a mudança de estado do toggle switch, mas só emite o sinal
@@ -122,54 +225,82 @@ class ConnectionConfigWidget(QGroupBox):
         ) or self.toggle_switch._current_state not in ["CONNECTING", "DISCONNECTING"]:
             self.toggle_requested.emit(state)
 
-    def update_connection_details(
-        self, conn_name, config_file_path, server_addr, conn_details
-    ):
-        self.conn_name_label.setText(conn_name)
-        self.server_address_label.setText(server_addr)
-        self.config_file_label.setText(config_file_path)
-        # Procurar por diferentes possíveis campos de autenticação
-        auth_type = (
-            conn_details.get("authby")
-            or conn_details.get("leftauth")
-            or conn_details.get("rightauth")
-            or "--"
-        )
-        self.auth_type_label.setText(auth_type)
-        protocols = f"{conn_details.get('ike', '--')}/{conn_details.get('esp', '--')}"
-        self.protocols_label.setText(protocols)
-        self.rightsubnet_label.setText(conn_details.get("rightsubnet", "--"))
+    def update_connection_details(self, record):
+        """Exibe os detalhes de um ConnectionRecord."""
+        self.conn_name_label.setText(record.name)
+        self._server_address = record.server_address if record.is_valid else ""
+        if not record.is_valid:
+            self.server_address_label.setText(SERVER_ADDRESS_NOT_FOUND)
+            self.config_file_label.setText(record.config_file or "--")
+            self.auth_type_label.setText("--")
+            self.protocols_label.setText("--/--")
+            self.rightsubnet_label.setText("--")
+            return
+        self.server_address_label.setText(self._format_server_address(record.server_address))
+        self.config_file_label.setText(record.config_file)
+        self.auth_type_label.setText(record.auth_type or "--")
+        ike = ",".join(record.ike) or "--"
+        esp = ",".join(record.esp) or "--"
+        self.protocols_label.setText(f"{ike}/{esp}")
+        self.protocols_label.setToolTip("")
+        self.rightsubnet_label.setText(",".join(record.right_subnets) or "--")
+
+    def refresh_server_address(self):
+        """Reexibe o gateway atual com o endereço que estiver em cache."""
+        if self._server_address:
+            self.server_address_label.setText(self._format_server_address(self._server_address))
+
+    def _format_server_address(self, server_address):
+        """Acrescenta o endereço já resolvido em segundo plano, sem consultar o DNS aqui."""
+        if server_address == SERVER_ADDRESS_NOT_FOUND or server_address.startswith("%"):
+            return server_address
+        entry = self.connection_mgr.resolver.lookup(server_address)
+        if entry is None or not entry.address or entry.address == server_address:
+            return server_address
+        return f"{server_address} ({entry.address})"
 
     def set_connections(self, connections):
-        self.conn_selector.clear()
-        if connections:
-            self.conn_selector.addItems(connections)
-        else:
-            self.conn_selector.addItem("No configurations found")
+        self.search_field.clear()
+        self.search_field.setVisible(len(connections) >= CONNECTION_SEARCH_MIN_ITEMS)
+        self.connection_model.set_connections(connections or ["No configurations found"])
+        # Após um reset a seleção volta ao primeiro item; sincronizar sem esperar o debounce
+        self._selection_timer.stop()
+        self._selected_connection = self.conn_selector.currentText()
+        self._last_emitted_connection = self._selected_connection
 
     def get_selected_connection(self):
-        return self.conn_selector.currentText()
+        return self._selected_connection
+
+    def select_connection(self, conn_name):
+        """Seleciona uma conexão pelo nome, sem debounce; retorna False se ela não existir."""
+        self.search_field.clear()
+        index = self.conn_selector.findText(conn_name, Qt.MatchExactly)
+        if index < 0:
+            return False
+        self.conn_selector.setCurrentIndex(index)
+        self._selected_connection = conn_name
+        self._selection_timer.stop()
+        self._emit_connection_changed()
+        return True
 
-    def update_status(self, status, is_connected):
-        self.status_label.setText(status)
+    def set_state(self, state, detail=""):
+        """Reflete um ConnectionState; chamado apenas em transições reais."""
+        if state in (ConnectionState.ERROR, ConnectionState.FAILED) and detail:
+            self.status_label.setText(detail)
+        else:
+            self.status_label.setText(state.label)
         # O ToggleSwitch gerencia seu próprio estado e estilo
-        if status == CONNECTION_STATES["CONNECTED"] or status == "Conectado":
+        if state.is_active:
             self.toggle_switch.setConnectionState("CONNECTED")
-        elif status == CONNECTION_STATES["DISCONNECTED"] or status == "Desconectado":
-            self.toggle_switch.setConnectionState("DISCONNECTED")
-        elif (
-            CONNECTION_STATES["CONNECTING"] in status or status == "Conectando"
-        ):  # Adicionando suporte para o status retornado pelo IPsec Commander
-            self.toggle_switch.setConnectionState("CONNECTING")
-        elif status == "Não configurado":
-            self.toggle_switch.setConnectionState(
-                "DISCONNECTED"
-            )  # Tratar como desconectado se não estiver configurado
+        elif state in (ConnectionState.CONNECTING, ConnectionState.DISCONNECTING):
+            self.toggle_switch.setConnectionState(state.name)
         else:
-            self.toggle_switch.setConnectionState("DISCONNECTED")  # Estado padrão
+            self.toggle_switch.setConnectionState("DISCONNECTED")
 
     def set_error_state(self, message):
-        self.conn_selector.clear()
+        self.connection_model.set_connections([])
+        self._selected_connection = ""
+        self._server_address = ""
         self.conn_name_label.setText(CONNECTION_STATES["ERROR"])
         self.server_address_label.setText("N/A")
         self.config_file_label.setText("N/A")
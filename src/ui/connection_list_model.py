@@ -0,0 +1,120 @@
+"""
+Connection List Model
+
+Model/view support for the connection selector: a list model over connection names
+with per-row status badges read from the IPsecManager status snapshot, and a proxy
+model for type-ahead filtering of large catalogs.
+"""
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QSortFilterProxyModel, Qt
+from PySide6.QtGui import QColor, QIcon, QPainter, QPixmap
+
+# Cores dos badges, as mesmas do ToggleSwitchButton
+BADGE_COLORS = {
+    "CONNECTED": "#4cd964",
+    "CONNECTING": "#FFA500",
+    "DISCONNECTED": "#d9534f",
+    "UNKNOWN": "#9e9e9e",
+}
+BADGE_SIZE = 10
+
+
+def _badge_key(state) -> str:
+    """Mapeia o ConnectionState do snapshot para uma cor de badge."""
+    if state is None:
+        return "UNKNOWN"
+    if state.is_active:
+        return "CONNECTED"
+    if state.is_transitional:
+        return "CONNECTING"
+    return "DISCONNECTED"
+
+
+class ConnectionListModel(QAbstractListModel):
+    """
+    List model of connection names backed by a shared status snapshot.
+    """
+
+    StatusRole = Qt.UserRole + 1
+
+    def __init__(self, status_snapshot: dict, tooltip_provider=None, parent=None):
+        super().__init__(parent)
+        self._connections = []
+        # Referência ao dicionário do IPsecManager: o modelo nunca consulta o IPsec diretamente
+        self._status_snapshot = status_snapshot
+        # Chamado com (nome, entrada do snapshot) só quando a view pede a dica da linha
+        self._tooltip_provider = tooltip_provider
+        self._badges = {}
+
+    def set_connections(self, connections):
+        """Substitui a lista inteira com um único reset, em vez de inserir item a item."""
+        self.beginResetModel()
+        self._connections = list(connections)
+        self.endResetModel()
+
+    def connection_at(self, row: int) -> str:
+        if 0 <= row < len(self._connections):
+            return self._connections[row]
+        return ""
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._connections)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._connections):
+            return None
+        conn_name = self._connections[index.row()]
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return conn_name
+        if role == Qt.DecorationRole:
+            return self._badge(_badge_key(self._status_snapshot.get(conn_name)))
+        if role == Qt.ToolTipRole:
+            state = self._status_snapshot.get(conn_name)
+            if self._tooltip_provider:
+                return self._tooltip_provider(conn_name, state)
+            return state.label if state else None
+        if role == self.StatusRole:
+            state = self._status_snapshot.get(conn_name)
+            return state.label if state else None
+        return None
+
+    def status_snapshot_changed(self):
+        """Avisa as views que os badges podem ter mudado; apenas as linhas visíveis são repintadas."""
+        if self._connections:
+            self.dataChanged.emit(
+                self.index(0),
+                self.index(len(self._connections) - 1),
+                [Qt.DecorationRole, Qt.ToolTipRole, self.StatusRole],
+            )
+
+    def _badge(self, key: str) -> QIcon:
+        # Um ícone por cor, criado sob demanda e reutilizado por todas as linhas
+        icon = self._badges.get(key)
+        if icon is None:
+            pixmap = QPixmap(BADGE_SIZE, BADGE_SIZE)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(BADGE_COLORS[key]))
+            painter.drawEllipse(0, 0, BADGE_SIZE, BADGE_SIZE)
+            painter.end()
+            icon = QIcon(pixmap)
+            self._badges[key] = icon
+        return icon
+
+
+class ConnectionFilterProxyModel(QSortFilterProxyModel):
+    """
+    Case-insensitive substring filter over connection names.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.setFilterRole(Qt.DisplayRole)
+
+    def set_search_text(self, text: str):
+        self.setFilterFixedString(text.strip())
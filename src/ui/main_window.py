@@ -5,7 +5,6 @@ This module contains the main application class (VPNIPSecClientApp) and all UI c
 for managing IPsec VPN connections.
 """
 
-import os
 from datetime import datetime
 
 from PySide6.QtWidgets import (
@@ -20,12 +19,11 @@ from PySide6.QtWidgets import (
     QMessageBox,
     QStatusBar,
 )
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import QEvent, Qt, QTimer, Signal
 from PySide6.QtGui import QFont, QPalette, QColor, QIcon
 
 # Import from other modules
-from ..ipsec.ipsec_manager import IPsecManager
-from ..loggers.app_loggers import AppLoggers
+from ..ipsec.connection_state import ConnectionState
 from ..config.app_config import (
     CONNECTION_STATES,
     APP_TITLE,
@@ -35,7 +33,8 @@ from ..config.app_config import (
 from .connection_config_widget import ConnectionConfigWidget
 from .status_log_widget import StatusLogWidget
 from ..utils.system_theme import get_system_color_scheme # Importar a nova função
-from .theme_selector import ThemeSelectorWidget
+from ..utils.resources import asset_path, read_asset_text
+from ..utils.single_instance import ACTION_CONNECT, ACTION_DISCONNECT, ACTION_SHOW
 
 
 class MainWindow(QMainWindow):
@@ -43,11 +42,20 @@ class MainWindow(QMainWindow):
     GUI application for managing IPsec VPN connections.
     """
 
-    def __init__(self):
+    # (gateway, endereços anteriores, novos) — vindo da thread do resolver
+    gateway_address_changed = Signal(str, object, object)
+    # CipherRecommendation da comparação de cifras, vindo da thread de medição
+    cipher_benchmark_finished = Signal(object)
+    # PathMtuReport ou mensagem de erro do diagnóstico de MTU, vindo da thread das sondas
+    path_mtu_finished = Signal(object)
+
+    def __init__(self, controller):
         super().__init__()
-        self.connection_manager = IPsecManager()
-        self.log_manager = AppLoggers()
-        self.is_connected = False
+        self.controller = controller
+        # Serviços do AppController: no modo bandeja sobrevivem à janela
+        self.connection_manager = controller.connection_manager
+        self.log_manager = controller.log_manager
+        self.status_scheduler = controller.status_scheduler
         self.current_conn_name = None
         self.initUI()
 
@@ -57,9 +65,8 @@ class MainWindow(QMainWindow):
         self.setMinimumSize(*WINDOW_SIZE)
 
         # Set window icon
-        script_dir = os.path.dirname(os.path.realpath(__file__))
-        # Navigate up to src/ then to assets/
-        icon_path = os.path.join(script_dir, "..", "assets", "icon.svg")
+        # Recurso Qt compilado nos pacotes, src/assets/ em desenvolvimento
+        icon_path = asset_path("icon.svg")
         icon = QIcon(icon_path)
         if icon.isNull():
             print(f"WARNING: Failed to load application icon from: {icon_path}")
@@ -83,6 +90,8 @@ class MainWindow(QMainWindow):
         self.config_widget = ConnectionConfigWidget(self.connection_manager)
         self.config_widget.connection_changed.connect(self.on_connection_changed)
         self.config_widget.toggle_requested.connect(self.toggle_connection)
+        self.config_widget.cipher_benchmark_requested.connect(self.run_cipher_benchmark)
+        self.cipher_benchmark_finished.connect(self.on_cipher_benchmark_finished)
         layout.addWidget(self.config_widget)
 
         self.status_log_widget = StatusLogWidget()
@@ -91,21 +100,42 @@ class MainWindow(QMainWindow):
 
         buttons_layout = QHBoxLayout()
         buttons_layout.addStretch()
+        history_button = QPushButton("Histórico")
+        history_button.clicked.connect(self.show_session_history)
+        buttons_layout.addWidget(history_button)
+        speed_test_button = QPushButton("Velocidade")
+        speed_test_button.clicked.connect(self.show_speed_test)
+        buttons_layout.addWidget(speed_test_button)
+        self.path_mtu_button = QPushButton("MTU")
+        self.path_mtu_button.clicked.connect(self.run_path_mtu_check)
+        self.path_mtu_finished.connect(self.on_path_mtu_finished)
+        buttons_layout.addWidget(self.path_mtu_button)
         layout.addLayout(buttons_layout)
 
         self.add_status_message(DEFAULT_MESSAGES["INIT"])
         self.add_status_message(DEFAULT_MESSAGES["CHECKING_CONFIG"])
 
+        # Todas as consultas de status passam pelo agendador; a janela apenas assina as mudanças
+        self.status_scheduler.state_changed.connect(self.on_state_changed)
+        self.status_scheduler.snapshot_updated.connect(self.on_status_snapshot_updated)
+
+        # O resolver chama seus ouvintes em outra thread; o sinal entrega a mudança na thread da UI
+        self.gateway_address_changed.connect(self.on_gateway_address_changed)
+        self.connection_manager.resolver.add_change_listener(self.gateway_address_changed.emit)
+
+        # Linhas do charon, lidas pelo AppController; a janela exibe as da conexão selecionada
+        self.controller.charon_log_tailer.lines_ready.connect(self.on_charon_log_lines)
+        self.controller.connect_finished.connect(self.on_connect_finished)
+
         self.load_ipsec_config()
-        
-        # Iniciar um timer para verificar periodicamente o status da conexão
-        self.status_timer = QTimer()
-        self.status_timer.timeout.connect(self.refresh_connection_status_if_needed)
-        self.status_timer.start(5000)  # Atualizar a cada 5 segundos
-        
-        # Adicionar controle de tempo para evitar chamadas muito frequentes
-        import time
-        self._last_refresh_time = time.time()
+
+        # O seletor de tema não é necessário para a primeira exibição:
+        # são carregados na primeira volta do loop de eventos, com a janela já visível
+        QTimer.singleShot(0, self._init_deferred_subsystems)
+
+    def _init_deferred_subsystems(self):
+        """Cria os componentes opcionais depois que a janela foi exibida."""
+        from .theme_selector import ThemeSelectorWidget
 
         # Criar o seletor de tema e adicionar à interface
         self.theme_selector = ThemeSelectorWidget()
@@ -113,12 +143,14 @@ class MainWindow(QMainWindow):
         self.theme_selector.theme_changed.connect(self.handle_theme_change)
         
         # Adicionar o seletor de tema ao layout principal
-        layout.addWidget(self.theme_selector)
+        self.centralWidget().layout().addWidget(self.theme_selector)
         
         # Iniciar um timer para verificar periodicamente o tema do sistema (quando em modo automático)
-        self.theme_timer = QTimer()
+        self.theme_timer = QTimer(self)
         self.theme_timer.timeout.connect(self.update_theme)
-        self.theme_timer.start(10000)  # Verificar a cada 10 segundos
+        self.theme_timer.setInterval(10000)  # Verificar a cada 10 segundos
+        if not self.isMinimized():
+            self.theme_timer.start()
         self.current_app_theme = get_system_color_scheme() # Armazenar o tema atual do app
         
         # Definir o tema inicial como automático
@@ -130,17 +162,24 @@ class MainWindow(QMainWindow):
         """Carrega a configuração IPsec do sistema."""
         try:
             connections = self.connection_manager.load_connections()
+            self.controller.set_connections(connections)
+
+            for conn_name, files in self.connection_manager.duplicate_connections.items():
+                self.add_status_message(
+                    f"Conexão '{conn_name}' definida em mais de um arquivo "
+                    f"({', '.join(files)}); usando '{files[0]}'."
+                )
 
             if connections:
                 self.config_widget.set_connections(connections)
+                # Janela recriada (modo bandeja): voltar à conexão que estava selecionada
+                if self.controller.current_conn_name in connections:
+                    self.config_widget.select_connection(self.controller.current_conn_name)
                 first_conn = self.config_widget.get_selected_connection()
                 self.current_conn_name = first_conn
-                config_file_path, server_addr, conn_details = (
-                    self.connection_manager.get_connection_details(first_conn)
-                )
-                self.config_widget.update_connection_details(
-                    first_conn, config_file_path, server_addr, conn_details
-                )
+                self.controller.select_connection(first_conn)
+                record = self.connection_manager.get_connection_details(first_conn)
+                self.config_widget.update_connection_details(record)
                 self.refresh_connection_status()
                 self.add_status_message(f"Loaded IPsec configuration: {first_conn}")
             else:
@@ -156,86 +195,107 @@ class MainWindow(QMainWindow):
         """Atualiza a interface quando a conexão selecionada muda."""
         if conn_name:
             self.current_conn_name = conn_name
-            config_file_path, server_addr, conn_details = (
-                self.connection_manager.get_connection_details(conn_name)
-            )
-            self.config_widget.update_connection_details(
-                conn_name, config_file_path, server_addr, conn_details
-            )
+            self.controller.select_connection(conn_name)
+            record = self.connection_manager.get_connection_details(conn_name)
+            self.config_widget.update_connection_details(record)
             self.refresh_connection_status()
 
     def refresh_connection_status(self):
-        """Atualiza o status da conexão atual."""
-        if not self.current_conn_name or self.current_conn_name in [
+        """Exibe o estado conhecido da conexão atual e pede uma nova consulta."""
+        if not self._has_selected_connection():
+            return
+        machine = self.connection_manager.get_state_machine(self.current_conn_name)
+        self._apply_current_state(machine.state, machine.detail)
+        self.status_scheduler.request_refresh()
+
+    def on_state_changed(self, transition):
+        """Recebe as transições de estado de qualquer conexão."""
+        self.add_status_message(
+            f"{transition.conn_name}: {transition.previous.label} -> {transition.state.label}",
+            show_in_ui=False,
+        )
+        if transition.conn_name == self.current_conn_name:
+            self._apply_current_state(transition.state, transition.detail)
+        tracer = self.connection_manager.tracer
+        if tracer is not None and not transition.state.is_transitional:
+            trace = tracer.pop_finished(transition.conn_name)
+            if trace is not None:
+                self.add_status_message(trace.summary(), show_in_ui=False)
+
+    def on_charon_log_lines(self, conn_name, lines):
+        """Exibe as linhas do charon da conexão selecionada."""
+        if conn_name == self.current_conn_name:
+            self.status_log_widget.add_log_lines(lines)
+
+    def on_gateway_address_changed(self, gateway, old_addresses, new_addresses):
+        """Registra a mudança de endereço de um gateway e atualiza os detalhes exibidos."""
+        self.add_status_message(
+            f"Endereço do gateway {gateway} mudou: {', '.join(old_addresses)} -> {', '.join(new_addresses)}",
+            show_in_ui=False,
+        )
+        if self._has_selected_connection():
+            record = self.connection_manager.get_connection_details(self.current_conn_name)
+            if record.is_valid and record.server_address == gateway:
+                self.config_widget.update_connection_details(record)
+
+    def on_status_snapshot_updated(self):
+        """Atualiza os badges do seletor e o resumo dos rekeys/modo rápido após cada consulta."""
+        self.config_widget.refresh_status_badges()
+        if not self._has_selected_connection():
+            return
+        # O gateway da conexão recém-selecionada pode ter sido resolvido desde a seleção
+        self.config_widget.refresh_server_address()
+        lines = [self.connection_manager.fast_connect_text(self.current_conn_name)]
+        monitor = self.connection_manager.rekey_monitor
+        if monitor is not None:
+            lines.append(monitor.status_text(self.current_conn_name))
+        self.config_widget.status_label.setToolTip("\n".join(line for line in lines if line))
+
+    def _has_selected_connection(self):
+        return bool(self.current_conn_name) and self.current_conn_name not in [
             "No configurations found",
             "Not installed",
             CONNECTION_STATES["ERROR"],
-        ]:
-            return
+        ]
 
-        # Evitar atualizações muito frequentes
-        import time
-        current_time = time.time()
-        # Verificar se o atributo existe, senão inicializar
-        if not hasattr(self, '_last_refresh_time'):
-            self._last_refresh_time = current_time - 2  # Definir um valor antigo para permitir a primeira atualização
-            
-        if current_time - self._last_refresh_time < 1:  # No mínimo 1 segundo entre atualizações
-            return
-        self._last_refresh_time = current_time
+    def _apply_current_state(self, state, detail=""):
+        """Reflete o estado da conexão atual na interface e registra as mudanças de conexão."""
+        self.config_widget.set_state(state, detail)
 
-        status, is_connected = self.connection_manager.get_connection_status(
-            self.current_conn_name
-        )
-        self.config_widget.update_status(status, is_connected)
-
-        # Verificar se houve mudança no estado de conexão
-        if is_connected and not self.is_connected:
-            # Mudança para conectado
-            self.is_connected = True
-            self.log_manager.set_connection_status(True)
-            self.log_manager.create_log_file(self.current_conn_name)
-            self.add_status_message(
-                f"Connected to {self.current_conn_name}. Log file created.",
-                show_in_ui=True,
-            )
-        elif not is_connected and self.is_connected:
-            # Mudança para desconectado
-            self.is_connected = False
-            self.log_manager.set_connection_status(False)
-            self.log_manager.delete_log_file()
-            self.add_status_message(
-                f"Disconnected from {self.current_conn_name}.", show_in_ui=True
-            )
+        # Início/fim da sessão; o estado fica no log_manager e sobrevive à janela
+        message = self.log_manager.track_connection_state(self.current_conn_name, state)
+        if message:
+            self.add_status_message(message, show_in_ui=True)
+
+    def _restore_current_state(self):
+        """Desfaz no toggle um clique que não resultou em ação."""
+        if self._has_selected_connection():
+            machine = self.connection_manager.get_state_machine(self.current_conn_name)
+            self.config_widget.set_state(machine.state, machine.detail)
+        else:
+            self.config_widget.set_state(ConnectionState.DISCONNECTED)
 
     def toggle_connection(self, is_checked: bool):
         """Alterna a conexão IPsec entre ON/OFF."""
-        if not self.current_conn_name or self.current_conn_name in [
-            "No configurations found",
-            "Not installed",
-            CONNECTION_STATES["ERROR"],
-        ]:
+        if not self._has_selected_connection():
             QMessageBox.critical(
                 self, "Error", "No IPsec configuration available to connect."
             )
             # Resetar o toggle switch para o estado anterior se houver um erro
-            QTimer.singleShot(100, lambda: self.config_widget.update_status(CONNECTION_STATES["DISCONNECTED"], False))
+            self._restore_current_state()
+            return
+
+        state = self.connection_manager.get_connection_state(self.current_conn_name)
+        if state.is_transitional:
+            # Já está conectando/desconectando, não fazer nada
+            self._restore_current_state()
             return
 
         if is_checked:
-            # Verificar se já está conectando ou conectado para evitar ações duplicadas
-            current_status, _ = self.connection_manager.get_connection_status(
-                self.current_conn_name
-            )
-            if current_status == CONNECTION_STATES["CONNECTING"]:
-                # Já está tentando conectar, não fazer nada
+            if state.is_active:
+                # Se já está conectado, apenas refletir o estado correto
+                self._restore_current_state()
                 return
-            elif current_status == CONNECTION_STATES["CONNECTED"]:
-                # Se já está conectado, atualizar o status para refletir o estado correto
-                QTimer.singleShot(100, lambda: self.config_widget.update_status(CONNECTION_STATES["CONNECTED"], True))
-                return
-
-            self.config_widget.update_status(CONNECTION_STATES["CONNECTING"], False)
             self.connect_vpn()
         else:
             self.disconnect_vpn()
@@ -247,20 +307,15 @@ class MainWindow(QMainWindow):
         self.add_status_message(
             f"Initiating IPsec connection: {self.current_conn_name}..."
         )
-        success, message = self.connection_manager.connect_connection(
-            self.current_conn_name
-        )
+        # Diagnóstico e 'ipsec up' rodam na thread de ações; o resultado chega por connect_finished
+        self.controller.start_connect(self.current_conn_name)
+
+    def on_connect_finished(self, conn_name, success, message):
+        """Exibe o resultado de uma conexão iniciada pela janela, pela bandeja ou por outra instância."""
+        report = self.connection_manager.last_preflight
+        if success and report is not None and report.conn_name == conn_name:
+            self.add_status_message(report.summary(), show_in_ui=False)
         self.add_status_message(message, show_in_ui=True)
-        
-        if success:
-            # Aguardar um tempo menor e verificar o status mais vezes para feedback mais rápido
-            # Atualizar status após a tentativa de conexão
-            QTimer.singleShot(1500, self.refresh_connection_status)  # Verificar após 1.5 segundos
-            QTimer.singleShot(4000, self.refresh_connection_status)  # Verificar novamente após 4 segundos
-        else:
-            # Em caso de falha, restaurar o estado do toggle para DISCONNECTED
-            # Usar uma chamada adiada para evitar conflitos durante a transição
-            QTimer.singleShot(100, lambda: self.config_widget.update_status(CONNECTION_STATES["DISCONNECTED"], False))
 
     def disconnect_vpn(self):
         """Desconecta do servidor VPN usando IPsec."""
@@ -274,15 +329,126 @@ class MainWindow(QMainWindow):
             self.current_conn_name
         )
         self.add_status_message(message, show_in_ui=True)
-        
-        if success:
-            # Verificar status com um intervalo adequado
-            QTimer.singleShot(1500, self.refresh_connection_status)  # Verificar após 1.5 segundos
-            QTimer.singleShot(4000, self.refresh_connection_status)  # Verificar novamente após 4 segundos
-        else:
-            # Em caso de falha, atualizar o status para refletir o estado real
-            # Usar uma chamada adiada para evitar conflitos durante a transição
-            QTimer.singleShot(100, self.refresh_connection_status)
+
+    def handle_instance_command(self, command):
+        """Executa um comando repassado por outra execução da aplicação (--show/--connect/--disconnect)."""
+        # Qualquer comando traz a janela para a frente, para que o resultado fique visível
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
+        action = command["action"]
+        if action == ACTION_SHOW:
+            return
+
+        conn_name = command.get("connection")
+        if conn_name and conn_name != self.current_conn_name:
+            if not self.config_widget.select_connection(conn_name):
+                self.add_status_message(f"Conexão '{conn_name}' não encontrada.")
+                return
+        if not self._has_selected_connection():
+            self.add_status_message(DEFAULT_MESSAGES["NO_CONFIGS"])
+            return
+
+        state = self.connection_manager.get_connection_state(self.current_conn_name)
+        if state.is_transitional:
+            self.add_status_message(f"{self.current_conn_name}: {state.label}")
+        elif action == ACTION_CONNECT:
+            if state.is_active:
+                self.add_status_message(f"{self.current_conn_name} já está conectada.")
+            else:
+                self.connect_vpn()
+        elif action == ACTION_DISCONNECT:
+            if state.is_active:
+                self.disconnect_vpn()
+            else:
+                self.add_status_message(f"{self.current_conn_name} não está conectada.")
+
+    def show_session_history(self):
+        """Abre o histórico de sessões (índice do log) e a disponibilidade dos túneis."""
+        from .session_history_dialog import SessionHistoryDialog
+
+        dialog = SessionHistoryDialog(
+            self.log_manager.session_index, self, event_store=self.log_manager.event_store
+        )
+        dialog.exec()
+
+    def show_speed_test(self):
+        """Abre o teste de vazão do túnel selecionado e os resultados anteriores."""
+        if not self._has_selected_connection():
+            return
+        from .speed_test_dialog import SpeedTestDialog
+
+        if not self.connection_manager.get_connection_state(self.current_conn_name).is_connected:
+            self.add_status_message(
+                f"{self.current_conn_name} não está conectada; o teste não passará pelo túnel.",
+                show_in_ui=True,
+            )
+        dialog = SpeedTestDialog(
+            self.connection_manager, self.log_manager.event_store, self.current_conn_name, self
+        )
+        dialog.exec()
+
+    def run_path_mtu_check(self):
+        """Diagnóstico de MTU do túnel selecionado em segundo plano (sondas levam alguns segundos)."""
+        if not self._has_selected_connection():
+            return
+        import threading
+
+        conn_name = self.current_conn_name
+        self.path_mtu_button.setEnabled(False)
+        self.add_status_message(f"Verificando o MTU através do túnel {conn_name}...", show_in_ui=True)
+
+        def worker():
+            try:
+                outcome = self.connection_manager.run_path_mtu_check(conn_name)
+            except (OSError, ValueError) as e:
+                outcome = f"Diagnóstico de MTU de {conn_name} falhou: {e}"
+            try:
+                self.path_mtu_finished.emit(outcome)
+            except RuntimeError:
+                # Janela destruída durante as sondas (modo bandeja)
+                pass
+
+        threading.Thread(target=worker, name="path-mtu", daemon=True).start()
+
+    def on_path_mtu_finished(self, outcome):
+        self.path_mtu_button.setEnabled(True)
+        if isinstance(outcome, str):
+            self.add_status_message(outcome, show_in_ui=True)
+            return
+        # O relatório foi pedido explicitamente: vai inteiro para o painel
+        for line in outcome.describe().splitlines():
+            self.add_status_message(line, show_in_ui=True)
+
+    def run_cipher_benchmark(self):
+        """Compara as cifras ESP da conexão selecionada em segundo plano (cache por máquina)."""
+        if not self._has_selected_connection():
+            return
+        import threading
+
+        from ..ipsec.cipher_benchmark import recommend
+
+        record = self.connection_manager.get_connection_details(self.current_conn_name)
+        self.config_widget.benchmark_button.setEnabled(False)
+        self.add_status_message(f"Comparando as cifras ESP de {record.name}...", show_in_ui=True)
+
+        def worker():
+            result = recommend(record)
+            try:
+                self.cipher_benchmark_finished.emit(result)
+            except RuntimeError:
+                # Janela destruída durante a medição (modo bandeja)
+                pass
+
+        threading.Thread(target=worker, name="cipher-benchmark", daemon=True).start()
+
+    def on_cipher_benchmark_finished(self, result):
+        self.config_widget.benchmark_button.setEnabled(True)
+        for line in result.describe().splitlines()[:-1]:
+            self.add_status_message(line, show_in_ui=False)
+        self.add_status_message(result.summary(), show_in_ui=True)
+        if result.conn_name == self.current_conn_name:
+            self.config_widget.protocols_label.setToolTip(result.describe())
 
     def clear_logs(self):
         """Limpa o display de logs."""
@@ -298,34 +464,6 @@ class MainWindow(QMainWindow):
         if show_in_ui:
             self.status_log_widget.add_message(message)
 
-    def refresh_connection_status_if_needed(self):
-        """Atualiza o status da conexão se não estiver em estado de transição."""
-        if not self.current_conn_name:
-            return
-            
-        # Evitar atualizações muito frequentes
-        import time
-        current_time = time.time()
-        # Verificar se o atributo existe, senão inicializar
-        if not hasattr(self, '_last_refresh_time'):
-            self._last_refresh_time = current_time - 2  # Definir um valor antigo para permitir a primeira atualização
-            
-        if current_time - self._last_refresh_time < 1:  # No mínimo 1 segundo entre atualizações
-            return
-        self._last_refresh_time = current_time
-            
-        # Obter o status atual da conexão
-        status, is_connected = self.connection_manager.get_connection_status(
-            self.current_conn_name
-        )
-        
-        # Atualizar apenas se não estiver em estado de transição (CONNECTING/DISCONNECTING)
-        # Levando em consideração os status retornados em português também
-        if status not in [CONNECTION_STATES["CONNECTING"], CONNECTION_STATES["DISCONNECTING"], "Conectando"]:
-            # Só atualizar o widget de status, mas não executar ações de logging/mensagem
-            # que já são tratadas em connect_vpn/disconnect_vpn
-            self.config_widget.update_status(status, is_connected)
-
     def center_window(self):
         """Centraliza a janela na tela."""
         window_geometry = self.frameGeometry()
@@ -369,32 +507,39 @@ class MainWindow(QMainWindow):
         """Aplica o tema especificado."""
         app = QApplication.instance()
         if app:
-            script_dir = os.path.dirname(os.path.realpath(__file__))
             if theme.lower() == "dark":
-                style_path = os.path.join(script_dir, "..", "assets", "styles", "dark_theme.qss")
+                style_name = "styles/dark_theme.qss"
             else:
-                style_path = os.path.join(script_dir, "..", "assets", "styles", "light_theme.qss")
+                style_name = "styles/light_theme.qss"
             
-            if os.path.exists(style_path):
-                with open(style_path, "r") as f:
-                    app.setStyleSheet(f.read())
+            stylesheet = read_asset_text(style_name)
+            if stylesheet:
+                app.setStyleSheet(stylesheet)
             else:
-                print(f"WARNING: Stylesheet not found: {style_path}")
+                print(f"WARNING: Stylesheet not found: {asset_path(style_name)}")
+
+    def changeEvent(self, event):
+        """Minimizada, a janela não verifica o tema e as consultas de status são espaçadas."""
+        if event.type() == QEvent.WindowStateChange:
+            minimized = self.isMinimized()
+            self.controller.set_background(minimized)
+            theme_timer = getattr(self, "theme_timer", None)
+            if theme_timer is not None:
+                if minimized:
+                    theme_timer.stop()
+                else:
+                    theme_timer.start()
+                    self.update_theme()
+        super().changeEvent(event)
 
     def closeEvent(self, event):
-        """Lida com o evento de fechamento da janela, desconectando a VPN se estiver conectada."""
-        if self.is_connected and self.current_conn_name:
-            # Desconecta automaticamente a VPN ao fechar o aplicativo
-            self.add_status_message(f"Desconectando IPsec connection: {self.current_conn_name} antes de sair...", show_in_ui=True)
-            success, message = self.connection_manager.disconnect_connection(self.current_conn_name)
-            self.add_status_message(message, show_in_ui=True)
-            
-            if success:
-                self.add_status_message(f"VPN '{self.current_conn_name}' desconectada com sucesso antes de sair.", show_in_ui=True)
-                event.accept()  # Aceita o evento de fechamento
-            else:
-                # Mesmo se falhar, permitir o fechamento do aplicativo
-                self.add_status_message(f"Falha ao desconectar VPN '{self.current_conn_name}' antes de sair, mas aplicativo será fechado: {message}", show_in_ui=True)
-                event.accept()  # Aceita o evento de fechamento
-        else:
-            event.accept()  # Se não estiver conectado, apenas fecha o app
\ No newline at end of file
+        """Desliga a janela dos serviços; ao sair, o AppController desconecta a VPN ativa."""
+        self.controller.charon_log_tailer.lines_ready.disconnect(self.on_charon_log_lines)
+        self.controller.connect_finished.disconnect(self.on_connect_finished)
+        theme_timer = getattr(self, "theme_timer", None)
+        if theme_timer is not None:
+            theme_timer.stop()
+        self.status_scheduler.state_changed.disconnect(self.on_state_changed)
+        self.status_scheduler.snapshot_updated.disconnect(self.on_status_snapshot_updated)
+        self.connection_manager.resolver.remove_change_listener(self.gateway_address_changed.emit)
+        event.accept()
@@ -0,0 +1,152 @@
+"""
+Session History Dialog
+
+Lists past connection sessions from the session index and shows the messages of the
+selected one, read by seeking straight to its offset in the application log.
+Above them, the availability of each tunnel (uptime, drops, MTBF, rekeys) over the chosen
+period, queried from the event store.
+"""
+
+import time
+from datetime import datetime
+
+from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QComboBox,
+    QDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QSplitter,
+    QTableWidget,
+    QTableWidgetItem,
+    QTextEdit,
+    QVBoxLayout,
+)
+from PySide6.QtCore import Qt
+
+from ..loggers.event_store import format_duration as format_uptime, format_ratio, format_rekeys
+
+# Períodos oferecidos para a disponibilidade: (rótulo, segundos)
+AVAILABILITY_PERIODS = (("24 horas", 86400), ("7 dias", 7 * 86400), ("30 dias", 30 * 86400))
+
+
+def _format_time(timestamp) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _format_duration(seconds) -> str:
+    if seconds is None:
+        return "interrompida"
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+
+
+class SessionHistoryDialog(QDialog):
+    """
+    Dialog listing past sessions, newest first.
+    """
+
+    def __init__(self, session_index, parent=None, event_store=None):
+        super().__init__(parent)
+        self.session_index = session_index
+        self.event_store = event_store
+        self.sessions = []
+        self.setWindowTitle("Histórico de Sessões")
+        self.resize(640, 560)
+        self.initUI()
+        self.load_availability()
+        self.load_sessions()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+        splitter = QSplitter(Qt.Vertical)
+
+        if self.event_store is not None:
+            period_layout = QHBoxLayout()
+            period_layout.addWidget(QLabel("Disponibilidade nos últimos"))
+            self.period_combo = QComboBox()
+            for label, _seconds in AVAILABILITY_PERIODS:
+                self.period_combo.addItem(label)
+            self.period_combo.setCurrentIndex(1)
+            self.period_combo.currentIndexChanged.connect(self.load_availability)
+            period_layout.addWidget(self.period_combo)
+            period_layout.addStretch()
+            layout.addLayout(period_layout)
+
+            self.availability_table = QTableWidget(0, 6)
+            self.availability_table.setHorizontalHeaderLabels(
+                ["Conexão", "Disponibilidade", "Quedas", "MTBF", "Reconexões", "Rekeys"]
+            )
+            self.availability_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            self.availability_table.setSelectionMode(QAbstractItemView.NoSelection)
+            self.availability_table.verticalHeader().setVisible(False)
+            self.availability_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+            splitter.addWidget(self.availability_table)
+
+        self.sessions_table = QTableWidget(0, 3)
+        self.sessions_table.setHorizontalHeaderLabels(["Início", "Conexão", "Duração"])
+        self.sessions_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.sessions_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.sessions_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.sessions_table.verticalHeader().setVisible(False)
+        self.sessions_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.sessions_table.currentCellChanged.connect(self._on_session_selected)
+        splitter.addWidget(self.sessions_table)
+
+        self.session_view = QTextEdit()
+        self.session_view.setReadOnly(True)
+        splitter.addWidget(self.session_view)
+
+        layout.addWidget(splitter)
+
+    def load_availability(self):
+        """Consulta a disponibilidade de cada conexão no período escolhido."""
+        if self.event_store is None:
+            return
+        _label, seconds = AVAILABILITY_PERIODS[self.period_combo.currentIndex()]
+        rows = self.event_store.summary(time.time() - seconds)
+        self.availability_table.setRowCount(len(rows))
+        for row, availability in enumerate(rows):
+            values = (
+                availability.conn_name,
+                format_ratio(availability.uptime_ratio),
+                str(availability.drops),
+                format_uptime(availability.mtbf),
+                str(availability.reconnects),
+                format_rekeys(availability),
+            )
+            for column, value in enumerate(values):
+                self.availability_table.setItem(row, column, QTableWidgetItem(value))
+
+    def load_sessions(self):
+        """Preenche a tabela a partir do índice, sem ler o log."""
+        self.sessions = self.session_index.list_sessions()
+        current = self.session_index.current
+        self.sessions_table.setRowCount(len(self.sessions))
+        for row, session in enumerate(self.sessions):
+            if current is not None and session.session_id == current.session_id:
+                duration = "em andamento"
+            else:
+                duration = _format_duration(session.duration)
+            self.sessions_table.setItem(row, 0, QTableWidgetItem(_format_time(session.start)))
+            self.sessions_table.setItem(row, 1, QTableWidgetItem(session.conn_name))
+            self.sessions_table.setItem(row, 2, QTableWidgetItem(duration))
+        if self.sessions:
+            self.sessions_table.selectRow(0)
+
+    def _on_session_selected(self, row, _column, _previous_row, _previous_column):
+        if not 0 <= row < len(self.sessions):
+            self.session_view.clear()
+            return
+        records = self.session_index.read_session(self.sessions[row])
+        lines = []
+        for record in records:
+            if record.get("type") == "message":
+                lines.append(f"[{_format_time(record['time'])}] {record.get('message', '')}")
+            elif record.get("type") == "session_start":
+                lines.append(f"[{_format_time(record['time'])}] Início da sessão: {record.get('conn', '')}")
+            elif record.get("type") == "session_end":
+                lines.append(f"[{_format_time(record['time'])}] Fim da sessão")
+        self.session_view.setPlainText("\n".join(lines))
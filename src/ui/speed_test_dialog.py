@@ -0,0 +1,138 @@
+"""
+Speed Test Dialog
+
+Runs a throughput test through the selected tunnel against a server inside its
+rightsubnet (see src/ipsec/throughput.py) and lists the previous results of the
+connection, recorded in the event store together with the negotiated cipher suite.
+"""
+
+import threading
+from datetime import datetime
+
+from PySide6.QtCore import Signal
+from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QComboBox,
+    QDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+
+def _format_result(row) -> tuple:
+    if row["mode"] == "tcp":
+        details = f"{row['retransmits'] if row['retransmits'] is not None else '-'} retransmissões"
+        if row["rtt_ms"] is not None:
+            details += f", RTT {row['rtt_ms']:.1f} ms"
+    else:
+        loss = row["lost"] / row["sent"] * 100 if row["sent"] else 0.0
+        details = f"perda {loss:.2f}%, jitter {row['jitter_ms'] or 0:.2f} ms"
+    return (
+        datetime.fromtimestamp(row["time"]).strftime("%Y-%m-%d %H:%M"),
+        row["mode"].upper(),
+        f"{row['goodput_bps'] / 1e6:.1f} Mbit/s",
+        details,
+        row["cipher"] or "--",
+    )
+
+
+class SpeedTestDialog(QDialog):
+    """
+    Dialog with the test controls and the connection's result history.
+    """
+
+    # SpeedTestResult ou mensagem de erro, vindo da thread do teste
+    _finished = Signal(object)
+
+    def __init__(self, connection_manager, event_store, conn_name, parent=None):
+        super().__init__(parent)
+        self.connection_manager = connection_manager
+        self.event_store = event_store
+        self.conn_name = conn_name
+        self.setWindowTitle(f"Teste de Velocidade - {conn_name}")
+        self.resize(640, 400)
+        self._finished.connect(self._on_finished)
+        self.initUI()
+        self.load_results()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Servidor:"))
+        self.target_field = QLineEdit()
+        self.target_field.setPlaceholderText("host[:porta] dentro do rightsubnet")
+        self.target_field.setText(self._default_target())
+        controls.addWidget(self.target_field, 1)
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(["TCP", "UDP"])
+        controls.addWidget(self.mode_combo)
+        self.run_button = QPushButton("Testar")
+        self.run_button.clicked.connect(self.run_test)
+        controls.addWidget(self.run_button)
+        layout.addLayout(controls)
+
+        self.status_label = QLabel("")
+        self.status_label.setWordWrap(True)
+        layout.addWidget(self.status_label)
+
+        self.results_table = QTableWidget(0, 5)
+        self.results_table.setHorizontalHeaderLabels(["Data", "Modo", "Vazão", "Detalhes", "Cifra"])
+        self.results_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.results_table.verticalHeader().setVisible(False)
+        self.results_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        layout.addWidget(self.results_table)
+
+    def _default_target(self):
+        """Servidor configurado para a conexão ou o do último teste."""
+        configured = self.connection_manager.speed_test_target(self.conn_name)
+        if configured:
+            return configured
+        previous = self.event_store.speed_tests(self.conn_name, limit=1)
+        return previous[0]["target"] if previous else ""
+
+    def load_results(self):
+        rows = self.event_store.speed_tests(self.conn_name)
+        self.results_table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            for column, value in enumerate(_format_result(row)):
+                self.results_table.setItem(row_index, column, QTableWidgetItem(value))
+
+    def run_test(self):
+        """Executa o teste em segundo plano; a janela continua respondendo."""
+        target = self.target_field.text().strip()
+        if not target:
+            self.status_label.setText("Informe o servidor de teste (python -m src.ipsec.throughput server).")
+            return
+        udp = self.mode_combo.currentText() == "UDP"
+        self.run_button.setEnabled(False)
+        self.status_label.setText(f"Testando {target}...")
+
+        def worker():
+            try:
+                outcome = self.connection_manager.run_speed_test(self.conn_name, target, udp)
+            except (OSError, ValueError) as e:
+                outcome = str(e)
+            try:
+                self._finished.emit(outcome)
+            except RuntimeError:
+                # Diálogo fechado durante o teste
+                pass
+
+        threading.Thread(target=worker, name="speed-test", daemon=True).start()
+
+    def _on_finished(self, outcome):
+        self.run_button.setEnabled(True)
+        if isinstance(outcome, str):
+            self.status_label.setText(f"Falha no teste: {outcome}")
+            return
+        self.event_store.record_speed_test(outcome)
+        self.status_label.setText(outcome.summary())
+        self.load_results()
@@ -1,4 +1,3 @@
-import os
 from datetime import datetime
 
 from PySide6.QtWidgets import (
@@ -10,9 +9,11 @@ from PySide6.QtWidgets import (
     QTextEdit,
     QFrame,
 )
-from PySide6.QtCore import Qt, Signal
-from PySide6.QtGui import QFont, QIcon, QPixmap, QPainter
-from PySide6.QtSvg import QSvgRenderer
+from PySide6.QtCore import Signal
+from PySide6.QtGui import QFont, QIcon
+
+from ..config.app_config import STATUS_LOG_MAX_LINES
+from ..utils.resources import asset_path
 
 
 class StatusLogWidget(QWidget):
@@ -37,16 +38,9 @@ class StatusLogWidget(QWidget):
         
         # Botão de limpar logs
         clear_logs_btn = QPushButton()
-        icon_path = os.path.join(
-            os.path.dirname(__file__), "..", "assets", "clear_log_icon.svg"
-        )
-        pixmap = QPixmap(18, 18)  # Tamanho do pixmap igual ao tamanho do botão
-        pixmap.fill(Qt.transparent)
-        painter = QPainter(pixmap)
-        svg_renderer = QSvgRenderer(icon_path)
-        svg_renderer.render(painter)
-        painter.end()
-        clear_logs_btn.setIcon(QIcon(pixmap))
+        icon_path = asset_path("clear_log_icon.svg")
+        # O QIcon rasteriza o SVG sob demanda pelo plugin de ícones do Qt, sem importar o QtSvg
+        clear_logs_btn.setIcon(QIcon(icon_path))
         clear_logs_btn.clicked.connect(self.clear_logs_requested.emit)
         clear_logs_btn.setStyleSheet(
             "QPushButton {"
@@ -88,6 +82,8 @@ class StatusLogWidget(QWidget):
         self.status_display.setFrameStyle(QFrame.StyledPanel | QFrame.Sunken)
         # Adiciona um pequeno espaçamento à direita para evitar sobreposição do scrollbar
         self.status_display.setViewportMargins(0, 0, 10, 0)
+        # Limita o painel: as linhas do charon podem chegar continuamente
+        self.status_display.document().setMaximumBlockCount(STATUS_LOG_MAX_LINES)
 
         main_layout.addWidget(self.status_display)
         
@@ -100,6 +96,11 @@ class StatusLogWidget(QWidget):
             formatted_message = f"[{timestamp}] {message}"
             self.status_display.append(formatted_message)
 
+    def add_log_lines(self, lines):
+        """Acrescenta um lote de linhas do log do charon com uma única atualização."""
+        if lines:
+            self.status_display.append("\n".join(lines))
+
     def _is_routine_status_message(self, message: str) -> bool:
         """Verifica se a mensagem é de status rotineira."""
         routine_messages = [
@@ -29,13 +29,13 @@ class ToggleSwitchButton(QWidget):
         self._target = 2.0
         self._speed = 0.15
 
-        # Simplificar para 3 estados
-        self._current_state = "DISCONNECTED"  # Pode ser "CONNECTED", "DISCONNECTED", "CONNECTING"
+        # Pode ser "CONNECTED", "DISCONNECTED", "CONNECTING" ou "DISCONNECTING"
+        self._current_state = "DISCONNECTED"
 
-        self._timer = QTimer()
+        # O timer só roda enquanto a bolinha está em movimento
+        self._timer = QTimer(self)
         self._timer.setInterval(15)
         self._timer.timeout.connect(self._animate)
-        self._timer.start()
 
     def sizeHint(self):
         return QSize(self._width, self._height)
@@ -46,7 +46,7 @@ class ToggleSwitchButton(QWidget):
             "DISCONNECTING",
         ]:
             self._checked = not self._checked
-            self._target = self._width - self._height + 2 if self._checked else 2
+            self._move_thumb(self._width - self._height + 2 if self._checked else 2)
             self.stateChanged.emit(self._checked)
             self.update()
         else:
@@ -54,26 +54,27 @@ class ToggleSwitchButton(QWidget):
 
     def setConnectionState(self, state: str):
         """Define o estado de conexão e atualiza a aparência do toggle"""
+        checked = state in ("CONNECTED", "CONNECTING")
+        # Ignorar repetições; um clique local ainda não confirmado é desfeito normalmente
+        if state == self._current_state and checked == self._checked:
+            return
         self._current_state = state
 
-        if state == "CONNECTED":
-            # Conexão estabelecida - toggle deve estar no estado ON
-            self._checked = True
-            self._target = self._width - self._height + 2
-        elif state == "DISCONNECTED":
-            # Conexão encerrada - toggle deve estar no estado OFF
-            self._checked = False
-            self._target = 2
-        elif state == "CONNECTING":
-            # Iniciando conexão - o thumb se move para posição de "conectado"
-            self._target = self._width - self._height + 2
-            self._checked = True
+        # Conectado ou iniciando conexão: ON; desconectado ou encerrando: OFF
+        self._checked = checked
+        self._move_thumb(self._width - self._height + 2 if checked else 2)
 
         self.update()
 
+    def _move_thumb(self, target: float):
+        self._target = target
+        if abs(self._thumb_pos - target) >= 0.5 and not self._timer.isActive():
+            self._timer.start()
+
     def _animate(self):
         if abs(self._thumb_pos - self._target) < 0.5:
             self._thumb_pos = self._target
+            self._timer.stop()
         else:
             self._thumb_pos += (self._target - self._thumb_pos) * self._speed
         self.update()
@@ -84,12 +85,10 @@ class ToggleSwitchButton(QWidget):
         painter.setRenderHint(QPainter.Antialiasing)
 
         # Determinar cor de fundo com base no estado
-        if self._current_state == "CONNECTED" or (
-            self._current_state not in ["CONNECTING"] and self._checked
-        ):
+        if self._current_state in ["CONNECTING", "DISCONNECTING"]:
+            color = QColor(self._connecting_color)  # Laranja durante a transição
+        elif self._current_state == "CONNECTED" or self._checked:
             color = QColor(self._on_color)  # Verde quando ON ou CONNECTED
-        elif self._current_state == "CONNECTING":
-            color = QColor(self._connecting_color)  # Laranja durante conexão
         else:
             color = QColor(self._off_color)  # Cinza quando OFF
 
@@ -0,0 +1,123 @@
+"""
+Import Budget
+
+Mede o custo de importação do caminho de inicialização com 'python -X importtime' e
+compara com um orçamento por módulo. Também falha se algum subsistema opcional (que
+deve ser importado só quando usado) voltar a ser carregado antes da janela aparecer.
+
+Uso, a partir da raiz do projeto:
+
+    python -m src.utils.import_budget            # verifica; código de saída 1 se exceder
+    python -m src.utils.import_budget --report 20
+    python -m src.utils.import_budget --scale 3  # máquinas lentas: orçamento x3
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+# Módulos importados antes de a janela principal ser exibida
+STARTUP_MODULES = ("PySide6.QtWidgets", "src.ui.app_controller")
+
+# Tempo cumulativo máximo de importação (ms), medido como o melhor de várias execuções
+IMPORT_BUDGETS_MS = {
+    "PySide6.QtWidgets": 250,
+    "PySide6.QtGui": 45,
+    "src.ui.app_controller": 165,
+    "src.ui.main_window": 160,
+    "src.ipsec.ipsec_manager": 45,
+    "src.loggers.app_loggers": 20,
+    "src.ui.connection_config_widget": 20,
+    "src.ipsec.charon_log_tailer": 10,
+    "src.ui.status_log_widget": 5,
+    "src.ipsec.status_scheduler": 3,
+    "src.utils.system_theme": 3,
+}
+
+# Módulos que só podem ser importados sob demanda
+DEFERRED_MODULES = (
+    "PySide6.QtSvg",
+    "http.server",
+    "src.metrics.prometheus_exporter",
+    "src.ui.session_history_dialog",
+    "src.ui.theme_selector",
+)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def measure_imports(modules=STARTUP_MODULES) -> Dict[str, int]:
+    """
+    Executa um interpretador novo com -X importtime e retorna o tempo cumulativo (µs) por módulo.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        capture_output=True,
+        text=True,
+        cwd=PROJECT_ROOT,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "import failed")
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def best_of(runs: int) -> Dict[str, int]:
+    """
+    Menor tempo de cada módulo entre várias execuções (reduz o ruído de cache e agendamento).
+    """
+    best: Dict[str, int] = {}
+    for _ in range(runs):
+        for name, cumulative in measure_imports().items():
+            best[name] = min(cumulative, best.get(name, cumulative))
+    return best
+
+
+def check_budget(timings: Dict[str, int], scale: float = 1.0) -> List[str]:
+    """
+    Retorna as violações encontradas (vazio quando tudo está dentro do orçamento).
+    """
+    violations = []
+    for name, budget_ms in IMPORT_BUDGETS_MS.items():
+        if name not in timings:
+            continue
+        elapsed_ms = timings[name] / 1000
+        if elapsed_ms > budget_ms * scale:
+            violations.append(f"{name}: {elapsed_ms:.1f} ms (orçamento {budget_ms * scale:.1f} ms)")
+    for name in DEFERRED_MODULES:
+        if name in timings:
+            violations.append(f"{name}: importado na inicialização (deve ser carregado sob demanda)")
+    return violations
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica o orçamento de tempo de importação da inicialização.")
+    parser.add_argument("--runs", type=int, default=3, help="execuções; vale o menor tempo de cada módulo")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplicador do orçamento")
+    parser.add_argument("--report", type=int, default=0, metavar="N", help="lista os N módulos mais caros")
+    args = parser.parse_args(argv)
+
+    timings = best_of(max(1, args.runs))
+    if args.report:
+        for name, cumulative in sorted(timings.items(), key=lambda item: -item[1])[: args.report]:
+            print(f"{cumulative / 1000:9.1f} ms  {name}")
+        print()
+
+    violations = check_budget(timings, args.scale)
+    for violation in violations:
+        print(f"FALHA {violation}")
+    total_ms = max(timings.get(name, 0) for name in STARTUP_MODULES) / 1000
+    print(f"{'Dentro' if not violations else 'Fora'} do orçamento ({total_ms:.1f} ms no módulo mais caro).")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
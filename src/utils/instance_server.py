@@ -0,0 +1,58 @@
+"""
+Módulo InstanceServer
+
+Lado Qt da instância única: escuta no socket local e entrega à janela, na thread da UI,
+os comandos enviados por execuções seguintes (ver single_instance.py).
+"""
+
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+
+from ..config.app_config import SINGLE_INSTANCE_SOCKET_PATH
+from .single_instance import MAX_COMMAND_SIZE, REPLY_ERROR, REPLY_OK, decode_command
+
+
+class InstanceServer(QObject):
+    """
+    Recebe um comando (uma linha JSON) por conexão e responde 'ok' ou 'error'.
+    """
+
+    # dict com 'action' e, opcionalmente, 'connection'
+    command_received = Signal(dict)
+
+    def __init__(self, path: str = SINGLE_INSTANCE_SOCKET_PATH, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self._server = QLocalServer(self)
+        # Apenas o próprio usuário pode enviar comandos
+        self._server.setSocketOptions(QLocalServer.UserAccessOption)
+        self._server.newConnection.connect(self._on_new_connection)
+
+    def listen(self) -> bool:
+        """
+        Começa a escutar. Deve ser chamado com o InstanceLock retido: um socket que
+        tenha sobrado de uma execução interrompida é removido.
+        """
+        QLocalServer.removeServer(self.path)
+        return self._server.listen(self.path)
+
+    def close(self) -> None:
+        self._server.close()
+
+    def _on_new_connection(self) -> None:
+        while self._server.hasPendingConnections():
+            client = self._server.nextPendingConnection()
+            client.readyRead.connect(lambda client=client: self._on_ready_read(client))
+            client.disconnected.connect(client.deleteLater)
+
+    def _on_ready_read(self, client: QLocalSocket) -> None:
+        if not client.canReadLine():
+            if client.bytesAvailable() > MAX_COMMAND_SIZE:
+                client.abort()
+            return
+        command = decode_command(bytes(client.readLine(MAX_COMMAND_SIZE)).strip())
+        # Confirmar antes de executar: quem enviou termina sem esperar a ação
+        client.write((REPLY_OK if command else REPLY_ERROR) + b"\n")
+        client.disconnectFromServer()
+        if command:
+            self.command_received.emit(command)
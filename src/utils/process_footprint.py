@@ -0,0 +1,74 @@
+"""
+Módulo ProcessFootprint
+
+Lê de /proc a memória residente do processo e as trocas de contexto voluntárias de
+todas as suas threads. Cada troca voluntária corresponde a uma thread que dormiu e foi
+acordada, então a diferença entre duas leituras mede os despertares do período.
+"""
+
+import os
+import time
+from typing import Optional
+
+PROC_SELF = "/proc/self"
+
+
+class ProcessFootprint:
+    """
+    Uma leitura do consumo do processo.
+    """
+
+    __slots__ = ("rss_kib", "wakeups", "threads", "timestamp")
+
+    def __init__(self, rss_kib: int, wakeups: int, threads: int, timestamp: float):
+        self.rss_kib = rss_kib
+        self.wakeups = wakeups
+        self.threads = threads
+        self.timestamp = timestamp
+
+    def __repr__(self) -> str:
+        return f"ProcessFootprint(rss_kib={self.rss_kib}, wakeups={self.wakeups}, threads={self.threads})"
+
+
+def _status_value(path: str, key: str) -> Optional[int]:
+    try:
+        with open(path, "r", encoding="ascii") as status_file:
+            for line in status_file:
+                if line.startswith(key):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def read_footprint(proc_path: str = PROC_SELF) -> Optional[ProcessFootprint]:
+    """
+    Retorna a leitura atual, ou None fora do Linux.
+    """
+    rss_kib = _status_value(os.path.join(proc_path, "status"), "VmRSS:")
+    if rss_kib is None:
+        return None
+    wakeups = 0
+    threads = 0
+    task_dir = os.path.join(proc_path, "task")
+    for task in os.listdir(task_dir):
+        switches = _status_value(os.path.join(task_dir, task, "status"), "voluntary_ctxt_switches:")
+        if switches is not None:
+            # Threads encerradas levam suas contagens; a diferença é um limite inferior
+            wakeups += switches
+            threads += 1
+    return ProcessFootprint(rss_kib, wakeups, threads, time.monotonic())
+
+
+def describe_footprint(start: Optional[ProcessFootprint], end: Optional[ProcessFootprint]) -> str:
+    """
+    Resumo legível de um período: memória residente ao final e despertares por segundo.
+    """
+    if start is None or end is None:
+        return "consumo indisponível"
+    elapsed = max(end.timestamp - start.timestamp, 1e-3)
+    rate = max(end.wakeups - start.wakeups, 0) / elapsed
+    return (
+        f"RSS {end.rss_kib / 1024:.1f} MiB, {rate:.2f} despertares/s "
+        f"em {elapsed:.0f} s ({end.threads} threads)"
+    )
@@ -0,0 +1,56 @@
+"""
+Resources
+
+Localiza os arquivos de src/assets. Nos pacotes eles vêm do recurso Qt compilado
+(src/assets/resources_rc.py, gerado por pyside6-rcc); em desenvolvimento, do
+sistema de arquivos.
+"""
+
+import os
+
+ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "assets"))
+
+_compiled_resources = None
+
+
+def _has_compiled_resources() -> bool:
+    global _compiled_resources
+    if _compiled_resources is None:
+        try:
+            # Registrar o recurso é um efeito colateral da importação
+            from ..assets import resources_rc  # noqa: F401
+
+            _compiled_resources = True
+        except ImportError:
+            _compiled_resources = False
+    return _compiled_resources
+
+
+def asset_path(relative_path: str) -> str:
+    """
+    Caminho de um asset, aceito por QIcon/QFile (":/assets/..." ou caminho no disco).
+    """
+    if _has_compiled_resources():
+        return f":/assets/{relative_path}"
+    return os.path.join(ASSETS_DIR, relative_path)
+
+
+def read_asset_text(relative_path: str) -> str:
+    """
+    Conteúdo de um asset de texto (ex.: stylesheet); vazio se não existir.
+    """
+    path = asset_path(relative_path)
+    if path.startswith(":/"):
+        from PySide6.QtCore import QFile, QIODevice
+
+        resource = QFile(path)
+        if not resource.open(QIODevice.ReadOnly | QIODevice.Text):
+            return ""
+        try:
+            return bytes(resource.readAll()).decode("utf-8")
+        finally:
+            resource.close()
+    if not os.path.exists(path):
+        return ""
+    with open(path, "r") as f:
+        return f.read()
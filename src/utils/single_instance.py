@@ -0,0 +1,127 @@
+"""
+Módulo SingleInstance
+
+Garante uma única instância da aplicação por usuário. A instância em execução mantém um
+lock (flock) e escuta em um socket local (ver instance_server.py); execuções seguintes
+apenas entregam seus argumentos (mostrar a janela, conectar, desconectar) e terminam.
+
+Este lado usa apenas a biblioteca padrão: a segunda execução não carrega o Qt.
+"""
+
+import fcntl
+import json
+import os
+import socket
+import time
+from typing import Optional
+
+from ..config.app_config import (
+    SINGLE_INSTANCE_LOCK_PATH,
+    SINGLE_INSTANCE_SOCKET_PATH,
+    SINGLE_INSTANCE_TIMEOUT_S,
+)
+
+ACTION_SHOW = "show"
+ACTION_CONNECT = "connect"
+ACTION_DISCONNECT = "disconnect"
+# Aviso de mudança de rede vindo de fora (ex.: script do NetworkManager dispatcher)
+ACTION_NETWORK_CHANGED = "network-changed"
+ACTIONS = (ACTION_SHOW, ACTION_CONNECT, ACTION_DISCONNECT, ACTION_NETWORK_CHANGED)
+
+# Respostas da instância em execução
+REPLY_OK = b"ok"
+REPLY_ERROR = b"error"
+
+# Tamanho máximo de um comando (uma linha JSON)
+MAX_COMMAND_SIZE = 4096
+
+
+def make_command(action: str, connection: Optional[str] = None) -> dict:
+    command = {"action": action}
+    if connection:
+        command["connection"] = connection
+    return command
+
+
+def encode_command(command: dict) -> bytes:
+    return json.dumps(command).encode("utf-8") + b"\n"
+
+
+def decode_command(data: bytes) -> Optional[dict]:
+    """
+    Valida uma linha recebida; retorna None se não for um comando conhecido.
+    """
+    try:
+        command = json.loads(data.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(command, dict) or command.get("action") not in ACTIONS:
+        return None
+    connection = command.get("connection")
+    if connection is not None and not isinstance(connection, str):
+        return None
+    return make_command(command["action"], connection)
+
+
+class InstanceLock:
+    """
+    Lock exclusivo da instância em execução. O flock é liberado pelo kernel se o
+    processo terminar de forma anormal, então não há lock obsoleto a limpar.
+    """
+
+    def __init__(self, path: str = SINGLE_INSTANCE_LOCK_PATH):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> bool:
+        """
+        Retorna True se esta é a única instância (o lock fica retido até release()).
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def send_command(
+    command: dict,
+    path: str = SINGLE_INSTANCE_SOCKET_PATH,
+    timeout: float = SINGLE_INSTANCE_TIMEOUT_S,
+) -> bool:
+    """
+    Entrega um comando à instância em execução; retorna True quando ela confirma o recebimento.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.settimeout(max(0.05, deadline - time.monotonic()))
+            client.connect(path)
+            client.sendall(encode_command(command))
+            reply = b""
+            while not reply.endswith(b"\n") and len(reply) < MAX_COMMAND_SIZE:
+                chunk = client.recv(64)
+                if not chunk:
+                    break
+                reply += chunk
+            return reply.strip() == REPLY_OK
+        except (FileNotFoundError, ConnectionRefusedError):
+            # A instância detém o lock mas ainda não começou a escutar
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        except OSError:
+            return False
+        finally:
+            client.close()
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+# src.config.app_config cria ~/.vpnlogs ao ser importado: os testes usam um HOME temporário
+os.environ["HOME"] = tempfile.mkdtemp(prefix="vpn_ipsec_tests_")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """
+    QApplication sem display; app_config força QT_QPA_PLATFORM=xcb, então a plataforma
+    vai nos argumentos.
+    """
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(["tests", "-platform", "offscreen"])
+    yield app
+
+
+def wait_until(condition, timeout=3.0):
+    """
+    Processa os eventos do Qt (sinais enfileirados, timers) até a condição valer.
+    """
+    from PySide6.QtCore import QCoreApplication
+
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condição não atingida a tempo")
+        QCoreApplication.processEvents()
+        time.sleep(0.002)
+
+
+def replay_command(args, stdout="", returncode=0, duration=0.0, stderr=""):
+    """
+    Uma entrada de comando de uma gravação (src/ipsec/command_trace.py).
+    """
+    return {"type": "command", "args": args, "at": 0.0, "duration": duration,
+            "returncode": returncode, "stdout": stdout, "stderr": stderr}
+
+
+def use_replay(monkeypatch, tmp_path, config, commands, latency_scale=0.0):
+    """
+    Faz o IPsecManager responder pela gravação: cabeçalho com o ipsec.conf, o 'which
+    ipsec' da carga das conexões e os comandos informados, na ordem.
+    """
+    from src.ipsec import ipsec_commander
+
+    entries = [
+        {"type": "header", "version": 1, "backend": "strongswan", "time": 0,
+         "config": {"/etc/ipsec.conf": config}},
+        replay_command(["which", "ipsec"], "/usr/sbin/ipsec\n"),
+    ] + list(commands)
+    trace_path = tmp_path / "trace.jsonl"
+    trace_path.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+    monkeypatch.setattr(ipsec_commander, "COMMAND_REPLAY_PATH", str(trace_path))
+    monkeypatch.setattr(ipsec_commander, "COMMAND_REPLAY_LATENCY_SCALE", latency_scale)
+    return trace_path
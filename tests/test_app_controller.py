@@ -0,0 +1,76 @@
+"""
+AppController (src/ui/app_controller.py) sem janela, como no modo bandeja: o 'ipsec up'
+roda fora da thread da UI e o resultado volta por sinal. Comandos respondidos por uma
+gravação (src/ipsec/command_trace.py).
+"""
+
+import json
+import time
+
+import pytest
+
+from src.ipsec import ipsec_commander
+
+from conftest import wait_until
+
+CONFIG = "conn office\n    right=203.0.113.5\n    rightsubnet=10.0.0.0/24\n    auto=add\n"
+UP_OK = "initiating IKE_SA office[3] to 203.0.113.5\nconnection 'office' established successfully\n"
+
+
+def command(args, duration=0.0, stdout="", returncode=0):
+    return {"type": "command", "args": args, "at": 0.0, "duration": duration,
+            "returncode": returncode, "stdout": stdout, "stderr": ""}
+
+
+@pytest.fixture
+def controller(qapp, tmp_path, monkeypatch):
+    trace_path = tmp_path / "trace.jsonl"
+    entries = [
+        {"type": "header", "version": 1, "backend": "strongswan", "time": 0,
+         "config": {"/etc/ipsec.conf": CONFIG}},
+        command(["which", "ipsec"], stdout="/usr/sbin/ipsec\n"),
+        command(["sudo", "ipsec", "status"]),
+        # 'ipsec up' lento: meio segundo até retornar
+        command(["sudo", "ipsec", "up", "office"], duration=0.5, stdout=UP_OK),
+    ]
+    trace_path.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+    monkeypatch.setattr(ipsec_commander, "COMMAND_REPLAY_PATH", str(trace_path))
+    monkeypatch.setattr(ipsec_commander, "COMMAND_REPLAY_LATENCY_SCALE", 1.0)
+    from src.ui.app_controller import AppController
+
+    controller = AppController(tray_enabled=False)
+    yield controller
+    controller.shutdown()
+
+
+def test_background_connect_does_not_block_the_ui_thread(controller):
+    finished = []
+    controller.connect_finished.connect(lambda *result: finished.append(result))
+
+    start = time.monotonic()
+    controller._connect_in_background("office")
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.3
+    assert controller.connection_manager.get_connection_state("office").name == "CONNECTING"
+    assert controller.current_conn_name == "office"
+
+    # Pedido repetido durante a conexão não inicia outro 'ipsec up'
+    controller._connect_in_background("office")
+
+    wait_until(lambda: finished)
+    assert len(finished) == 1
+    conn_name, success, _message = finished[0]
+    assert (conn_name, success) == ("office", True)
+    machine = controller.connection_manager.get_state_machine("office")
+    assert machine.initiated_at is not None
+
+
+def test_unknown_connection_is_reported(controller):
+    finished = []
+    controller.connect_finished.connect(lambda *result: finished.append(result))
+
+    controller._connect_in_background("missing")
+
+    assert finished == []
+    assert "missing" not in controller.connection_manager.state_machines
@@ -0,0 +1,201 @@
+"""
+Comparação das propostas ESP (src/ipsec/cipher_benchmark.py): leitura das propostas do
+strongSwan, instruções da CPU, cache por máquina e a recomendação, com as vazões fixadas
+para que o resultado não dependa da máquina que roda os testes.
+"""
+
+import json
+
+import pytest
+
+from src.ipsec import cipher_benchmark
+from src.ipsec.cipher_benchmark import (
+    CipherBenchmark,
+    CpuFeatures,
+    heuristic_order,
+    parse_proposal,
+    read_cpu_features,
+    recommend,
+)
+from src.ipsec.connection_record import ConnectionRecord
+
+# MB/s fixos por transformação
+SPEEDS = {
+    "aes128gcm16": 3000.0,
+    "aes256gcm16": 2500.0,
+    "chacha20poly1305": 1500.0,
+    "aes128-sha256": 600.0,
+    "aes256-sha256": 550.0,
+    "aes128-sha1": 900.0,
+    "aes256-sha1": 800.0,
+    "aes256ccm16": 700.0,
+    "3des-sha1": 30.0,
+}
+
+
+@pytest.mark.parametrize(
+    "proposal, name, mode, integrity, tag_bytes, dh_groups",
+    [
+        ("aes256gcm16-modp2048", "aes256gcm16", "gcm", None, 16, ["modp2048"]),
+        ("aes128gcm128-ecp256!", "aes128gcm16", "gcm", None, 16, ["ecp256"]),
+        ("aesgcm8", "aes128gcm8", "gcm", None, 8, []),
+        ("aes192ccm96", "aes192ccm12", "ccm", None, 12, []),
+        ("chacha20poly1305-x25519", "chacha20poly1305", "poly1305", None, 16, ["x25519"]),
+        ("AES256-SHA2_256-MODP2048-ESN", "aes256-sha2_256", "cbc", "sha2_256", 16, ["modp2048", "esn"]),
+        ("aes128ctr-sha1", "aes128ctr-sha1", "ctr", "sha1", 16, []),
+        ("3des-md5-modp1024", "3des-md5", "cbc", "md5", 16, ["modp1024"]),
+    ],
+)
+def test_parse_proposal(proposal, name, mode, integrity, tag_bytes, dh_groups):
+    transform, groups = parse_proposal(proposal)
+
+    assert (transform.name, transform.mode, transform.integrity, transform.tag_bytes) == (
+        name, mode, integrity, tag_bytes,
+    )
+    assert transform.is_aead == (integrity is None)
+    assert groups == dh_groups
+
+
+@pytest.mark.parametrize("proposal", ["", "modp2048", "aes256", "aes256-foo", "blowfish-sha1"])
+def test_unknown_proposals(proposal):
+    assert parse_proposal(proposal)[0] is None
+
+
+@pytest.mark.parametrize(
+    "cpuinfo, model, aes, clmul, vector_aes",
+    [
+        (
+            "processor\t: 0\nmodel name\t: Intel(R) Xeon(R)\n"
+            "flags\t\t: fpu sse2 aes pclmulqdq avx2 vaes vpclmulqdq\n",
+            "Intel(R) Xeon(R)", True, True, True,
+        ),
+        ("processor\t: 0\nFeatures\t: fp asimd aes pmull sha1 sha2\nHardware\t: BCM2711\n", "BCM2711", True, True, False),
+        ("processor\t: 0\nmodel name\t: Atom\nflags\t\t: fpu sse2\n", "Atom", False, False, False),
+    ],
+)
+def test_read_cpu_features(tmp_path, cpuinfo, model, aes, clmul, vector_aes):
+    path = tmp_path / "cpuinfo"
+    path.write_text(cpuinfo)
+
+    features = read_cpu_features(str(path))
+
+    assert (features.model, features.aes, features.clmul, features.vector_aes) == (model, aes, clmul, vector_aes)
+
+
+def test_missing_cpuinfo(tmp_path):
+    features = read_cpu_features(str(tmp_path / "missing"))
+
+    assert features.describe() == "CPU desconhecida: AES-NI não, CLMUL não"
+
+
+def test_heuristic_order():
+    assert heuristic_order(CpuFeatures("x86", True, True))[0] == "aes128gcm16"
+    # GHASH sem CLMUL é lento: ChaCha20-Poly1305 primeiro
+    assert heuristic_order(CpuFeatures("x86", True, False))[0] == "chacha20poly1305"
+    assert heuristic_order(CpuFeatures("arm", False, False))[0] == "chacha20poly1305"
+
+
+@pytest.fixture
+def measured(monkeypatch):
+    calls = []
+
+    def measure_transform(transform):
+        calls.append(transform.name)
+        return SPEEDS.get(transform.name)
+
+    monkeypatch.setattr(cipher_benchmark, "measure_transform", measure_transform)
+    return calls
+
+
+def _record(esp, ike="", extra=""):
+    section = f"  right=203.0.113.5\n  esp={esp}\n"
+    if ike:
+        section += f"  ike={ike}\n"
+    return ConnectionRecord("office", "/etc/ipsec.conf", section + extra)
+
+
+def test_recommendation_keeps_pfs_and_matches_ike(tmp_path, measured):
+    benchmark = CipherBenchmark(str(tmp_path / "cache.json"))
+
+    result = recommend(_record("aes256-sha1-modp2048", "aes256-sha1-modp2048"), benchmark)
+
+    assert result.measured
+    assert result.configured == "aes256-sha1"
+    assert result.esp == "aes128gcm16-modp2048"
+    assert result.ike == "aes128gcm16-prfsha256-modp2048"
+    assert result.summary() == (
+        "office: recomendado esp=aes128gcm16-modp2048 (3000 MB/s); "
+        "configurado aes256-sha1 (800 MB/s, 3.8x mais lento); ike=aes128gcm16-prfsha256-modp2048."
+    )
+    # Tabela da mais rápida para a mais lenta
+    table = [line.split() for line in result.describe().splitlines()[1:-1]]
+    assert [row[0] for row in table] == [
+        "aes128gcm16", "aes256gcm16", "chacha20poly1305", "aes128-sha1", "aes256-sha1", "aes128-sha256", "aes256-sha256",
+    ]
+    assert table[4] == ["aes256-sha1", "800", "MB/s", "configurada"]
+
+
+def test_recommendation_respects_the_policy(tmp_path, measured, monkeypatch):
+    monkeypatch.setattr(cipher_benchmark, "CIPHER_ALLOWED_ESP", ["aes256-sha1", "aes256ccm16"])
+    benchmark = CipherBenchmark(str(tmp_path / "cache.json"))
+
+    result = recommend(_record("aes256-sha1", "aes256-sha1-modp2048", "  keyexchange=ikev1\n"), benchmark)
+
+    assert result.esp == "aes256-sha1"
+    assert result.summary().endswith("; já é a proposta configurada; ike=aes256-sha1-modp2048.")
+    assert ("aes128gcm16", 3000.0, False, False) in result.rows
+    assert "fora da política" in result.describe()
+
+    # IKEv1 não negocia AEAD na fase 1
+    monkeypatch.setattr(cipher_benchmark, "CIPHER_ALLOWED_ESP", ["aes256ccm16"])
+    result = recommend(_record("aes256-sha1", "aes256-sha1-modp2048", "  keyexchange=ikev1\n"), benchmark)
+    assert (result.esp, result.ike) == ("aes256ccm16", None)
+
+
+def test_results_are_cached_per_machine(tmp_path, measured):
+    cache_path = str(tmp_path / "cache.json")
+    CipherBenchmark(cache_path).measure(["aes128gcm16", "aes256-sha1"])
+    assert measured == ["aes128gcm16", "aes256-sha1"]
+
+    cached = CipherBenchmark(cache_path)
+    assert cached.measure(["aes256-sha1", "chacha20poly1305"]) == {"aes256-sha1": 800.0, "chacha20poly1305": 1500.0}
+    assert measured[2:] == ["chacha20poly1305"]
+
+    cached.measure(["aes128gcm16"], refresh=True)
+    assert measured[3:] == ["aes128gcm16"]
+
+    # Outra CPU (ou OpenSSL) invalida o cache, assim como um cache vencido
+    with open(cache_path, encoding="utf-8") as cache_file:
+        data = json.load(cache_file)
+    data["key"]["cpu"] = "outra CPU"
+    with open(cache_path, "w", encoding="utf-8") as cache_file:
+        json.dump(data, cache_file)
+    assert CipherBenchmark(cache_path).results == {}
+
+    data["key"] = CipherBenchmark(cache_path)._key
+    data["time"] -= cipher_benchmark.CIPHER_BENCHMARK_CACHE_TTL_S + 1
+    with open(cache_path, "w", encoding="utf-8") as cache_file:
+        json.dump(data, cache_file)
+    assert CipherBenchmark(cache_path).results == {}
+
+
+def test_recommendation_without_cryptography(tmp_path, monkeypatch, measured):
+    monkeypatch.setattr(cipher_benchmark, "Cipher", None)
+    benchmark = CipherBenchmark(str(tmp_path / "cache.json"))
+    benchmark.features = CpuFeatures("arm", False, False)
+
+    result = recommend(_record("aes256gcm16-ecp256", "aes256-sha256-ecp256"), benchmark)
+
+    assert measured == []
+    assert not result.measured
+    assert result.esp == "chacha20poly1305-ecp256"
+    assert result.summary() == (
+        "office: recomendado esp=chacha20poly1305-ecp256 (pelas instruções da CPU; instale 'cryptography' para medir)."
+    )
+
+
+@pytest.mark.parametrize("name", ["aes128gcm16", "aes256ccm16", "chacha20poly1305", "aes256ctr-sha256", "aes128-aescmac"])
+def test_measure_transform(name):
+    pytest.importorskip("cryptography")
+
+    assert cipher_benchmark.measure_transform(parse_proposal(name)[0], duration=0.01, chunk=1024) > 0
@@ -0,0 +1,239 @@
+"""
+Reprodução de gravações de comandos do IPsec (src/ipsec/command_trace.py) pelo
+IPsecManager, sem daemon nem gateway.
+"""
+
+import json
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from src.ipsec import ipsec_commander
+from src.ipsec.command_trace import (
+    CommandRecorder,
+    CommandReplayer,
+    CommandRunner,
+    load_trace,
+    replay_session,
+)
+
+CONFIG = "conn office\n    right=203.0.113.5\n    rightsubnet=10.0.0.0/24\n    auto=add\n"
+STATUS_UP = (
+    "Security Associations (1 up, 0 connecting):\n"
+    "  office[3]: ESTABLISHED 2 seconds ago, 192.0.2.10[me]...203.0.113.5[gw]\n"
+    "  office{4}:  INSTALLED, TUNNEL, reqid 1, ESP in UDP SPIs: c1_i c2_o\n"
+)
+STATUS_DOWN = ""
+UP_OK = "initiating IKE_SA office[3] to 203.0.113.5\nconnection 'office' established successfully\n"
+UP_AUTH_FAILED = (
+    "initiating IKE_SA office[3] to 203.0.113.5\n"
+    "received AUTHENTICATION_FAILED notify error\n"
+    "establishing connection 'office' failed\n"
+)
+
+
+def command(args, at, stdout="", returncode=0, streamed=False):
+    entry = {
+        "type": "command",
+        "args": args,
+        "at": at,
+        "duration": 0.05,
+        "returncode": returncode,
+        "stdout": stdout,
+        "stderr": "",
+    }
+    if streamed:
+        entry["lines"] = [[0.01 * (i + 1), line] for i, line in enumerate(stdout.splitlines(True))]
+    return entry
+
+
+def write_trace(path, commands, backend="strongswan"):
+    header = {
+        "type": "header",
+        "version": 1,
+        "backend": backend,
+        "time": 0,
+        "config": {"/etc/ipsec.conf": CONFIG},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in [header] + commands:
+            f.write(json.dumps(entry) + "\n")
+    return str(path)
+
+
+def replay(monkeypatch, trace_path):
+    """
+    IPsecManager respondido pela gravação; retorna as transições de replay_session.
+    """
+    monkeypatch.setattr(ipsec_commander, "COMMAND_REPLAY_PATH", trace_path)
+    monkeypatch.setattr(ipsec_commander, "COMMAND_REPLAY_LATENCY_SCALE", 0.0)
+    from src.ipsec.ipsec_manager import IPsecManager
+
+    manager = IPsecManager()
+    transitions = []
+    manager.add_transition_listener(
+        lambda transition: transitions.append((transition.previous.name, transition.state.name))
+    )
+    try:
+        assert manager.connections == ["office"]
+        _header, commands = load_trace(trace_path)
+        replay_session(manager, commands, output=lambda _line: None)
+    finally:
+        manager.shutdown()
+    return transitions, manager
+
+
+def session(up_stdout, up_returncode, status_after_up):
+    return [
+        command(["which", "ipsec"], 0.0, "/usr/sbin/ipsec\n"),
+        command(["sudo", "ipsec", "status"], 0.1, STATUS_DOWN),
+        command(["sudo", "ipsec", "up", "office"], 0.2, up_stdout, up_returncode, streamed=True),
+        command(["sudo", "ipsec", "status"], 1.0, status_after_up),
+    ]
+
+
+def test_replayed_session_connects_and_disconnects(tmp_path, monkeypatch):
+    commands = session(UP_OK, 0, STATUS_UP) + [
+        command(["sudo", "ipsec", "down", "office"], 2.0, "deleting IKE_SA office[3]\n"),
+        command(["sudo", "ipsec", "status"], 2.5, STATUS_DOWN),
+    ]
+    transitions, manager = replay(monkeypatch, write_trace(tmp_path / "trace.jsonl", commands))
+
+    assert transitions == [
+        ("DISCONNECTED", "CONNECTING"),
+        ("CONNECTING", "CONNECTED"),
+        ("CONNECTED", "DISCONNECTING"),
+        ("DISCONNECTING", "DISCONNECTED"),
+    ]
+    assert manager.get_connection_state("office").name == "DISCONNECTED"
+
+
+def test_authentication_failure_fails_without_waiting_for_timeout(tmp_path, monkeypatch):
+    commands = session(UP_AUTH_FAILED, 1, STATUS_DOWN)
+    transitions, manager = replay(monkeypatch, write_trace(tmp_path / "trace.jsonl", commands))
+
+    assert transitions == [("DISCONNECTED", "CONNECTING"), ("CONNECTING", "FAILED")]
+    assert "AUTHENTICATION_FAILED" in manager.get_state_machine("office").detail
+
+
+def test_missing_tunnel_after_up_returns_fails_on_next_poll(tmp_path, monkeypatch):
+    # 'ipsec up' retornou 0, mas a consulta seguinte não mostra nenhuma SA
+    commands = session(UP_OK, 0, STATUS_DOWN)
+    transitions, _manager = replay(monkeypatch, write_trace(tmp_path / "trace.jsonl", commands))
+
+    assert transitions == [("DISCONNECTED", "CONNECTING"), ("CONNECTING", "FAILED")]
+
+
+def test_replayer_answers_in_recorded_order_and_repeats_the_last(tmp_path):
+    trace_path = write_trace(
+        tmp_path / "trace.jsonl",
+        [
+            command(["sudo", "ipsec", "status"], 0.0, "first"),
+            command(["sudo", "ipsec", "status"], 1.0, "second"),
+            {"type": "command", "args": ["ipsec", "--version"], "at": 2.0, "duration": 0.0,
+             "error": "FileNotFoundError", "message": "ipsec"},
+        ],
+    )
+    replayer = CommandReplayer(trace_path, latency_scale=0)
+
+    outputs = [replayer.run(["sudo", "ipsec", "status"]).stdout for _ in range(3)]
+    assert outputs == ["first", "second", "second"]
+    assert replayer.run(["sudo", "ipsec", "statusall"]).returncode == 127
+    with pytest.raises(FileNotFoundError):
+        replayer.run(["ipsec", "--version"])
+
+
+def test_recording_replays_the_same_answers(tmp_path):
+    class FakeRunner(CommandRunner):
+        def run(self, args):
+            return subprocess.CompletedProcess(args, 0, STATUS_UP, "")
+
+        def stream(self, args, on_line):
+            for line in UP_OK.splitlines(True):
+                on_line(line)
+            return subprocess.CompletedProcess(args, 0, UP_OK, "")
+
+    trace_path = str(tmp_path / "trace.jsonl")
+    recorder = CommandRecorder(trace_path, FakeRunner())
+    recorder.write_header("strongswan", [])
+    recorder.run(["sudo", "ipsec", "status"])
+    recorder.stream(["sudo", "ipsec", "up", "office"], lambda _line: None)
+    recorder.close()
+
+    replayer = CommandReplayer(trace_path, latency_scale=0)
+    lines = []
+    result = replayer.stream(["sudo", "ipsec", "up", "office"], lines.append)
+    assert replayer.backend == "strongswan"
+    assert result.returncode == 0
+    assert lines == UP_OK.splitlines(True)
+    assert replayer.run(["sudo", "ipsec", "status"]).stdout == STATUS_UP
+
+
+def test_recorded_backend_detection(tmp_path, monkeypatch):
+    monkeypatch.setattr(ipsec_commander, "IPSEC_BACKEND", "auto")
+    monkeypatch.setattr(ipsec_commander, "PLUTO_CTL_PATH", str(tmp_path / "missing-pluto.ctl"))
+    monkeypatch.setattr(ipsec_commander, "CHARON_CTL_PATH", str(tmp_path / "missing-charon.ctl"))
+    trace_path = write_trace(
+        tmp_path / "trace.jsonl",
+        [command(["ipsec", "--version"], 0.0, "Libreswan 4.12\n")],
+        backend="libreswan",
+    )
+
+    assert ipsec_commander.detect_backend(CommandReplayer(trace_path, latency_scale=0)) == "libreswan"
+
+
+def test_stream_drains_stderr_while_reading_stdout():
+    # Mais que um buffer de pipe no stderr antes da última linha do stdout
+    script = (
+        "import sys\n"
+        "print('initiating', flush=True)\n"
+        "sys.stderr.write('x' * 1_000_000)\n"
+        "sys.stderr.flush()\n"
+        "print('established', flush=True)\n"
+        "sys.exit(3)\n"
+    )
+    lines = []
+    results = []
+    worker = threading.Thread(
+        target=lambda: results.append(CommandRunner().stream([sys.executable, "-c", script], lines.append)),
+        daemon=True,
+    )
+    worker.start()
+    worker.join(timeout=10)
+
+    assert not worker.is_alive(), "stream() travou com o stderr cheio"
+    result = results[0]
+    assert lines == ["initiating\n", "established\n"]
+    assert result.stdout == "initiating\nestablished\n"
+    assert len(result.stderr) == 1_000_000
+    assert result.returncode == 3
+
+
+def test_header_redacts_secret_options(tmp_path):
+    config_path = tmp_path / "ipsec.conf"
+    config_path.write_text(
+        "conn office\n"
+        "    right=203.0.113.5\n"
+        "    authby=secret\n"
+        "    keyexchange=ikev2\n"
+        "    leftrsasigkey=0sAwEAAb1234\n"
+        "    xauth_password = hunter2  # temporário\n"
+        "    PSK=abc\n"
+    )
+    trace_path = str(tmp_path / "trace.jsonl")
+    recorder = CommandRecorder(trace_path, CommandRunner())
+    recorder.write_header("strongswan", [str(config_path)])
+    recorder.close()
+
+    header, _ = load_trace(trace_path)
+    assert header["config"][str(config_path)] == (
+        "conn office\n"
+        "    right=203.0.113.5\n"
+        "    authby=secret\n"
+        "    keyexchange=ikev2\n"
+        "    leftrsasigkey=<redacted>\n"
+        "    xauth_password = <redacted>\n"
+        "    PSK=<redacted>\n"
+    )
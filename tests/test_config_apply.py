@@ -0,0 +1,253 @@
+"""
+Aplicação seletiva da configuração (src/ipsec/config_apply.py e IPsecManager.apply_config):
+comparação pelas opções efetivas, gravação atômica e, sobre uma gravação, os comandos
+executados para as conexões alteradas.
+"""
+
+import os
+import stat
+
+import pytest
+
+from src.ipsec.command_trace import CommandRecorder, load_trace
+from src.ipsec.config_apply import ConfigDiff, effective_connections, read_config_file, write_atomic
+from src.ipsec.connection_state import ConnectionState
+
+from conftest import replay_command, use_replay
+
+BASE = """\
+config setup
+    charondebug="ike 1"
+
+conn %default
+    keyexchange=ikev2
+    ike=aes256-sha256-modp2048
+
+conn office-base
+    right=203.0.113.5
+    auto=ignore
+
+conn office
+    also=office-base
+    rightsubnet=10.0.0.0/24
+    auto=add
+
+conn lab
+    right=198.51.100.7
+    auto=add
+"""
+
+
+def test_formatting_is_not_a_change():
+    reformatted = """\
+# Reescrito à mão
+config setup
+    charondebug="ike 1"
+conn lab
+\tauto=add   # comentário
+\tright=198.51.100.7
+
+conn %default
+    ike=aes256-sha256-modp2048
+    keyexchange=ikev2
+conn office-base
+    auto=ignore
+    right=203.0.113.5
+conn office
+    auto=add
+    rightsubnet=10.0.0.0/24
+    also=office-base
+"""
+    diff = ConfigDiff(BASE, reformatted)
+
+    assert diff.is_empty
+    assert sorted(diff.unchanged) == ["lab", "office", "office-base"]
+    assert diff.describe() == "Nenhuma conexão alterada."
+
+
+def test_effective_options_expand_default_and_also():
+    office = effective_connections(BASE)["office"]
+
+    # A própria seção prevalece sobre o also=, que prevalece sobre o %default
+    assert office == {
+        "keyexchange": "ikev2",
+        "ike": "aes256-sha256-modp2048",
+        "right": "203.0.113.5",
+        "auto": "add",
+        "rightsubnet": "10.0.0.0/24",
+    }
+    assert "%default" not in effective_connections(BASE)
+
+
+def test_changes_through_default_and_also():
+    new = BASE.replace("right=203.0.113.5", "right=203.0.113.9").replace("keyexchange=ikev2", "keyexchange=ikev1")
+
+    diff = ConfigDiff(BASE, new)
+
+    # O %default atinge todas; o also= atinge quem inclui a seção
+    assert diff.changed == ["office-base", "office", "lab"]
+    assert diff.changed_options["office"] == {"keyexchange": "ikev1", "right": "203.0.113.9"}
+    assert diff.changed_options["lab"] == {"keyexchange": "ikev1"}
+
+
+def test_added_removed_and_removed_options():
+    new = BASE.replace("    rightsubnet=10.0.0.0/24\n", "").replace("conn lab", "conn branch")
+
+    diff = ConfigDiff(BASE, new)
+
+    assert (diff.added, diff.removed, diff.changed) == (["branch"], ["lab"], ["office"])
+    assert diff.affected == ["branch", "lab", "office"]
+    assert diff.describe().splitlines() == [
+        "+ branch",
+        "- lab",
+        "~ office: -rightsubnet",
+        "  1 conexões sem mudança não serão tocadas",
+    ]
+
+
+def test_setup_change_is_flagged():
+    diff = ConfigDiff(BASE, BASE.replace('charondebug="ike 1"', 'charondebug="ike 2"'))
+
+    assert not diff.is_empty and diff.affected == []
+    assert diff.describe().splitlines()[-1].startswith("! 'config setup' alterada")
+
+
+def test_repeated_section_extends_the_previous_one():
+    content = "conn lab\n    right=198.51.100.7\nconn lab\n    auto=start\n"
+
+    assert effective_connections(content) == {"lab": {"right": "198.51.100.7", "auto": "start"}}
+
+
+def test_write_atomic_keeps_permissions(tmp_path):
+    path = tmp_path / "ipsec.conf"
+    path.write_text(BASE)
+    os.chmod(path, 0o640)
+
+    write_atomic(str(path), "conn lab\n")
+
+    assert path.read_text() == "conn lab\n"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    assert os.listdir(tmp_path) == ["ipsec.conf"]
+
+
+def test_failed_write_keeps_the_original(tmp_path):
+    path = tmp_path / "ipsec.conf"
+    path.write_text(BASE)
+
+    with pytest.raises(TypeError):
+        write_atomic(str(path), None)
+
+    assert path.read_text() == BASE
+    assert os.listdir(tmp_path) == ["ipsec.conf"]
+
+
+def test_read_missing_file(tmp_path):
+    assert read_config_file(str(tmp_path / "missing.conf")) == ""
+
+
+UP_OK = "initiating IKE_SA office[5] to 203.0.113.9\nconnection 'office' established successfully\n"
+
+
+def _manager(monkeypatch, tmp_path, commands):
+    use_replay(monkeypatch, tmp_path, BASE, commands)
+    from src.ipsec.ipsec_manager import IPsecManager
+
+    manager = IPsecManager()
+    # Sem diagnóstico de rede antes do 'ipsec up' reproduzido
+    manager.preflight = None
+    manager.commander.runner = CommandRecorder(str(tmp_path / "executed.jsonl"), manager.commander.runner)
+    manager.apply_status_snapshot(
+        {"office": (ConnectionState.CONNECTED, ""), "lab": (ConnectionState.CONNECTED, "")}
+    )
+    return manager, manager.config_parser.config_files[0]
+
+
+def _executed(tmp_path):
+    path = tmp_path / "executed.jsonl"
+    if not path.exists() or not path.read_text():
+        return []
+    commands = []
+    for entry in load_trace(str(path))[1]:
+        args = entry["args"]
+        commands.append(" ".join(args[2:] if args[:2] == ["sudo", "ipsec"] else args))
+    return commands
+
+
+def test_apply_touches_only_changed_connections(monkeypatch, tmp_path):
+    manager, path = _manager(
+        monkeypatch,
+        tmp_path,
+        [
+            replay_command(["sudo", "ipsec", "update"], "Updating IKE charon daemon configuration\n"),
+            replay_command(["sudo", "ipsec", "up", "office"], UP_OK),
+        ],
+    )
+    new = BASE.replace("right=203.0.113.5", "right=203.0.113.9") + "\nconn branch\n    right=192.0.2.44\n"
+    try:
+        result = manager.apply_config(new, path)
+
+        assert result.ok and result.written
+        assert (result.diff.added, result.diff.changed, result.diff.unchanged) == (
+            ["branch"], ["office-base", "office"], ["lab"],
+        )
+        # O túnel de lab não é tocado; office, ligada, é religada com a nova configuração
+        # A releitura das conexões ('which ipsec') vem antes da religação
+        assert _executed(tmp_path) == ["update", "which ipsec", "up office"]
+        assert result.reconnected == ["office"]
+        assert read_config_file(path) == new
+        assert "branch" in manager.connections
+        assert manager.get_connection_details("branch").server_address == "192.0.2.44"
+        assert result.describe().splitlines()[-1] == "Religadas após a mudança: office"
+    finally:
+        manager.shutdown()
+
+
+def test_identical_content_is_not_written(monkeypatch, tmp_path):
+    manager, path = _manager(monkeypatch, tmp_path, [])
+    mtime = os.stat(path).st_mtime_ns
+    try:
+        result = manager.apply_config(read_config_file(path), path)
+    finally:
+        manager.shutdown()
+
+    assert result.ok and not result.written
+    assert os.stat(path).st_mtime_ns == mtime
+    assert _executed(tmp_path) == []
+
+
+def test_failed_update_does_not_reconnect(monkeypatch, tmp_path):
+    manager, path = _manager(
+        monkeypatch,
+        tmp_path,
+        [replay_command(["sudo", "ipsec", "update"], "", 1, stderr="starter is not running")],
+    )
+    try:
+        result = manager.apply_config(BASE.replace("right=203.0.113.5", "right=203.0.113.9"), path)
+    finally:
+        manager.shutdown()
+
+    assert result.written
+    assert not result.ok and "starter is not running" in result.error
+    assert result.reconnected == []
+    assert _executed(tmp_path) == ["update"]
+
+
+def test_apply_secrets(monkeypatch, tmp_path):
+    manager, _path = _manager(
+        monkeypatch,
+        tmp_path,
+        [replay_command(["sudo", "ipsec", "rereadsecrets"], "")],
+    )
+    secrets = tmp_path / "ipsec.secrets"
+    secrets.write_text(": PSK \"old\"\n")
+    os.chmod(secrets, 0o600)
+    try:
+        unchanged = manager.apply_secrets(": PSK \"old\"\n", str(secrets))
+        result = manager.apply_secrets(": PSK \"new\"\n", str(secrets))
+    finally:
+        manager.shutdown()
+
+    assert unchanged.messages == ["Segredos sem mudança."] and not unchanged.written
+    assert result.ok and result.written
+    assert stat.S_IMODE(os.stat(secrets).st_mode) == 0o600
+    assert _executed(tmp_path) == ["rereadsecrets"]
@@ -0,0 +1,173 @@
+"""
+Varredura dos arquivos de configuração (src/ipsec/ipsec_config_parser.py): mesclagem do
+ipsec.conf com os fragmentos do ipsec.d, duplicatas, extensões e o parsing em processos.
+"""
+
+import concurrent.futures
+
+import pytest
+
+from src.ipsec import ipsec_config_parser
+from src.ipsec.ipsec_config_parser import IPsecConfigParser, parse_config_sections
+
+
+def conn(name, right):
+    return f"conn {name}\n    right={right}\n    auto=add\n\n"
+
+
+@pytest.fixture
+def config_tree(tmp_path, monkeypatch):
+    """
+    ipsec.conf e ipsec.d em tmp_path, usados pelo parser no lugar dos caminhos do sistema.
+    """
+    ipsec_conf = tmp_path / "ipsec.conf"
+    ipsec_d = tmp_path / "ipsec.d"
+    ipsec_d.mkdir()
+    monkeypatch.setattr(ipsec_config_parser, "IPSEC_CONFIG_PATHS", [str(ipsec_conf)])
+    monkeypatch.setattr(ipsec_config_parser, "IPSEC_D_PATH", str(ipsec_d))
+    return ipsec_conf, ipsec_d
+
+
+def test_parse_config_sections_keeps_file_order():
+    content = "config setup\n    uniqueids=yes\n\nconn %default\n    keyexchange=ikev2\n\n" + conn("office", "gw")
+    sections = parse_config_sections(content)
+
+    assert [(kind, name) for kind, name, _section in sections] == [
+        ("config", "setup"),
+        ("conn", "%default"),
+        ("conn", "office"),
+    ]
+    assert "right=gw" in sections[2][2]
+
+
+def test_scan_merges_ipsec_conf_and_sorted_fragments(config_tree):
+    ipsec_conf, ipsec_d = config_tree
+    ipsec_conf.write_text("config setup\n    charondebug=ike 1\n\n" + conn("office", "203.0.113.5"))
+    (ipsec_d / "b.conf").write_text(conn("lab", "203.0.113.80"))
+    (ipsec_d / "a.conf").write_text(conn("backup", "198.51.100.20") + conn("rw", "%any"))
+
+    result = IPsecConfigParser().scan()
+
+    assert result.files == [str(ipsec_conf), str(ipsec_d / "a.conf"), str(ipsec_d / "b.conf")]
+    assert result.connections == ["office", "backup", "rw", "lab"]
+    assert result.connection_files["lab"] == str(ipsec_d / "b.conf")
+    assert result.records["backup"].server_address == "198.51.100.20"
+    assert result.duplicates == {}
+    assert result.errors == {}
+
+
+def test_first_definition_wins_and_duplicates_are_reported(config_tree):
+    ipsec_conf, ipsec_d = config_tree
+    ipsec_conf.write_text(conn("office", "203.0.113.5"))
+    (ipsec_d / "a.conf").write_text(conn("office", "203.0.113.6"))
+    (ipsec_d / "b.conf").write_text(conn("office", "203.0.113.7"))
+
+    parser = IPsecConfigParser()
+    result = parser.scan()
+
+    assert result.connections == ["office"]
+    assert parser.get_connection_record("office").server_address == "203.0.113.5"
+    assert result.duplicates == {
+        "office": [str(ipsec_conf), str(ipsec_d / "a.conf"), str(ipsec_d / "b.conf")]
+    }
+
+
+def test_only_conf_fragments_are_scanned(config_tree):
+    # O charon só carrega o que o ipsec.conf inclui ('include /etc/ipsec.d/*.conf')
+    _ipsec_conf, ipsec_d = config_tree
+    (ipsec_d / "office.conf").write_text(conn("office", "203.0.113.5"))
+    for name in ("legacy.ipsec", "old.cfg", "office.conf~", "office.conf.bak"):
+        (ipsec_d / name).write_text(conn(name.replace(".", "-"), "192.0.2.1"))
+    (ipsec_d / "subdir.conf").mkdir()
+
+    result = IPsecConfigParser().scan()
+
+    assert result.connections == ["office"]
+    assert result.files[1:] == [str(ipsec_d / "office.conf")]
+
+
+def test_missing_files_are_skipped_and_unreadable_ones_reported(config_tree, monkeypatch, tmp_path):
+    ipsec_conf, ipsec_d = config_tree
+    unreadable = tmp_path / "not-a-file"
+    unreadable.mkdir()
+    monkeypatch.setattr(ipsec_config_parser, "IPSEC_CONFIG_PATHS", [str(ipsec_conf), str(unreadable)])
+    (ipsec_d / "a.conf").write_text(conn("office", "203.0.113.5"))
+
+    parser = IPsecConfigParser()
+    result = parser.scan()
+
+    assert result.connections == ["office"]
+    assert list(result.errors) == [str(unreadable)]
+    assert not parser.get_connection_record("missing").is_valid
+
+
+def test_missing_ipsec_d_is_not_an_error(config_tree, monkeypatch, tmp_path):
+    ipsec_conf, _ipsec_d = config_tree
+    ipsec_conf.write_text(conn("office", "203.0.113.5"))
+    monkeypatch.setattr(ipsec_config_parser, "IPSEC_D_PATH", str(tmp_path / "absent"))
+
+    assert IPsecConfigParser().scan().connections == ["office"]
+
+
+def catalog(ipsec_d, files=12, per_file=5):
+    for f in range(files):
+        (ipsec_d / f"{f:03d}.conf").write_text(
+            "".join(conn(f"c{f}-{i}", f"10.{f}.{i}.1") for i in range(per_file))
+        )
+    return [f"c{f}-{i}" for f in range(files) for i in range(per_file)]
+
+
+def test_threaded_scan_preserves_scan_order(config_tree, monkeypatch):
+    _ipsec_conf, ipsec_d = config_tree
+    expected = catalog(ipsec_d)
+    monkeypatch.setattr(ipsec_config_parser, "CONFIG_SCAN_SEQUENTIAL_LIMIT", 0)
+
+    result = IPsecConfigParser().scan()
+
+    assert result.connections == expected
+    assert result.records["c7-3"].server_address == "10.7.3.1"
+
+
+def test_large_scan_is_parsed_in_worker_processes(config_tree, monkeypatch):
+    _ipsec_conf, ipsec_d = config_tree
+    expected = catalog(ipsec_d)
+    monkeypatch.setattr(ipsec_config_parser, "CONFIG_SCAN_SEQUENTIAL_LIMIT", 0)
+    monkeypatch.setattr(ipsec_config_parser, "CONFIG_SCAN_PROCESSES", 2)
+    monkeypatch.setattr(ipsec_config_parser, "CONFIG_SCAN_PROCESS_MIN_BYTES", 0)
+    pools = []
+
+    class RecordingPool(concurrent.futures.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(kwargs.get("max_workers"))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", RecordingPool)
+
+    result = IPsecConfigParser().scan()
+
+    assert pools == [2]
+    assert result.connections == expected
+
+
+def test_process_pool_failure_falls_back_to_parsing_in_process(config_tree, monkeypatch):
+    _ipsec_conf, ipsec_d = config_tree
+    expected = catalog(ipsec_d)
+    monkeypatch.setattr(ipsec_config_parser, "CONFIG_SCAN_SEQUENTIAL_LIMIT", 0)
+    monkeypatch.setattr(ipsec_config_parser, "CONFIG_SCAN_PROCESSES", 2)
+    monkeypatch.setattr(ipsec_config_parser, "CONFIG_SCAN_PROCESS_MIN_BYTES", 0)
+
+    class UnavailablePool:
+        def __init__(self, *args, **kwargs):
+            raise OSError("sem processos")
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", UnavailablePool)
+
+    assert IPsecConfigParser().scan().connections == expected
+
+
+@pytest.mark.parametrize("value, expected", [("1048576", 1048576), ("", 32 * 1024 * 1024), ("32M", 32 * 1024 * 1024)])
+def test_process_threshold_env_var_is_parsed_defensively(monkeypatch, value, expected):
+    from src.config import app_config
+
+    monkeypatch.setenv("VPN_CLIENT_CONFIG_SCAN_PROCESS_MIN_BYTES", value)
+    assert app_config._env_int("VPN_CLIENT_CONFIG_SCAN_PROCESS_MIN_BYTES", 32 * 1024 * 1024) == expected
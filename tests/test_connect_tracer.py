@@ -0,0 +1,200 @@
+"""
+Trace por fase das conexões (src/ipsec/connect_tracer.py): fases a partir das linhas
+de 'ipsec up', encerramento pelas transições, gravação OTLP e conversão para o
+formato do Chrome; de ponta a ponta com o 'ipsec up' de uma gravação.
+"""
+
+import json
+import os
+
+import pytest
+
+from src.ipsec.connect_tracer import (
+    STATUS_ERROR,
+    STATUS_OK,
+    STATUS_UNSET,
+    ConnectTrace,
+    ConnectTracer,
+    list_trace_files,
+    otlp_to_chrome,
+)
+from src.ipsec.connection_state import ConnectionState, StateTransition
+
+from conftest import replay_command, use_replay
+
+MS = 1_000_000
+UP_LINES = [
+    (10, "initiating IKE_SA office[3] to 127.0.0.1\n"),
+    (20, "sending packet: from 192.0.2.10[500] to 127.0.0.1[500] (464 bytes)\n"),
+    (1020, "retransmit 1 of request with message ID 0\n"),
+    (1050, "parsed IKE_SA_INIT response 0 [ SA KE No N(NATD_S_IP) ]\n"),
+    (1100, "server requested EAP_IDENTITY (id 0x00), sending 'user'\n"),
+    (1400, "EAP method EAP_MSCHAPV2 succeeded, MSK established\n"),
+    (1450, "IKE_SA office[3] established between 192.0.2.10[me]...127.0.0.1[gw]\n"),
+    (1500, "CHILD_SA office{4} established with SPIs c1_i c2_o\n"),
+    (1510, "connection 'office' established successfully\n"),
+]
+
+
+def _spans(trace):
+    return {span.name: span for span in trace.spans}
+
+
+def _fed_trace(start_ns=0):
+    trace = ConnectTrace("office")
+    trace.begin_ipsec_up()
+    for offset_ms, line in UP_LINES:
+        trace.feed_line(line, start_ns + offset_ms * MS)
+    return trace
+
+
+def test_phases_from_ipsec_up_lines():
+    trace = _fed_trace(start_ns=1_700_000_000_000 * MS)
+    spans = _spans(trace)
+
+    assert [span.name for span in trace.spans] == [
+        "connect office", "ipsec up", "sudo", "IKE_SA_INIT", "IKE_AUTH", "EAP", "CHILD_SA",
+    ]
+    up = spans["ipsec up"]
+    assert spans["sudo"].parent_id == up.span_id
+    assert spans["EAP"].parent_id == spans["IKE_AUTH"].span_id
+    assert spans["CHILD_SA"].parent_id == up.span_id
+    assert spans["IKE_SA_INIT"].duration == pytest.approx(1.04)
+    assert spans["IKE_SA_INIT"].attributes["ike.retransmits"] == 1
+    assert spans["EAP"].duration == pytest.approx(0.3)
+    assert spans["IKE_AUTH"].duration == pytest.approx(0.4)
+    assert all(spans[name].status == STATUS_OK for name in ("IKE_SA_INIT", "IKE_AUTH", "EAP", "CHILD_SA"))
+    # Cada linha vira um evento da fase aberta naquele momento
+    assert [event[1] for event in spans["IKE_SA_INIT"].events][-1].startswith("retransmit 1")
+
+
+def test_lines_outside_ipsec_up_are_ignored():
+    trace = ConnectTrace("office")
+    trace.feed_line("initiating IKE_SA office[3] to 127.0.0.1")
+
+    assert [span.name for span in trace.spans] == ["connect office"]
+
+
+def test_failed_ipsec_up_marks_open_phases():
+    trace = ConnectTrace("office")
+    trace.begin_ipsec_up()
+    trace.feed_line(UP_LINES[0][1])
+
+    trace.end_ipsec_up(False, "AUTHENTICATION_FAILED")
+    trace.finish(False, "AUTHENTICATION_FAILED")
+
+    spans = _spans(trace)
+    assert spans["IKE_SA_INIT"].status == STATUS_ERROR
+    assert spans["ipsec up"].message == "AUTHENTICATION_FAILED"
+    assert "confirmação" not in spans
+    assert trace.root.status == STATUS_ERROR
+    assert all(span.end_ns is not None for span in trace.spans)
+
+
+def test_successful_ipsec_up_waits_for_confirmation():
+    trace = _fed_trace()
+    trace.end_ipsec_up(True, "")
+    spans = _spans(trace)
+    assert spans["confirmação"].end_ns is None
+
+    trace.finish(True)
+    assert spans["confirmação"].status == STATUS_OK
+    assert spans["CHILD_SA"].status == STATUS_OK
+    assert trace.summary().startswith("Trace de office (")
+    assert "IKE_SA_INIT 1.04s (1 retransmissão)" in trace.summary()
+
+
+def _transition(previous, state, detail=""):
+    return StateTransition("office", previous, state, 1_700_000_000.0, detail)
+
+
+def test_tracer_finishes_on_transitions_and_saves_otlp(tmp_path):
+    tracer = ConnectTracer(str(tmp_path), max_files=2)
+    tracer.begin("office").begin_ipsec_up()
+    tracer.record_log_lines("office", ["12[IKE] sending DPD request"])
+    tracer.record_transition(_transition(ConnectionState.DISCONNECTED, ConnectionState.CONNECTING))
+    assert "office" in tracer.active
+
+    tracer.record_transition(_transition(ConnectionState.CONNECTING, ConnectionState.CONNECTED))
+
+    assert tracer.active == {}
+    trace = tracer.pop_finished("office")
+    assert trace.root.status == STATUS_OK
+    assert tracer.pop_finished("office") is None
+    (path,) = list_trace_files(str(tmp_path))
+    with open(path, encoding="utf-8") as trace_file:
+        document = json.load(trace_file)
+    spans = document["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [span["name"] for span in spans] == ["connect office", "ipsec up", "sudo"]
+    assert all(span["traceId"] == trace.trace_id for span in spans)
+    assert "parentSpanId" not in spans[0]
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+    events = [event["name"] for event in spans[2]["events"]]
+    assert events == [
+        "12[IKE] sending DPD request",
+        f"{ConnectionState.DISCONNECTED.label} -> {ConnectionState.CONNECTING.label}",
+        f"{ConnectionState.CONNECTING.label} -> {ConnectionState.CONNECTED.label}",
+    ]
+
+
+def test_tracer_failure_and_pruning(tmp_path):
+    tracer = ConnectTracer(str(tmp_path), max_files=2)
+    for _ in range(3):
+        tracer.begin("office")
+        tracer.record_transition(_transition(ConnectionState.CONNECTING, ConnectionState.FAILED, "timeout"))
+
+    assert len(list_trace_files(str(tmp_path))) == 2
+    trace = tracer.pop_finished("office")
+    assert (trace.root.status, trace.root.message) == (STATUS_ERROR, "timeout")
+
+    # Uma nova tentativa encerra a anterior ainda aberta
+    first = tracer.begin("lab")
+    tracer.begin("lab")
+    assert first.finished and first.root.message == "substituído por uma nova tentativa"
+
+
+def test_chrome_export():
+    trace = _fed_trace(start_ns=2_000 * MS)
+    trace.end_ipsec_up(True, "")
+    trace.finish(True)
+
+    chrome = otlp_to_chrome(trace.to_otlp())
+
+    complete = [event for event in chrome["traceEvents"] if event["ph"] == "X"]
+    instants = [event for event in chrome["traceEvents"] if event["ph"] == "i"]
+    assert [event["name"] for event in complete][:4] == ["connect office", "ipsec up", "sudo", "IKE_SA_INIT"]
+    init = next(event for event in complete if event["name"] == "IKE_SA_INIT")
+    assert init["ts"] == 2_010_000
+    assert init["dur"] == 1_040_000
+    assert init["args"]["ike.retransmits"] == "1"
+    assert len(instants) == len(UP_LINES)
+    assert chrome["displayTimeUnit"] == "ms"
+
+
+def test_trace_of_a_replayed_connect(monkeypatch, tmp_path):
+    up = replay_command(
+        ["sudo", "ipsec", "up", "office"], "".join(line for _, line in UP_LINES), duration=0.02
+    )
+    up["lines"] = [[offset_ms / 100_000, line] for offset_ms, line in UP_LINES]
+    use_replay(monkeypatch, tmp_path, "conn office\n    right=127.0.0.1\n    auto=add\n", [up])
+    from src.ipsec.ipsec_manager import IPsecManager
+
+    manager = IPsecManager()
+    manager.tracer = ConnectTracer(str(tmp_path / "traces"))
+    try:
+        success, _message = manager.connect_connection("office")
+        assert success
+        trace = manager.tracer.active["office"]
+        assert _spans(trace)["confirmação"].end_ns is None
+
+        manager.apply_status_snapshot({"office": (ConnectionState.CONNECTED, "")})
+    finally:
+        manager.shutdown()
+
+    trace = manager.tracer.pop_finished("office")
+    assert trace.root.status == STATUS_OK
+    assert [span.name for span in trace.spans] == [
+        "connect office", "ipsec up", "sudo", "IKE_SA_INIT", "IKE_AUTH", "EAP", "CHILD_SA", "confirmação",
+    ]
+    assert all(span.status != STATUS_UNSET for span in trace.spans if span.name != "sudo")
+    assert len(os.listdir(tmp_path / "traces")) == 1
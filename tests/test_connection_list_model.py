@@ -0,0 +1,191 @@
+"""
+Seletor de conexões (src/ui/connection_list_model.py e connection_config_widget.py)
+sem display: modelo de lista, filtro por substring, debounce da seleção e dica
+carregada só quando pedida.
+"""
+
+import pytest
+from PySide6.QtCore import Qt
+
+from src.ipsec.connection_record import ConnectionRecord
+from src.ipsec.connection_state import ConnectionState
+
+from conftest import wait_until
+
+NAMES = ["office", "Office-Backup", "lab", "home"]
+
+
+@pytest.fixture
+def snapshot():
+    return {"office": ConnectionState.CONNECTED, "lab": ConnectionState.CONNECTING}
+
+
+@pytest.fixture
+def model(qapp, snapshot):
+    from src.ui.connection_list_model import ConnectionListModel
+
+    model = ConnectionListModel(snapshot)
+    model.set_connections(NAMES)
+    return model
+
+
+def _data(model, row, role):
+    return model.data(model.index(row), role)
+
+
+def test_model_rows_and_roles(model):
+    assert model.rowCount() == 4
+    assert [_data(model, row, Qt.DisplayRole) for row in range(4)] == NAMES
+    assert model.connection_at(2) == "lab"
+    assert model.connection_at(4) == ""
+    assert _data(model, 0, model.StatusRole) == ConnectionState.CONNECTED.label
+    assert _data(model, 3, model.StatusRole) is None
+    assert _data(model, 0, Qt.ToolTipRole) == ConnectionState.CONNECTED.label
+    assert model.data(model.index(9), Qt.DisplayRole) is None
+
+
+def test_badges_are_shared_per_color(model):
+    from src.ui.connection_list_model import _badge_key
+
+    _data(model, 0, Qt.DecorationRole)
+    _data(model, 1, Qt.DecorationRole)
+    _data(model, 3, Qt.DecorationRole)
+    _data(model, 2, Qt.DecorationRole)
+
+    # office conectada; Office-Backup e home sem estado; lab conectando
+    assert set(model._badges) == {"CONNECTED", "UNKNOWN", "CONNECTING"}
+    assert _badge_key(ConnectionState.FAILED) == "DISCONNECTED"
+
+
+def test_status_snapshot_changed_repaints_every_row(model, snapshot):
+    changes = []
+    model.dataChanged.connect(lambda first, last, roles: changes.append((first.row(), last.row(), list(roles))))
+
+    snapshot["home"] = ConnectionState.CONNECTED
+    model.status_snapshot_changed()
+
+    assert changes == [(0, 3, [Qt.DecorationRole, Qt.ToolTipRole, model.StatusRole])]
+    assert _data(model, 3, model.StatusRole) == ConnectionState.CONNECTED.label
+
+    model.set_connections([])
+    model.status_snapshot_changed()
+    assert len(changes) == 1
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("", NAMES),
+        ("office", ["office", "Office-Backup"]),
+        ("  BACK ", ["Office-Backup"]),
+        ("o", ["office", "Office-Backup", "home"]),
+        ("vpn", []),
+    ],
+)
+def test_filter_proxy(model, text, expected):
+    from src.ui.connection_list_model import ConnectionFilterProxyModel
+
+    proxy = ConnectionFilterProxyModel()
+    proxy.setSourceModel(model)
+    proxy.set_search_text(text)
+
+    assert [proxy.data(proxy.index(row, 0)) for row in range(proxy.rowCount())] == expected
+
+
+class FakeManager:
+    """
+    O mínimo do IPsecManager usado pelo widget: snapshot, detalhes e resolver.
+    """
+
+    class Resolver:
+        def lookup(self, host):
+            return None
+
+    def __init__(self, snapshot):
+        self.status_snapshot = snapshot
+        self.resolver = self.Resolver()
+        self.details_requests = []
+
+    def get_connection_details(self, conn_name):
+        self.details_requests.append(conn_name)
+        return ConnectionRecord(
+            conn_name, "/etc/ipsec.conf", "  right=203.0.113.5\n  ike=aes256-sha256-ecp256\n  esp=aes256gcm16\n"
+        )
+
+
+@pytest.fixture
+def widget(qapp, snapshot):
+    from src.ui.connection_config_widget import ConnectionConfigWidget
+
+    manager = FakeManager(snapshot)
+    widget = ConnectionConfigWidget(manager)
+    widget.set_connections(NAMES)
+    widget.emitted = []
+    widget.connection_changed.connect(widget.emitted.append)
+    yield widget
+    widget.deleteLater()
+
+
+def test_selection_is_debounced(widget):
+    widget.conn_selector.activated.emit(1)
+    widget.conn_selector.activated.emit(2)
+    widget.conn_selector.activated.emit(3)
+
+    # Nada até o fim do intervalo; depois, uma única troca para a última escolha
+    assert widget.emitted == []
+    wait_until(lambda: widget.emitted)
+    assert widget.emitted == ["home"]
+
+    widget.conn_selector.activated.emit(3)
+    wait_until(lambda: not widget._selection_timer.isActive())
+    assert widget.emitted == ["home"]
+
+
+def test_select_connection_skips_debounce(widget):
+    assert widget.select_connection("lab") is True
+    assert widget.emitted == ["lab"]
+    assert widget.select_connection("missing") is False
+    assert widget.get_selected_connection() == "lab"
+
+
+def test_filter_keeps_the_chosen_connection(widget):
+    # "office" já é a seleção carregada: selecioná-la de novo não emite
+    widget.select_connection("office")
+
+    widget.search_field.setText("office")
+    assert widget.conn_selector.currentText() == "office"
+
+    # Oculta pelo filtro: o seletor mostra a contagem, não outra conexão como atual
+    widget.search_field.setText("lab")
+    assert widget.conn_selector.currentIndex() == -1
+    assert widget.get_selected_connection() == "office"
+    assert widget.conn_selector.placeholderText() == "1 conexões correspondem ao filtro"
+
+    widget.search_field.returnPressed.emit()
+    assert widget.emitted == ["lab"]
+
+
+def test_search_field_only_for_large_catalogs(widget):
+    assert widget.search_field.isHidden()
+    widget.set_connections([f"conn-{i}" for i in range(10)])
+    assert not widget.search_field.isHidden()
+    # Um reset não conta como escolha do usuário
+    assert widget.get_selected_connection() == "conn-0"
+    assert widget.emitted == []
+
+
+def test_tooltip_details_are_loaded_on_demand(widget):
+    manager = widget.connection_mgr
+    model = widget.connection_model
+    model.status_snapshot_changed()
+    _data(model, 0, Qt.DisplayRole)
+    _data(model, 0, Qt.DecorationRole)
+    assert manager.details_requests == []
+
+    tooltip = _data(model, 0, Qt.ToolTipRole)
+
+    assert manager.details_requests == ["office"]
+    assert tooltip == (
+        "office\nServidor: 203.0.113.5\nIKE/ESP: aes256-sha256-ecp256/aes256gcm16\n"
+        f"Status: {ConnectionState.CONNECTED.label}"
+    )
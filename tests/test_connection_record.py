@@ -0,0 +1,119 @@
+"""
+ConnectionRecord (src/ipsec/connection_record.py): campos preguiçosos, registros de erro
+e o cache de registros por varredura.
+"""
+
+import pytest
+
+from src.ipsec import connection_record, ipsec_config_parser
+from src.ipsec.connection_record import (
+    SERVER_ADDRESS_NOT_FOUND,
+    ConnectionRecord,
+    measure_catalog_memory,
+    parse_section_options,
+)
+from src.ipsec.ipsec_config_parser import IPsecConfigParser
+
+SECTION = (
+    "    # escritório\n"
+    "    keyexchange=ikev2\n"
+    "    ike=aes256-sha256-ecp256!, aes128-sha256-modp2048\n"
+    "    esp=aes256gcm16!\n"
+    "    right=203.0.113.5   # gateway\n"
+    "    leftsubnet=10.1.0.2/32\n"
+    "    rightsubnet=10.0.0.0/24,192.168.10.0/24\n"
+    "    leftauth=eap-mschapv2\n"
+)
+
+
+def test_parse_section_options_ignores_comments():
+    options = parse_section_options(SECTION)
+
+    assert options["right"] == "203.0.113.5"
+    assert options["keyexchange"] == "ikev2"
+    assert "#" not in "".join(options)
+
+
+def test_strict_suffix_is_stripped_from_proposals():
+    record = ConnectionRecord("office", "/etc/ipsec.conf", SECTION)
+
+    assert record.ike == ("aes256-sha256-ecp256", "aes128-sha256-modp2048")
+    assert record.esp == ("aes256gcm16",)
+    assert record.left_subnets == ("10.1.0.2/32",)
+    assert record.right_subnets == ("10.0.0.0/24", "192.168.10.0/24")
+    assert record.auth_type == "eap-mschapv2"
+    assert record.server_address == "203.0.113.5"
+    assert record.is_valid
+
+
+def test_lazy_fields_are_parsed_once(monkeypatch):
+    calls = []
+
+    def counting_parse(section):
+        calls.append(section)
+        return parse_section_options(section)
+
+    monkeypatch.setattr(connection_record, "parse_section_options", counting_parse)
+    record = ConnectionRecord("office", "/etc/ipsec.conf", SECTION)
+    assert calls == []
+
+    for _ in range(3):
+        record.ike, record.esp, record.right_subnets, record.auth_type, record.server_address
+    assert calls == [SECTION]
+
+
+def test_none_is_a_resolved_value():
+    record = ConnectionRecord("office", "/etc/ipsec.conf", "    right=gw\n")
+
+    assert record.auth_type is None
+    # Resolvido: o marcador _UNSET não volta a disparar o cálculo
+    assert record._auth_type is None
+    assert record.ike == ()
+
+
+@pytest.mark.parametrize(
+    "section, expected",
+    [
+        ("    right=gw.example.net\n    rightsubnet=10.0.0.0/24\n", "gw.example.net"),
+        ("    alsoip=198.51.100.20\n", "198.51.100.20"),
+        ("    rightsubnet=10.20.0.0/16\n", "10.20.0.0"),
+        ("    left=%defaultroute\n", SERVER_ADDRESS_NOT_FOUND),
+    ],
+)
+def test_server_address_fallbacks(section, expected):
+    assert ConnectionRecord("office", "", section).server_address == expected
+
+
+def test_error_record():
+    record = ConnectionRecord.from_error("office", "não encontrada", "/etc/ipsec.d/a.conf")
+
+    assert not record.is_valid
+    assert record.error == "não encontrada"
+    assert record.config_file == "/etc/ipsec.d/a.conf"
+    assert record.options == {}
+    assert record.server_address == SERVER_ADDRESS_NOT_FOUND
+    assert "error=" in repr(record)
+
+
+def test_records_are_built_once_per_scan(tmp_path, monkeypatch):
+    ipsec_conf = tmp_path / "ipsec.conf"
+    ipsec_conf.write_text("conn office\n" + SECTION)
+    monkeypatch.setattr(ipsec_config_parser, "IPSEC_CONFIG_PATHS", [str(ipsec_conf)])
+    monkeypatch.setattr(ipsec_config_parser, "IPSEC_D_PATH", str(tmp_path / "ipsec.d"))
+    parser = IPsecConfigParser()
+
+    first = parser.get_connection_record("office")
+    assert parser.get_connection_record("office") is first
+    assert parser.get_connection_details_from_file(str(ipsec_conf), "office") is first
+
+    ipsec_conf.write_text("conn office\n    right=203.0.113.9\n")
+    parser.scan()
+    second = parser.get_connection_record("office")
+    assert second is not first
+    assert second.server_address == "203.0.113.9"
+
+
+def test_measure_catalog_memory_reports_growth_after_parsing():
+    unparsed, parsed = measure_catalog_memory(200)
+
+    assert 0 < unparsed < parsed
@@ -0,0 +1,187 @@
+"""
+Máquina de estados das conexões (src/ipsec/connection_state.py) e a regra de sucesso
+do 'ipsec up' no IPsecCommander.
+"""
+
+import subprocess
+
+import pytest
+
+from src.ipsec.command_trace import CommandRunner
+from src.ipsec.connection_state import ConnectionState, ConnectionStateMachine
+from src.ipsec.ipsec_commander import IPsecCommander
+
+S = ConnectionState
+
+
+def machine_in(state, initiated_at=None):
+    machine = ConnectionStateMachine("office", state)
+    machine.initiated_at = initiated_at
+    return machine
+
+
+@pytest.mark.parametrize(
+    "state, observed, initiated_at, polled_at, expected",
+    [
+        # Negociação em andamento: o túnel ainda ausente não encerra a conexão
+        (S.CONNECTING, S.DISCONNECTED, None, 10.0, S.CONNECTING),
+        # Consulta iniciada antes do retorno do 'ipsec up'
+        (S.CONNECTING, S.DISCONNECTED, 10.0, 9.5, S.CONNECTING),
+        # Consulta posterior ao retorno, sem túnel: falha
+        (S.CONNECTING, S.DISCONNECTED, 10.0, 10.5, S.FAILED),
+        (S.CONNECTING, S.NOT_CONFIGURED, 10.0, 10.5, S.FAILED),
+        # Sem o instante da consulta, o retorno do comando basta
+        (S.CONNECTING, S.DISCONNECTED, 10.0, None, S.FAILED),
+        (S.CONNECTING, S.CONNECTED, None, 10.0, S.CONNECTED),
+        (S.CONNECTING, S.ROUTED, None, 10.0, S.ROUTED),
+        # Desconectando: o túnel ainda ativo mantém a transição
+        (S.DISCONNECTING, S.CONNECTED, None, None, S.DISCONNECTING),
+        (S.DISCONNECTING, S.ROUTED, None, None, S.DISCONNECTING),
+        (S.DISCONNECTING, S.DISCONNECTED, None, None, S.DISCONNECTED),
+        # Uma falha continua visível até o túnel subir
+        (S.FAILED, S.DISCONNECTED, None, None, S.FAILED),
+        (S.FAILED, S.CONNECTED, None, None, S.CONNECTED),
+        # Estados estáveis seguem o observado; rekey é um estado conectado
+        (S.CONNECTED, S.REKEYING, None, None, S.REKEYING),
+        (S.REKEYING, S.CONNECTED, None, None, S.CONNECTED),
+        (S.CONNECTED, S.DISCONNECTED, None, None, S.DISCONNECTED),
+        (S.DISCONNECTED, S.CONNECTED, None, None, S.CONNECTED),
+    ],
+)
+def test_observe(state, observed, initiated_at, polled_at, expected):
+    machine = machine_in(state, initiated_at)
+
+    transition = machine.observe(observed, polled_at=polled_at)
+
+    assert machine.state == expected
+    assert machine.observed == observed
+    if expected == state:
+        assert transition is None
+    else:
+        assert (transition.previous, transition.state) == (state, expected)
+
+
+def test_failure_after_initiated_keeps_the_detail():
+    machine = machine_in(S.CONNECTING, initiated_at=10.0)
+
+    transition = machine.observe(S.DISCONNECTED, "no proposal chosen", polled_at=11.0)
+
+    assert transition.detail == "no proposal chosen"
+    assert machine.detail == "no proposal chosen"
+
+
+def test_connect_resets_initiated_and_mark_initiated_only_while_connecting():
+    machine = machine_in(S.FAILED, initiated_at=5.0)
+
+    assert machine.begin_connect().state == S.CONNECTING
+    assert machine.initiated_at is None
+    machine.mark_initiated()
+    assert machine.initiated_at is not None
+
+    idle = machine_in(S.DISCONNECTED)
+    idle.mark_initiated()
+    assert idle.initiated_at is None
+
+
+@pytest.mark.parametrize(
+    "state, action, expected",
+    [
+        (S.DISCONNECTED, "begin_connect", S.CONNECTING),
+        (S.CONNECTED, "begin_connect", S.CONNECTED),
+        (S.ROUTED, "begin_connect", S.ROUTED),
+        (S.CONNECTED, "begin_disconnect", S.DISCONNECTING),
+        (S.ROUTED, "begin_disconnect", S.DISCONNECTING),
+        (S.DISCONNECTED, "begin_disconnect", S.DISCONNECTED),
+        (S.NOT_CONFIGURED, "begin_disconnect", S.NOT_CONFIGURED),
+        (S.CONNECTED, "abort_transition", S.CONNECTED),
+    ],
+)
+def test_user_actions(state, action, expected):
+    machine = machine_in(state)
+
+    getattr(machine, action)()
+
+    assert machine.state == expected
+
+
+def test_abort_returns_to_last_observed_state():
+    machine = machine_in(S.CONNECTED)
+    machine.observe(S.CONNECTED)
+    machine.begin_disconnect()
+
+    transition = machine.abort_transition()
+
+    assert (transition.previous, transition.state) == (S.DISCONNECTING, S.CONNECTED)
+
+
+@pytest.mark.parametrize(
+    "state, elapsed, expected",
+    [
+        (S.CONNECTING, 30, S.CONNECTING),
+        (S.CONNECTING, 61, S.FAILED),
+        (S.DISCONNECTING, 61, S.CONNECTED),
+        (S.CONNECTED, 600, S.CONNECTED),
+    ],
+)
+def test_expire(state, elapsed, expected):
+    machine = machine_in(state)
+    machine.observed = S.CONNECTED
+
+    machine.expire(60, now=machine.since + elapsed)
+
+    assert machine.state == expected
+
+
+def test_only_real_changes_produce_transitions():
+    machine = machine_in(S.CONNECTED)
+
+    assert machine.observe(S.CONNECTED, "mesmo estado") is None
+    assert machine.detail == "mesmo estado"
+
+
+@pytest.mark.parametrize(
+    "state, connected, active, transitional",
+    [
+        (S.CONNECTED, True, True, False),
+        (S.REKEYING, True, True, False),
+        (S.ROUTED, False, True, False),
+        (S.CONNECTING, False, False, True),
+        (S.DISCONNECTING, False, False, True),
+        (S.FAILED, False, False, False),
+    ],
+)
+def test_state_properties(state, connected, active, transitional):
+    assert (state.is_connected, state.is_active, state.is_transitional) == (connected, active, transitional)
+
+
+class FakeRunner(CommandRunner):
+    def __init__(self, returncode, stdout, stderr=""):
+        self.result = (returncode, stdout, stderr)
+
+    def stream(self, args, on_line):
+        returncode, stdout, stderr = self.result
+        for line in stdout.splitlines(True):
+            on_line(line)
+        return subprocess.CompletedProcess(args, returncode, stdout, stderr)
+
+
+@pytest.mark.parametrize(
+    "returncode, stdout, success",
+    [
+        (0, "initiating IKE_SA office[1]\nconnection 'office' established successfully\n", True),
+        # "initiating" na saída não basta: só o código 0 é sucesso
+        (1, "initiating IKE_SA office[1]\nestablishing connection 'office' failed\n", False),
+        (7, "initiating IKE_SA office[1]\n", False),
+    ],
+)
+def test_ipsec_up_success_is_the_return_code(returncode, stdout, success):
+    commander = IPsecCommander.__new__(IPsecCommander)
+    commander.runner = FakeRunner(returncode, stdout)
+    lines = []
+
+    ok, message = commander.connect_connection("office", on_line=lambda line, _ns: lines.append(line))
+
+    assert ok is success
+    assert lines == stdout.splitlines(True)
+    if not success:
+        assert "office" in message
@@ -0,0 +1,189 @@
+"""
+Histórico dos túneis (src/loggers/event_store.py) em um SQLite temporário: uptime,
+quedas, MTBF, falhas e reconexões por período, redução das amostras antigas e retenção.
+O relógio do módulo é substituído para que a linha do tempo seja exata.
+"""
+
+import math
+
+import pytest
+
+from src.ipsec.connection_state import ConnectionState as S
+from src.ipsec.connection_state import StateTransition
+from src.loggers import event_store
+from src.loggers.event_store import EventStore, format_summary, parse_period
+
+T0 = 1_000_000.0
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(T0)
+    monkeypatch.setattr(event_store, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = EventStore(str(tmp_path / "events.db"))
+    yield store
+    store.flush()
+    with store._db_lock:
+        store._connection.close()
+
+
+class Rekey:
+    def __init__(self, start, duration, probes_lost):
+        self.start = start
+        self.conn_name = "office"
+        self.kind = "rekey"
+        self.duration = duration
+        self.ok = True
+        self.source = "log"
+        self.probes_sent = 10
+        self.probes_lost = probes_lost
+        self.stall = 0.2
+
+
+def _move(store, conn_name, at, previous, state, detail=""):
+    store.record_transition(StateTransition(conn_name, previous, state, T0 + at, detail))
+
+
+@pytest.fixture
+def timeline(store, clock):
+    """
+    office: conectada de 10 a 1010 s, cai, reconecta de 1030 até o cliente sair em 3030 s
+    (com um rekey no meio); depois do reinício, uma falha. lab: desligada pelo usuário.
+    """
+    _move(store, "office", 0, S.DISCONNECTED, S.CONNECTING)
+    _move(store, "office", 10, S.CONNECTING, S.CONNECTED)
+    _move(store, "office", 1010, S.CONNECTED, S.DISCONNECTED, "DPD timeout")
+    clock.now = T0 + 1020
+    store.record_reconnect("office", True)
+    _move(store, "office", 1020, S.DISCONNECTED, S.CONNECTING)
+    _move(store, "office", 1030, S.CONNECTING, S.CONNECTED)
+    _move(store, "office", 2030, S.CONNECTED, S.REKEYING)
+    _move(store, "office", 2040, S.REKEYING, S.CONNECTED)
+    store.record_rekey(Rekey(T0 + 2030, 0.8, 0))
+    store.record_rekey(Rekey(T0 + 2500, 1.5, 2))
+    clock.now = T0 + 3030
+    store.record_app_event("stop")
+    clock.now = T0 + 4030
+    store.record_app_event("start")
+    _move(store, "office", 4035, S.DISCONNECTED, S.CONNECTING)
+    _move(store, "office", 4040, S.CONNECTING, S.FAILED, "AUTHENTICATION_FAILED")
+
+    _move(store, "lab", 0, S.DISCONNECTED, S.CONNECTED)
+    _move(store, "lab", 100, S.CONNECTED, S.DISCONNECTING)
+    _move(store, "lab", 105, S.DISCONNECTING, S.DISCONNECTED)
+    clock.now = T0 + 5030
+    return store
+
+
+def test_availability_over_the_whole_timeline(timeline):
+    office = timeline.availability("office", T0, T0 + 5030)
+
+    assert office.observed == 5030
+    assert office.connected == pytest.approx(1000 + 2000)
+    assert office.uptime_ratio == pytest.approx(3000 / 5030)
+    assert office.drops == 1
+    assert office.mtbf == pytest.approx(3000)
+    assert office.failures == 1
+    assert office.reconnects == 1
+    assert (office.rekeys, office.rekey_max, office.disrupted_rekeys) == (2, 1.5, 1)
+
+
+def test_user_disconnect_is_not_a_drop(timeline):
+    lab = timeline.availability("lab", T0, T0 + 5030)
+
+    assert lab.connected == pytest.approx(100)
+    assert lab.drops == 0
+    assert lab.mtbf is None
+
+
+@pytest.mark.parametrize(
+    "start, end, connected",
+    [
+        # Período dentro de um intervalo conectado: o estado vem do evento anterior
+        (2000, 2500, 500),
+        # Depois que o cliente saiu: desconectado, mesmo sem evento da conexão
+        (3500, 4000, 0),
+        # Atravessa a saída do cliente
+        (3000, 3500, 30),
+    ],
+)
+def test_availability_of_partial_periods(timeline, start, end, connected):
+    office = timeline.availability("office", T0 + start, T0 + end)
+
+    assert office.observed == end - start
+    assert office.connected == pytest.approx(connected)
+    assert office.drops == 0
+
+
+def test_unknown_connection_and_future_end(timeline):
+    assert timeline.availability("missing", T0, T0 + 5030).uptime_ratio is None
+    # O fim do período é limitado ao momento atual
+    assert timeline.availability("lab", T0, T0 + 99999).end == T0 + 5030
+
+
+def test_summary_table(timeline):
+    rows = timeline.summary(T0, T0 + 5030)
+
+    assert [row.conn_name for row in rows] == ["lab", "office"]
+    table = format_summary(rows).splitlines()
+    assert table[0].split() == ["Conexão", "Disponibilidade", "Conectado", "Quedas", "MTBF", "Falhas", "Reconexões", "Rekeys"]
+    assert table[2].split()[:6] == ["office", "59.64%", "00:50:00", "1", "00:50:00", "1"]
+    assert table[2].endswith("2 (máx. 1.50 s, 1 com perda)")
+
+
+def test_counter_samples_are_downsampled(store, clock):
+    now = T0 + 60 * 86400
+    hourly = math.floor((now - 40 * 86400) / 3600) * 3600
+    five_minutes = math.floor((now - 3 * 86400) / 300) * 300
+    samples = [
+        (hourly, 10), (hourly + 1200, 20),
+        (five_minutes, 100), (five_minutes + 60, 200), (five_minutes + 120, 300), (five_minutes + 300, 400),
+        (now - 3600, 500),
+    ]
+    for at, value in samples:
+        clock.now = at
+        assert store.record_counters("office", value, value, 1, 1)
+    clock.now = at + 10
+    assert not store.record_counters("office", 0, 0, 0, 0)
+
+    clock.now = now
+    store.flush()
+    store.maintain(now)
+
+    assert [(at, bytes_in) for at, bytes_in, *_ in store.counter_samples("office", 0, now)] == [
+        (hourly, 20), (five_minutes, 300), (five_minutes + 300, 400), (now - 3600, 500),
+    ]
+
+
+def test_retention_removes_old_events(store, clock):
+    _move(store, "office", 0, S.DISCONNECTED, S.CONNECTED)
+    clock.now = T0 + 400 * 86400
+    _move(store, "office", 400 * 86400 - 10, S.CONNECTED, S.DISCONNECTED)
+
+    store.flush()
+    store.maintain(clock.now)
+
+    assert store._query("SELECT time FROM events") == [(T0 + 400 * 86400 - 10,)]
+
+
+@pytest.mark.parametrize("text, seconds", [("24h", 86400), ("7d", 7 * 86400), (" 2W ", 14 * 86400)])
+def test_parse_period(text, seconds):
+    assert parse_period(text) == seconds
+
+
+def test_parse_period_rejects_other_formats():
+    with pytest.raises(ValueError):
+        parse_period("7 days")
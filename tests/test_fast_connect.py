@@ -0,0 +1,161 @@
+"""
+Modo de conexão rápida do IPsecManager ('ipsec route' e a IKE SA mantida após desligar)
+sobre uma gravação: os comandos executados são gravados de novo pelo CommandRecorder
+(src/ipsec/command_trace.py) para conferir a sequência.
+"""
+
+import time
+
+import pytest
+
+from src.ipsec import ipsec_manager
+from src.ipsec.command_trace import CommandRecorder, load_trace
+from src.ipsec.connection_state import ConnectionState
+
+from conftest import replay_command, use_replay, wait_until
+
+WARM_S = ipsec_manager.FAST_CONNECT_WARM_S
+IKE_ONLY_STATUS = (
+    "Security Associations (1 up, 0 connecting):\n"
+    "  office[3]: ESTABLISHED 5 minutes ago, 192.0.2.10[me]...127.0.0.1[gw]\n"
+)
+COMMANDS = [
+    replay_command(["sudo", "ipsec", "route", "office"], "'office' routed\n"),
+    replay_command(["sudo", "ipsec", "unroute", "office"], "configuration 'office' unrouted\n"),
+    replay_command(["sudo", "ipsec", "down", "office{*}"], "closing CHILD_SA office{4} with SPIs c1_i c2_o\n"),
+    replay_command(["sudo", "ipsec", "down", "office"], "deleting IKE_SA office[3]\nIKE_SA [3] closed successfully\n"),
+    replay_command(["sudo", "ipsec", "status"], IKE_ONLY_STATUS),
+]
+
+
+def _manager(monkeypatch, tmp_path, commands=COMMANDS):
+    use_replay(monkeypatch, tmp_path, "conn office\n    right=127.0.0.1\n    auto=add\n", commands)
+    monkeypatch.setattr(ipsec_manager, "FAST_CONNECT_CONNECTIONS", {"office"})
+    manager = ipsec_manager.IPsecManager()
+    manager.commander.runner = CommandRecorder(str(tmp_path / "executed.jsonl"), manager.commander.runner)
+    return manager
+
+
+def _executed(tmp_path):
+    return [" ".join(entry["args"][2:]) for entry in load_trace(str(tmp_path / "executed.jsonl"))[1]]
+
+
+@pytest.fixture
+def manager(monkeypatch, tmp_path):
+    manager = _manager(monkeypatch, tmp_path)
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture
+def warm(manager):
+    """
+    Conexão ligada pelo trap, com a IKE SA estabelecida, e depois desligada.
+    """
+    manager.connect_connection("office")
+    manager.commander.last_sa_states = {"office": {"ESTABLISHED"}}
+    success, message = manager.disconnect_connection("office")
+    assert success
+    return manager
+
+
+def test_connect_installs_the_trap(manager, tmp_path):
+    success, message = manager.connect_connection("office")
+
+    assert success
+    assert message == 'Conexão IPsec "office" ativada sob demanda: o túnel sobe com o primeiro pacote.'
+    assert manager.get_connection_state("office") == ConnectionState.ROUTED
+    # Sem 'ipsec up' não há diagnóstico nem trace
+    assert manager.last_preflight is None
+    assert manager.tracer is None or "office" not in manager.tracer.active
+    assert _executed(tmp_path) == ["route office"]
+    assert manager.fast_connect_text("office") == (
+        "Conexão rápida: trap instalado, túnel sobe com o primeiro pacote (sem IKE SA)"
+    )
+
+
+def test_disconnect_keeps_the_ike_sa(warm, tmp_path):
+    assert _executed(tmp_path) == ["route office", "unroute office", "down office{*}"]
+    since = warm.warm_ike_sas["office"]
+    assert warm.fast_connect_text("office", now=since + 61) == "Conexão rápida: IKE SA mantida por mais 8 min 59 s"
+
+
+def test_reconnect_reuses_the_ike_sa(warm, tmp_path):
+    warm.apply_status_snapshot({"office": (ConnectionState.DISCONNECTED, "")})
+
+    success, message = warm.connect_connection("office")
+
+    assert success
+    assert message.endswith("IKE SA já estabelecida: apenas a CHILD SA será negociada.")
+    assert warm.warm_ike_sas == {}
+    assert warm.expire_warm_ike_sas(now=time.time() + WARM_S) == []
+
+
+def test_expired_ike_sa_is_closed(warm, tmp_path):
+    since = warm.warm_ike_sas["office"]
+    # Desligamento ainda não confirmado por uma consulta: decidido depois
+    assert warm.expire_warm_ike_sas(now=since + WARM_S) == []
+    warm.apply_status_snapshot({"office": (ConnectionState.DISCONNECTED, "")})
+    assert warm.expire_warm_ike_sas(now=since + WARM_S - 1) == []
+
+    assert warm.expire_warm_ike_sas(now=since + WARM_S) == ["office"]
+    assert warm.warm_ike_sas == {}
+    assert warm.end_warm_ike_sa("office")[0]
+    assert _executed(tmp_path)[-1] == "down office"
+
+
+def test_ike_sa_in_use_again_is_not_closed(warm, tmp_path):
+    since = warm.warm_ike_sas["office"]
+    warm.apply_status_snapshot({"office": (ConnectionState.DISCONNECTED, "")})
+    # O trap foi instalado fora do cliente e o tráfego religou o túnel
+    warm.apply_status_snapshot({"office": (ConnectionState.CONNECTED, "")})
+
+    assert warm.expire_warm_ike_sas(now=since + WARM_S) == []
+    assert warm.warm_ike_sas == {}
+    # Religada entre a expiração e a execução do 'ipsec down'
+    assert warm.end_warm_ike_sa("office")[0] is False
+    assert "down office" not in _executed(tmp_path)
+
+
+def test_shutdown_closes_the_ike_sa(warm, tmp_path):
+    warm.shutdown()
+
+    assert _executed(tmp_path)[-1] == "down office"
+    assert warm.warm_ike_sas == {}
+
+
+def test_failed_unroute_restores_the_state(monkeypatch, tmp_path):
+    manager = _manager(
+        monkeypatch,
+        tmp_path,
+        [COMMANDS[0], replay_command(["sudo", "ipsec", "unroute", "office"], "", 1, stderr="permission denied")],
+    )
+    try:
+        manager.connect_connection("office")
+        manager.commander.last_sa_states = {"office": {"ESTABLISHED"}}
+
+        success, message = manager.disconnect_connection("office")
+
+        assert not success and "permission denied" in message
+        assert manager.get_connection_state("office") == ConnectionState.ROUTED
+        assert manager.warm_ike_sas == {}
+        assert _executed(tmp_path) == ["route office", "unroute office"]
+    finally:
+        manager.shutdown()
+
+
+def test_scheduler_closes_the_expired_ike_sa(qapp, warm, tmp_path):
+    from src.ipsec.status_scheduler import StatusScheduler
+
+    warm.warm_ike_sas["office"] -= WARM_S
+    scheduler = StatusScheduler(warm)
+    try:
+        scheduler.start()
+        # A consulta confirma o desligamento; o 'ipsec down' vai para a thread de consulta
+        wait_until(lambda: "down office" in _executed(tmp_path))
+    finally:
+        scheduler.stop()
+
+    assert warm.get_connection_state("office") == ConnectionState.DISCONNECTED
+    assert warm.warm_ike_sas == {}
+    assert _executed(tmp_path)[3:] == ["status", "down office"]
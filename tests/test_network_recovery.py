@@ -0,0 +1,159 @@
+"""
+Recuperação após mudanças de rede (IPsecManager.plan_network_recovery e
+src/ipsec/network_recovery.py) sem gateway: o gateway é 127.0.0.1, então o endereço
+local atual é 127.0.0.1, e o endereço da IKE SA vem da consulta de status.
+"""
+
+import pytest
+
+from src.ipsec.connection_state import ConnectionState
+
+from conftest import replay_command, use_replay, wait_until
+
+STATUS_FROM_OLD_ADDRESS = (
+    "Security Associations (1 up, 0 connecting):\n"
+    "  office[3]: ESTABLISHED 2 seconds ago, 192.0.2.10[me]...127.0.0.1[gw]\n"
+    "  office{4}:  INSTALLED, TUNNEL, reqid 1, ESP in UDP SPIs: c1_i c2_o\n"
+)
+UP_OK = "initiating IKE_SA office[5] to 127.0.0.1\nconnection 'office' established successfully\n"
+
+
+def _config(extra=""):
+    return f"conn office\n    right=127.0.0.1\n    rightsubnet=10.0.0.0/24\n{extra}    auto=add\n"
+
+
+def _manager(monkeypatch, tmp_path, config, commands=()):
+    use_replay(monkeypatch, tmp_path, config, commands)
+    from src.ipsec.ipsec_manager import IPsecManager
+
+    manager = IPsecManager()
+    # Entrada do resolver já em cache, como após a resolução em segundo plano
+    manager.resolver.resolve("127.0.0.1")
+    return manager
+
+
+def _established(manager, sa_source):
+    manager.commander.last_sa_endpoints = {"office": (sa_source, "127.0.0.1")}
+    manager.apply_status_snapshot({"office": (ConnectionState.CONNECTED, "")})
+
+
+@pytest.fixture
+def ikev2(monkeypatch, tmp_path):
+    manager = _manager(monkeypatch, tmp_path, _config())
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture
+def ikev1(monkeypatch, tmp_path):
+    manager = _manager(monkeypatch, tmp_path, _config("    keyexchange=ikev1\n"))
+    yield manager
+    manager.shutdown()
+
+
+def test_tunnel_on_current_address_is_left_alone(ikev1):
+    _established(ikev1, "127.0.0.1")
+
+    assert ikev1.established_sources == {"office": "127.0.0.1"}
+    assert ikev1.plan_network_recovery(mobike_grace_over=True) == ([], False)
+
+
+def test_mobike_gets_a_grace_period(ikev2):
+    _established(ikev2, "192.0.2.10")
+
+    assert ikev2.supports_mobike("office")
+    assert ikev2.plan_network_recovery(mobike_grace_over=False) == ([], True)
+    assert ikev2.plan_network_recovery(mobike_grace_over=True) == (
+        [("office", "endereço local 192.0.2.10 -> 127.0.0.1")],
+        False,
+    )
+
+
+def test_migrated_sa_updates_the_known_source(ikev2):
+    _established(ikev2, "192.0.2.10")
+    # O charon migrou a IKE SA sozinho (MOBIKE) durante o prazo
+    ikev2.commander.last_sa_endpoints = {"office": ("127.0.0.1", "127.0.0.1")}
+
+    assert ikev2.plan_network_recovery(mobike_grace_over=False) == ([], False)
+    assert ikev2.established_sources["office"] == "127.0.0.1"
+
+
+def test_ikev1_is_reinitiated_without_waiting(ikev1):
+    _established(ikev1, "192.0.2.10")
+
+    assert not ikev1.supports_mobike("office")
+    assert ikev1.plan_network_recovery(mobike_grace_over=False) == (
+        [("office", "endereço local 192.0.2.10 -> 127.0.0.1")],
+        False,
+    )
+
+
+def test_dropped_tunnel_is_reinitiated(ikev2):
+    _established(ikev2, "127.0.0.1")
+    ikev2.apply_status_snapshot({"office": (ConnectionState.DISCONNECTED, "")})
+
+    reinitiate, waiting = ikev2.plan_network_recovery(mobike_grace_over=False)
+
+    assert reinitiate == [("office", f"túnel inativo ({ConnectionState.DISCONNECTED.label})")]
+    assert waiting is False
+
+
+def test_transitional_and_never_connected_tunnels_are_skipped(ikev2):
+    assert ikev2.plan_network_recovery(mobike_grace_over=True) == ([], False)
+
+    _established(ikev2, "192.0.2.10")
+    ikev2._emit(ikev2.get_state_machine("office").begin_disconnect())
+    assert ikev2.plan_network_recovery(mobike_grace_over=True) == ([], False)
+
+
+def test_user_disconnect_removes_the_candidate(monkeypatch, tmp_path):
+    manager = _manager(
+        monkeypatch,
+        tmp_path,
+        _config("    keyexchange=ikev1\n"),
+        [replay_command(["sudo", "ipsec", "down", "office"], "closed\n")],
+    )
+    try:
+        _established(manager, "192.0.2.10")
+        manager.disconnect_connection("office")
+
+        assert "office" not in manager.established_sources
+        assert manager.plan_network_recovery(mobike_grace_over=True) == ([], False)
+    finally:
+        manager.shutdown()
+
+
+def test_network_change_reconnects_in_the_background(qapp, monkeypatch, tmp_path):
+    manager = _manager(
+        monkeypatch,
+        tmp_path,
+        _config("    keyexchange=ikev1\n"),
+        [
+            replay_command(["sudo", "ipsec", "status"], STATUS_FROM_OLD_ADDRESS),
+            replay_command(["sudo", "ipsec", "up", "office"], UP_OK),
+        ],
+    )
+    from src.ipsec.network_recovery import NetworkRecovery
+    from src.ipsec.status_scheduler import StatusScheduler
+
+    scheduler = StatusScheduler(manager)
+    # Sem start(): o netlink não é aberto, a mudança é entregue diretamente
+    recovery = NetworkRecovery(manager, scheduler)
+    messages, finished = [], []
+    recovery.message.connect(messages.append)
+    recovery.reconnect_finished.connect(lambda *result: finished.append(result))
+    try:
+        scheduler.start()
+        wait_until(lambda: manager.get_connection_state("office") == ConnectionState.CONNECTED)
+        assert manager.established_sources == {"office": "192.0.2.10"}
+
+        recovery.on_network_changed("endereço adicionado")
+        wait_until(lambda: finished)
+
+        assert finished[0][:2] == ("office", True)
+        assert messages[0] == "Reconectando office: endereço local 192.0.2.10 -> 127.0.0.1"
+        assert not recovery._in_progress
+    finally:
+        recovery.stop()
+        scheduler.stop()
+        manager.shutdown()
@@ -0,0 +1,280 @@
+"""
+Diagnóstico de MTU (src/ipsec/path_mtu.py): overhead do ESP por transformação, busca
+binária com um caminho simulado (ICMP "fragmentação necessária", buraco negro, perdas
+comuns), o relatório com as recomendações e o diagnóstico de uma conexão gravada.
+"""
+
+import socket
+
+import pytest
+
+from src.ipsec import path_mtu
+from src.ipsec.cipher_benchmark import parse_proposal
+from src.ipsec.connection_state import ConnectionState
+from src.ipsec.path_mtu import (
+    IcmpProber,
+    PathMtuReport,
+    discover_path_mtu,
+    inner_mtu,
+    mss_for_mtu,
+    overhead_for_sa_suite,
+    overhead_for_transform,
+)
+
+from conftest import replay_command, use_replay
+
+
+@pytest.mark.parametrize(
+    "suite, iv, block, icv",
+    [
+        ("AES_GCM_16_256", 8, 4, 16),
+        ("AES_CCM_12_128", 8, 4, 12),
+        ("CHACHA20_POLY1305_256", 8, 4, 16),
+        ("AES_CBC_256/HMAC_SHA2_256_128", 16, 16, 16),
+        ("AES_CBC_128/HMAC_SHA1_96/MODP_2048", 16, 16, 12),
+        ("3DES_CBC/HMAC_MD5_96", 8, 8, 12),
+        ("AES_CTR_128/AES_XCBC_96", 8, 4, 12),
+        ("NULL/HMAC_SHA2_256_128", 0, 4, 16),
+    ],
+)
+def test_overhead_for_sa_suite(suite, iv, block, icv):
+    overhead = overhead_for_sa_suite(suite)
+
+    assert (overhead.iv, overhead.block, overhead.icv) == (iv, block, icv)
+
+
+def test_unknown_sa_suite():
+    assert overhead_for_sa_suite("CAMELLIA_XTS_256") is None
+
+
+@pytest.mark.parametrize(
+    "proposal, suite",
+    [
+        ("aes256gcm16", "AES_GCM_16_256"),
+        ("aes256-sha256", "AES_CBC_256/HMAC_SHA2_256_128"),
+        ("aes128-sha1", "AES_CBC_128/HMAC_SHA1_96"),
+        ("3des-md5", "3DES_CBC/HMAC_MD5_96"),
+        ("chacha20poly1305", "CHACHA20_POLY1305_256"),
+    ],
+)
+def test_transform_and_sa_suite_agree(proposal, suite):
+    configured = overhead_for_transform(parse_proposal(proposal)[0])
+    negotiated = overhead_for_sa_suite(suite)
+
+    assert (configured.iv, configured.block, configured.icv) == (negotiated.iv, negotiated.block, negotiated.icv)
+
+
+@pytest.mark.parametrize(
+    "suite, family, udp_encap, expected",
+    [
+        # 1500 - (20 IP + 8 ESP + 8 IV + 16 ICV) = 1448, já múltiplo de 4; menos o trailer
+        ("AES_GCM_16_256", socket.AF_INET, False, 1446),
+        ("AES_GCM_16_256", socket.AF_INET, True, 1438),
+        ("AES_GCM_16_256", socket.AF_INET6, True, 1418),
+        # 1500 - (20 + 8 UDP + 8 + 16 IV + 16 ICV) = 1432, alinhado a 1424 pelo bloco de 16
+        ("AES_CBC_256/HMAC_SHA2_256_128", socket.AF_INET, True, 1422),
+        ("3DES_CBC/HMAC_SHA1_96", socket.AF_INET, False, 1446),
+    ],
+)
+def test_inner_mtu(suite, family, udp_encap, expected):
+    assert inner_mtu(1500, overhead_for_sa_suite(suite), family, udp_encap) == expected
+
+
+def test_mss_for_mtu():
+    assert mss_for_mtu(1438) == 1398
+    assert mss_for_mtu(1418, socket.AF_INET6) == 1358
+
+
+class SimulatedPath(IcmpProber):
+    """
+    Caminho com um MTU fixo: acima dele os pacotes voltam como 'too_big' (com o MTU
+    informado por ICMP) ou somem; 'lose_once' perde a primeira sonda de cada tamanho.
+    """
+
+    def __init__(self, mtu, reports_icmp=True, responds=True, lose_once=()):
+        self.family = socket.AF_INET
+        self.mtu = mtu
+        self.reports_icmp = reports_icmp
+        self.responds = responds
+        self.lose_once = set(lose_once)
+        self.sent = []
+
+    def close(self):
+        pass
+
+    def probe(self, size):
+        self.sent.append(size)
+        if not self.responds:
+            return "lost", None
+        if size in self.lose_once:
+            self.lose_once.discard(size)
+            return "lost", None
+        if size <= self.mtu:
+            return "ok", None
+        if self.reports_icmp:
+            return "too_big", self.mtu
+        return "lost", None
+
+
+@pytest.fixture
+def path(monkeypatch):
+    paths = []
+
+    def use(*args, **kwargs):
+        simulated = SimulatedPath(*args, **kwargs)
+        paths.append(simulated)
+        return simulated
+
+    monkeypatch.setattr(path_mtu, "IcmpProber", lambda address, timeout: paths[-1])
+    return use
+
+
+def test_icmp_narrows_the_search(path):
+    simulated = path(1400)
+
+    probe = discover_path_mtu("10.0.0.1", upper=1500)
+
+    assert (probe.mtu, probe.reported_mtu, probe.silent_drops) == (1400, 1400, [])
+    assert probe.blackhole is False
+    assert probe.probes == len(simulated.sent)
+    # Depois do primeiro ICMP nenhuma sonda passa do MTU informado
+    too_big = [size for size in simulated.sent if size > 1400]
+    assert len(too_big) == 1
+
+
+def test_silent_drops_are_a_blackhole(path):
+    simulated = path(1400, reports_icmp=False)
+
+    probe = discover_path_mtu("10.0.0.1", upper=1500)
+
+    assert probe.mtu == 1400
+    assert probe.reported_mtu is None
+    assert probe.silent_drops and min(probe.silent_drops) > 1400
+    assert probe.blackhole is True
+    # Cada tamanho perdido é repetido antes de ser considerado descartado
+    assert all(simulated.sent.count(size) == 2 for size in probe.silent_drops)
+
+
+def test_ordinary_loss_is_retried(path):
+    path(1400, lose_once=[768, 1134])
+
+    probe = discover_path_mtu("10.0.0.1", upper=1500)
+
+    assert probe.mtu == 1400
+    assert probe.silent_drops == []
+
+
+def test_full_path_mtu(path):
+    path(1500, reports_icmp=False)
+
+    probe = discover_path_mtu("10.0.0.1", upper=1500)
+
+    assert probe.mtu == 1500
+    assert probe.blackhole is False
+
+
+def test_unresponsive_host(path):
+    simulated = path(1500, responds=False)
+
+    probe = discover_path_mtu("10.0.0.1", upper=1500)
+
+    assert probe.mtu is None
+    assert probe.blackhole is None
+    assert simulated.sent == [36, 36]
+
+
+def test_loopback_probe():
+    try:
+        probe = discover_path_mtu("127.0.0.1", upper=2000, timeout=0.2)
+    except PermissionError:
+        pytest.skip("sondas ICMP não permitidas neste ambiente")
+
+    assert probe.mtu == 2000
+
+
+def _report(probe=None, **kwargs):
+    report = PathMtuReport("office", "203.0.113.5", 1500, True, overhead_for_sa_suite("AES_GCM_16_256"), **kwargs)
+    report.probe = probe
+    return report
+
+
+def test_report_without_probe():
+    report = _report()
+
+    assert (report.expected_inner_mtu, report.effective_mtu, report.recommended_mss) == (1438, 1438, 1398)
+    assert report.blackhole is None
+    text = report.describe()
+    assert "Overhead: IP 20 + UDP 8 + ESP 8 + IV 8 + ICV 16 = 60 bytes" in text
+    assert "MTU interno calculado: 1438 (MSS 1398)" in text
+    assert "--set-mss 1398" in text
+
+
+def test_report_with_blackhole(path):
+    path(1380, reports_icmp=False)
+    report = _report(discover_path_mtu("10.0.0.1", upper=1438), fragmentation="no", ike_version="ikev1")
+
+    assert report.effective_mtu == 1380
+    assert report.recommended_mss == 1340
+    text = report.describe()
+    assert "buraco negro de PMTU" in text
+    assert "O caminho é menor" not in text
+    recommendations = report.recommendations()
+    assert "--set-mss 1340" in recommendations[0]
+    assert recommendations[1].startswith("O caminho descarta pacotes acima de 1380 bytes")
+    assert recommendations[2].startswith("fragmentation=yes")
+
+
+def test_report_ikev1_blackhole_suggests_forced_fragmentation(path):
+    path(1380, reports_icmp=False)
+    report = _report(discover_path_mtu("10.0.0.1", upper=1438), ike_version="ikev1")
+
+    assert report.recommendations()[-1].startswith("fragmentation=force")
+
+
+def test_report_with_unknown_transform():
+    report = PathMtuReport("office", "203.0.113.5", 1500, None, None)
+
+    assert report.recommended_mss is None
+    assert report.recommendations() == []
+    assert "Transformação ESP desconhecida" in report.describe()
+
+
+STATUSALL = (
+    "Security Associations (1 up, 0 connecting):\n"
+    "  office[3]: ESTABLISHED 2 seconds ago, 192.0.2.10[me]...127.0.0.1[gw]\n"
+    "  office{4}:  INSTALLED, TUNNEL, reqid 1, ESP in UDP SPIs: c1_i c2_o\n"
+    "  office{4}:  AES_CBC_256/HMAC_SHA2_256_128, 1024 bytes_i (8 pkts, 1s ago), 2048 bytes_o (9 pkts, 1s ago)\n"
+)
+
+
+def test_connection_report_from_a_recording(monkeypatch, tmp_path, path):
+    use_replay(
+        monkeypatch,
+        tmp_path,
+        "conn office\n    right=127.0.0.1\n    rightsubnet=10.0.0.0/24\n    esp=aes128gcm16\n    auto=add\n",
+        [replay_command(["sudo", "ipsec", "statusall", "office"], STATUSALL)],
+    )
+    monkeypatch.setattr(path_mtu, "kernel_path_mtu", lambda address: 1500)
+    simulated = path(1400)
+    from src.ipsec.ipsec_manager import IPsecManager
+
+    manager = IPsecManager()
+    try:
+        manager.resolver.resolve("127.0.0.1")
+        with pytest.raises(ValueError):
+            manager.run_path_mtu_check("office")
+        manager.apply_status_snapshot({"office": (ConnectionState.CONNECTED, "")})
+
+        report = manager.run_path_mtu_check("office")
+    finally:
+        manager.shutdown()
+
+    # A suite negociada prevalece sobre o esp= configurado
+    assert report.overhead.label == "AES_CBC_256/HMAC_SHA2_256_128"
+    assert report.udp_encap is True
+    assert report.expected_inner_mtu == 1422
+    # Sonda até o primeiro endereço do rightsubnet, limitada ao MTU do kernel
+    assert report.probe.address == "10.0.0.1"
+    assert (report.probe.upper, report.probe.mtu) == (1500, 1400)
+    assert report.effective_mtu == 1400
+    assert simulated.sent
@@ -0,0 +1,183 @@
+"""
+Diagnóstico antes do 'ipsec up' (src/ipsec/preflight.py): sondas UDP contra sockets
+locais, resumo do relatório, verificação de credenciais e cache por gateway.
+"""
+
+import socket
+
+import pytest
+
+from src.ipsec import preflight
+from src.ipsec.connection_record import ConnectionRecord
+from src.ipsec.preflight import PreflightCheck, PreflightChecker, PreflightReport
+
+
+def _free_udp_port():
+    # Porta que acabou de ser liberada: ninguém escuta nela, o kernel responde com ICMP
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def udp_listener():
+    """Socket UDP local que recebe e não responde (gateway que ignora o keepalive)."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    yield sock
+    sock.close()
+
+
+def _use_ports(monkeypatch, ike_port, nat_t_port):
+    monkeypatch.setattr(preflight, "IKE_PORT", ike_port)
+    monkeypatch.setattr(preflight, "NAT_T_PORT", nat_t_port)
+
+
+def test_probe_both_ports_refused_blocks(monkeypatch):
+    _use_ports(monkeypatch, _free_udp_port(), _free_udp_port())
+    checks = preflight._probe_udp_ports("127.0.0.1", 1.0)
+
+    assert [check.passed for check in checks] == [False, False]
+    assert all("ICMP port unreachable" in check.message for check in checks)
+    assert not any("outra porta" in check.message for check in checks)
+
+
+def test_probe_single_refused_port_is_a_warning(monkeypatch, udp_listener):
+    _use_ports(monkeypatch, udp_listener.getsockname()[1], _free_udp_port())
+    checks = preflight._probe_udp_ports("127.0.0.1", 0.2)
+
+    ike, nat_t = checks
+    assert ike.passed is True
+    assert ike.message == "nenhuma recusa recebida"
+    assert udp_listener.recv(16) == preflight.NAT_T_KEEPALIVE
+    assert nat_t.passed is None
+    assert nat_t.message.endswith("; o IKE pode seguir pela outra porta")
+
+
+def test_probe_reply_is_reported(monkeypatch, udp_listener):
+    port = udp_listener.getsockname()[1]
+    _use_ports(monkeypatch, port, port)
+    # Resposta a cada keepalive, antes mesmo do select: fica na fila dos sockets da sonda
+    original_send = socket.socket.send
+
+    def send_and_echo(sock, data):
+        sent = original_send(sock, data)
+        payload, peer = udp_listener.recvfrom(16)
+        udp_listener.sendto(payload, peer)
+        return sent
+
+    monkeypatch.setattr(socket.socket, "send", send_and_echo)
+    checks = preflight._probe_udp_ports("127.0.0.1", 1.0)
+
+    assert [(check.name, check.passed, check.message) for check in checks] == [
+        (f"UDP/{port}", True, "resposta recebida"),
+        (f"UDP/{port}", True, "resposta recebida"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "passed, ok, failures, warnings, summary",
+    [
+        ((True, True), True, 0, 0, 'Diagnóstico de "office" sem problemas (12 ms).'),
+        (
+            (True, None),
+            True,
+            0,
+            1,
+            'Diagnóstico de "office" sem bloqueios (12 ms); avisos: UDP/4500: motivo UDP/4500',
+        ),
+        (
+            (False, None),
+            False,
+            1,
+            1,
+            'Diagnóstico de "office" falhou: DNS: motivo DNS',
+        ),
+    ],
+)
+def test_report_summary(passed, ok, failures, warnings, summary):
+    checks = [
+        PreflightCheck(name, value, f"motivo {name}")
+        for name, value in zip(("DNS", "UDP/4500"), passed)
+    ]
+    report = PreflightReport("office", "vpn.example.com", checks, 0.012)
+
+    assert report.ok is ok
+    assert len(report.failures) == failures
+    assert len(report.warnings) == warnings
+    assert report.summary() == summary
+
+
+def test_check_credentials(monkeypatch, tmp_path):
+    (tmp_path / "client.pem").write_text("cert")
+    monkeypatch.setattr(preflight, "IPSEC_CERTS_PATH", str(tmp_path))
+    monkeypatch.setattr(preflight, "IPSEC_SECRETS_PATH", str(tmp_path / "ipsec.secrets"))
+    record = ConnectionRecord(
+        "office",
+        section="  leftcert=client.pem\n  rightcert=%any\n  authby=secret\n",
+    )
+
+    checks = preflight.check_credentials(record)
+
+    assert [(check.name, check.passed) for check in checks] == [
+        ("leftcert", True),
+        ("Segredos", False),
+    ]
+    assert checks[0].message == str(tmp_path / "client.pem")
+
+
+class FakeGatewayCheck:
+    """Substitui check_gateway: resultado fixo e contagem de chamadas."""
+
+    def __init__(self, checks):
+        self.checks = checks
+        self.calls = []
+
+    def __call__(self, host, timeout, resolver):
+        self.calls.append(host)
+        return list(self.checks)
+
+
+@pytest.fixture
+def checker():
+    checker = PreflightChecker(timeout=1.0, cache_ttl=60)
+    yield checker
+    checker.shutdown()
+
+
+def test_checker_caches_network_checks(monkeypatch, checker):
+    gateway_check = FakeGatewayCheck([PreflightCheck("DNS", True, "ok")])
+    monkeypatch.setattr(preflight, "check_gateway", gateway_check)
+    record = ConnectionRecord("office", section="  right=vpn.example.com\n")
+
+    first = checker.run(record)
+    second = checker.run(record)
+
+    assert gateway_check.calls == ["vpn.example.com"]
+    assert (first.cached, second.cached) == (False, True)
+    assert [check.name for check in second.checks] == ["DNS"]
+
+    checker.invalidate("vpn.example.com")
+    assert checker.run(record).cached is False
+    assert len(gateway_check.calls) == 2
+
+
+def test_checker_does_not_cache_failures(monkeypatch, checker):
+    gateway_check = FakeGatewayCheck([PreflightCheck("Rota", False, "sem rota")])
+    monkeypatch.setattr(preflight, "check_gateway", gateway_check)
+    record = ConnectionRecord("office", section="  right=vpn.example.com\n")
+
+    assert not checker.run(record).ok
+    assert not checker.run(record).ok
+    assert len(gateway_check.calls) == 2
+
+
+def test_checker_skips_wildcard_gateway(monkeypatch, checker):
+    gateway_check = FakeGatewayCheck([])
+    monkeypatch.setattr(preflight, "check_gateway", gateway_check)
+    record = ConnectionRecord("roadwarrior", section="  right=%any\n")
+
+    report = checker.run(record)
+
+    assert gateway_check.calls == []
+    assert report.ok and report.checks == [] and report.cached is False
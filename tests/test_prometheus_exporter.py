@@ -0,0 +1,125 @@
+"""
+Exposição das métricas (src/metrics/prometheus_exporter.py): formato texto do
+Prometheus a partir das ConnectionStats e gravação atômica do textfile.
+"""
+
+import os
+
+from src.ipsec.connection_state import ConnectionState, StateTransition
+from src.ipsec.connection_stats import ConnectionStats
+from src.metrics import prometheus_exporter
+from src.metrics.prometheus_exporter import MetricsExporter, render_metrics
+
+STATES = (
+    "not_configured", "disconnected", "connecting", "connected", "rekeying",
+    "routed", "disconnecting", "failed", "error",
+)
+
+
+def _state_lines(label, current):
+    return "".join(
+        f'vpn_ipsec_connection_state{{{label},state="{state}"}} {1 if state == current else 0}\n'
+        for state in STATES
+    )
+
+
+def _stats():
+    office = ConnectionStats('office "hq"')
+    office.record_transition(
+        StateTransition(office.name, ConnectionState.DISCONNECTED, ConnectionState.CONNECTING, 1000.0)
+    )
+    office.record_transition(
+        StateTransition(office.name, ConnectionState.CONNECTING, ConnectionState.CONNECTED, 1001.25)
+    )
+    office.record_counters(2048, 1024, 20, 10)
+    lab = ConnectionStats("lab")
+    return [office, lab]
+
+
+OFFICE = 'connection="office \\"hq\\""'
+LAB = 'connection="lab"'
+GOLDEN = (
+    "# HELP vpn_ipsec_connection_up 1 se a conexão está estabelecida.\n"
+    "# TYPE vpn_ipsec_connection_up gauge\n"
+    f"vpn_ipsec_connection_up{{{OFFICE}}} 1\n"
+    f"vpn_ipsec_connection_up{{{LAB}}} 0\n"
+    "# HELP vpn_ipsec_connection_uptime_seconds Tempo desde que a conexão foi estabelecida.\n"
+    "# TYPE vpn_ipsec_connection_uptime_seconds gauge\n"
+    f"vpn_ipsec_connection_uptime_seconds{{{OFFICE}}} 60.0\n"
+    f"vpn_ipsec_connection_uptime_seconds{{{LAB}}} 0.0\n"
+    "# HELP vpn_ipsec_connection_connects_total Conexões estabelecidas desde o início do cliente.\n"
+    "# TYPE vpn_ipsec_connection_connects_total counter\n"
+    f"vpn_ipsec_connection_connects_total{{{OFFICE}}} 1\n"
+    f"vpn_ipsec_connection_connects_total{{{LAB}}} 0\n"
+    "# HELP vpn_ipsec_connection_reconnects_total Conexões estabelecidas após a primeira.\n"
+    "# TYPE vpn_ipsec_connection_reconnects_total counter\n"
+    f"vpn_ipsec_connection_reconnects_total{{{OFFICE}}} 0\n"
+    f"vpn_ipsec_connection_reconnects_total{{{LAB}}} 0\n"
+    "# HELP vpn_ipsec_connection_connect_latency_seconds Tempo entre 'ipsec up' e o estado conectado na última conexão.\n"
+    "# TYPE vpn_ipsec_connection_connect_latency_seconds gauge\n"
+    f"vpn_ipsec_connection_connect_latency_seconds{{{OFFICE}}} 1.25\n"
+    "# HELP vpn_ipsec_connection_sa_bytes_in Bytes recebidos pelas CHILD SAs atuais.\n"
+    "# TYPE vpn_ipsec_connection_sa_bytes_in gauge\n"
+    f"vpn_ipsec_connection_sa_bytes_in{{{OFFICE}}} 2048\n"
+    f"vpn_ipsec_connection_sa_bytes_in{{{LAB}}} 0\n"
+    "# HELP vpn_ipsec_connection_sa_bytes_out Bytes enviados pelas CHILD SAs atuais.\n"
+    "# TYPE vpn_ipsec_connection_sa_bytes_out gauge\n"
+    f"vpn_ipsec_connection_sa_bytes_out{{{OFFICE}}} 1024\n"
+    f"vpn_ipsec_connection_sa_bytes_out{{{LAB}}} 0\n"
+    "# HELP vpn_ipsec_connection_sa_packets_in Pacotes recebidos pelas CHILD SAs atuais.\n"
+    "# TYPE vpn_ipsec_connection_sa_packets_in gauge\n"
+    f"vpn_ipsec_connection_sa_packets_in{{{OFFICE}}} 20\n"
+    f"vpn_ipsec_connection_sa_packets_in{{{LAB}}} 0\n"
+    "# HELP vpn_ipsec_connection_sa_packets_out Pacotes enviados pelas CHILD SAs atuais.\n"
+    "# TYPE vpn_ipsec_connection_sa_packets_out gauge\n"
+    f"vpn_ipsec_connection_sa_packets_out{{{OFFICE}}} 10\n"
+    f"vpn_ipsec_connection_sa_packets_out{{{LAB}}} 0\n"
+    "# HELP vpn_ipsec_connection_state 1 para o estado atual da conexão, 0 para os demais.\n"
+    "# TYPE vpn_ipsec_connection_state gauge\n"
+    + _state_lines(OFFICE, "connected")
+    + _state_lines(LAB, "disconnected")
+    + "# HELP vpn_ipsec_connection_transitions_total Transições de estado desde o início do cliente.\n"
+    "# TYPE vpn_ipsec_connection_transitions_total counter\n"
+    f"vpn_ipsec_connection_transitions_total{{{OFFICE}}} 2\n"
+    f"vpn_ipsec_connection_transitions_total{{{LAB}}} 0\n"
+    "# HELP vpn_ipsec_snapshot_timestamp_seconds Momento em que o snapshot foi gerado.\n"
+    "# TYPE vpn_ipsec_snapshot_timestamp_seconds gauge\n"
+    "vpn_ipsec_snapshot_timestamp_seconds 1061.250\n"
+)
+
+
+def test_render_metrics_golden():
+    assert render_metrics(_stats(), now=1061.25) == GOLDEN
+
+
+def test_render_metrics_without_connections():
+    assert render_metrics([], now=5) == (
+        "# HELP vpn_ipsec_snapshot_timestamp_seconds Momento em que o snapshot foi gerado.\n"
+        "# TYPE vpn_ipsec_snapshot_timestamp_seconds gauge\n"
+        "vpn_ipsec_snapshot_timestamp_seconds 5.000\n"
+    )
+
+
+def test_textfile_is_replaced_atomically(tmp_path):
+    path = tmp_path / "vpn_ipsec.prom"
+    exporter = MetricsExporter(textfile_path=str(path))
+
+    exporter.publish("first\n")
+    exporter.publish("second\n")
+
+    assert path.read_text() == "second\n"
+    assert os.listdir(tmp_path) == ["vpn_ipsec.prom"]
+
+
+def test_textfile_failure_removes_temporary(tmp_path, monkeypatch, capsys):
+    def failing_replace(source, destination):
+        raise PermissionError(13, "Permission denied")
+
+    monkeypatch.setattr(prometheus_exporter.os, "replace", failing_replace)
+    exporter = MetricsExporter(textfile_path=str(tmp_path / "vpn_ipsec.prom"))
+
+    exporter.publish("snapshot\n")
+
+    assert os.listdir(tmp_path) == []
+    assert exporter.snapshot == "snapshot\n"
+    assert "Error writing metrics textfile" in capsys.readouterr().out
@@ -0,0 +1,240 @@
+"""
+Acompanhamento dos rekeys (src/ipsec/rekey_monitor.py): prazos do 'ipsec statusall',
+início e fim pelas linhas do charon e pelo estado REKEYING, e a associação da perda das
+sondas ao rekey, com as amostras das sondas fixadas.
+"""
+
+import time
+
+import pytest
+
+from src.ipsec import rekey_monitor
+from src.ipsec.connection_state import ConnectionState, StateTransition
+from src.ipsec.rekey_monitor import (
+    KIND_CHILD_REKEY,
+    KIND_IKE_REKEY,
+    KIND_REAUTH,
+    KIND_REKEY,
+    RekeyEvent,
+    RekeyMonitor,
+    TunnelProber,
+    line_timestamp,
+    parse_sa_timers,
+)
+
+from conftest import replay_command, use_replay, wait_until
+
+STATUSALL = (
+    "Security Associations (1 up, 0 connecting):\n"
+    "      office[3]: ESTABLISHED 20 minutes ago, 192.0.2.10[me]...127.0.0.1[gw]\n"
+    "      office[3]: IKEv2 SPIs: 1a_i* 2b_r, rekeying in 3 hours, pubkey reauthentication in 7 hours\n"
+    "      office{4}:  INSTALLED, TUNNEL, reqid 1, ESP in UDP SPIs: c1_i c2_o\n"
+    "      office{4}:  AES_GCM_16_256, 1024 bytes_i (8 pkts, 1s ago), 2048 bytes_o (9 pkts, 1s ago), "
+    "rekeying in 40 minutes\n"
+    "      office{5}:  AES_GCM_16_256, 0 bytes_i, 0 bytes_o, rekeying in 45 seconds\n"
+    "         lab[7]: IKEv1 SPIs: 3c_i* 4d_r, rekeying in 1 day\n"
+)
+CHILD_REKEY_START = "13[ENC] generating CREATE_CHILD_SA request 5 [ N(REKEY_SA) SA No TSi TSr ]"
+CHILD_ESTABLISHED = "13[IKE] CHILD_SA office{6} established with SPIs c3_i c4_o and TS 10.0.0.0/24"
+IKE_REKEY_START = "07[ENC] generating CREATE_CHILD_SA request 9 [ SA No KE ]"
+IKE_REKEYED = "07[IKE] IKE_SA office[4] rekeyed between 192.0.2.10[me]...127.0.0.1[gw]"
+REAUTH_START = "11[IKE] reauthenticating IKE_SA office[3]"
+NO_PROPOSAL = "13[IKE] received NO_PROPOSAL_CHOSEN notify, no CHILD_SA built"
+
+T0 = 1_700_000_000.0
+
+
+def test_parse_sa_timers():
+    assert parse_sa_timers(STATUSALL) == {
+        "office": {KIND_IKE_REKEY: 3 * 3600, KIND_REAUTH: 7 * 3600, KIND_CHILD_REKEY: 45},
+        "lab": {KIND_IKE_REKEY: 86400},
+    }
+
+
+def test_line_timestamp():
+    stamped = line_timestamp("Oct 19 13:00:00.123 13[IKE] CHILD_SA office{6} established", 0.0)
+
+    assert stamped % 1 == pytest.approx(0.123)
+    assert time.localtime(stamped)[1:6] == (10, 19, 13, 0, 0)
+    assert line_timestamp(CHILD_ESTABLISHED, 42.0) == 42.0
+
+
+def _closed(monitor):
+    return [(event.kind, event.ok, event.duration) for event in monitor._closing]
+
+
+@pytest.fixture
+def monitor():
+    monitor = RekeyMonitor(lambda conn_name: None)
+    yield monitor
+    monitor.stop()
+
+
+@pytest.mark.parametrize(
+    "start, end, kind, ok",
+    [
+        (CHILD_REKEY_START, CHILD_ESTABLISHED, KIND_CHILD_REKEY, True),
+        (IKE_REKEY_START, IKE_REKEYED, KIND_IKE_REKEY, True),
+        (REAUTH_START, CHILD_ESTABLISHED, KIND_REAUTH, True),
+        (CHILD_REKEY_START, NO_PROPOSAL, KIND_CHILD_REKEY, False),
+    ],
+)
+def test_rekeys_from_charon_lines(monitor, start, end, kind, ok):
+    monitor.feed_log_lines("office", [start], now=T0)
+    assert monitor.active["office"].kind == kind
+    assert monitor.status_text("office").startswith(rekey_monitor.KIND_LABELS[kind].capitalize())
+
+    monitor.feed_log_lines("office", ["13[NET] sending packet"], now=T0 + 0.5)
+    monitor.feed_log_lines("office", [end], now=T0 + 1.25)
+
+    assert monitor.active == {}
+    assert _closed(monitor) == [(kind, ok, 1.25)]
+
+
+def test_child_sa_of_the_initial_connect_is_not_a_rekey(monitor):
+    # Sem rekey em andamento, o estabelecimento de uma CHILD_SA não abre nem fecha nada
+    monitor.feed_log_lines("office", [CHILD_ESTABLISHED, IKE_REKEYED], now=T0)
+
+    assert monitor.active == {} and _closed(monitor) == []
+
+
+def test_reauthentication_supersedes_a_running_rekey(monitor):
+    monitor.feed_log_lines("office", [CHILD_REKEY_START], now=T0)
+    monitor.feed_log_lines("office", [REAUTH_START], now=T0 + 1)
+
+    assert monitor.active["office"].kind == KIND_REAUTH
+    assert _closed(monitor) == [(KIND_CHILD_REKEY, True, 1)]
+
+
+def test_quick_mode_is_a_rekey_only_on_an_established_ikev1_tunnel(monitor):
+    quick_mode = "05[ENC] generating QUICK_MODE request 2891 [ HASH SA No ID ID ]"
+    monitor.feed_log_lines("lab", [quick_mode], now=T0)
+    assert monitor.active == {}
+
+    monitor.update_timers({"lab": {KIND_IKE_REKEY: 3600}}, T0, ["lab"])
+    monitor.feed_log_lines("lab", [quick_mode], now=T0)
+    assert monitor.active["lab"].kind == KIND_CHILD_REKEY
+
+
+def _transition(previous, state, at):
+    return StateTransition("office", previous, state, T0 + at)
+
+
+def test_rekeying_state_without_the_log(monitor):
+    monitor.record_transition(_transition(ConnectionState.CONNECTED, ConnectionState.REKEYING, 0))
+    monitor.record_transition(_transition(ConnectionState.REKEYING, ConnectionState.CONNECTED, 2))
+
+    assert _closed(monitor) == [(KIND_REKEY, True, 2)]
+    assert monitor._closing[0].source == "status"
+
+
+def test_tunnel_lost_during_the_rekey(monitor):
+    monitor.update_timers({"office": {KIND_CHILD_REKEY: 30}}, T0, ["office"])
+    monitor.feed_log_lines("office", [CHILD_REKEY_START], now=T0)
+    # Voltar a CONNECTED não fecha um rekey visto no log: o fim vem do charon
+    monitor.record_transition(_transition(ConnectionState.REKEYING, ConnectionState.CONNECTED, 1))
+    assert "office" in monitor.active
+
+    monitor.record_transition(_transition(ConnectionState.CONNECTED, ConnectionState.DISCONNECTED, 3))
+
+    assert _closed(monitor) == [(KIND_CHILD_REKEY, False, 3)]
+    # Os prazos eram da SA que caiu
+    assert monitor.next_rekey("office") is None
+    assert monitor.timers_due(["office"])
+
+
+def test_timers_and_status_text(monitor):
+    monitor.update_timers(parse_sa_timers(STATUSALL), T0, ["office"])
+
+    assert monitor.next_rekey("office", now=T0 + 15) == (KIND_CHILD_REKEY, 30)
+    assert "lab" not in monitor.timers
+    assert monitor.status_text("office", now=T0) == "Próximo rekey da CHILD_SA: em 45 s"
+    # Prazo próximo: o statusall é lido de novo, mas não a cada consulta
+    assert not monitor.timers_due(["office"], now=T0 + 1)
+    assert monitor.timers_due(["office"], now=T0 + rekey_monitor.REKEY_PROBE_LEAD_S)
+    assert monitor.timers_due(["office", "lab"], now=T0 + 1)
+
+
+def _samples(start, lost):
+    # Sondas a cada 0,2 s, deslocadas 0,1 s dos limites dos intervalos
+    return [(start + k * 0.2 + 0.1, k not in lost) for k in range(-10, 30)]
+
+
+def test_loss_between():
+    prober = TunnelProber("10.0.0.1", interval=0.2)
+    prober.samples.extend(_samples(T0, lost={2, 3, 4, 5, 9}))
+
+    sent, lost, stall = prober.loss_between(T0 - 0.4, T0 + 1.45)
+
+    # k de -2 a 6: quatro perdas seguidas (0,8 s); a perda em k=9 fica fora
+    assert (sent, lost) == (9, 4)
+    assert stall == pytest.approx(0.8)
+    assert prober.responsive
+
+
+def test_probe_loss_is_attributed_to_the_rekey(monitor, monkeypatch):
+    monkeypatch.setattr(rekey_monitor, "REKEY_PROBE_TAIL_S", 0)
+    finished = []
+    monitor.add_listener(finished.append)
+    start = time.time() - 5
+    prober = monitor.probers["office"] = TunnelProber("10.0.0.1")
+    prober.samples.extend(_samples(start, lost={2, 3, 4, 5}))
+
+    monitor.feed_log_lines("office", [REAUTH_START], now=start)
+    monitor.feed_log_lines("office", [CHILD_ESTABLISHED], now=start + 1.45)
+    monitor.start()
+    wait_until(lambda: finished)
+
+    (event,) = finished
+    assert (event.kind, event.ok, event.probes_sent, event.probes_lost) == (KIND_REAUTH, True, 9, 4)
+    assert event.stall == pytest.approx(0.8)
+    assert event.disrupted and event.slow
+    assert event.summary() == (
+        "office: reautenticação em 1.45 s, 4/9 sondas perdidas (interrupção de 0.8 s). "
+        "A reautenticação recria as SAs: reauth=no (IKEv2) ou charon.make_before_break=yes evitam a interrupção"
+    )
+    assert monitor.recent("office") == [event]
+    assert monitor.status_text("office").splitlines()[0] == "Últimos 1 rekeys: máx. 1.45 s, 1 com perda de sondas"
+    # Sem rekey em andamento nem previsto, a sonda é encerrada
+    wait_until(lambda: "office" not in monitor.probers)
+
+
+def test_unfinished_rekey_times_out(monitor):
+    finished = []
+    monitor.add_listener(finished.append)
+    monitor.feed_log_lines("office", [IKE_REKEY_START], now=time.time() - rekey_monitor.REKEY_EVENT_TIMEOUT_S - 5)
+
+    monitor.start()
+    wait_until(lambda: finished)
+
+    (event,) = finished
+    assert (event.ok, event.duration, event.probes_sent) == (None, None, None)
+    assert event.summary() == "office: rekey da IKE_SA sem conclusão observada"
+
+
+def test_quiet_rekey_has_no_hint():
+    event = RekeyEvent("office", KIND_CHILD_REKEY, T0)
+    event.end, event.ok = T0 + 0.3, True
+    event.probes_sent, event.probes_lost = 5, 0
+
+    assert event.summary() == "office: rekey da CHILD_SA em 0.30 s, sem perda (5 sondas)"
+
+
+def test_timers_reach_the_monitor_from_statusall(monkeypatch, tmp_path):
+    use_replay(
+        monkeypatch,
+        tmp_path,
+        "conn office\n    right=127.0.0.1\n    auto=add\n",
+        [replay_command(["sudo", "ipsec", "statusall"], STATUSALL)],
+    )
+    from src.ipsec.ipsec_manager import IPsecManager
+
+    manager = IPsecManager()
+    try:
+        manager.apply_status_snapshot(manager.commander.get_status_snapshot(["office"], detailed=True))
+
+        assert manager.get_connection_state("office") == ConnectionState.CONNECTED
+        kind, seconds = manager.rekey_monitor.next_rekey("office")
+        assert kind == KIND_CHILD_REKEY and 40 <= seconds <= 45
+    finally:
+        manager.shutdown()
@@ -0,0 +1,196 @@
+"""
+ResolverCache (src/ipsec/resolver_cache.py) e os gateways que o IPsecManager mantém
+resolvidos: validade pelo TTL, resolução pelo getaddrinfo sem o dnspython, gateways
+acompanhados e ouvintes de mudança de endereço.
+"""
+
+import json
+import socket
+import time
+
+import pytest
+
+from src.ipsec import ipsec_commander, resolver_cache
+from src.ipsec.resolver_cache import ResolverCache
+
+from conftest import wait_until
+
+
+class FakeSystemResolver:
+    """
+    Substitui _query_system: endereços por host e contagem de consultas.
+    """
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.queries = []
+
+    def __call__(self, host):
+        self.queries.append(host)
+        answer = self.answers[host]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+@pytest.fixture
+def system_resolver(monkeypatch):
+    # Sem dnspython: o caminho usado quando o pacote opcional não está instalado
+    monkeypatch.setattr(resolver_cache, "dns", None)
+    fake = FakeSystemResolver({})
+    monkeypatch.setattr(resolver_cache, "_query_system", fake)
+    return fake
+
+
+@pytest.fixture
+def cache():
+    cache = ResolverCache(default_ttl=300, negative_ttl=30, min_ttl=10)
+    yield cache
+    cache.stop()
+
+
+def test_ip_literals_are_not_queried(cache, system_resolver):
+    entry = cache.resolve("203.0.113.5")
+
+    assert entry.addresses == ("203.0.113.5",)
+    assert entry.ttl == float("inf")
+    assert system_resolver.queries == []
+
+
+def test_getaddrinfo_fallback_uses_the_default_ttl(cache, system_resolver):
+    system_resolver.answers["gw.example.net"] = ("192.0.2.1", "2001:db8::1")
+
+    entry = cache.resolve("gw.example.net")
+
+    assert entry.address == "192.0.2.1"
+    assert entry.ttl == 300
+    assert entry.is_fresh
+    # Em cache: nenhuma nova consulta enquanto a entrada for válida
+    assert cache.lookup("gw.example.net") is entry
+    assert cache.resolve("gw.example.net") is entry
+    assert system_resolver.queries == ["gw.example.net"]
+
+
+def test_query_system_keeps_order_without_duplicates(monkeypatch):
+    infos = [
+        (socket.AF_INET, socket.SOCK_DGRAM, 17, "", ("192.0.2.1", 0)),
+        (socket.AF_INET6, socket.SOCK_DGRAM, 17, "", ("2001:db8::1", 0, 0, 0)),
+        (socket.AF_INET, socket.SOCK_DGRAM, 17, "", ("192.0.2.1", 0)),
+    ]
+    monkeypatch.setattr(socket, "getaddrinfo", lambda host, port, type=0: infos)
+
+    assert resolver_cache._query_system("gw.example.net") == ("192.0.2.1", "2001:db8::1")
+
+
+def test_dnspython_ttl_is_clamped_to_the_minimum(cache, monkeypatch):
+    pytest.importorskip("dns.resolver")
+    monkeypatch.setattr(resolver_cache, "_query_dnspython", lambda host: (("192.0.2.1",), 2))
+
+    assert cache.resolve("gw.example.net").ttl == 10
+
+
+def test_expired_entry_is_returned_and_renewed(cache, system_resolver):
+    cache.default_ttl = 0.05
+    system_resolver.answers["gw.example.net"] = ("192.0.2.1",)
+    first = cache.resolve("gw.example.net")
+    changes = []
+    cache.add_change_listener(lambda host, old, new: changes.append((host, old, new)))
+
+    time.sleep(0.06)
+    assert not first.is_fresh
+    system_resolver.answers["gw.example.net"] = ("192.0.2.2",)
+    # lookup não bloqueia: devolve a entrada vencida e agenda a renovação
+    assert cache.lookup("gw.example.net") is first
+
+    wait_until(lambda: changes)
+    assert changes == [("gw.example.net", ("192.0.2.1",), ("192.0.2.2",))]
+    assert cache.lookup("gw.example.net").address == "192.0.2.2"
+
+
+def test_failure_keeps_the_last_known_address(cache, system_resolver):
+    cache.default_ttl = 0.01
+    system_resolver.answers["gw.example.net"] = ("192.0.2.1",)
+    cache.resolve("gw.example.net")
+    time.sleep(0.02)
+    system_resolver.answers["gw.example.net"] = socket.gaierror(socket.EAI_AGAIN, "Temporary failure")
+
+    entry = cache.resolve("gw.example.net")
+
+    assert entry.error == "Temporary failure"
+    assert entry.addresses == ("192.0.2.1",)
+    assert entry.ttl == 30
+
+
+def test_unknown_host_is_a_negative_entry(cache, system_resolver):
+    system_resolver.answers["nope.example.net"] = socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+    entry = cache.resolve("nope.example.net")
+
+    assert entry.address is None
+    assert entry.ttl == 30
+
+
+def test_watch_resolves_in_background_and_replacing_the_set_unwatches(cache, system_resolver):
+    system_resolver.answers.update({"a.example.net": ("192.0.2.1",), "b.example.net": ("192.0.2.2",)})
+
+    cache.watch({"a.example.net", "b.example.net", ""})
+    wait_until(lambda: cache.lookup("a.example.net") and cache.lookup("b.example.net"))
+    assert sorted(system_resolver.queries) == ["a.example.net", "b.example.net"]
+
+    cache.watch({"b.example.net"})
+    for host in ("a.example.net", "b.example.net"):
+        cache._entries[host].expires = 0
+    cache._wakeup.set()
+    # Só o gateway ainda acompanhado é renovado pela thread quando vence
+    wait_until(lambda: system_resolver.queries.count("b.example.net") == 2)
+    assert system_resolver.queries.count("a.example.net") == 1
+
+
+def test_stopped_cache_answers_from_memory(cache, system_resolver):
+    system_resolver.answers["gw.example.net"] = ("192.0.2.1",)
+    cache.stop()
+
+    assert cache.resolve("gw.example.net") is None
+    assert system_resolver.queries == []
+
+
+def test_manager_watches_only_selected_and_active_gateways(tmp_path, monkeypatch):
+    config = "".join(f"conn c{i}\n    right=203.0.113.{i}\n    auto=add\n" for i in range(5))
+    status_c3_up = (
+        "Security Associations (1 up, 0 connecting):\n"
+        "  c3[3]: ESTABLISHED 2 seconds ago, 192.0.2.10[me]...203.0.113.3[gw]\n"
+        "  c3{4}:  INSTALLED, TUNNEL, reqid 1, ESP in UDP SPIs: c1_i c2_o\n"
+    )
+    trace_path = tmp_path / "trace.jsonl"
+    entries = [
+        {"type": "header", "version": 1, "backend": "strongswan", "time": 0,
+         "config": {"/etc/ipsec.conf": config}},
+        {"type": "command", "args": ["which", "ipsec"], "at": 0.0, "duration": 0.0,
+         "returncode": 0, "stdout": "/usr/sbin/ipsec\n", "stderr": ""},
+        {"type": "command", "args": ["sudo", "ipsec", "status"], "at": 0.1, "duration": 0.0,
+         "returncode": 0, "stdout": "", "stderr": ""},
+        {"type": "command", "args": ["sudo", "ipsec", "status"], "at": 0.2, "duration": 0.0,
+         "returncode": 0, "stdout": status_c3_up, "stderr": ""},
+    ]
+    trace_path.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+    monkeypatch.setattr(ipsec_commander, "COMMAND_REPLAY_PATH", str(trace_path))
+    monkeypatch.setattr(ipsec_commander, "COMMAND_REPLAY_LATENCY_SCALE", 0.0)
+    from src.ipsec.ipsec_manager import IPsecManager
+
+    manager = IPsecManager()
+    try:
+        # Carregar o catálogo não resolve nenhum gateway
+        assert len(manager.connections) == 5
+        assert manager._watched_gateways == set()
+
+        manager.select_connection("c1")
+        assert manager._watched_gateways == {"203.0.113.1"}
+
+        # c3 subiu fora do cliente: ativa, passa a ser acompanhada junto com a selecionada
+        manager.refresh_status_snapshot()
+        manager.refresh_status_snapshot()
+        assert manager.get_connection_state("c3").is_connected
+        manager.select_connection("c2")
+        assert manager._watched_gateways == {"203.0.113.2", "203.0.113.3"}
+    finally:
+        manager.shutdown()
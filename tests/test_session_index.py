@@ -0,0 +1,188 @@
+"""
+Histórico de sessões (src/loggers/session_index.py): sessões delimitadas no log de
+texto, índice de deslocamentos, leitura por seek, reconstrução do índice e os casos
+de queda (última linha truncada, índice desatualizado).
+"""
+
+import os
+from datetime import datetime
+
+import pytest
+
+from src.loggers import app_loggers
+from src.loggers.session_index import SessionIndex
+
+
+def _message(log_path, text, when="2026-10-19 10:00:00"):
+    # Mesmo formato do AppLoggers.add_log_message
+    with open(log_path, "a", encoding="utf-8") as log_file:
+        log_file.write(f"[{when}] {text}\n")
+
+
+def _messages(records):
+    return [record["message"] for record in records if record["type"] == "message"]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "vpn_ipsec_client.log"), str(tmp_path / "vpn_sessions.idx")
+
+
+@pytest.fixture
+def two_sessions(paths):
+    log_path, index_path = paths
+    index = SessionIndex(log_path, index_path)
+    _message(log_path, "antes de conectar")
+    index.start_session("office")
+    _message(log_path, "túnel estabelecido")
+    _message(log_path, "rekey\ncom duas linhas")
+    index.end_session()
+    _message(log_path, "entre sessões")
+    index.start_session("lab")
+    _message(log_path, "lab conectado")
+    index.end_session()
+    return index
+
+
+def test_sessions_listed_newest_first(two_sessions):
+    sessions = two_sessions.list_sessions()
+
+    assert [session.conn_name for session in sessions] == ["lab", "office"]
+    assert all(session.duration is not None and session.duration >= 0 for session in sessions)
+
+
+def test_read_session_seeks_to_its_range(two_sessions):
+    lab, office = two_sessions.list_sessions()
+
+    records = two_sessions.read_session(office)
+
+    assert [record["type"] for record in records] == ["session_start", "message", "message", "session_end"]
+    assert records[0]["conn"] == "office"
+    assert _messages(records) == ["túnel estabelecido", "rekey\ncom duas linhas"]
+    assert records[1]["time"] == datetime(2026, 10, 19, 10, 0, 0).timestamp()
+    assert _messages(two_sessions.read_session(lab)) == ["lab conectado"]
+
+
+def test_log_is_the_only_copy_of_messages(paths):
+    log_path, index_path = paths
+    index = SessionIndex(log_path, index_path)
+    index.start_session("office")
+    _message(log_path, "túnel estabelecido")
+    index.end_session()
+
+    with open(log_path, encoding="utf-8") as log_file:
+        assert log_file.read().count("túnel estabelecido") == 1
+    with open(index_path, encoding="utf-8") as index_file:
+        assert "túnel estabelecido" not in index_file.read()
+
+
+def test_rebuild_index_matches_live_index(two_sessions):
+    live = two_sessions.list_sessions()
+    os.remove(two_sessions.index_path)
+
+    rebuilt = two_sessions.list_sessions()
+
+    assert [(s.session_id, s.conn_name, s.offset, s.end_offset) for s in rebuilt] == [
+        (s.session_id, s.conn_name, s.offset, s.end_offset) for s in live
+    ]
+    # O log guarda o horário em segundos
+    assert [int(s.start) for s in rebuilt] == [int(s.start) for s in live]
+    assert _messages(two_sessions.read_session(rebuilt[1])) == ["túnel estabelecido", "rekey\ncom duas linhas"]
+
+
+def test_log_written_before_the_index(paths):
+    # Cabeçalhos no formato que o AppLoggers sempre escreveu, sem índice
+    log_path, index_path = paths
+    with open(log_path, "w", encoding="utf-8") as log_file:
+        log_file.write(
+            "\n" + "=" * 50 + "\nVPN IPsec Log - Connection: legacy\n"
+            "Start Time: 2026-01-02 03:04:05\n" + "=" * 50 + "\n"
+            "[2026-01-02 03:04:06] conectado\n"
+            + "=" * 50 + "\nEnd Time: 2026-01-02 03:14:05\nConnection ended.\n" + "=" * 50 + "\n"
+        )
+
+    (session,) = SessionIndex(log_path, index_path).list_sessions()
+
+    assert session.conn_name == "legacy"
+    assert session.duration == 600
+    assert _messages(SessionIndex(log_path, index_path).read_session(session)) == ["conectado"]
+
+
+def test_interrupted_session_with_truncated_last_line(paths):
+    log_path, index_path = paths
+    index = SessionIndex(log_path, index_path)
+    index.start_session("office")
+    _message(log_path, "túnel estabelecido")
+    # Queda no meio da escrita de uma mensagem: sem fim de sessão nem quebra de linha
+    with open(log_path, "ab") as log_file:
+        log_file.write("[2026-10-19 10:00:01] mensagem inter".encode("utf-8")[:-3])
+
+    (interrupted,) = SessionIndex(log_path, index_path).list_sessions()
+    assert interrupted.end_offset is None
+    assert _messages(SessionIndex(log_path, index_path).read_session(interrupted)) == [
+        "túnel estabelecido",
+        "mensagem in",
+    ]
+
+    restarted = SessionIndex(log_path, index_path)
+    restarted.start_session("lab")
+    lab, office = restarted.list_sessions()
+    # A sessão interrompida termina onde a seguinte começa
+    assert office.end_offset == lab.offset
+    assert office.duration is None
+    assert restarted.read_session(lab)[0]["conn"] == "lab"
+
+
+def test_truncated_index_line_does_not_swallow_the_next_entry(paths):
+    log_path, index_path = paths
+    index = SessionIndex(log_path, index_path)
+    index.start_session("office")
+    index.end_session()
+    with open(index_path, "a", encoding="utf-8") as index_file:
+        index_file.write('{"event": "start", "sess')
+
+    index.start_session("lab")
+    index.end_session()
+
+    assert [session.conn_name for session in index.list_sessions()] == ["lab", "office"]
+
+
+def test_stale_index_is_rebuilt(paths):
+    log_path, index_path = paths
+    index = SessionIndex(log_path, index_path)
+    for name in ("office", "lab", "home"):
+        index.start_session(name)
+        _message(log_path, f"{name} conectado")
+        index.end_session()
+
+    # Log apagado e reescrito: os deslocamentos do índice apontam para outro conteúdo
+    os.remove(log_path)
+    fresh = SessionIndex(log_path, index_path)
+    _message(log_path, "novo log")
+    fresh.start_session("office")
+    _message(log_path, "office conectado de novo")
+    fresh.end_session()
+
+    (session,) = SessionIndex(log_path, index_path).list_sessions()
+    assert session.conn_name == "office"
+    assert _messages(fresh.read_session(session)) == ["office conectado de novo"]
+
+
+def test_app_loggers_write_each_message_once(tmp_path, monkeypatch):
+    log_path = str(tmp_path / "vpn_ipsec_client.log")
+    monkeypatch.setattr(app_loggers, "LOG_FILE_PATH", log_path)
+    loggers = app_loggers.AppLoggers()
+    loggers.session_index.log_path = log_path
+    loggers.session_index.index_path = str(tmp_path / "vpn_sessions.idx")
+
+    loggers.create_log_file("office")
+    loggers.add_log_message("túnel estabelecido")
+    loggers.delete_log_file()
+
+    assert sorted(os.listdir(tmp_path)) == ["vpn_ipsec_client.log", "vpn_sessions.idx"]
+    (session,) = loggers.session_index.list_sessions()
+    assert _messages(loggers.session_index.read_session(session)) == ["túnel estabelecido"]
+    with open(log_path, encoding="utf-8") as log_file:
+        content = log_file.read()
+    assert content.count("túnel estabelecido") == 1
+    assert "VPN IPsec Log - Connection: office" in content and "Connection ended." in content
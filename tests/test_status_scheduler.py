@@ -0,0 +1,159 @@
+"""
+StatusScheduler (src/ipsec/status_scheduler.py): consulta única em andamento, nova
+consulta pedida durante outra, recuo durante transições e registro de falhas.
+"""
+
+import threading
+
+import pytest
+
+from src.config.app_config import (
+    STATUS_POLL_FAST_MS,
+    STATUS_POLL_HIDDEN_MS,
+    STATUS_POLL_MAX_FAST_MS,
+    STATUS_POLL_STABLE_MS,
+)
+from src.ipsec.connection_state import ConnectionState, StateTransition
+from src.ipsec.status_scheduler import StatusScheduler
+
+from conftest import wait_until
+
+
+class FakeManager:
+    """
+    O suficiente do IPsecManager para o agendador; cada consulta espera 'release'.
+    """
+
+    def __init__(self):
+        self.listeners = []
+        self.polls = 0
+        self.applied = []
+        self.transitional = False
+        self.error = None
+        self.release = threading.Event()
+        self.release.set()
+
+    def add_transition_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_transition_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def poll_status_snapshot(self):
+        self.polls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {"office": "up"}
+
+    def apply_status_snapshot(self, snapshot, polled_at=None):
+        self.applied.append((snapshot, polled_at))
+
+    def expire_stale_transitions(self, timeout):
+        pass
+
+    def expire_warm_ike_sas(self):
+        return []
+
+    def has_transitional_states(self):
+        return self.transitional
+
+
+@pytest.fixture
+def scheduler(qapp):
+    manager = FakeManager()
+    scheduler = StatusScheduler(manager)
+    yield scheduler, manager
+    manager.release.set()
+    scheduler.stop()
+
+
+def test_single_poll_in_flight_and_pending_refresh(scheduler):
+    scheduler, manager = scheduler
+    manager.release.clear()
+    scheduler.start()
+    wait_until(lambda: manager.polls == 1)
+
+    for _ in range(3):
+        scheduler.request_refresh()
+    scheduler._poll()
+    assert manager.polls == 1
+    assert scheduler._refresh_pending
+
+    # Os pedidos durante a consulta viram uma única nova consulta, logo após ela
+    manager.release.set()
+    wait_until(lambda: len(manager.applied) == 2)
+    assert manager.polls == 2
+    assert not scheduler._refresh_pending
+    assert scheduler._timer.remainingTime() > STATUS_POLL_STABLE_MS - 1000
+
+
+def test_snapshot_is_applied_with_the_poll_start_time(scheduler):
+    scheduler, manager = scheduler
+    updates = []
+    scheduler.snapshot_updated.connect(lambda: updates.append(True))
+    scheduler.start()
+
+    wait_until(lambda: updates)
+    snapshot, polled_at = manager.applied[0]
+    assert snapshot == {"office": "up"}
+    assert polled_at == scheduler._polled_at > 0
+
+
+def test_transition_during_poll_requests_another(scheduler):
+    scheduler, manager = scheduler
+    manager.release.clear()
+    scheduler.start()
+    wait_until(lambda: manager.polls == 1)
+
+    transition = StateTransition("office", ConnectionState.DISCONNECTED, ConnectionState.CONNECTING, 0.0)
+    emitted = []
+    scheduler.state_changed.connect(emitted.append)
+    manager.listeners[0](transition)
+
+    assert emitted == [transition]
+    assert scheduler._refresh_pending
+    manager.release.set()
+    wait_until(lambda: manager.polls == 2)
+
+
+def test_backoff_during_transitions(scheduler):
+    scheduler, manager = scheduler
+    manager.transitional = True
+
+    intervals = [scheduler._next_interval() for _ in range(8)]
+
+    assert intervals[0] == STATUS_POLL_FAST_MS
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == STATUS_POLL_MAX_FAST_MS
+
+    manager.transitional = False
+    assert scheduler._next_interval() == STATUS_POLL_STABLE_MS
+    assert scheduler._fast_interval == STATUS_POLL_FAST_MS
+    scheduler.set_background(True)
+    assert scheduler._next_interval() == STATUS_POLL_HIDDEN_MS
+
+
+def test_failures_are_reported_once_per_distinct_error(scheduler, capsys):
+    scheduler, manager = scheduler
+    failures = []
+    scheduler.poll_failed.connect(failures.append)
+    manager.error = RuntimeError("whack: socket ausente")
+    scheduler.start()
+
+    wait_until(lambda: manager.polls == 1 and not scheduler._in_flight)
+    for expected_polls in (2, 3):
+        scheduler.request_refresh()
+        wait_until(lambda: manager.polls == expected_polls and not scheduler._in_flight)
+
+    assert failures == ["Falha na consulta de status: RuntimeError: whack: socket ausente"]
+    assert manager.applied == []
+    assert "Traceback" in capsys.readouterr().out
+
+    # Após uma consulta bem-sucedida o mesmo erro volta a ser informado
+    manager.error = None
+    scheduler.request_refresh()
+    wait_until(lambda: manager.applied)
+    manager.error = RuntimeError("whack: socket ausente")
+    scheduler.request_refresh()
+    wait_until(lambda: len(failures) == 2)